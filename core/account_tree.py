@@ -0,0 +1,119 @@
+"""
+⚡ شجرة الحسابات في الذاكرة: عقدة لكل كود مع مؤشر للأب ومجموع الفرع.
+
+تُبنى مرة واحدة ثم تُرقَّع بالفروق: تغيير رصيد حساب واحد يعدّل مجاميع
+سلسلة آبائه فقط بدل إعادة بناء الشجرة وإعادة جمعها بالكامل.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping
+
+
+def infer_parent_code(code: str) -> str | None:
+    """استنتاج كود الأب من نمط الترقيم (6 أو 4 أرقام) عند غياب parent_id."""
+    if not code:
+        return None
+    code_len = len(code)
+    if code_len == 6:
+        if code.endswith("00000"):
+            return None
+        if code.endswith("0000"):
+            return code[0] + "00000"
+        if code.endswith("000"):
+            return code[:2] + "0000"
+        if code.endswith("00"):
+            return code[:3] + "000"
+        return code[:4] + "00"
+    if code_len == 4:
+        if code.endswith("000"):
+            return None
+        if code.endswith("00"):
+            return code[0] + "000"
+        return code[:2] + "00"
+    return None
+
+
+def _is_root_code(code: str) -> bool:
+    return (len(code) == 6 and code.endswith("00000")) or (len(code) == 4 and code.endswith("000"))
+
+
+def build_account_tree(
+    accounts: Iterable, overrides: Mapping[str, float] | None = None
+) -> dict[str, dict]:
+    """
+    بناء الشجرة: {code: {obj, total, children, is_group, parent}}.
+    total للورقة = رصيدها (أو القيمة التشغيلية المشتقة)، وللمجموعة = مجموع أبنائها.
+    """
+    accounts = [acc for acc in accounts if getattr(acc, "code", None)]
+    tree_map: dict[str, dict] = {}
+    for acc in accounts:
+        tree_map[acc.code] = {
+            "obj": acc,
+            "total": getattr(acc, "balance", 0.0) or 0.0,
+            "children": [],
+            "is_group": getattr(acc, "is_group", False),
+            "parent": None,
+        }
+
+    for code, balance in (overrides or {}).items():
+        if code in tree_map:
+            tree_map[code]["total"] = float(balance)
+
+    for acc in accounts:
+        if _is_root_code(acc.code):
+            continue
+        parent_code = getattr(acc, "parent_id", None) or getattr(acc, "parent_code", None)
+        if not parent_code:
+            parent_code = infer_parent_code(acc.code)
+        if parent_code and parent_code in tree_map and parent_code != acc.code:
+            tree_map[parent_code]["children"].append(tree_map[acc.code])
+            tree_map[acc.code]["parent"] = parent_code
+
+    def calculate_total(node: dict, visiting: set[int]) -> float:
+        if not node["children"] or id(node) in visiting:
+            return float(node["total"])
+        visiting.add(id(node))
+        total = sum(calculate_total(child, visiting) for child in node["children"])
+        node["total"] = total
+        return float(total)
+
+    for node in tree_map.values():
+        acc = node["obj"]
+        parent_id = getattr(acc, "parent_id", None) or getattr(acc, "parent_code", None)
+        if not parent_id or parent_id not in tree_map:
+            calculate_total(node, set())
+
+    return tree_map
+
+
+def apply_account_tree_deltas(tree_map: dict[str, dict], deltas: Mapping[str, float]) -> bool:
+    """
+    ⚡ ترقيع الشجرة بفروق أرصدة أوراق: رصيد الورقة وكل آبائها (كما في قاعدة البيانات)
+    ومجموع الفرع على مسار الأسلاف فقط.
+
+    Returns:
+        False لو كود غير موجود في الشجرة (يجب إعادة البناء)
+    """
+    if any(code not in tree_map for code in deltas):
+        return False
+
+    for code, delta in deltas.items():
+        delta = float(delta or 0.0)
+        if not delta:
+            continue
+        node = tree_map[code]
+        affects_total = not node["children"]
+        visited: set[str] = set()
+        current: str | None = code
+        while current and current in tree_map and current not in visited:
+            visited.add(current)
+            current_node = tree_map[current]
+            acc = current_node["obj"]
+            if hasattr(acc, "model_copy"):
+                balance = float(getattr(acc, "balance", 0.0) or 0.0) + delta
+                current_node["obj"] = acc.model_copy(update={"balance": balance})
+            if affects_total:
+                current_node["total"] = float(current_node["total"] or 0.0) + delta
+            current = current_node.get("parent")
+    return True
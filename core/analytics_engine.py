@@ -0,0 +1,164 @@
+"""
+⚡ محرك تحليلات عمودي (NumPy) للتدفق النقدي و KPIs الفترات.
+
+البيانات (تاريخ، مبلغ) تُحمّل مرة واحدة في مصفوفات مرتبة بالتاريخ، ثم:
+- مجموع أي فترة = بحث ثنائي + فرق مجموع تراكمي (O(log n)).
+- التجميع اليومي/الأسبوعي/الشهري = groupby متجه (np.unique + np.bincount).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import datetime
+
+import numpy as np
+
+_DATETIME_UNIT = "datetime64[us]"
+_EMPTY_DATES = np.array([], dtype=_DATETIME_UNIT)
+
+
+def _to_datetime64(value: datetime) -> np.datetime64:
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None)
+    return np.datetime64(value, "us")
+
+
+class DatedColumn:
+    """قيم مرتبة بالتاريخ مع مواضعها الأصلية (لاستخراج السجلات نفسها عند الحاجة)."""
+
+    __slots__ = ("dates", "values", "positions", "_cumsum")
+
+    def __init__(self, dates: np.ndarray, values: np.ndarray, positions: np.ndarray):
+        order = np.argsort(dates, kind="stable")
+        self.dates = dates[order]
+        self.values = values[order]
+        self.positions = positions[order]
+        self._cumsum = np.concatenate(([0.0], np.cumsum(self.values)))
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[tuple[int, datetime | None, float]]) -> DatedColumn:
+        """بناء العمود من (الموضع الأصلي، التاريخ، القيمة)؛ السجلات بدون تاريخ تُتجاهل."""
+        positions: list[int] = []
+        dates: list[np.datetime64] = []
+        values: list[float] = []
+        for position, date_value, amount in pairs:
+            if not isinstance(date_value, datetime):
+                continue
+            positions.append(position)
+            dates.append(_to_datetime64(date_value))
+            values.append(amount)
+        if not dates:
+            return cls(_EMPTY_DATES, np.array([], dtype=np.float64), np.array([], dtype=np.int64))
+        return cls(
+            np.array(dates, dtype=_DATETIME_UNIT),
+            np.array(values, dtype=np.float64),
+            np.array(positions, dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return int(self.dates.size)
+
+    def _bounds(self, start: datetime, end: datetime) -> tuple[int, int]:
+        low = int(np.searchsorted(self.dates, _to_datetime64(start), side="left"))
+        high = int(np.searchsorted(self.dates, _to_datetime64(end), side="right"))
+        return low, max(low, high)
+
+    def total(self, start: datetime, end: datetime) -> float:
+        """مجموع القيم في [start, end] (شاملة الطرفين)."""
+        low, high = self._bounds(start, end)
+        return float(self._cumsum[high] - self._cumsum[low])
+
+    def positions_between(self, start: datetime, end: datetime) -> np.ndarray:
+        """المواضع الأصلية للسجلات في [start, end] بترتيبها الأصلي."""
+        low, high = self._bounds(start, end)
+        return np.sort(self.positions[low:high])
+
+    def buckets(self, start: datetime, end: datetime, period: str) -> dict[str, float]:
+        """تجميع القيم في [start, end] حسب "daily" / "weekly" / "monthly" (الافتراضي)."""
+        low, high = self._bounds(start, end)
+        if high <= low:
+            return {}
+        dates = self.dates[low:high]
+        values = self.values[low:high]
+
+        if period == "daily":
+            keys = dates.astype("datetime64[D]")
+        elif period == "weekly":
+            keys = _iso_week_keys(dates)
+        else:
+            keys = dates.astype("datetime64[M]")
+
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=values, minlength=unique_keys.size)
+        if period == "weekly":
+            labels = [f"{int(key) // 100}-W{int(key) % 100:02d}" for key in unique_keys]
+        else:
+            labels = [str(key) for key in unique_keys]
+        return dict(zip(labels, (float(value) for value in sums), strict=True))
+
+
+def _iso_week_keys(dates: np.ndarray) -> np.ndarray:
+    """مفتاح ISO (السنة * 100 + رقم الأسبوع) لكل تاريخ، بنفس نتيجة isocalendar()."""
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    weekday = (days + 3) % 7  # 1970-01-01 كان خميس -> الاثنين = 0
+    thursday = days - weekday + 3
+    iso_year = thursday.astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64)
+    year_start = iso_year.astype("datetime64[Y]").astype("datetime64[D]").astype(np.int64)
+    week = (thursday - year_start) // 7 + 1
+    return (iso_year + 1970) * 100 + week
+
+
+class AnalyticsSnapshot:
+    """
+    ⚡ لقطة أعمدة التحليلات لنسخة بيانات واحدة (version من change_counters).
+    تُبنى مرة وتخدم كل تغييرات نطاق الفترة حتى تتغير البيانات.
+    """
+
+    def __init__(
+        self,
+        version,
+        inflows: DatedColumn,
+        outflows: DatedColumn,
+        revenue: DatedColumn,
+        expense_lines: DatedColumn,
+        projects: DatedColumn,
+        project_records: list,
+        payment_records: list | None = None,
+        expense_records: list | None = None,
+        journal_entries: DatedColumn | None = None,
+        journal_records: list | None = None,
+    ):
+        self.version = version
+        self.inflows = inflows
+        self.outflows = outflows
+        self.revenue = revenue
+        self.expense_lines = expense_lines
+        self.projects = projects
+        self.project_records = project_records
+        # السجلات المقابلة لمواضع الأعمدة (للفلترة بالتاريخ بدون تحميل جديد)
+        self.payment_records = payment_records or []
+        self.expense_records = expense_records or []
+        self.journal_entries = journal_entries or DatedColumn.from_pairs(())
+        self.journal_records = journal_records or []
+        # مستحقات المشاريع تُحسب عند أول طلب لكل مشروع ثم تُحفظ لهذه النسخة
+        self.project_receivables: dict[int, float] = {}
+
+    def records_between(self, source: str, start: datetime, end: datetime) -> list:
+        """سجلات المصدر (payments/expenses/projects/journal_entries) داخل الفترة."""
+        column, records = {
+            "payments": (self.inflows, self.payment_records),
+            "expenses": (self.outflows, self.expense_records),
+            "projects": (self.projects, self.project_records),
+            "journal_entries": (self.journal_entries, self.journal_records),
+        }[source]
+        return [records[int(index)] for index in column.positions_between(start, end)]
+
+    def cash_flow(self, start: datetime, end: datetime, period: str) -> dict:
+        inflows = self.inflows.buckets(start, end, period)
+        outflows = self.outflows.buckets(start, end, period)
+        periods = sorted(set(inflows) | set(outflows))
+        return {
+            "inflows": [(key, inflows.get(key, 0.0)) for key in periods],
+            "outflows": [(key, outflows.get(key, 0.0)) for key in periods],
+            "net_flow": [(key, inflows.get(key, 0.0) - outflows.get(key, 0.0)) for key in periods],
+        }
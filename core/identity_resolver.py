@@ -0,0 +1,152 @@
+"""
+⚡ فهرس هويات العملاء والمشاريع في الذاكرة.
+
+يحوّل أي مرجع (id محلي، _mongo_id، الاسم، كود المشروع، رقم الفاتورة) إلى الصف
+الأصلي في O(1). النسخة (version) مأخوذة من change_counters للعملاء والمشاريع،
+فلا يُعاد البناء إلا عند الكتابة في أحد الجدولين.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterable
+from typing import Any
+
+_PROJECT_EXACT_FIELDS = ("name", "id", "_mongo_id")
+_PROJECT_KEY_FIELDS = ("project_code", "invoice_number")
+
+
+class IdentityResolver:
+    """لقطة هويات للقراءة فقط (لا تعدّل الصفوف المرجعة)."""
+
+    def __init__(
+        self,
+        version: Any,
+        client_rows: Iterable[dict[str, Any]],
+        project_rows: Iterable[dict[str, Any]],
+        client_key: Callable[[Any], str],
+        project_key: Callable[[Any], str],
+    ):
+        self.version = version
+        self.project_rows: list[dict[str, Any]] = list(project_rows)
+        self._project_key = project_key
+
+        self._clients_by_ref: dict[str, dict[str, Any]] = {}
+        self._clients_by_key: dict[str, dict[str, Any]] = {}
+        for row in client_rows:
+            for field in ("id", "_mongo_id", "name"):
+                value = str(row.get(field) or "").strip()
+                if value:
+                    self._clients_by_ref.setdefault(value, row)
+            name_key = client_key(row.get("name"))
+            if name_key:
+                self._clients_by_key.setdefault(name_key, row)
+        self._client_key = client_key
+
+        self._projects_exact: dict[str, dict[str, list[dict[str, Any]]]] = {
+            field: {} for field in _PROJECT_EXACT_FIELDS
+        }
+        self._projects_by_key: dict[str, dict[str, list[dict[str, Any]]]] = {
+            field: {} for field in (*_PROJECT_KEY_FIELDS, "name")
+        }
+        for row in self.project_rows:
+            for field in _PROJECT_EXACT_FIELDS:
+                value = str(row.get(field) or "")
+                if field == "_mongo_id":
+                    value = value.strip()
+                if value:
+                    self._projects_exact[field].setdefault(value, []).append(row)
+            for field in _PROJECT_KEY_FIELDS:
+                if not str(row.get(field) or "").strip():
+                    continue
+                key = project_key(row.get(field))
+                if key:
+                    self._projects_by_key[field].setdefault(key, []).append(row)
+            name_key = project_key(row.get("name"))
+            if name_key:
+                self._projects_by_key["name"].setdefault(name_key, []).append(row)
+
+    # ---------- العملاء ----------
+
+    def client(self, reference: Any) -> dict[str, Any] | None:
+        """صف العميل (id, _mongo_id, name) لأي مرجع: مطابقة حرفية ثم الاسم المطبّع."""
+        text = str(reference or "").strip()
+        if not text:
+            return None
+        row = self._clients_by_ref.get(text)
+        if row is None:
+            row = self._clients_by_key.get(self._client_key(text))
+        return row
+
+    def client_name(self, reference: Any) -> str:
+        row = self.client(reference)
+        return str(row.get("name") or "").strip() if row else ""
+
+    def client_references(self, reference: Any) -> set[str]:
+        """كل المراجع المعروفة لنفس العميل (المرجع نفسه + id + _mongo_id + الاسم)."""
+        text = str(reference or "").strip()
+        if not text:
+            return set()
+        references = {text}
+        row = self.client(text)
+        if row is not None:
+            for field in ("id", "_mongo_id", "name"):
+                value = str(row.get(field) or "").strip()
+                if value:
+                    references.add(value)
+        return references
+
+    def client_keys(self, reference: Any) -> set[str]:
+        """مراجع العميل بصيغة مفاتيح المشاريع (لفرز المشاريع المتشابهة بالعميل)."""
+        keys = {self._project_key(value) for value in self.client_references(reference)}
+        keys.discard("")
+        return keys
+
+    # ---------- المشاريع ----------
+
+    def project(self, reference: str, client_keys: set[str] | None = None) -> dict[str, Any] | None:
+        """
+        صف المشروع بنفس أولوية المطابقة: الاسم، id رقمي، _mongo_id، كود المشروع /
+        رقم الفاتورة، ثم الاسم المطبّع. عند التعدد يُفرز بالعميل (client_keys مطبّعة).
+        """
+        if not reference:
+            return None
+
+        def pick(candidates: list[dict[str, Any]] | None) -> dict[str, Any] | None:
+            if not candidates:
+                return None
+            if len(candidates) == 1:
+                return candidates[0]
+            if client_keys:
+                by_client = [
+                    row
+                    for row in candidates
+                    if self._project_key(row.get("client_id")) in client_keys
+                ]
+                if len(by_client) == 1:
+                    return by_client[0]
+            return None
+
+        chosen = pick(self._projects_exact["name"].get(reference))
+        if chosen is None and reference.isdigit():
+            chosen = pick(self._projects_exact["id"].get(reference))
+        if chosen is None:
+            chosen = pick(self._projects_exact["_mongo_id"].get(reference))
+        if chosen is not None:
+            return chosen
+
+        ref_key = self._project_key(reference)
+        for field in (*_PROJECT_KEY_FIELDS, "name"):
+            chosen = pick(self._projects_by_key[field].get(ref_key))
+            if chosen is not None:
+                return chosen
+        return None
+
+    def has_ambiguous_project_name(self, reference: str) -> bool:
+        matches = {
+            id(row)
+            for row in (
+                *(self._projects_exact["name"].get(reference) or ()),
+                *(self._projects_by_key["name"].get(self._project_key(reference)) or ()),
+            )
+        }
+        return len(matches) > 1
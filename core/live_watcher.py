@@ -63,6 +63,7 @@ class LiveDataWatcher(QObject):
         self._last_check_time = {}
         self._last_counts = {}
         self._last_modified = {}
+        self._last_versions: dict[str, int] = {}  # ⚡ آخر version من change_counters
         self._shutdown = False
         self._pending_changes = set()  # ⚡ تجميع التغييرات لتقليل الإشارات
         self._debounce_timer = None  # ⚡ مؤقت للتأخير
@@ -122,8 +123,24 @@ class LiveDataWatcher(QObject):
         self._is_running = False
         logger.info("[LiveWatcher] ⏹️ تم إيقاف المراقبة")
 
+    def _read_change_counters(self):
+        """⚡ قراءة عدّادات التغييرات (صف صغير لكل جدول) أو None لو غير متاحة."""
+        reader = getattr(self.repository, "get_change_counters", None)
+        if not callable(reader):
+            return None
+        try:
+            return reader(self.WATCHED_TABLES)
+        except Exception as e:
+            logger.debug("[LiveWatcher] تعذر قراءة change_counters: %s", e)
+            return None
+
     def _init_counts(self):
         """تهيئة الأعداد الأولية للجداول"""
+        counters = self._read_change_counters()
+        if counters is not None:
+            for table in self.WATCHED_TABLES:
+                self._last_versions[table] = counters.get(table, (0, None))[0]
+            return
         try:
             cursor = self.repository.get_cursor()
             try:
@@ -149,6 +166,11 @@ class LiveDataWatcher(QObject):
         if self._shutdown:
             return
 
+        counters = self._read_change_counters()
+        if counters is not None:
+            self._check_change_counters(counters)
+            return
+
         try:
             cursor = self.repository.get_cursor()
             changed_tables = []
@@ -168,7 +190,6 @@ class LiveDataWatcher(QObject):
                         if current_count != self._last_counts.get(
                             table, 0
                         ) or current_modified != self._last_modified.get(table):
-
                             changed_tables.append(table)
                             self._last_counts[table] = current_count
                             self._last_modified[table] = current_modified
@@ -186,6 +207,26 @@ class LiveDataWatcher(QObject):
         except Exception as e:
             logger.debug("[LiveWatcher] خطأ في فحص التغييرات: %s", e)
 
+    def _check_change_counters(self, counters: dict):
+        """
+        ⚡ مقارنة version لكل جدول مع آخر قيمة مقروءة (تكلفة ثابتة مهما كبر حجم البيانات).
+        """
+        changed_tables = []
+        for table in self.WATCHED_TABLES:
+            version = counters.get(table, (0, None))[0]
+            previous = self._last_versions.get(table)
+            if previous is None:
+                self._last_versions[table] = version
+                continue
+            if version == previous:
+                continue
+            self._last_versions[table] = version
+            changed_tables.append(table)
+
+        if changed_tables:
+            self._pending_changes.update(changed_tables)
+            self._schedule_emit()
+
     def _schedule_emit(self):
         """⚡ جدولة إرسال الإشارات مع تأخير لتجميع التغييرات"""
         if self._debounce_timer is None:
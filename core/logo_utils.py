@@ -1,4 +1,5 @@
 import base64
+import hashlib
 import os
 from pathlib import Path
 from typing import Any
@@ -121,3 +122,68 @@ def rasterize_svg_to_png_bytes(svg_bytes: bytes, width_px: int, height_px: int)
         return out
     except Exception:
         return None
+
+
+# ⚡ مخزن الشعارات بالمحتوى (content-addressed): الصورة تُحفظ مرة واحدة باسم بصمتها
+LOGO_THUMBNAIL_SIZE = 128
+
+
+def logo_blob_from_data(logo_data: Any) -> tuple[bytes, str] | None:
+    """(bytes, mime) من logo_data (data URL / base64 / SVG)؛ النص غير المفهوم يُحفظ كما هو."""
+    text = str(logo_data).strip() if logo_data is not None else ""
+    if not text:
+        return None
+    data_url = image_data_url_from_sources(text)
+    if data_url.startswith("data:") and "," in data_url:
+        meta, payload = data_url.split(",", 1)
+        try:
+            return base64.b64decode(payload, validate=False), meta[5:].split(";", 1)[0]
+        except Exception:
+            pass
+    return text.encode("utf-8"), "text/plain"
+
+
+def logo_data_from_blob(data: bytes, mime: str) -> str:
+    """عكس logo_blob_from_data: الصور ترجع data URL والنص يرجع كما هو."""
+    if str(mime or "").startswith("image/"):
+        return _data_url_from_bytes(data, mime)
+    return data.decode("utf-8", errors="replace")
+
+
+def logo_content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def logo_thumbnail_png_bytes(
+    data: bytes, mime: str, size_px: int = LOGO_THUMBNAIL_SIZE
+) -> bytes | None:
+    """صورة مصغرة PNG (size_px كحد أقصى) لعرض القوائم؛ None لو Qt غير متاح أو الصورة تالفة."""
+    if mime == "image/svg+xml":
+        return rasterize_svg_to_png_bytes(data, size_px, size_px)
+    if not str(mime or "").startswith("image/"):
+        return None
+    try:
+        from PyQt6.QtCore import QBuffer, QIODevice, Qt
+        from PyQt6.QtGui import QImage
+    except Exception:
+        return None
+
+    try:
+        image = QImage()
+        if not image.loadFromData(data) or image.isNull():
+            return None
+        if image.width() > size_px or image.height() > size_px:
+            image = image.scaled(
+                size_px,
+                size_px,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation,
+            )
+        buf = QBuffer()
+        buf.open(QIODevice.OpenModeFlag.WriteOnly)
+        image.save(buf, "PNG")
+        out = bytes(buf.data())
+        buf.close()
+        return out or None
+    except Exception:
+        return None
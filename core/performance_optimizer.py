@@ -19,7 +19,7 @@ import weakref
 from collections import OrderedDict
 from collections.abc import Callable
 from contextlib import contextmanager
-from queue import Queue
+from queue import Empty, Queue
 from typing import Any
 
 from core.logger import get_logger
@@ -43,19 +43,24 @@ class SQLiteConnectionPool:
     """
     ⚡ Connection Pool لـ SQLite
     يوفر اتصالات جاهزة للاستخدام بدلاً من إنشاء اتصال جديد كل مرة
+
+    بدون db_path يرجع الـ instance العام المشترك؛ مع db_path يُنشأ pool مستقل
+    (مثلاً pool قراءة فقط خاص بـ Repository). الاتصالات تُنشأ عند الحاجة حتى pool_size.
     """
 
     _instance = None
     _lock = threading.Lock()
 
-    def __new__(cls, *args, **kwargs):
+    def __new__(cls, db_path: str | None = None, *args, **kwargs):
+        if db_path is not None:
+            return super().__new__(cls)
         if cls._instance is None:
             with cls._lock:
                 if cls._instance is None:
                     cls._instance = super().__new__(cls)
         return cls._instance
 
-    def __init__(self, db_path: str | None = None, pool_size: int = 5):
+    def __init__(self, db_path: str | None = None, pool_size: int = 5, *, read_only: bool = False):
         if hasattr(self, "_initialized"):
             return
         self._initialized = True
@@ -67,17 +72,19 @@ class SQLiteConnectionPool:
             db_path = Config.get_local_db_path()
 
         self.db_path = db_path
-        self.pool_size = pool_size
-        self._pool: Queue = Queue(maxsize=pool_size)
+        self.pool_size = max(1, int(pool_size))
+        self.read_only = read_only
+        self._pool: Queue = Queue(maxsize=self.pool_size)
         self._lock = threading.RLock()
         self._active_connections = 0
+        self._all_connections: list[sqlite3.Connection] = []
+        self._closed = False
 
-        # إنشاء الاتصالات الأولية
-        for _ in range(pool_size):
-            conn = self._create_connection()
-            self._pool.put(conn)
-
-        logger.info("⚡ [ConnectionPool] تم إنشاء %s اتصالات", pool_size)
+        logger.info(
+            "⚡ [ConnectionPool] pool %s بحد %s اتصالات",
+            "قراءة فقط" if read_only else "قراءة/كتابة",
+            self.pool_size,
+        )
 
     def _create_connection(self) -> sqlite3.Connection:
         """إنشاء اتصال جديد محسّن"""
@@ -90,26 +97,54 @@ class SQLiteConnectionPool:
         conn.row_factory = sqlite3.Row
 
         # تحسينات SQLite للأداء
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA synchronous=NORMAL")
+        if self.read_only:
+            # اتصال الكتابة هو المسؤول عن WAL؛ هنا نمنع أي كتابة بالخطأ
+            conn.execute("PRAGMA query_only=ON")
+        else:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
         conn.execute("PRAGMA cache_size=10000")
         conn.execute("PRAGMA temp_store=MEMORY")
         conn.execute("PRAGMA mmap_size=268435456")  # 256MB
 
         return conn
 
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._pool.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("sqlite_closed")
+            if len(self._all_connections) < self.pool_size:
+                conn = self._create_connection()
+                self._all_connections.append(conn)
+                return conn
+        return self._pool.get(timeout=5)
+
     @contextmanager
     def get_connection(self):
         """الحصول على اتصال من الـ pool"""
         conn = None
         try:
-            conn = self._pool.get(timeout=5)
-            self._active_connections += 1
+            conn = self._acquire()
+            with self._lock:
+                self._active_connections += 1
             yield conn
         finally:
             if conn:
-                self._active_connections -= 1
-                self._pool.put(conn)
+                with self._lock:
+                    self._active_connections -= 1
+                    closed = self._closed
+                if closed:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                else:
+                    self._pool.put(conn)
 
     def get_cursor(self) -> sqlite3.Cursor:
         """الحصول على cursor منفصل"""
@@ -119,12 +154,16 @@ class SQLiteConnectionPool:
 
     def close_all(self):
         """إغلاق كل الاتصالات"""
+        # الاتصالات المستخدمة حالياً تُغلق عند إرجاعها (get_connection)
+        with self._lock:
+            self._closed = True
+            self._all_connections.clear()
         while not self._pool.empty():
             try:
                 conn = self._pool.get_nowait()
                 conn.close()
             except Exception:
-                pass
+                break
         logger.info("⚡ [ConnectionPool] تم إغلاق كل الاتصالات")
 
 
@@ -16,11 +16,14 @@ import threading
 import time
 from datetime import datetime
 from pathlib import Path
+from typing import Any
 from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 from PyQt6.QtCore import QObject, pyqtSignal
 
 from core.logger import get_logger
+from core.sqlite_identifiers import quote_identifier, quote_identifier_list
+from core.unified_sync import UnifiedSyncManagerV3
 
 # استيراد دالة الطباعة الآمنة
 try:
@@ -54,6 +57,11 @@ logger = get_logger(__name__)
 _REALTIME_MANAGER = None
 DEFAULT_CHANGE_STREAM_MAX_AWAIT_MS = 250
 DEFAULT_EVENT_DEDUPE_MS = 120
+DEFAULT_CHANGE_APPLY_BATCH_SIZE = 200
+RESUME_TOKEN_SAVE_INTERVAL_SECONDS = 5.0
+RESUME_TOKEN_FILENAME = "realtime_resume_token.json"
+# أكواد MongoDB لانتهاء/عدم صلاحية resume token (ChangeStreamHistoryLost وما يشبهها)
+RESUME_TOKEN_ERROR_CODES = {260, 280, 286}
 _PROCESS_LOCAL_RS_BOOTSTRAP_ATTEMPTED = False
 
 
@@ -242,8 +250,10 @@ class RealtimeSyncManager(QObject):
         "tasks",
         "system_settings",
     ]
+    # جداول تُحدَّث بسحب الجدول (فلترة خاصة أو إعدادات) بدل تطبيق المستند مباشرة
+    DOCUMENT_APPLY_EXCLUDED = {"notifications", "system_settings"}
 
-    def __init__(self, repository, parent=None):
+    def __init__(self, repository, parent=None, document_preparer=None):
         super().__init__(parent)
         self.repo = repository
         self.is_running = False
@@ -256,6 +266,14 @@ class RealtimeSyncManager(QObject):
         self._event_dedupe_ms = DEFAULT_EVENT_DEDUPE_MS
         self._last_collection_event_ms: dict[str, int] = {}
         self._pending_changes = set()  # ⚡ تجميع التغييرات
+        self._pending_applied_changes: set[str] = set()  # جداول طُبّقت مستنداتها محلياً
+        self._insert_listeners: dict[str, list] = {}  # collection -> callbacks(document)
+        self._document_apply_enabled = True
+        self._document_preparer = document_preparer
+        self._change_apply_batch_size = DEFAULT_CHANGE_APPLY_BATCH_SIZE
+        self._resume_token = None
+        self._resume_token_loaded = False
+        self._last_resume_token_save_mono = 0.0
         self._debounce_timer = None
         self._realtime_enabled = True
         self._realtime_auto_detect = True
@@ -310,6 +328,7 @@ class RealtimeSyncManager(QObject):
             except (TypeError, ValueError):
                 self._event_dedupe_ms = DEFAULT_EVENT_DEDUPE_MS
             self._event_dedupe_ms = max(0, min(5000, self._event_dedupe_ms))
+            self._document_apply_enabled = bool(cfg.get("realtime_apply_documents", True))
             self._local_rs_bootstrap_enabled = bool(
                 cfg.get("realtime_attempt_local_rs_bootstrap", True)
             )
@@ -643,6 +662,9 @@ class RealtimeSyncManager(QObject):
                 except Exception:
                     pass
 
+            # نفس ضواغط اتصال الـ repo حتى لا يفقد الاتصال الجديد ضغط البروتوكول
+            compressors = list(getattr(self.repo, "mongo_compressors", None) or [])
+            compression_options = {"compressors": compressors} if compressors else {}
             new_client = pymongo.MongoClient(
                 mongo_uri,
                 serverSelectionTimeoutMS=5000,
@@ -655,6 +677,7 @@ class RealtimeSyncManager(QObject):
                 maxIdleTimeMS=120000,
                 waitQueueTimeoutMS=10000,
                 appname="SkyWaveERP-Realtime",
+                **compression_options,
             )
             new_client.admin.command("ping")
             self.repo.mongo_client = new_client
@@ -802,26 +825,8 @@ class RealtimeSyncManager(QObject):
                         time.sleep(1.0)
                         continue
 
-                    with self.repo.mongo_db.watch(
-                        pipeline=pipeline,
-                        max_await_time_ms=self._change_stream_max_await_ms,
-                    ) as stream:
-                        for change in stream:
-                            if self._stop_event.is_set() or self._shutdown:
-                                break
-                            if not isinstance(change, dict):
-                                continue
-
-                            namespace = change.get("ns") or {}
-                            collection_name = namespace.get("coll")
-                            if collection_name not in self.COLLECTIONS:
-                                continue
-
-                            if collection_name == "system_settings":
-                                self._sync_system_settings_from_cloud()
-                                continue
-
-                            self._queue_collection_change(collection_name)
+                    with self._open_change_stream(pipeline) as stream:
+                        self._consume_change_stream(stream)
 
                 except PyMongoError as e:
                     if self._shutdown:
@@ -829,6 +834,9 @@ class RealtimeSyncManager(QObject):
                     error_msg = str(e).lower()
                     if "cannot use mongoclient after close" in error_msg:
                         break
+                    if self._resume_token is not None and self._is_resume_token_error(e):
+                        self._discard_resume_token()
+                        continue
                     if "timed out" not in error_msg:
                         logger.debug("[RealtimeSync] خطأ في stream الموحد: %s", e)
                     time.sleep(0.8)
@@ -846,15 +854,204 @@ class RealtimeSyncManager(QObject):
         )
         self._watcher_thread.start()
 
-    def _queue_collection_change(self, collection_name: str) -> None:
+    def set_document_preparer(self, preparer) -> None:
+        """تحديد دالة تحضير المستند (مثل تطبيع UnifiedSync) قبل كتابته في SQLite."""
+        self._document_preparer = preparer
+
+    def _get_resume_token_path(self) -> Path | None:
+        """ملف resume token بجوار قاعدة SQLite المحلية."""
+        try:
+            db_path = getattr(self.repo, "_local_db_path", None)
+            conn = getattr(self.repo, "sqlite_conn", None)
+            if not db_path and conn is not None:
+                for row in conn.execute("PRAGMA database_list").fetchall():
+                    if len(row) > 2 and row[2]:
+                        db_path = row[2]
+                        break
+            if not db_path or db_path == ":memory:":
+                return None
+            return Path(db_path).resolve().parent / RESUME_TOKEN_FILENAME
+        except Exception as e:
+            logger.debug("[RealtimeSync] تعذر تحديد مسار resume token: %s", e)
+            return None
+
+    def _load_resume_token(self):
+        if self._resume_token_loaded:
+            return self._resume_token
+        self._resume_token_loaded = True
+        token_path = self._get_resume_token_path()
+        if token_path is None or not token_path.exists():
+            return None
+        try:
+            raw = token_path.read_text(encoding="utf-8")
+            try:
+                from bson import json_util
+
+                token = json_util.loads(raw)
+            except ImportError:
+                token = json.loads(raw)
+            self._resume_token = token if isinstance(token, dict) and token else None
+        except Exception as e:
+            logger.debug("[RealtimeSync] تعذر قراءة resume token: %s", e)
+            self._resume_token = None
+        return self._resume_token
+
+    def _save_resume_token(self, token, force: bool = False) -> None:
+        """حفظ resume token (مع تقليل الكتابة أثناء الخمول)."""
+        if not isinstance(token, dict) or not token or token == self._resume_token:
+            return
+        self._resume_token = token
+        now_mono = time.monotonic()
+        if (
+            not force
+            and (now_mono - self._last_resume_token_save_mono) < RESUME_TOKEN_SAVE_INTERVAL_SECONDS
+        ):
+            return
+        self._write_resume_token(token)
+        self._last_resume_token_save_mono = now_mono
+
+    def _write_resume_token(self, token) -> None:
+        token_path = self._get_resume_token_path()
+        if token_path is None:
+            return
+        try:
+            if token is None:
+                token_path.unlink(missing_ok=True)
+                return
+            try:
+                from bson import json_util
+
+                payload = json_util.dumps(token)
+            except ImportError:
+                payload = json.dumps(token)
+            token_path.write_text(payload, encoding="utf-8")
+        except Exception as e:
+            logger.debug("[RealtimeSync] تعذر حفظ resume token: %s", e)
+
+    @staticmethod
+    def _is_resume_token_error(error: Exception) -> bool:
+        if getattr(error, "code", None) in RESUME_TOKEN_ERROR_CODES:
+            return True
+        error_text = str(error).lower()
+        return "resume" in error_text and ("token" in error_text or "point" in error_text)
+
+    def _discard_resume_token(self) -> None:
+        """token منتهي الصلاحية: نبدأ stream جديداً ونسحب كل الجداول لتعويض ما فات."""
+        logger.info("[RealtimeSync] resume token غير صالح - إعادة البدء مع سحب تعويضي")
+        self._resume_token = None
+        self._write_resume_token(None)
+        for collection_name in self.COLLECTIONS:
+            if collection_name != "system_settings":
+                self._queue_collection_change(collection_name)
+
+    def _open_change_stream(self, pipeline: list[dict]):
+        """فتح change stream مع fullDocument واستئناف من آخر token محفوظ."""
+        watch_kwargs = {
+            "pipeline": pipeline,
+            "max_await_time_ms": self._change_stream_max_await_ms,
+        }
+        if self._document_apply_enabled:
+            watch_kwargs["full_document"] = "updateLookup"
+        resume_token = self._load_resume_token()
+        if resume_token is not None:
+            watch_kwargs["resume_after"] = resume_token
+        return self.repo.mongo_db.watch(**watch_kwargs)
+
+    def _consume_change_stream(self, stream) -> None:
+        """
+        ⚡ قراءة الأحداث بدفعات: تُطبّق الدفعة عند امتلائها أو عند خمول الـ stream،
+        ثم يُحفظ resume token بعد تطبيقها فقط حتى لا يضيع حدث عند الانقطاع.
+        """
+        batch: list[dict] = []
+        while not self._stop_event.is_set() and not self._shutdown:
+            if not getattr(stream, "alive", True):
+                break
+            change = stream.try_next()
+            if isinstance(change, dict):
+                batch.append(change)
+                if len(batch) < self._change_apply_batch_size:
+                    continue
+            if batch:
+                self._apply_change_batch(batch)
+                batch = []
+                self._save_resume_token(getattr(stream, "resume_token", None), force=True)
+            else:
+                self._save_resume_token(getattr(stream, "resume_token", None))
+        if batch and not self._shutdown:
+            self._apply_change_batch(batch)
+            self._save_resume_token(getattr(stream, "resume_token", None), force=True)
+
+    def _apply_change_batch(self, changes: list[dict]) -> None:
+        """
+        تطبيق دفعة أحداث: المستندات الكاملة تُكتب مباشرة في SQLite (صف لكل حدث)،
+        وما لا يمكن تطبيقه (بدون fullDocument أو جدول مستثنى) يرجع لسحب الجدول.
+        """
+        operations: dict[str, dict[str, dict | None]] = {}
+        pull_tables: set[str] = set()
+        settings_changed = False
+
+        for change in changes:
+            namespace = change.get("ns") or {}
+            collection_name = namespace.get("coll")
+            if collection_name not in self.COLLECTIONS:
+                continue
+            if collection_name == "system_settings":
+                settings_changed = True
+                continue
+            operation = change.get("operationType")
+            if operation == "insert" and collection_name in self._insert_listeners:
+                self._notify_insert_listeners(collection_name, change.get("fullDocument"))
+            if not self._document_apply_enabled or collection_name in self.DOCUMENT_APPLY_EXCLUDED:
+                pull_tables.add(collection_name)
+                continue
+
+            document_id = (change.get("documentKey") or {}).get("_id")
+            mongo_id = str(document_id) if document_id is not None else ""
+            table_ops = operations.setdefault(collection_name, {})
+            if operation == "delete" and mongo_id:
+                table_ops.pop(mongo_id, None)
+                table_ops[mongo_id] = None
+                continue
+
+            document = change.get("fullDocument")
+            if isinstance(document, dict) and document.get("_id") is not None:
+                mongo_id = str(document["_id"])
+                table_ops.pop(mongo_id, None)
+                table_ops[mongo_id] = document
+            else:
+                pull_tables.add(collection_name)
+
+        if settings_changed:
+            self._sync_system_settings_from_cloud()
+
+        for collection_name, table_ops in operations.items():
+            if not table_ops:
+                continue
+            changed = self._apply_documents_to_local(collection_name, table_ops)
+            if changed is None:
+                pull_tables.add(collection_name)
+            elif changed:
+                self._queue_collection_change(collection_name, applied=True)
+
+        for collection_name in pull_tables:
+            self._queue_collection_change(collection_name)
+
+    def _queue_collection_change(self, collection_name: str, applied: bool = False) -> None:
+        """
+        تسجيل جدول متغير لإرسال إشارته على main thread.
+        applied=True: المستندات كُتبت محلياً بالفعل فيكفي تحديث الواجهة بدون سحب الجدول.
+        """
         now_ms = int(time.time() * 1000)
         should_schedule = False
         with self._pending_changes_lock:
-            last_seen = self._last_collection_event_ms.get(collection_name, 0)
-            if self._event_dedupe_ms > 0 and (now_ms - last_seen) < self._event_dedupe_ms:
-                return
-            self._last_collection_event_ms[collection_name] = now_ms
-            self._pending_changes.add(collection_name)
+            if applied:
+                self._pending_applied_changes.add(collection_name)
+            else:
+                last_seen = self._last_collection_event_ms.get(collection_name, 0)
+                if self._event_dedupe_ms > 0 and (now_ms - last_seen) < self._event_dedupe_ms:
+                    return
+                self._last_collection_event_ms[collection_name] = now_ms
+                self._pending_changes.add(collection_name)
             if not self._emit_dispatch_queued:
                 self._emit_dispatch_queued = True
                 should_schedule = True
@@ -871,13 +1068,33 @@ class RealtimeSyncManager(QObject):
     def _emit_pending_changes_slot(self):
         """⚡ إرسال التغييرات المجمعة (يعمل على main thread)"""
         with self._pending_changes_lock:
-            if not self._pending_changes:
+            if not self._pending_changes and not self._pending_applied_changes:
                 self._emit_dispatch_queued = False
                 return
             changes = list(self._pending_changes)
+            # جدول يحتاج سحباً كاملاً لا يكفيه إشعار "مطبّق"
+            applied_changes = sorted(self._pending_applied_changes - self._pending_changes)
             self._pending_changes.clear()
+            self._pending_applied_changes.clear()
             self._emit_dispatch_queued = False
 
+        if applied_changes:
+            try:
+                from core.signals import app_signals
+
+                for collection_name in applied_changes:
+                    app_signals.emit_ui_data_changed(collection_name)
+            except Exception as e:
+                logger.debug("[RealtimeSync] تعذر بث تحديث الواجهة: %s", e)
+
+        for collection_name in applied_changes:
+            try:
+                self.data_updated.emit(collection_name, {"operation": "change", "applied": True})
+                self.sync_completed.emit(collection_name)
+                self._last_sync_time[collection_name] = datetime.now()
+            except RuntimeError:
+                pass
+
         for collection_name in changes:
             try:
                 self.data_updated.emit(collection_name, {"operation": "change"})
@@ -940,71 +1157,140 @@ class RealtimeSyncManager(QObject):
             return
         if not document:
             return
+        mongo_id = str(document.get("_id", ""))
+        if not mongo_id:
+            return
+        self._apply_documents_to_local(collection_name, {mongo_id: document})
 
-        try:
-            mongo_id = str(document.get("_id", ""))
-            if not mongo_id:
-                return
+    def _delete_document_from_local(self, collection_name: str, mongo_id: str):
+        """حذف مستند من SQLite"""
+        if collection_name not in self.COLLECTIONS:
+            return
+        if not mongo_id:
+            return
+        self._apply_documents_to_local(collection_name, {str(mongo_id): None})
 
-            # تحضير البيانات
-            data = self._prepare_document_for_sqlite(document)
-            data["_mongo_id"] = mongo_id
-            data["sync_status"] = "synced"
+    def _prepare_remote_document(self, collection_name: str, document: dict) -> dict | None:
+        preparer = self._document_preparer
+        if callable(preparer):
+            return preparer(document, collection_name)
+        return self._prepare_document_for_sqlite(document)
 
+    def _apply_documents_to_local(
+        self, collection_name: str, operations: dict[str, dict | None]
+    ) -> list[Any] | None:
+        """
+        ⚡ تطبيق مستندات change stream مباشرة في SQLite داخل transaction واحدة.
+        operations: mongo_id -> المستند الكامل (upsert) أو None (حذف).
+        يطبّق نفس قواعد delta pull: لا إحياء لصف محذوف محلياً ولا كتابة نسخة أقدم.
+        يرجع مراجع الصفوف المتغيرة، أو None عند الفشل (فيرجع المستدعي لسحب الجدول).
+        """
+        if collection_name not in self.COLLECTIONS or not operations:
+            return []
+
+        try:
+            table_ref = quote_identifier(collection_name, allowed=self.COLLECTIONS)
             cursor = self.repo.get_cursor()
             try:
-                # البحث عن السجل المحلي
-                cursor.execute(f"SELECT id FROM {collection_name} WHERE _mongo_id = ?", (mongo_id,))
-                existing = cursor.fetchone()
-
-                # الحصول على أعمدة الجدول
-                cursor.execute(f"PRAGMA table_info({collection_name})")
+                cursor.execute(f"PRAGMA table_info({table_ref})")
                 table_columns = {row[1] for row in cursor.fetchall()}
+                if not table_columns:
+                    return None
+
+                mongo_ids = list(operations)
+                placeholders = ", ".join("?" for _ in mongo_ids)
+                cursor.execute(
+                    f"SELECT id, _mongo_id, last_modified, sync_status, is_deleted "
+                    f"FROM {table_ref} WHERE _mongo_id IN ({placeholders})",  # nosec B608
+                    mongo_ids,
+                )
+                local_rows = {str(row[1]): tuple(row) for row in cursor.fetchall()}
+
+                changed_refs: list[Any] = []
+                for mongo_id, document in operations.items():
+                    local_row = local_rows.get(mongo_id)
+                    remote_deleted = document is not None and (
+                        bool(document.get("is_deleted", False))
+                        or str(document.get("sync_status") or "").lower() == "deleted"
+                    )
+                    if document is None or remote_deleted:
+                        if local_row:
+                            cursor.execute(
+                                f"DELETE FROM {table_ref} WHERE id = ?",  # nosec B608
+                                (local_row[0],),
+                            )
+                            changed_refs.append(local_row[0])
+                        continue
 
-                # تصفية البيانات
-                filtered_data = {k: v for k, v in data.items() if k in table_columns}
+                    if local_row and (
+                        bool(local_row[4]) or str(local_row[3] or "").lower() == "deleted"
+                    ):
+                        continue
 
-                if existing:
-                    # تحديث
-                    local_id = existing[0]
-                    set_clause = ", ".join([f"{k}=?" for k in filtered_data.keys()])
-                    values = list(filtered_data.values()) + [local_id]
-                    cursor.execute(f"UPDATE {collection_name} SET {set_clause} WHERE id=?", values)
-                else:
-                    # إدراج
-                    columns = ", ".join(filtered_data.keys())
-                    placeholders = ", ".join(["?" for _ in filtered_data])
-                    cursor.execute(
-                        f"INSERT INTO {collection_name} ({columns}) VALUES ({placeholders})",
-                        list(filtered_data.values()),
-                    )
+                    data = self._prepare_remote_document(collection_name, document)
+                    if not data or data.pop("__skip_sync__", False):
+                        continue
+                    data["_mongo_id"] = mongo_id
+                    data["sync_status"] = "synced"
+                    data["dirty_flag"] = 0
+                    data["is_deleted"] = 0
+                    filtered = {k: v for k, v in data.items() if k in table_columns}
+
+                    # نفس مقارنة delta pull: صيغ مختلفة (Z، إزاحة، datetime) تُطبَّع أولاً
+                    incoming_modified = filtered.get("last_modified")
+                    if (
+                        local_row
+                        and UnifiedSyncManagerV3._to_iso_timestamp(incoming_modified)
+                        and not UnifiedSyncManagerV3._is_newer_timestamp(
+                            incoming_modified, local_row[2]
+                        )
+                    ):
+                        continue
 
-                self.repo.sqlite_conn.commit()
-                logger.debug("[RealtimeSync] ✅ تم مزامنة %s/%s", collection_name, mongo_id)
+                    columns = quote_identifier_list(filtered.keys(), allowed=table_columns)
+                    if local_row:
+                        set_clause = ", ".join(f"{column} = ?" for column in columns)
+                        cursor.execute(
+                            f"UPDATE {table_ref} SET {set_clause} WHERE id = ?",  # nosec B608
+                            [*filtered.values(), local_row[0]],
+                        )
+                        changed_refs.append(local_row[0])
+                    else:
+                        cursor.execute(
+                            f"INSERT INTO {table_ref} ({', '.join(columns)}) "
+                            f"VALUES ({', '.join('?' for _ in columns)})",  # nosec B608
+                            list(filtered.values()),
+                        )
+                        changed_refs.append(cursor.lastrowid or mongo_id)
 
+                self.repo.sqlite_conn.commit()
             finally:
                 cursor.close()
-
         except Exception as e:
-            logger.debug("[RealtimeSync] خطأ في مزامنة المستند: %s", e)
+            logger.debug("[RealtimeSync] تعذر تطبيق مستندات %s محلياً: %s", collection_name, e)
+            try:
+                self.repo.sqlite_conn.rollback()
+            except Exception:
+                pass
+            return None
 
-    def _delete_document_from_local(self, collection_name: str, mongo_id: str):
-        """حذف مستند من SQLite"""
-        if collection_name not in self.COLLECTIONS:
-            return
-        if not mongo_id:
-            return
+        if changed_refs:
+            self._refresh_repository_cache(collection_name, changed_refs)
+            logger.debug(
+                "[RealtimeSync] ✅ تم تطبيق %s تغيير على %s", len(changed_refs), collection_name
+            )
+        return changed_refs
 
+    def _refresh_repository_cache(self, collection_name: str, changed_refs: list[Any]) -> None:
+        apply_delta = getattr(self.repo, "apply_table_cache_delta", None)
+        invalidate = getattr(self.repo, "invalidate_table_cache", None)
         try:
-            cursor = self.repo.get_cursor()
-            try:
-                cursor.execute(f"DELETE FROM {collection_name} WHERE _mongo_id = ?", (mongo_id,))
-                self.repo.sqlite_conn.commit()
-                logger.debug("[RealtimeSync] 🗑️ تم حذف %s/%s", collection_name, mongo_id)
-            finally:
-                cursor.close()
+            if callable(apply_delta):
+                apply_delta(collection_name, changed_refs)
+            elif callable(invalidate):
+                invalidate(collection_name)
         except Exception as e:
-            logger.debug("[RealtimeSync] خطأ في حذف المستند: %s", e)
+            logger.debug("[RealtimeSync] تعذر تحديث cache لـ %s: %s", collection_name, e)
 
     def _prepare_document_for_sqlite(self, document: dict) -> dict:
         """تحضير مستند MongoDB للحفظ في SQLite"""
@@ -1046,13 +1332,43 @@ class RealtimeSyncManager(QObject):
     def is_change_stream_supported(self) -> bool:
         return bool(self._change_stream_supported)
 
+    def is_streaming(self) -> bool:
+        """هل الـ change stream شغال فعلاً الآن (مدعوم + الـ watcher لم يتوقف)."""
+        return bool(self.is_running and not self._shutdown and self._change_stream_supported)
+
+    def add_insert_listener(self, collection_name: str, callback) -> None:
+        """
+        ⚡ الاشتراك في المستندات الجديدة لـ collection مراقب: callback(document) تُستدعى
+        من thread المراقبة لكل insert، فلا يحتاج المشترك لاستعلام MongoDB دوري.
+        """
+        listeners = self._insert_listeners.setdefault(collection_name, [])
+        if callback not in listeners:
+            listeners.append(callback)
+
+    def remove_insert_listener(self, collection_name: str, callback) -> None:
+        listeners = self._insert_listeners.get(collection_name) or []
+        if callback in listeners:
+            listeners.remove(callback)
+        if not listeners:
+            self._insert_listeners.pop(collection_name, None)
+
+    def _notify_insert_listeners(self, collection_name: str, document) -> None:
+        if not isinstance(document, dict):
+            return
+        for callback in list(self._insert_listeners.get(collection_name) or ()):
+            try:
+                callback(document)
+            except Exception as e:
+                logger.debug("[RealtimeSync] insert listener failed for %s: %s", collection_name, e)
+
 
-def setup_realtime_sync(repository) -> RealtimeSyncManager | None:
+def setup_realtime_sync(repository, document_preparer=None) -> RealtimeSyncManager | None:
     """
     🚀 إعداد وتشغيل نظام المزامنة الفورية
 
     Args:
         repository: مخزن البيانات
+        document_preparer: دالة (document, table) لتحضير المستندات قبل كتابتها محلياً
 
     Returns:
         مدير المزامنة الفورية أو None إذا فشل
@@ -1063,7 +1379,7 @@ def setup_realtime_sync(repository) -> RealtimeSyncManager | None:
         if _REALTIME_MANAGER is not None:
             return _REALTIME_MANAGER
 
-        _REALTIME_MANAGER = RealtimeSyncManager(repository)
+        _REALTIME_MANAGER = RealtimeSyncManager(repository, document_preparer=document_preparer)
         started = _REALTIME_MANAGER.start()
         if not started:
             _REALTIME_MANAGER = None
@@ -7,6 +7,8 @@
 
 from __future__ import annotations
 
+import hashlib
+import importlib.util
 import json
 import os
 import re
@@ -18,10 +20,19 @@ import time
 import traceback
 import urllib.request
 import uuid
+from contextlib import contextmanager
 from datetime import datetime
 from typing import Any
 
+from .identity_resolver import IdentityResolver
+from .logo_utils import (
+    logo_blob_from_data,
+    logo_content_hash,
+    logo_data_from_blob,
+    logo_thumbnail_png_bytes,
+)
 from .project_currency import normalize_currency_code, normalize_exchange_rate
+from .scan_records import ScanRecord, scan_record_type
 from .sqlite_identifiers import quote_identifier
 from .text_utils import normalize_user_text
 
@@ -136,14 +147,14 @@ class QTimer:
 
 # ⚡ استيراد محسّن السرعة
 try:
-    from .speed_optimizer import LRUCache, cached, invalidate_cache  # noqa: F401
+    from .speed_optimizer import DeltaRowCache, LRUCache, cached, invalidate_cache  # noqa: F401
 
     CACHE_ENABLED = True
 except ImportError:
     CACHE_ENABLED = False
     safe_print("WARNING: speed_optimizer غير متوفر - الـ cache معطل")
 
-# ⚡ لا نحمّل performance_optimizer عند الاستيراد لأنه غير مستخدم runtime هنا.
+# ⚡ لا نحمّل performance_optimizer عند الاستيراد؛ pool القراءة يستورده عند أول استخدام.
 PERFORMANCE_OPTIMIZER_ENABLED = False
 
 # ⚡ استيراد إعدادات التكوين الآمنة
@@ -170,6 +181,26 @@ else:
 
 _SQLITE_BOOTSTRAP_VERSION = 1
 
+# الجداول التي يسحبها الـ delta sync بالـ watermark (UnifiedSyncManagerV3.TABLES)
+DELTA_PULL_COLLECTIONS = (
+    "accounts",
+    "clients",
+    "services",
+    "quotations",
+    "projects",
+    "invoices",
+    "payments",
+    "expenses",
+    "journal_entries",
+    "currencies",
+    "notifications",
+    "tasks",
+)
+
+# ضغط بروتوكول MongoDB: الاسم -> مكتبة Python المطلوبة له
+MONGO_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+DEFAULT_MONGO_COMPRESSORS = ("zstd", "snappy", "zlib")
+
 
 # ⚡ نسخ قاعدة البيانات من مجلد البرنامج لو مش موجودة في AppData
 def _copy_initial_db():
@@ -295,6 +326,7 @@ class Repository:
         self.online = False
         self.mongo_client = None
         self.mongo_db = None
+        self.mongo_compressors: list[str] = []
         self._closed = False
         self._lock = threading.RLock()
         self._mongo_stop_event = threading.Event()
@@ -310,15 +342,50 @@ class Repository:
             maximum=120,
         )
         self._sqlite_table_columns_cache: dict[str, set[str]] = {}
+        # ⚡ pool اتصالات قراءة فقط (WAL) يُنشأ عند أول قراءة ثقيلة؛ 0 = تعطيل
+        self._local_db_path = LOCAL_DB_FILE
+        self._read_pool = None
+        self._read_pool_size = self._safe_int_env(
+            "SKYWAVE_SQLITE_READ_POOL_SIZE",
+            default=4,
+            minimum=0,
+            maximum=16,
+        )
+        # ⚡ دفتر تغييرات المزامنة (sync_queue + triggers)؛ يُفعَّل في _ensure_change_journal
+        self._change_journal_ready = False
+        self._change_journal_tables: set[str] = set()
+        # ⚡ عدّادات تغييرات الجداول (change_counters + triggers)؛ يُفعَّل في _ensure_change_counters
+        self._change_counters_ready = False
+        # ⚡ أسطر القيود المفككة (journal_lines)؛ يُفعَّل في _ensure_journal_lines
+        self._journal_lines_ready = False
+        # ⚡ فهرس هويات العملاء/المشاريع (نسخته من change_counters)
+        self._identity_resolver: IdentityResolver | None = None
+        # ⚡ total_changes لاتصال SQLite عند آخر تحقق من نسخة الفهرس (بدون استعلام)
+        self._identity_resolver_write_count: int | None = None
+        # ⚡ جدول أرصدة العملاء: (نسخة change_counters، الأرصدة، فهرس المراجع)
+        self._client_balance_table: tuple[Any, dict, dict] | None = None
+        # ⚡ ids الصفوف المكررة بالتوقيع لكل جدول: {table: (نسخة change_counters، ids)}
+        self._signature_duplicates: dict[str, tuple[Any, frozenset[int]]] = {}
+        # ⚡ بصمات الصور المؤكد وجودها في مجموعة logo_blobs السحابية (رفع مرة لكل بصمة)
+        self._pushed_logo_hashes: set[str] = set()
 
         # ⚡ Cache للبيانات المتكررة - TTL محسّن للسرعة
         if CACHE_ENABLED:
             self._clients_cache = LRUCache(maxsize=1000, ttl_seconds=300)  # ⚡ 5 دقائق
-            self._projects_cache = LRUCache(maxsize=1000, ttl_seconds=300)  # ⚡ 5 دقائق
+            # ⚡ المشاريع/الدفعات/المصروفات: صفوف بمفتاح id تُرقَّع بالتغييرات (DeltaRowCache)
+            # الفهرس (الترتيب، الفائز لكل توقيع، مراجع المشروع) يُحدَّث مع كل ترقيع
+            self._projects_cache = DeltaRowCache(  # ⚡ 5 دقائق
+                ttl_seconds=300,
+                sort_key=lambda entry: str(entry["row"].get("created_at") or ""),
+            )
             self._services_cache = LRUCache(maxsize=500, ttl_seconds=600)  # ⚡ 10 دقائق
             self._accounts_cache = LRUCache(maxsize=500, ttl_seconds=600)  # ⚡ 10 دقائق
-            self._payments_cache = LRUCache(maxsize=500, ttl_seconds=180)  # ⚡ 3 دقائق
-            self._expenses_cache = LRUCache(maxsize=500, ttl_seconds=180)  # ⚡ 3 دقائق
+            self._payments_cache = DeltaRowCache(  # ⚡ 3 دقائق
+                ttl_seconds=180, **self._signature_cache_index()
+            )
+            self._expenses_cache = DeltaRowCache(  # ⚡ 3 دقائق
+                ttl_seconds=180, **self._signature_cache_index()
+            )
 
         # ⚡ 1. SQLite أولاً (سريع جداً) - لا ننتظر MongoDB
         self.sqlite_conn = sqlite3.connect(
@@ -364,6 +431,38 @@ class Repository:
             value = maximum
         return value
 
+    @staticmethod
+    def _mongo_compressors() -> list[str]:
+        """
+        ⚡ ضواغط بروتوكول MongoDB حسب SKYWAVE_MONGO_COMPRESSORS أو enable_compression في
+        sync_config.json؛ الضاغط الذي مكتبته غير مثبتة يُستبعد والخادم يختار أول ما يدعمه.
+        """
+        raw = os.environ.get("SKYWAVE_MONGO_COMPRESSORS")
+        if raw is not None:
+            requested: Any = raw.split(",")
+        else:
+            try:
+                with open("sync_config.json", encoding="utf-8") as f:
+                    config = json.load(f)
+            except Exception:
+                config = {}
+            if not isinstance(config, dict) or not config.get("enable_compression", False):
+                return []
+            requested = config.get("compressors") or DEFAULT_MONGO_COMPRESSORS
+            if isinstance(requested, str):
+                requested = requested.split(",")
+
+        compressors: list[str] = []
+        for name in requested:
+            name = str(name).strip().lower()
+            module_name = MONGO_COMPRESSOR_MODULES.get(name)
+            if not module_name or name in compressors:
+                continue
+            if importlib.util.find_spec(module_name) is None:
+                continue
+            compressors.append(name)
+        return compressors
+
     def _mongo_client_options(self) -> dict[str, Any]:
         max_pool = self._safe_int_env(
             "SKYWAVE_MONGO_MAX_POOL_SIZE",
@@ -377,7 +476,7 @@ class Repository:
             minimum=0,
             maximum=max_pool,
         )
-        return {
+        options: dict[str, Any] = {
             "retryWrites": True,
             "retryReads": True,
             "maxPoolSize": max_pool,
@@ -396,6 +495,17 @@ class Repository:
             ),
             "appname": "SkyWaveERP",
         }
+        compressors = self._mongo_compressors()
+        if compressors:
+            options["compressors"] = compressors
+            if "zlib" in compressors:
+                options["zlibCompressionLevel"] = self._safe_int_env(
+                    "SKYWAVE_MONGO_ZLIB_LEVEL",
+                    default=6,
+                    minimum=-1,
+                    maximum=9,
+                )
+        return options
 
     def _ensure_mongo_indexes_ready(self) -> None:
         with self._lock:
@@ -432,6 +542,64 @@ class Repository:
                     safe_print(f"ERROR: [Repository] فشل إنشاء cursor: {e}")
                 raise
 
+    def _get_read_pool(self):
+        """⚡ pool اتصالات القراءة (SQLiteConnectionPool بوضع query_only) - يُنشأ مرة واحدة."""
+        if self._read_pool is not None or self._read_pool_size <= 0:
+            return self._read_pool
+        if not self._local_db_path or str(self._local_db_path).startswith(":memory:"):
+            return None
+        with self._lock:
+            if self._read_pool is None and not self._closed:
+                try:
+                    from .performance_optimizer import SQLiteConnectionPool
+
+                    self._read_pool = SQLiteConnectionPool(
+                        self._local_db_path,
+                        pool_size=self._read_pool_size,
+                        read_only=True,
+                    )
+                except Exception as e:
+                    safe_print(f"WARNING: [Repository] تعذر إنشاء pool القراءة: {e}")
+                    self._read_pool_size = 0
+            return self._read_pool
+
+    @contextmanager
+    def read_cursor(self):
+        """
+        ⚡ cursor للقراءة فقط بدون حجز قفل اتصال الكتابة.
+
+        القراءات المتوازية (تحميل التابات، المزامنة، المراقب اللحظي) تأخذ اتصالاً من
+        pool القراءة (WAL يسمح بقراءات متزامنة مع الكاتب). لو اتصال الكتابة داخل
+        transaction مفتوحة نقرأ منه هو مع القفل حتى نرى التغييرات غير المؤكدة.
+
+        فحص in_transaction يتم والقفل محجوز: لو القفل مع خيط آخر فالـ transaction
+        ليست لهذا الخيط (RLock يُحجز فوراً لمالكه) فنقرأ من الـ pool بدون انتظار.
+        """
+        conn = self.sqlite_conn
+        if conn is None:
+            raise RuntimeError("sqlite_closed")
+        pool = self._get_read_pool()
+        owns_lock = self._lock.acquire(blocking=pool is None)
+        if owns_lock and (pool is None or conn.in_transaction):
+            try:
+                cursor = conn.cursor()
+                try:
+                    yield cursor
+                finally:
+                    cursor.close()
+            finally:
+                self._lock.release()
+            return
+        if owns_lock:
+            self._lock.release()
+
+        with pool.get_connection() as read_conn:
+            cursor = read_conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
     def _account_has_children(self, account_code: str) -> bool:
         if not account_code:
             return False
@@ -1041,8 +1209,12 @@ class Repository:
                 except Exception:
                     pass
 
+        self._reset_dashboard_cache_for(normalized)
+
+    @staticmethod
+    def _reset_dashboard_cache_for(normalized_table: str) -> None:
         # Dashboard depends on accounting/projects/payments/expenses totals.
-        if not normalized or normalized in {
+        if not normalized_table or normalized_table in {
             "projects",
             "payments",
             "expenses",
@@ -1053,6 +1225,201 @@ class Repository:
             Repository._dashboard_cache = None
             Repository._dashboard_cache_time = 0
 
+    # ⚡ الجداول التي يحمل الـ cache الخاص بها صفوفاً بمفتاح id (DeltaRowCache)
+    _DELTA_CACHE_TABLES = {
+        "payments": "_payments_cache",
+        "expenses": "_expenses_cache",
+        "projects": "_projects_cache",
+    }
+
+    def apply_table_cache_delta(self, table_name: str, row_refs) -> bool:
+        """
+        ⚡ ترقيع cache جدول بصفوف محددة (id محلي أو _mongo_id) بدل إبطاله كله.
+        يُعاد قراءة الصفوف المذكورة فقط؛ الصف غير النشط أو المحذوف يُزال من الـ cache.
+        ترجع False لو تم الرجوع لإبطال الجدول كاملاً.
+        """
+        normalized = (table_name or "").strip().lower()
+        attr_name = self._DELTA_CACHE_TABLES.get(normalized)
+        cache = getattr(self, attr_name, None) if (CACHE_ENABLED and attr_name) else None
+        if cache is None or not isinstance(cache, DeltaRowCache):
+            self.invalidate_table_cache(normalized)
+            return False
+
+        self._reset_dashboard_cache_for(normalized)
+        refs = {str(ref).strip() for ref in (row_refs or ()) if str(ref or "").strip()}
+        # المشاريع: حتى بدون cache مشاريع محمّل تتأثر توقيعات الدفعات/المصروفات المخزنة
+        if not refs or (not cache.is_loaded() and normalized != "projects"):
+            return True
+
+        try:
+            local_ids = sorted({int(ref) for ref in refs if ref.isdigit()})
+            mongo_refs = sorted(ref for ref in refs if not ref.isdigit())
+            table_ref = self._quote_sqlite_identifier(
+                normalized, allowed=set(self._DELTA_CACHE_TABLES)
+            )
+            conditions: list[str] = []
+            params: list[Any] = []
+            if local_ids:
+                conditions.append(f"id IN ({', '.join('?' for _ in local_ids)})")
+                params.extend(local_ids)
+            if mongo_refs:
+                conditions.append(f"_mongo_id IN ({', '.join('?' for _ in mongo_refs)})")
+                params.extend(mongo_refs)
+            cursor = self.get_cursor()
+            try:
+                cursor.execute(
+                    f"SELECT * FROM {table_ref} WHERE {' OR '.join(conditions)}",  # nosec B608
+                    params,
+                )
+                rows = [dict(row) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+
+            if normalized == "projects":
+                # مراجع المشروع قبل التغيير (من الـ cache) وبعده، لإعادة توقيع ما يشير إليه
+                project_refs = set(refs)
+                for row in rows:
+                    project_refs |= self._project_reference_values(row)
+                    previous = cache.get_entry(row.get("id"))
+                    if previous is not None:
+                        project_refs |= self._project_reference_values(previous["row"])
+                self._refresh_project_dependents(project_refs)
+                if not cache.is_loaded():
+                    return True
+
+            seen_refs: set[str] = set()
+            for row in rows:
+                seen_refs.add(str(row.get("id") or ""))
+                seen_refs.add(str(row.get("_mongo_id") or ""))
+                entry = self._build_delta_cache_entry(normalized, row)
+                if entry is None:
+                    cache.discard(row.get("id"))
+                else:
+                    cache.upsert(row.get("id"), entry)
+
+            # مراجع لم تعد موجودة في الجدول (حذف فعلي) -> إزالتها من الـ cache
+            missing_refs = refs - seen_refs
+            if missing_refs:
+                cache.discard_where(
+                    lambda key, entry: (
+                        str(key) in missing_refs
+                        or str(entry["row"].get("_mongo_id") or "") in missing_refs
+                    )
+                )
+            return True
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] فشل ترقيع cache {normalized}: {e}")
+            cache.invalidate()
+            return False
+
+    @staticmethod
+    def _is_active_cache_row(row: dict[str, Any]) -> bool:
+        if str(row.get("sync_status") or "") == "deleted":
+            return False
+        return not row.get("is_deleted")
+
+    def _build_delta_cache_entry(
+        self, table_name: str, row: dict[str, Any]
+    ) -> dict[str, Any] | None:
+        """صف cache واحد: الصف الخام + توقيع إزالة التكرار (أو موديل المشروع الجاهز)."""
+        if not self._is_active_cache_row(row):
+            return None
+        if table_name == "projects":
+            try:
+                payload = self._normalize_project_payload(row)
+                if not payload:
+                    return None
+                return {"row": payload, "model": schemas.Project(**payload)}
+            except Exception:
+                return None
+        signature_fn = (
+            self._payment_signature if table_name == "payments" else self._expense_signature
+        )
+        return {"row": row, "signature": signature_fn(row), "model": None}
+
+    def _load_delta_cache_entries(
+        self, table_name: str, rows: list[dict[str, Any]]
+    ) -> dict[Any, dict[str, Any]]:
+        entries: dict[Any, dict[str, Any]] = {}
+        for row in rows:
+            entry = self._build_delta_cache_entry(table_name, row)
+            if entry is not None:
+                entries[row.get("id")] = entry
+        return entries
+
+    def _signature_cache_index(self) -> dict[str, Any]:
+        """فهرس DeltaRowCache للدفعات/المصروفات: نفس قاعدة _dedupe_rows_by_signature."""
+        return {
+            "group_key": lambda entry: entry["signature"],
+            "prefer": lambda candidate, current: (
+                self._prefer_row(current["row"], candidate["row"]) is candidate["row"]
+            ),
+            "sort_key": lambda entry: str(entry["row"].get("date") or ""),
+            "ref_keys": lambda entry: (entry["row"].get("project_id"),),
+        }
+
+    @staticmethod
+    def _models_from_ordered_entries(entries: list[dict[str, Any]], model_cls) -> list:
+        """موديلات الصفوف الفائزة من فهرس الـ cache (الموديل يُبنى مرة لكل صف)."""
+        models = []
+        for entry in entries:
+            if entry["model"] is None:
+                entry["model"] = model_cls(**entry["row"])
+            models.append(entry["model"])
+        return models
+
+    def _refresh_project_dependents(self, project_refs) -> None:
+        """
+        ⚡ توقيع الدفعة/المصروف يعتمد على حل مشروعها: عند تغيّر مشروع تُعاد قراءة
+        الصفوف المخزنة التي تشير لأي من مراجعه فقط (فهرس project_id في الـ cache).
+        """
+        if not CACHE_ENABLED:
+            return
+        for table in ("payments", "expenses"):
+            cache = getattr(self, self._DELTA_CACHE_TABLES[table], None)
+            if not isinstance(cache, DeltaRowCache) or not cache.is_loaded():
+                continue
+            keys = cache.keys_for_refs(project_refs)
+            if keys:
+                self.apply_table_cache_delta(table, keys)
+
+    def _deduped_models_from_entries(self, entries: dict[Any, dict[str, Any]], model_cls) -> list:
+        """بناء قائمة الموديلات (بعد إزالة التكرار والترتيب بالتاريخ) من صفوف الـ cache فقط."""
+        entry_by_row = {id(entry["row"]): entry for entry in entries.values()}
+        rows = sorted(
+            (entry["row"] for entry in entries.values()),
+            key=lambda row: str(row.get("date") or ""),
+            reverse=True,
+        )
+        deduped_rows = self._dedupe_rows_by_signature(
+            rows, lambda row: entry_by_row[id(row)]["signature"]
+        )
+        deduped_rows.sort(key=lambda row: str(row.get("date") or ""), reverse=True)
+        models = []
+        for row in deduped_rows:
+            entry = entry_by_row[id(row)]
+            if entry["model"] is None:
+                entry["model"] = model_cls(**row)
+            models.append(entry["model"])
+        return models
+
+    @staticmethod
+    def _projects_from_entries(
+        entries: list[dict[str, Any]],
+        status: schemas.ProjectStatus | None = None,
+        exclude_status: schemas.ProjectStatus | None = None,
+    ) -> list[schemas.Project]:
+        """entries مرتبة مسبقاً (الأحدث أولاً)؛ الفلترة بالحالة فقط."""
+        selected = []
+        for entry in entries:
+            status_value = str(entry["row"].get("status") or "")
+            if status and status_value != status.value:
+                continue
+            if not status and exclude_status and status_value == exclude_status.value:
+                continue
+            selected.append(entry["model"])
+        return selected
+
     def close(self):
         """⚡ إغلاق اتصالات قاعدة البيانات"""
         connection_thread = None
@@ -1072,6 +1439,14 @@ class Repository:
                 finally:
                     self.sqlite_cursor = None
 
+                try:
+                    if self._read_pool is not None:
+                        self._read_pool.close_all()
+                except Exception:
+                    pass
+                finally:
+                    self._read_pool = None
+
                 try:
                     if self.sqlite_conn is not None:
                         self.sqlite_conn.close()
@@ -1296,12 +1671,13 @@ class Repository:
                 try:
                     safe_print(f"INFO: محاولة الاتصال بـ MongoDB ({attempt + 1}/{max_retries})...")
 
+                    client_options = self._mongo_client_options()
                     mongo_client = pymongo_module.MongoClient(
                         mongo_uri,
                         serverSelectionTimeoutMS=5000,  # ⚡ 5 ثواني للاتصال
                         connectTimeoutMS=5000,
                         socketTimeoutMS=30000,  # ⚡ 30 ثانية للعمليات (زيادة لتجنب timeout)
-                        **self._mongo_client_options(),
+                        **client_options,
                     )
 
                     # اختبار الاتصال
@@ -1316,6 +1692,7 @@ class Repository:
                             break
                         self.mongo_client = mongo_client
                         self.mongo_db = mongo_db
+                        self.mongo_compressors = list(client_options.get("compressors") or [])
                         self.online = True
                         self._mongo_indexes_initialized = False
                     self._ensure_mongo_indexes_ready()
@@ -1387,6 +1764,7 @@ class Repository:
                 "INFO: [Repository] SQLite bootstrap up-to-date - skipping heavy schema work."
             )
             self._run_sync_state_maintenance(sync_tables)
+            self._ensure_incremental_sqlite_structures()
             safe_print("INFO: الجداول المحلية جاهزة.")
             if self.online:
                 self._ensure_mongo_indexes_ready()
@@ -1586,6 +1964,7 @@ class Repository:
             logo_data TEXT,
             has_logo INTEGER NOT NULL DEFAULT 0,
             logo_last_synced TEXT,
+            logo_hash TEXT,
             client_notes TEXT,
             is_vip INTEGER DEFAULT 0
         )"""
@@ -1616,6 +1995,14 @@ class Repository:
         except Exception:
             pass  # العمود موجود بالفعل
 
+        # ⚡ بصمة الشعار في مخزن blobs (الصورة نفسها خارج صف العميل)
+        try:
+            self.sqlite_cursor.execute("ALTER TABLE clients ADD COLUMN logo_hash TEXT")
+            self.sqlite_conn.commit()
+            safe_print("INFO: [Repository] تم إضافة عمود logo_hash لجدول العملاء")
+        except Exception:
+            pass  # العمود موجود بالفعل
+
         # ⚡ إضافة عمود is_vip للعملاء المميزين
         try:
             self.sqlite_cursor.execute("ALTER TABLE clients ADD COLUMN is_vip INTEGER DEFAULT 0")
@@ -2293,12 +2680,16 @@ class Repository:
                 self.sqlite_cursor.execute(reset_delete_flag_sql)
 
                 # تنظيف sync_status: وضع 'pending' بدلاً من NULL
-                reset_sync_status_sql = f"UPDATE {table_ref} SET sync_status = 'pending' WHERE sync_status IS NULL"  # nosec B608
+                reset_sync_status_sql = (
+                    f"UPDATE {table_ref} SET sync_status = 'pending' WHERE sync_status IS NULL"  # nosec B608
+                )
                 self.sqlite_cursor.execute(reset_sync_status_sql)
 
                 # تنظيف last_modified: وضع التاريخ الحالي بدلاً من NULL
                 now_iso = datetime.now().isoformat()
-                reset_last_modified_sql = f"UPDATE {table_ref} SET last_modified = ? WHERE last_modified IS NULL"  # nosec B608
+                reset_last_modified_sql = (
+                    f"UPDATE {table_ref} SET last_modified = ? WHERE last_modified IS NULL"  # nosec B608
+                )
                 self.sqlite_cursor.execute(reset_last_modified_sql, (now_iso,))
             except sqlite3.OperationalError as e:
                 safe_print(f"WARNING: [Repository] فشل تنظيف {table}: {e}")
@@ -2315,6 +2706,7 @@ class Repository:
 
         # ⚡ تحسين قاعدة البيانات للأداء
         self._optimize_sqlite_performance()
+        self._ensure_incremental_sqlite_structures()
         self._set_sqlite_user_version(_SQLITE_BOOTSTRAP_VERSION)
 
         # إنشاء collection و indexes في MongoDB إذا كان متصل
@@ -2556,102 +2948,1743 @@ class Repository:
         except Exception as e:
             safe_print(f"WARNING: فشل تحسين أداء قاعدة البيانات: {e}")
 
-    def _init_mongo_indexes(self) -> bool:
+    def _ensure_incremental_sqlite_structures(self) -> None:
+        """⚡ الجداول المشتقة التي تُحدَّث تزايدياً (تعمل في كل تشغيل وليس فقط أثناء bootstrap)."""
+        self._ensure_dashboard_kpi_ledger()
+        self._ensure_project_ref_keys()
+        self._ensure_change_journal()
+        self._ensure_change_counters()
+        self._ensure_journal_lines()
+        self._ensure_account_balance_snapshots()
+        self._ensure_cashbox_audit_checkpoints()
+        self._ensure_blob_store()
+
+    # ⚡ الجداول التي يُسجَّل أي تعديل غير متزامن فيها داخل دفتر التغييرات (sync_queue)
+    _CHANGE_JOURNAL_TABLES = (
+        "accounts",
+        "clients",
+        "services",
+        "quotations",
+        "projects",
+        "invoices",
+        "payments",
+        "expenses",
+        "journal_entries",
+        "currencies",
+        "notifications",
+        "tasks",
+    )
+    # نفس شرط "السجل يحتاج رفع" الذي يستخدمه push_local_changes
+    _CHANGE_JOURNAL_DIRTY_SQL = (
+        "{row}dirty_flag = 1 OR {row}sync_status IS NULL "
+        "OR {row}sync_status IN ('new_offline', 'modified_offline', 'pending', 'deleted') "
+        "OR {row}_mongo_id IS NULL"
+    )
+
+    def _ensure_change_journal(self) -> None:
         """
-        إنشاء indexes في MongoDB لتحسين الأداء
+        ⚡ دفتر تغييرات محلي (outbox) فوق جدول sync_queue:
+        triggers تسجل كل صف يصبح بحاجة للرفع كمدخل pending واحد لكل (جدول، id)،
+        والتعديلات المتكررة على نفس الصف تُدمج في نفس المدخل بدل تكراره.
+        الرفع التفاضلي يقرأ المدخلات المعلّقة بدل مسح كل جدول بحثاً عن dirty_flag.
         """
-        with self._lock:
-            if self._closed or self.mongo_db is None:
-                return False
-            mongo_db = self.mongo_db
-
+        self._change_journal_ready = False
+        self._change_journal_tables = set()
         try:
-            safe_print("INFO: جاري إنشاء indexes في MongoDB...")
-
-            # sync_queue
-            mongo_db.sync_queue.create_index([("status", 1)])
-            mongo_db.sync_queue.create_index([("priority", 1), ("status", 1)])
-            mongo_db.sync_queue.create_index([("entity_type", 1), ("entity_id", 1)])
-            mongo_db.sync_queue.create_index([("created_at", -1)])
-            mongo_db.sync_queue.create_index([("updated_at", -1)])
-
-            # projects / clients
-            mongo_db.projects.create_index([("client_id", 1)])
-            mongo_db.projects.create_index([("status", 1)])
-            mongo_db.projects.create_index([("start_date", -1)])
-            mongo_db.projects.create_index([("last_modified", -1)])
-            mongo_db.clients.create_index([("name", 1)])
-            mongo_db.clients.create_index([("status", 1)])
-            mongo_db.clients.create_index([("phone", 1)])
-            mongo_db.clients.create_index([("last_modified", -1)])
-
-            # accounting collections
-            mongo_db.accounts.create_index([("code", 1)])
-            mongo_db.accounts.create_index([("type", 1)])
-            mongo_db.accounts.create_index([("last_modified", -1)])
-            mongo_db.invoices.create_index([("invoice_number", 1)])
-            mongo_db.invoices.create_index([("client_id", 1)])
-            mongo_db.invoices.create_index([("status", 1)])
-            mongo_db.invoices.create_index([("issue_date", -1)])
-            mongo_db.invoices.create_index([("last_modified", -1)])
-            mongo_db.payments.create_index([("project_id", 1)])
-            mongo_db.payments.create_index([("client_id", 1)])
-            mongo_db.payments.create_index([("invoice_number", 1)])
-            mongo_db.payments.create_index([("date", -1)])
-            mongo_db.payments.create_index([("account_id", 1)])
-            mongo_db.payments.create_index([("last_modified", -1)])
-            mongo_db.journal_entries.create_index([("date", -1)])
-            mongo_db.journal_entries.create_index([("related_document_id", 1)])
-            mongo_db.journal_entries.create_index([("last_modified", -1)])
-            mongo_db.expenses.create_index([("date", -1)])
-            mongo_db.expenses.create_index([("project_id", 1)])
-            mongo_db.expenses.create_index([("account_id", 1)])
-            mongo_db.expenses.create_index([("payment_account_id", 1)])
-            mongo_db.expenses.create_index([("last_modified", -1)])
-
-            # ui-driven collections
-            mongo_db.notifications.create_index([("is_read", 1)])
-            mongo_db.notifications.create_index([("type", 1)])
-            mongo_db.notifications.create_index([("created_at", -1)])
-            mongo_db.notifications.create_index([("expires_at", 1)])
-            mongo_db.notifications.create_index([("entity_type", 1), ("created_at", -1)])
-            mongo_db.tasks.create_index([("status", 1)])
-            mongo_db.tasks.create_index([("due_date", 1)])
-            mongo_db.tasks.create_index([("last_modified", -1)])
-            mongo_db.users.create_index([("username", 1)])
-            mongo_db.users.create_index([("last_modified", -1)])
-            mongo_db.currencies.create_index([("code", 1)])
-            mongo_db.currencies.create_index([("active", 1)])
+            with self._lock:
+                if not self._table_exists("sync_queue"):
+                    return
+                self.sqlite_cursor.execute(
+                    """
+                    DELETE FROM sync_queue
+                    WHERE status = 'pending'
+                      AND id NOT IN (
+                          SELECT MIN(id) FROM sync_queue
+                          WHERE status = 'pending'
+                          GROUP BY entity_type, entity_id
+                      )
+                    """
+                )
+                self.sqlite_cursor.execute(
+                    """
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_sync_queue_pending_entity
+                    ON sync_queue(entity_type, entity_id) WHERE status = 'pending'
+                    """
+                )
 
-            safe_print("INFO: تم إنشاء indexes في MongoDB بنجاح.")
-            return True
+                allowed_tables = set(self._CHANGE_JOURNAL_TABLES)
+                required_columns = {"id", "dirty_flag", "sync_status", "_mongo_id", "is_deleted"}
+                journaled_tables: set[str] = set()
+                for table in self._CHANGE_JOURNAL_TABLES:
+                    if not self._table_exists(table):
+                        continue
+                    # الأعمدة تُقرأ من جديد: الكاش قد يحمل نتيجة قديمة قبل ترحيل أعمدة المزامنة
+                    self._sqlite_table_columns_cache.pop(table, None)
+                    if not required_columns.issubset(self._table_columns(table)):
+                        continue
+                    table_ref = self._quote_sqlite_identifier(table, allowed=allowed_tables)
+                    dirty_new = self._CHANGE_JOURNAL_DIRTY_SQL.format(row="NEW.")
+                    for suffix, event, operation in (
+                        ("ai", "INSERT", "'create'"),
+                        ("au", "UPDATE", "'update'"),
+                    ):
+                        self.sqlite_cursor.execute(
+                            f"DROP TRIGGER IF EXISTS trg_change_journal_{table}_{suffix}"
+                        )
+                        self.sqlite_cursor.execute(
+                            f"""
+                            CREATE TRIGGER trg_change_journal_{table}_{suffix}
+                            AFTER {event} ON {table_ref}
+                            WHEN {dirty_new}
+                            BEGIN
+                                INSERT INTO sync_queue (
+                                    created_at, last_modified, entity_type, entity_id, operation
+                                )
+                                VALUES (
+                                    strftime('%Y-%m-%dT%H:%M:%f', 'now'),
+                                    strftime('%Y-%m-%dT%H:%M:%f', 'now'),
+                                    '{table}',
+                                    CAST(NEW.id AS TEXT),
+                                    CASE
+                                        WHEN NEW.is_deleted = 1 OR NEW.sync_status = 'deleted'
+                                        THEN 'delete'
+                                        ELSE {operation}
+                                    END
+                                )
+                                ON CONFLICT(entity_type, entity_id) WHERE status = 'pending'
+                                DO UPDATE SET
+                                    operation = CASE
+                                        WHEN excluded.operation = 'delete' THEN 'delete'
+                                        WHEN sync_queue.operation = 'create' THEN 'create'
+                                        ELSE excluded.operation
+                                    END,
+                                    last_modified = excluded.last_modified;
+                            END
+                            """
+                        )
+                    # تسجيل الصفوف غير المتزامنة الموجودة مسبقاً (مسح واحد عند التشغيل فقط)
+                    dirty_rows = self._CHANGE_JOURNAL_DIRTY_SQL.format(row="")
+                    self.sqlite_cursor.execute(
+                        f"""
+                        INSERT OR IGNORE INTO sync_queue (
+                            created_at, last_modified, entity_type, entity_id, operation
+                        )
+                        SELECT
+                            strftime('%Y-%m-%dT%H:%M:%f', 'now'),
+                            strftime('%Y-%m-%dT%H:%M:%f', 'now'),
+                            '{table}',
+                            CAST(id AS TEXT),
+                            CASE WHEN _mongo_id IS NULL THEN 'create' ELSE 'update' END
+                        FROM {table_ref}
+                        WHERE {dirty_rows}
+                        """  # nosec B608
+                    )
+                    journaled_tables.add(table)
+                self.sqlite_conn.commit()
+                self._change_journal_tables = journaled_tables
+                self._change_journal_ready = True
         except Exception as e:
-            safe_print(f"WARNING: فشل إنشاء بعض indexes في MongoDB: {e}")
-            return False
-
-    def is_online(self) -> bool:
-        """دالة بسيطة لمعرفة حالة الاتصال"""
-        return bool(self.online)
+            safe_print(f"WARNING: [Repository] فشل تجهيز دفتر تغييرات المزامنة: {e}")
 
-    # --- دوال التعامل مع العملاء (كمثال) ---
+    def has_change_journal(self) -> bool:
+        return bool(self._change_journal_ready)
 
-    def create_client(self, client_data: schemas.Client) -> schemas.Client:
+    def get_pending_journal_ids(self, table_name: str, limit: int) -> list[int] | None:
         """
-        إنشاء عميل جديد (بذكاء)
-        1. يحفظ في SQLite دائماً (بحالة 'new_offline').
-        2. يحاول الحفظ في Mongo لو فيه نت.
+        ids الصفوف المعلّقة للرفع في جدول (الأقدم أولاً) من دفتر التغييرات.
+        المدخلات التي فشل رفعها تتأخر بعدد محاولاتها فلا تحجز الدفعة عن الصفوف الأحدث.
+        ترجع None لو الدفتر غير متاح أو الجدول بلا triggers، فيرجع المستدعي لمسح الجدول.
         """
-        # ✅ فحص التكرار قبل الإضافة (بالاسم - exact match)
-        existing_client = self.get_client_by_name(client_data.name)
-        if existing_client:
-            safe_print(f"WARNING: العميل '{client_data.name}' موجود بالفعل!")
-            raise ValueError(f"العميل '{client_data.name}' موجود بالفعل في النظام")
+        normalized = (table_name or "").strip()
+        if not self.has_change_journal() or normalized not in self._change_journal_tables:
+            return None
+        try:
+            with self._lock:
+                cursor = self.sqlite_conn.cursor()
+                try:
+                    cursor.execute(
+                        """
+                        SELECT entity_id FROM sync_queue
+                        WHERE status = 'pending' AND entity_type = ?
+                        ORDER BY COALESCE(retry_count, 0), id
+                        LIMIT ?
+                        """,
+                        (normalized, max(1, int(limit))),
+                    )
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] تعذر قراءة دفتر التغييرات لـ {normalized}: {e}")
+            return None
+        return [int(row[0]) for row in rows if str(row[0] or "").strip().isdigit()]
 
-        # ✅ فحص التكرار بالاسم (case insensitive)
-        similar_client = self._get_similar_client(client_data.name)
-        if similar_client:
-            safe_print(f"WARNING: يوجد عميل مشابه '{similar_client.name}'!")
-            raise ValueError(f"يوجد عميل مشابه بالاسم '{similar_client.name}'")
+    def acknowledge_journal_entries(self, table_name: str, local_ids) -> int:
+        """
+        إزالة مدخلات الدفتر للصفوف التي لم تعد بحاجة للرفع (رُفعت، حُذفت، أو مدخل قديم).
+        الصف الذي ما زال dirty (فشل رفعه أو عُدّل مجدداً) يبقى مدخله معلّقاً مع زيادة
+        retry_count، فيتأخر خلف المدخلات الأحدث في القراءة التالية.
+        """
+        normalized = (table_name or "").strip()
+        ids = [str(int(local_id)) for local_id in (local_ids or ()) if local_id is not None]
+        if not ids or not self.has_change_journal():
+            return 0
+        if normalized not in self._CHANGE_JOURNAL_TABLES:
+            return 0
+        table_ref = self._quote_sqlite_identifier(
+            normalized, allowed=set(self._CHANGE_JOURNAL_TABLES)
+        )
+        dirty_rows = self._CHANGE_JOURNAL_DIRTY_SQL.format(row="t.")
+        removed = 0
+        with self._lock:
+            cursor = self.sqlite_conn.cursor()
+            try:
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start : start + 500]
+                    placeholders = ", ".join("?" for _ in chunk)
+                    cursor.execute(
+                        f"""
+                        DELETE FROM sync_queue
+                        WHERE status = 'pending'
+                          AND entity_type = ?
+                          AND entity_id IN ({placeholders})
+                          AND NOT EXISTS (
+                              SELECT 1 FROM {table_ref} t
+                              WHERE t.id = CAST(sync_queue.entity_id AS INTEGER)
+                                AND ({dirty_rows})
+                          )
+                        """,  # nosec B608
+                        [normalized, *chunk],
+                    )
+                    removed += max(0, int(cursor.rowcount or 0))
+                    cursor.execute(
+                        f"""
+                        UPDATE sync_queue
+                        SET retry_count = COALESCE(retry_count, 0) + 1,
+                            last_attempt = strftime('%Y-%m-%dT%H:%M:%f', 'now')
+                        WHERE status = 'pending'
+                          AND entity_type = ?
+                          AND entity_id IN ({placeholders})
+                        """,  # nosec B608
+                        [normalized, *chunk],
+                    )
+                self.sqlite_conn.commit()
+            finally:
+                cursor.close()
+        return removed
+
+    def _ensure_change_counters(self) -> None:
+        """
+        ⚡ عدّاد تغييرات لكل جدول (change_counters): triggers بعد INSERT/UPDATE/DELETE
+        تزيد version وتحفظ آخر rowid متغير، فيقرأ LiveDataWatcher صفاً صغيراً لكل جدول
+        بدل COUNT(*) و MAX(last_modified) على الجداول كاملة.
+        """
+        self._change_counters_ready = False
+        try:
+            with self._lock:
+                self.sqlite_cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS change_counters (
+                        table_name TEXT PRIMARY KEY,
+                        version INTEGER NOT NULL DEFAULT 0,
+                        last_rowid INTEGER,
+                        last_changed_at TEXT
+                    )
+                    """
+                )
+                allowed_tables = set(self._CHANGE_JOURNAL_TABLES)
+                for table in self._CHANGE_JOURNAL_TABLES:
+                    if not self._table_exists(table):
+                        continue
+                    table_ref = self._quote_sqlite_identifier(table, allowed=allowed_tables)
+                    for suffix, event, row in (
+                        ("ai", "INSERT", "NEW"),
+                        ("au", "UPDATE", "NEW"),
+                        ("ad", "DELETE", "OLD"),
+                    ):
+                        self.sqlite_cursor.execute(
+                            f"DROP TRIGGER IF EXISTS trg_change_counter_{table}_{suffix}"
+                        )
+                        self.sqlite_cursor.execute(
+                            f"""
+                            CREATE TRIGGER trg_change_counter_{table}_{suffix}
+                            AFTER {event} ON {table_ref}
+                            BEGIN
+                                INSERT INTO change_counters (
+                                    table_name, version, last_rowid, last_changed_at
+                                )
+                                VALUES (
+                                    '{table}', 1, {row}.rowid,
+                                    strftime('%Y-%m-%dT%H:%M:%f', 'now')
+                                )
+                                ON CONFLICT(table_name) DO UPDATE SET
+                                    version = change_counters.version + 1,
+                                    last_rowid = excluded.last_rowid,
+                                    last_changed_at = excluded.last_changed_at;
+                            END
+                            """
+                        )
+                    self.sqlite_cursor.execute(
+                        "INSERT OR IGNORE INTO change_counters (table_name, version) VALUES (?, 0)",
+                        (table,),
+                    )
+                self.sqlite_conn.commit()
+                self._change_counters_ready = True
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] فشل تجهيز عدّادات تغييرات الجداول: {e}")
+
+    def has_change_counters(self) -> bool:
+        return bool(self._change_counters_ready)
+
+    def get_change_counters(self, table_names=None) -> dict[str, tuple[int, int | None]] | None:
+        """
+        {table: (version, last_rowid)} من جدول change_counters (استعلام واحد صغير).
+        ترجع None لو العدّادات غير متاحة، فيرجع المستدعي للفحص القديم.
+        """
+        if not self.has_change_counters():
+            return None
+        names = [str(name) for name in (table_names or ()) if name]
+        sql = "SELECT table_name, version, last_rowid FROM change_counters"
+        params: list[str] = []
+        if names:
+            sql += f" WHERE table_name IN ({', '.join('?' for _ in names)})"
+            params = names
+        try:
+            with self._lock:
+                cursor = self.sqlite_conn.cursor()
+                try:
+                    cursor.execute(sql, params)
+                    rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] تعذر قراءة عدّادات التغييرات: {e}")
+            return None
+        return {str(row[0]): (int(row[1] or 0), row[2]) for row in rows}
+
+    _JOURNAL_LINES_TRIGGERS = (
+        "trg_journal_lines_ai",
+        "trg_journal_lines_au",
+        "trg_journal_lines_ad",
+    )
+
+    @staticmethod
+    def _journal_lines_insert_sql(alias: str) -> str:
+        """تفكيك أسطر قيد (JSON) إلى journal_lines للقيود النشطة فقط."""
+        source = "journal_entries" if alias == "je" else alias
+        where_entry = (
+            f"({alias}.sync_status != 'deleted' OR {alias}.sync_status IS NULL) "
+            f"AND ({alias}.is_deleted = 0 OR {alias}.is_deleted IS NULL)"
+        )
+        from_clause = f"FROM {source} {alias}, " if alias == "je" else "FROM "
+        return f"""
+            INSERT OR REPLACE INTO journal_lines (
+                entry_id, line_no, account_code, account_id, debit, credit, date, description
+            )
+            SELECT
+                {alias}.id,
+                CAST(line.key AS INTEGER),
+                COALESCE(json_extract(line.value, '$.account_code'), ''),
+                COALESCE(
+                    NULLIF(json_extract(line.value, '$.account_id'), ''),
+                    json_extract(line.value, '$.account_code'),
+                    json_extract(line.value, '$.account_name'),
+                    ''
+                ),
+                COALESCE(json_extract(line.value, '$.debit'), 0.0),
+                COALESCE(json_extract(line.value, '$.credit'), 0.0),
+                {alias}.date,
+                json_extract(line.value, '$.description')
+            {from_clause}json_each(
+                CASE WHEN json_valid({alias}.lines) THEN {alias}.lines ELSE '[]' END
+            ) line
+            WHERE {where_entry}
+              AND line.type = 'object';
+        """  # nosec B608
+
+    def _ensure_journal_lines(self) -> None:
+        """
+        ⚡ أسطر القيود في جدول مستقل (journal_lines) مفهرس على (account_code, date):
+        كشف حساب واحد يصبح مسحاً محدوداً بالنطاق بدل فك JSON كل القيود.
+        triggers على journal_entries تغطي الإنشاء والتعديل والحذف والمزامنة.
+        """
+        try:
+            with self._lock:
+                if not self._table_exists("journal_entries"):
+                    return
+                required_columns = {"id", "date", "lines", "sync_status", "is_deleted"}
+                if not required_columns.issubset(self._table_columns("journal_entries")):
+                    return
+                lines_existed = self._table_exists("journal_lines")
+                self.sqlite_cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS journal_lines (
+                        entry_id INTEGER NOT NULL,
+                        line_no INTEGER NOT NULL,
+                        account_code TEXT NOT NULL DEFAULT '',
+                        account_id TEXT NOT NULL DEFAULT '',
+                        debit REAL NOT NULL DEFAULT 0.0,
+                        credit REAL NOT NULL DEFAULT 0.0,
+                        date TEXT,
+                        description TEXT,
+                        PRIMARY KEY (entry_id, line_no)
+                    )
+                    """
+                )
+                self.sqlite_cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_journal_lines_account_code_date "
+                    "ON journal_lines(account_code, date)"
+                )
+                self.sqlite_cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_journal_lines_account_id_date "
+                    "ON journal_lines(account_id, date)"
+                )
+
+                self.sqlite_cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_journal_lines_%'"
+                )
+                existing_triggers = {str(row[0]) for row in self.sqlite_cursor.fetchall()}
+                if lines_existed and set(self._JOURNAL_LINES_TRIGGERS).issubset(existing_triggers):
+                    self._journal_lines_ready = True
+                    return
+
+                for name in self._JOURNAL_LINES_TRIGGERS:
+                    self.sqlite_cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                self.sqlite_cursor.execute(
+                    f"""
+                    CREATE TRIGGER trg_journal_lines_ai AFTER INSERT ON journal_entries
+                    BEGIN {self._journal_lines_insert_sql("NEW")} END
+                    """
+                )
+                self.sqlite_cursor.execute(
+                    f"""
+                    CREATE TRIGGER trg_journal_lines_au
+                    AFTER UPDATE OF lines, date, sync_status, is_deleted ON journal_entries
+                    BEGIN
+                        DELETE FROM journal_lines WHERE entry_id = OLD.id;
+                        {self._journal_lines_insert_sql("NEW")}
+                    END
+                    """
+                )
+                self.sqlite_cursor.execute(
+                    """
+                    CREATE TRIGGER trg_journal_lines_ad AFTER DELETE ON journal_entries
+                    BEGIN
+                        DELETE FROM journal_lines WHERE entry_id = OLD.id;
+                    END
+                    """
+                )
+                self._rebuild_journal_lines_rows()
+                self.sqlite_conn.commit()
+                self._journal_lines_ready = True
+                safe_print("INFO: [Repository] ✅ تم تجهيز جدول أسطر القيود (journal_lines)")
+        except Exception as e:
+            self._journal_lines_ready = False
+            safe_print(f"WARNING: [Repository] فشل تجهيز جدول أسطر القيود: {e}")
+
+    def _rebuild_journal_lines_rows(self) -> None:
+        self.sqlite_cursor.execute("DELETE FROM journal_lines")
+        self.sqlite_cursor.execute(self._journal_lines_insert_sql("je"))
+
+    @staticmethod
+    def _journal_line_account_filter(identifiers) -> tuple[str, list[str]]:
+        refs = sorted({str(value).strip() for value in (identifiers or ()) if str(value).strip()})
+        placeholders = ", ".join("?" for _ in refs)
+        return (
+            f"(jl.account_code IN ({placeholders}) OR jl.account_id IN ({placeholders}))",
+            [*refs, *refs],
+        )
+
+    def get_journal_lines_for_accounts(
+        self, identifiers, start_iso: str | None = None, end_iso: str | None = None
+    ) -> list[dict] | None:
+        """
+        ⚡ أسطر القيود لحساب (بأي من معرفاته: code / id / _mongo_id) في نطاق تاريخ،
+        مرتبة بالتاريخ. ترجع None لو journal_lines غير متاح (يرجع المستدعي للمسح القديم).
+        """
+        if not self._journal_lines_ready:
+            return None
+        account_sql, params = self._journal_line_account_filter(identifiers)
+        if not params:
+            return []
+        conditions = [account_sql]
+        if start_iso:
+            conditions.append("jl.date >= ?")
+            params.append(start_iso)
+        if end_iso:
+            conditions.append("jl.date <= ?")
+            params.append(end_iso)
+        try:
+            with self.read_cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT jl.entry_id, jl.date, jl.debit, jl.credit,
+                           COALESCE(NULLIF(jl.description, ''), je.description) AS description,
+                           je.related_document_id
+                    FROM journal_lines jl
+                    JOIN journal_entries je ON je.id = jl.entry_id
+                    WHERE {" AND ".join(conditions)}
+                    ORDER BY jl.date ASC, jl.entry_id ASC, jl.line_no ASC
+                    """,  # nosec B608
+                    params,
+                )
+                return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] تعذر قراءة أسطر القيود: {e}")
+            return None
+
+    def sum_journal_lines_before(self, identifiers, before_iso: str) -> tuple[float, float] | None:
+        """⚡ (مجموع المدين، مجموع الدائن) لأسطر حساب قبل تاريخ محدد."""
+        if not self._journal_lines_ready:
+            return None
+        account_sql, params = self._journal_line_account_filter(identifiers)
+        if not params:
+            return 0.0, 0.0
+        try:
+            with self.read_cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT COALESCE(SUM(jl.debit), 0.0), COALESCE(SUM(jl.credit), 0.0)
+                    FROM journal_lines jl
+                    WHERE {account_sql} AND jl.date < ?
+                    """,  # nosec B608
+                    [*params, before_iso],
+                )
+                row = cursor.fetchone()
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] تعذر جمع أسطر القيود: {e}")
+            return None
+        return float(row[0] or 0.0), float(row[1] or 0.0)
+
+    # ⚡ الجداول التي تُبطل لقطات الأرصدة من تاريخ الصف المتغير وما بعده
+    _BALANCE_SNAPSHOT_SOURCES = ("payments", "expenses", "journal_entries")
+    _BALANCE_SNAPSHOT_COMPONENTS = (
+        "payments",
+        "expenses_paid",
+        "expenses_charged",
+        "journal_debit",
+        "journal_credit",
+    )
+
+    def _ensure_account_balance_snapshots(self) -> None:
+        """
+        ⚡ لقطات أرصدة شهرية لكل حساب (account_balance_snapshots): مجاميع تراكمية لكل
+        مكوّن (دفعات، مصروفات، أسطر قيود) لكل ما قبل بداية الشهر.
+        الرصيد الافتتاحي = لقطة واحدة + مسح قصير داخل الشهر.
+        أي كتابة بتاريخ قديم تُبطل اللقطات من ذلك التاريخ فصاعداً (triggers).
+        """
+        try:
+            with self._lock:
+                if self._table_exists("account_balance_snapshots"):
+                    self.sqlite_cursor.execute("PRAGMA table_info(account_balance_snapshots)")
+                    key_columns = {str(row[1]) for row in self.sqlite_cursor.fetchall() if row[5]}
+                    if "identifiers_key" not in key_columns:
+                        # مفتاح قديم (account_code, boundary): لقطات مجموعات مراجع مختلفة
+                        # كانت تستبدل بعضها -> تُمسح وتُبنى عند الطلب
+                        self.sqlite_cursor.execute("DROP TABLE account_balance_snapshots")
+                        self._sqlite_table_columns_cache.pop("account_balance_snapshots", None)
+                self.sqlite_cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS account_balance_snapshots (
+                        account_code TEXT NOT NULL,
+                        boundary TEXT NOT NULL,
+                        identifiers_key TEXT NOT NULL DEFAULT '',
+                        payments REAL NOT NULL DEFAULT 0.0,
+                        expenses_paid REAL NOT NULL DEFAULT 0.0,
+                        expenses_charged REAL NOT NULL DEFAULT 0.0,
+                        journal_debit REAL NOT NULL DEFAULT 0.0,
+                        journal_credit REAL NOT NULL DEFAULT 0.0,
+                        PRIMARY KEY (account_code, boundary, identifiers_key)
+                    )
+                    """
+                )
+                self.sqlite_cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_account_balance_snapshots_boundary "
+                    "ON account_balance_snapshots(boundary)"
+                )
+                allowed_tables = set(self._BALANCE_SNAPSHOT_SOURCES)
+                expected = set()
+                for table in self._BALANCE_SNAPSHOT_SOURCES:
+                    if self._table_exists(table):
+                        expected.update(
+                            f"trg_balance_snapshot_{table}_{suffix}"
+                            for suffix in ("ai", "au", "ad")
+                        )
+                self.sqlite_cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_balance_snapshot_%'"
+                )
+                existing = {str(row[0]) for row in self.sqlite_cursor.fetchall()}
+                if expected.issubset(existing):
+                    return
+
+                # triggers ناقصة = اللقطات ربما فاتها تعديل -> نمسحها وتُبنى عند الطلب
+                self.sqlite_cursor.execute("DELETE FROM account_balance_snapshots")
+                for table in self._BALANCE_SNAPSHOT_SOURCES:
+                    if not self._table_exists(table):
+                        continue
+                    table_ref = self._quote_sqlite_identifier(table, allowed=allowed_tables)
+                    invalidate = (
+                        "DELETE FROM account_balance_snapshots "
+                        "WHERE boundary > substr(COALESCE({row}.date, ''), 1, 10);"
+                    )
+                    for suffix, event, body in (
+                        ("ai", "INSERT", invalidate.format(row="NEW")),
+                        (
+                            "au",
+                            "UPDATE",
+                            invalidate.format(row="OLD") + invalidate.format(row="NEW"),
+                        ),
+                        ("ad", "DELETE", invalidate.format(row="OLD")),
+                    ):
+                        self.sqlite_cursor.execute(
+                            f"DROP TRIGGER IF EXISTS trg_balance_snapshot_{table}_{suffix}"
+                        )
+                        self.sqlite_cursor.execute(
+                            f"""
+                            CREATE TRIGGER trg_balance_snapshot_{table}_{suffix}
+                            AFTER {event} ON {table_ref}
+                            BEGIN {body} END
+                            """
+                        )
+                self.sqlite_conn.commit()
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] فشل تجهيز لقطات أرصدة الحسابات: {e}")
+
+    def _sum_account_components(
+        self,
+        cursor,
+        account_code: str,
+        identifiers,
+        start_iso: str | None,
+        end_iso: str,
+        cash_refs: list[str] | None = None,
+        duplicate_ids: dict[str, str] | None = None,
+    ) -> dict[str, float]:
+        """
+        مجاميع مكوّنات رصيد حساب للصفوف ذات التاريخ في [start_iso, end_iso).
+        cash_refs (للخزن): المراجع الخام المحلولة للحساب؛ الدفعة تطابق account_id والمصروف
+        يطابق payment_account_id أو account_id، بعد استبعاد النسخ المكررة (duplicate_ids).
+        """
+        range_sql = "date < ?" if start_iso is None else "date >= ? AND date < ?"
+        range_params = [end_iso] if start_iso is None else [start_iso, end_iso]
+        active_sql = (
+            "(sync_status != 'deleted' OR sync_status IS NULL) "
+            "AND (is_deleted = 0 OR is_deleted IS NULL)"
+        )
+        totals = dict.fromkeys(self._BALANCE_SNAPSHOT_COMPONENTS, 0.0)
+
+        if cash_refs is not None:
+            if cash_refs:
+                refs_sql = ", ".join("?" for _ in cash_refs)
+                dedupe_sql = "id NOT IN (SELECT value FROM json_each(?))"
+                duplicates = duplicate_ids or {}
+                cursor.execute(
+                    f"""
+                    SELECT COALESCE(SUM(amount), 0) FROM payments
+                    WHERE {active_sql} AND {dedupe_sql} AND {range_sql}
+                      AND account_id IN ({refs_sql})
+                    """,  # nosec B608
+                    [duplicates.get("payments", "[]"), *range_params, *cash_refs],
+                )
+                totals["payments"] = float(cursor.fetchone()[0] or 0.0)
+                cursor.execute(
+                    f"""
+                    SELECT COALESCE(SUM(amount), 0) FROM expenses
+                    WHERE {active_sql} AND {dedupe_sql} AND {range_sql}
+                      AND (payment_account_id IN ({refs_sql}) OR account_id IN ({refs_sql}))
+                    """,  # nosec B608
+                    [duplicates.get("expenses", "[]"), *range_params, *cash_refs, *cash_refs],
+                )
+                totals["expenses_paid"] = float(cursor.fetchone()[0] or 0.0)
+            self._sum_journal_components(cursor, totals, identifiers, range_sql, range_params)
+            return totals
+
+        cursor.execute(
+            f"""
+            SELECT COALESCE(SUM(amount), 0) FROM payments
+            WHERE {active_sql} AND account_id = ? AND {range_sql}
+            """,  # nosec B608
+            [account_code, *range_params],
+        )
+        totals["payments"] = float(cursor.fetchone()[0] or 0.0)
+        cursor.execute(
+            f"""
+            SELECT
+                COALESCE(SUM(CASE
+                    WHEN payment_account_id = ?
+                      OR (payment_account_id IS NULL AND account_id = ?)
+                    THEN amount ELSE 0 END), 0),
+                COALESCE(SUM(CASE
+                    WHEN account_id = ?
+                      AND payment_account_id IS NOT NULL
+                      AND payment_account_id != ?
+                    THEN amount ELSE 0 END), 0)
+            FROM expenses
+            WHERE {active_sql} AND {range_sql}
+              AND (payment_account_id = ? OR account_id = ?)
+            """,  # nosec B608
+            [account_code] * 4 + range_params + [account_code] * 2,
+        )
+        row = cursor.fetchone()
+        totals["expenses_paid"] = float(row[0] or 0.0)
+        totals["expenses_charged"] = float(row[1] or 0.0)
+        self._sum_journal_components(cursor, totals, identifiers, range_sql, range_params)
+        return totals
+
+    def _sum_journal_components(
+        self, cursor, totals: dict[str, float], identifiers, range_sql: str, range_params: list
+    ) -> None:
+        account_sql, account_params = self._journal_line_account_filter(identifiers)
+        if account_params:
+            journal_range = range_sql.replace("date", "jl.date")
+            cursor.execute(
+                f"""
+                SELECT COALESCE(SUM(jl.debit), 0.0), COALESCE(SUM(jl.credit), 0.0)
+                FROM journal_lines jl
+                WHERE {account_sql} AND {journal_range}
+                """,  # nosec B608
+                [*account_params, *range_params],
+            )
+            row = cursor.fetchone()
+            totals["journal_debit"] = float(row[0] or 0.0)
+            totals["journal_credit"] = float(row[1] or 0.0)
+
+    def get_cash_reference_values(self) -> list[str]:
+        """
+        المراجع الخام المميزة لحسابات الخزن في الحركات النشطة (payments.account_id،
+        expenses.payment_account_id / account_id) ليحلّها المستدعي بدل مسح كل الحركات.
+        """
+        with self.read_cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT account_id {self._is_active_filter_sql("payments")}
+                UNION
+                SELECT payment_account_id {self._is_active_filter_sql("expenses")}
+                UNION
+                SELECT account_id {self._is_active_filter_sql("expenses")}
+                """  # nosec B608
+            )
+            return [str(row[0]) for row in cursor.fetchall() if row[0] not in (None, "")]
+
+    def get_account_opening_components(
+        self, account_code: str, identifiers, before_iso: str, cash_refs=None
+    ) -> dict[str, float] | None:
+        """
+        ⚡ مكوّنات الرصيد الافتتاحي لحساب قبل تاريخ محدد (دفعات، مصروفات مدفوعة/محمّلة،
+        مدين/دائن القيود) = لقطة بداية الشهر + مسح المدة من بداية الشهر حتى التاريخ.
+        اللقطة الناقصة تُبنى من أقرب لقطة سابقة وتُحفظ. ترجع None لو غير متاح.
+        cash_refs (للخزن) يطابق الحركات بمراجعها المحلولة بدون النسخ المكررة كما في
+        get_all_*؛ المفتاح يتضمن نسخة النسخ المكررة فلا تُقرأ لقطة حُسبت قبل تغيرها.
+        """
+        code = str(account_code or "").strip()
+        if not code or not before_iso or not self._journal_lines_ready:
+            return None
+        refs = {str(value).strip() for value in (identifiers or ()) if str(value).strip()}
+        refs.add(code)
+        cash_list: list[str] | None = None
+        duplicate_ids: dict[str, str] | None = None
+        key_parts: list[Any] = [sorted(refs)]
+        if cash_refs is not None:
+            cash_list = sorted({str(value) for value in cash_refs if str(value or "")})
+            duplicate_ids = {
+                table: json.dumps(sorted(self.get_signature_duplicate_ids(table)))
+                for table in ("payments", "expenses")
+            }
+            duplicates_digest = hashlib.blake2b(
+                json.dumps(duplicate_ids, sort_keys=True).encode("utf-8"), digest_size=8
+            ).hexdigest()
+            key_parts.extend([cash_list, duplicates_digest])
+        identifiers_key = json.dumps(key_parts, ensure_ascii=False)
+        # لقطة عند بداية شهر التاريخ المطلوب، ولا لقطات لشهور لم تبدأ بعد
+        boundary = min(str(before_iso)[:7], datetime.now().strftime("%Y-%m")) + "-01"
+        components = self._BALANCE_SNAPSHOT_COMPONENTS
+        try:
+            with self._lock:
+                cursor = self.sqlite_conn.cursor()
+                try:
+                    cursor.execute(
+                        f"""
+                        SELECT boundary, {", ".join(components)}
+                        FROM account_balance_snapshots
+                        WHERE account_code = ? AND identifiers_key = ? AND boundary <= ?
+                        ORDER BY boundary DESC
+                        LIMIT 1
+                        """,  # nosec B608
+                        (code, identifiers_key, boundary),
+                    )
+                    snapshot = cursor.fetchone()
+                    if snapshot is not None and snapshot[0] == boundary:
+                        base = dict(zip(components, map(float, snapshot[1:]), strict=True))
+                    else:
+                        base_boundary = snapshot[0] if snapshot is not None else None
+                        base = self._sum_account_components(
+                            cursor, code, refs, base_boundary, boundary, cash_list, duplicate_ids
+                        )
+                        if snapshot is not None:
+                            for index, name in enumerate(components, start=1):
+                                base[name] += float(snapshot[index] or 0.0)
+                        cursor.execute(
+                            f"""
+                            INSERT OR REPLACE INTO account_balance_snapshots (
+                                account_code, boundary, identifiers_key, {", ".join(components)}
+                            ) VALUES (?, ?, ?, {", ".join("?" for _ in components)})
+                            """,  # nosec B608
+                            (code, boundary, identifiers_key, *(base[name] for name in components)),
+                        )
+                        self.sqlite_conn.commit()
+
+                    if boundary < str(before_iso):
+                        delta = self._sum_account_components(
+                            cursor, code, refs, boundary, str(before_iso), cash_list, duplicate_ids
+                        )
+                        for name in components:
+                            base[name] += delta[name]
+                    return base
+                finally:
+                    cursor.close()
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] تعذر حساب الرصيد الافتتاحي من اللقطات: {e}")
+            return None
+
+    # ⚡ الجداول التي تحمل مرجع مشروع (project_id) ويُفهرس مفتاحه المطبّع
+    _PROJECT_REF_KEY_SOURCES = ("payments", "expenses")
+
+    def get_report_aggregates(
+        self, start_iso: str | None = None, end_iso: str | None = None
+    ) -> dict[str, list[tuple]] | None:
+        """
+        ⚡ مجاميع التقارير (ميزان المراجعة / الأرباح والخسائر / الميزانية) بـ GROUP BY
+        للصفوف ذات التاريخ في [start_iso, end_iso) (أي طرف None = بلا حد).
+
+        الدفعات والمصروفات المكررة بالتوقيع (كما في get_all_*) تُستبعد من المجاميع.
+        journaled = 1 للحركات التي لها قيد مرتبط (related_document_id = id أو _mongo_id وسطر
+        يحرك خزنتها بنفس المبلغ)، فأسطر ذلك القيد تحمل أثرها ولا تُضاف فوقها في التقارير.
+
+        Returns:
+            {"payments": [(account_id, total, count, journaled)],
+             "expenses": [(payment_account_id, account_id, category, total, count, journaled)],
+             "journal": [(account_code, account_id, debit, credit)] أو None لو journal_lines غير جاهز}
+        """
+        conditions: list[str] = []
+        params: list[str] = []
+        if start_iso is not None:
+            conditions.append("date >= ?")
+            params.append(start_iso)
+        if end_iso is not None:
+            conditions.append("date < ?")
+            params.append(end_iso)
+        range_sql = "".join(f" AND {condition}" for condition in conditions)
+        dedupe_sql = " AND id NOT IN (SELECT value FROM json_each(?))"
+        payment_duplicates = json.dumps(sorted(self.get_signature_duplicate_ids("payments")))
+        expense_duplicates = json.dumps(sorted(self.get_signature_duplicate_ids("expenses")))
+
+        def journaled_sql(table_name: str, side: str, cash_refs: str) -> str:
+            # بدون journal_lines لا تُقرأ أسطر القيود فلا يوجد ما يُستبعد لأجله
+            if not self._journal_lines_ready:
+                return "0"
+            # المرجع وحده قد يطابق id جدول آخر؛ القيد يجب أن يحرك خزنة الحركة بنفس المبلغ
+            return f"""
+                EXISTS (
+                    SELECT 1 FROM journal_entries je
+                    JOIN journal_lines jl ON jl.entry_id = je.id
+                    WHERE je.related_document_id IN (
+                        CAST({table_name}.id AS TEXT), {table_name}._mongo_id
+                    )
+                      AND ABS(jl.{side} - {table_name}.amount) < 0.01
+                      AND (jl.account_code IN ({cash_refs}) OR jl.account_id IN ({cash_refs}))
+                )
+            """  # nosec B608
+
+        payment_journaled = journaled_sql("payments", "debit", "payments.account_id")
+        expense_journaled = journaled_sql(
+            "expenses", "credit", "expenses.payment_account_id, expenses.account_id"
+        )
+        try:
+            with self.read_cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT COALESCE(account_id, ''), COALESCE(SUM(amount), 0), COUNT(*), journaled
+                    FROM (
+                        SELECT account_id, amount, {payment_journaled} AS journaled
+                        {self._is_active_filter_sql("payments")}{range_sql}{dedupe_sql}
+                    )
+                    GROUP BY COALESCE(account_id, ''), journaled
+                    """,  # nosec B608
+                    [*params, payment_duplicates],
+                )
+                payments = [tuple(row) for row in cursor.fetchall()]
+                cursor.execute(
+                    f"""
+                    SELECT COALESCE(payment_account_id, ''), COALESCE(account_id, ''),
+                           COALESCE(category, ''), COALESCE(SUM(amount), 0), COUNT(*), journaled
+                    FROM (
+                        SELECT payment_account_id, account_id, category, amount,
+                               {expense_journaled} AS journaled
+                        {self._is_active_filter_sql("expenses")}{range_sql}{dedupe_sql}
+                    )
+                    GROUP BY COALESCE(payment_account_id, ''), COALESCE(account_id, ''),
+                             COALESCE(category, ''), journaled
+                    """,  # nosec B608
+                    [*params, expense_duplicates],
+                )
+                expenses = [tuple(row) for row in cursor.fetchall()]
+                journal = None
+                if self._journal_lines_ready:
+                    journal_range = range_sql.replace("date", "jl.date")
+                    cursor.execute(
+                        f"""
+                        SELECT COALESCE(jl.account_code, ''), COALESCE(jl.account_id, ''),
+                               COALESCE(SUM(jl.debit), 0.0), COALESCE(SUM(jl.credit), 0.0)
+                        FROM journal_lines jl
+                        WHERE 1 = 1{journal_range}
+                        GROUP BY COALESCE(jl.account_code, ''), COALESCE(jl.account_id, '')
+                        """,  # nosec B608
+                        params,
+                    )
+                    journal = [tuple(row) for row in cursor.fetchall()]
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] تعذر حساب مجاميع التقارير: {e}")
+            return None
+        return {"payments": payments, "expenses": expenses, "journal": journal}
+
+    # ==================== نقاط تحقق مراجعة الخزن ====================
+
+    # ==================== مخزن الصور بالمحتوى (blobs) ====================
+
+    def _ensure_blob_store(self) -> None:
+        """
+        ⚡ مخزن blobs: كل صورة تُحفظ مرة واحدة باسم بصمتها (sha256) مع صورة مصغرة جاهزة،
+        وصف العميل يحمل logo_hash فقط فتبقى قوائم العملاء خفيفة.
+        """
+        try:
+            with self._lock:
+                self.sqlite_cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS blobs (
+                        hash TEXT PRIMARY KEY,
+                        mime TEXT NOT NULL DEFAULT '',
+                        size INTEGER NOT NULL DEFAULT 0,
+                        data BLOB NOT NULL,
+                        thumbnail BLOB,
+                        created_at TEXT
+                    )
+                    """
+                )
+                self.sqlite_conn.commit()
+            self._move_client_logos_to_blobs()
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] تعذر تجهيز مخزن الصور: {e}")
+
+    def put_blob(self, data: bytes, mime: str = "") -> str:
+        """حفظ محتوى (مرة واحدة لكل بصمة) وإرجاع البصمة."""
+        digest = logo_content_hash(data)
+        if self.has_blob(digest):
+            return digest
+        thumbnail = logo_thumbnail_png_bytes(data, mime)
+        with self._lock:
+            # داخل transaction قائمة (مثل تطبيق دفعة سحب) يُحفظ مع commit المستدعي
+            outer_transaction = self.sqlite_conn.in_transaction
+            cursor = self.sqlite_conn.cursor()
+            try:
+                cursor.execute(
+                    """
+                    INSERT OR IGNORE INTO blobs (hash, mime, size, data, thumbnail, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        digest,
+                        str(mime or ""),
+                        len(data),
+                        sqlite3.Binary(data),
+                        sqlite3.Binary(thumbnail) if thumbnail else None,
+                        datetime.now().isoformat(),
+                    ),
+                )
+                if not outer_transaction:
+                    self.sqlite_conn.commit()
+            finally:
+                cursor.close()
+        return digest
+
+    def has_blob(self, blob_hash: str | None) -> bool:
+        if not blob_hash:
+            return False
+        with self.read_cursor() as cursor:
+            cursor.execute("SELECT 1 FROM blobs WHERE hash = ?", (str(blob_hash),))
+            return cursor.fetchone() is not None
+
+    def get_blob(self, blob_hash: str | None) -> tuple[bytes, str] | None:
+        """(data, mime) أو None لو غير موجود محلياً."""
+        if not blob_hash:
+            return None
+        with self.read_cursor() as cursor:
+            cursor.execute("SELECT data, mime FROM blobs WHERE hash = ?", (str(blob_hash),))
+            row = cursor.fetchone()
+        return (bytes(row[0]), str(row[1] or "")) if row else None
+
+    def get_blob_thumbnail(self, blob_hash: str | None) -> bytes | None:
+        if not blob_hash:
+            return None
+        with self.read_cursor() as cursor:
+            cursor.execute("SELECT thumbnail FROM blobs WHERE hash = ?", (str(blob_hash),))
+            row = cursor.fetchone()
+        return bytes(row[0]) if row and row[0] else None
+
+    def save_blob_thumbnail(self, blob_hash: str, thumbnail: bytes) -> None:
+        """حفظ صورة مصغرة أنتجتها الواجهة لصورة لم يتح لها Qt وقت الحفظ."""
+        with self._lock:
+            cursor = self.sqlite_conn.cursor()
+            try:
+                cursor.execute(
+                    "UPDATE blobs SET thumbnail = ? WHERE hash = ?",
+                    (sqlite3.Binary(thumbnail), str(blob_hash)),
+                )
+                self.sqlite_conn.commit()
+            finally:
+                cursor.close()
+
+    def store_client_logo(self, logo_data: Any) -> str | None:
+        """حفظ logo_data (data URL / base64 / SVG) في مخزن blobs وإرجاع بصمته."""
+        blob = logo_blob_from_data(logo_data)
+        if blob is None:
+            return None
+        return self.put_blob(*blob)
+
+    def get_client_logo_data(self, logo_hash: str | None) -> str | None:
+        """logo_data الكامل من البصمة (للطباعة والمزامنة)؛ None لو الصورة غير موجودة محلياً."""
+        blob = self.get_blob(logo_hash)
+        return logo_data_from_blob(*blob) if blob else None
+
+    # مجموعة MongoDB للصور: مستند لكل بصمة {_id: hash, logo_data}؛ وثائق العملاء تحمل البصمة فقط
+    CLOUD_LOGO_BLOBS_COLLECTION = "logo_blobs"
+
+    def push_logo_blobs(self, logo_hashes) -> int:
+        """
+        ⚡ رفع صور العملاء لمجموعة logo_blobs مرة واحدة لكل بصمة:
+        استعلام واحد عن البصمات الموجودة ثم رفع الناقص فقط. يعيد عدد الصور المرفوعة.
+        """
+        pending = sorted(
+            {str(h).strip() for h in logo_hashes or () if str(h or "").strip()}
+            - self._pushed_logo_hashes
+        )
+        if not pending or self.mongo_db is None:
+            return 0
+        collection = self.mongo_db[self.CLOUD_LOGO_BLOBS_COLLECTION]
+        existing = {
+            str(doc.get("_id")) for doc in collection.find({"_id": {"$in": pending}}, {"_id": 1})
+        }
+        uploaded = 0
+        for logo_hash in pending:
+            if logo_hash not in existing:
+                logo_data = self.get_client_logo_data(logo_hash)
+                if not logo_data:
+                    # الصورة غير موجودة محلياً: جهاز آخر هو من يملكها
+                    continue
+                collection.update_one(
+                    {"_id": logo_hash},
+                    {"$setOnInsert": {"logo_data": logo_data, "created_at": datetime.now()}},
+                    upsert=True,
+                )
+                uploaded += 1
+            self._pushed_logo_hashes.add(logo_hash)
+        if uploaded:
+            safe_print(f"INFO: [Repository] تم رفع {uploaded} صورة عميل لمجموعة الصور")
+        return uploaded
+
+    def _fetch_cloud_logo_blob(self, logo_hash: str) -> str | None:
+        """جلب صورة من logo_blobs وحفظها محلياً؛ يعيد البصمة المحفوظة أو None."""
+        if not logo_hash or self.mongo_db is None:
+            return None
+        doc = self.mongo_db[self.CLOUD_LOGO_BLOBS_COLLECTION].find_one(
+            {"_id": logo_hash}, {"logo_data": 1}
+        )
+        logo_data = (doc or {}).get("logo_data")
+        stored_hash = self.store_client_logo(logo_data) if logo_data else None
+        if stored_hash:
+            self._pushed_logo_hashes.add(stored_hash)
+        return stored_hash
+
+    def _hydrate_client_logo(self, client: schemas.Client) -> schemas.Client:
+        if client.logo_hash and not client.logo_data:
+            client.logo_data = self.get_client_logo_data(client.logo_hash)
+        return client
+
+    def _move_client_logos_to_blobs(self) -> int:
+        """نقل أي logo_data مخزن داخل صفوف العملاء (بيانات قديمة/سحب كامل) إلى مخزن blobs."""
+        with self.read_cursor() as cursor:
+            cursor.execute(
+                "SELECT id, logo_data FROM clients WHERE logo_data IS NOT NULL AND logo_data != ''"
+            )
+            rows = cursor.fetchall()
+        moved = 0
+        for client_id, logo_data in rows:
+            logo_hash = self.store_client_logo(logo_data)
+            if logo_hash is None:
+                continue
+            with self._lock:
+                cursor = self.sqlite_conn.cursor()
+                try:
+                    # بدون تغيير sync_status: النقل محلي ولا يحتاج رفعاً للسحابة
+                    cursor.execute(
+                        """
+                        UPDATE clients SET logo_hash = ?, logo_data = NULL, has_logo = 1
+                        WHERE id = ? AND logo_data = ?
+                        """,
+                        (logo_hash, client_id, logo_data),
+                    )
+                    self.sqlite_conn.commit()
+                    moved += max(0, int(cursor.rowcount or 0))
+                finally:
+                    cursor.close()
+        if moved:
+            safe_print(f"INFO: [Repository] تم نقل {moved} شعار عميل إلى مخزن الصور")
+            if CACHE_ENABLED and hasattr(self, "_clients_cache"):
+                self._clients_cache.invalidate()
+        return moved
+
+    _CASHBOX_AUDIT_SOURCES = {
+        "payments": "COALESCE(account_id, '')",
+        "expenses": "COALESCE(payment_account_id, ''), COALESCE(account_id, '')",
+    }
+
+    # الأعمدة التي تغير بصمة حركات الخزن (غير حالة الحذف)؛ تحديثات المزامنة لا تمسها
+    _CASH_MOVEMENT_COLUMNS = {
+        "payments": ("id", "amount", "account_id"),
+        "expenses": ("id", "amount", "account_id", "payment_account_id"),
+    }
+
+    @staticmethod
+    def _cash_movement_counter_name(table_name: str) -> str:
+        return f"cash_movements:{table_name}"
+
+    def _ensure_cash_movement_counters(self) -> None:
+        """
+        ⚡ عدّاد حركات الخزن لكل جدول في change_counters: مثل عدّاد الجدول لكن UPDATE
+        لا يرفعه إلا لو تغير عمود يدخل في بصمة المراجعة أو حالة الحذف، فتحديثات
+        المزامنة (sync_status/_mongo_id/last_modified) بعد كل push لا تفرض إعادة مراجعة.
+        """
+        for table, columns in self._CASH_MOVEMENT_COLUMNS.items():
+            if not self._table_exists(table):
+                continue
+            table_ref = self._quote_sqlite_identifier(
+                table, allowed=set(self._CASH_MOVEMENT_COLUMNS)
+            )
+            counter = self._cash_movement_counter_name(table)
+            changed_sql = " OR ".join(
+                [f"NEW.{column} IS NOT OLD.{column}" for column in columns]
+                + [
+                    "(COALESCE(NEW.sync_status, '') = 'deleted')"
+                    " != (COALESCE(OLD.sync_status, '') = 'deleted')",
+                    "COALESCE(NEW.is_deleted, 0) != COALESCE(OLD.is_deleted, 0)",
+                ]
+            )
+            for suffix, event, row, when_sql in (
+                ("ai", "INSERT", "NEW", ""),
+                ("au", "UPDATE", "NEW", f"WHEN {changed_sql}"),
+                ("ad", "DELETE", "OLD", ""),
+            ):
+                self.sqlite_cursor.execute(
+                    f"DROP TRIGGER IF EXISTS trg_cash_movement_counter_{table}_{suffix}"
+                )
+                self.sqlite_cursor.execute(
+                    f"""
+                    CREATE TRIGGER trg_cash_movement_counter_{table}_{suffix}
+                    AFTER {event} ON {table_ref}
+                    {when_sql}
+                    BEGIN
+                        INSERT INTO change_counters (
+                            table_name, version, last_rowid, last_changed_at
+                        )
+                        VALUES (
+                            '{counter}', 1, {row}.rowid,
+                            strftime('%Y-%m-%dT%H:%M:%f', 'now')
+                        )
+                        ON CONFLICT(table_name) DO UPDATE SET
+                            version = change_counters.version + 1,
+                            last_rowid = excluded.last_rowid,
+                            last_changed_at = excluded.last_changed_at;
+                    END
+                    """
+                )
+            self.sqlite_cursor.execute(
+                "INSERT OR IGNORE INTO change_counters (table_name, version) VALUES (?, 0)",
+                (counter,),
+            )
+
+    def get_cash_movement_versions(self) -> dict[str, int] | None:
+        """{table: version} لعدّادات حركات الخزن، أو None لو العدّادات غير متاحة."""
+        names = {
+            self._cash_movement_counter_name(table): table for table in self._CASH_MOVEMENT_COLUMNS
+        }
+        counters = self.get_change_counters(tuple(names))
+        if counters is None or set(counters) != set(names):
+            return None
+        return {table: int(counters[name][0]) for name, table in names.items()}
+
+    def _ensure_cashbox_audit_checkpoints(self) -> None:
+        """
+        ⚡ نقاط تحقق مراجعة الخزن: لكل خزنة آخر id دفعة/مصروف تم التحقق منه مع بصمة
+        حركاتها، فتراجع الجولة التالية الحركات الجديدة أو المعدّلة فقط.
+        """
+        try:
+            with self._lock:
+                self.sqlite_cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS cashbox_audit_checkpoints (
+                        account_code TEXT PRIMARY KEY,
+                        last_payment_id INTEGER NOT NULL DEFAULT 0,
+                        last_expense_id INTEGER NOT NULL DEFAULT 0,
+                        inflow REAL NOT NULL DEFAULT 0.0,
+                        outflow REAL NOT NULL DEFAULT 0.0,
+                        fingerprint TEXT NOT NULL DEFAULT '{}',
+                        movements_hash TEXT NOT NULL DEFAULT '',
+                        verified_versions TEXT NOT NULL DEFAULT '{}',
+                        verified_at TEXT
+                    )
+                    """
+                )
+                if self.has_change_counters():
+                    self._ensure_cash_movement_counters()
+                self.sqlite_conn.commit()
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] تعذر تجهيز نقاط تحقق مراجعة الخزن: {e}")
+
+    def get_cashbox_audit_checkpoints(self) -> dict[str, dict[str, Any]]:
+        """{account_code: checkpoint} (الكود '' = حركات لا تُحل لخزنة)."""
+        try:
+            with self.read_cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT account_code, last_payment_id, last_expense_id, inflow, outflow,
+                           fingerprint, movements_hash, verified_versions, verified_at
+                    FROM cashbox_audit_checkpoints
+                    """
+                )
+                rows = cursor.fetchall()
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] تعذر قراءة نقاط تحقق مراجعة الخزن: {e}")
+            return {}
+
+        checkpoints: dict[str, dict[str, Any]] = {}
+        for row in rows:
+            try:
+                fingerprint = json.loads(row[5] or "{}")
+                verified_versions = json.loads(row[7] or "{}")
+            except (TypeError, ValueError):
+                fingerprint, verified_versions = {}, {}
+            checkpoints[str(row[0] or "")] = {
+                "last_payment_id": int(row[1] or 0),
+                "last_expense_id": int(row[2] or 0),
+                "inflow": float(row[3] or 0.0),
+                "outflow": float(row[4] or 0.0),
+                "fingerprint": fingerprint if isinstance(fingerprint, dict) else {},
+                "movements_hash": str(row[6] or ""),
+                "verified_versions": (
+                    verified_versions if isinstance(verified_versions, dict) else {}
+                ),
+                "verified_at": row[8],
+            }
+        return checkpoints
+
+    def save_cashbox_audit_checkpoints(
+        self, checkpoints: dict[str, dict[str, Any]], *, replace: bool = False
+    ) -> None:
+        """حفظ نقاط التحقق (UPSERT) في transaction واحدة؛ replace يمسح القديم أولاً."""
+        now_iso = datetime.now().isoformat()
+        rows = [
+            (
+                str(code or ""),
+                int(checkpoint.get("last_payment_id") or 0),
+                int(checkpoint.get("last_expense_id") or 0),
+                float(checkpoint.get("inflow") or 0.0),
+                float(checkpoint.get("outflow") or 0.0),
+                json.dumps(checkpoint.get("fingerprint") or {}, sort_keys=True),
+                str(checkpoint.get("movements_hash") or ""),
+                json.dumps(checkpoint.get("verified_versions") or {}, sort_keys=True),
+                checkpoint.get("verified_at") or now_iso,
+            )
+            for code, checkpoint in (checkpoints or {}).items()
+        ]
+        with self._lock:
+            cursor = self.sqlite_conn.cursor()
+            try:
+                if replace:
+                    cursor.execute("DELETE FROM cashbox_audit_checkpoints")
+                cursor.executemany(
+                    """
+                    INSERT INTO cashbox_audit_checkpoints (
+                        account_code, last_payment_id, last_expense_id, inflow, outflow,
+                        fingerprint, movements_hash, verified_versions, verified_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(account_code) DO UPDATE SET
+                        last_payment_id = excluded.last_payment_id,
+                        last_expense_id = excluded.last_expense_id,
+                        inflow = excluded.inflow,
+                        outflow = excluded.outflow,
+                        fingerprint = excluded.fingerprint,
+                        movements_hash = excluded.movements_hash,
+                        verified_versions = excluded.verified_versions,
+                        verified_at = excluded.verified_at
+                    """,
+                    rows,
+                )
+                self.sqlite_conn.commit()
+            except Exception:
+                self.sqlite_conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def get_cash_movement_chunk_bound(
+        self, table_name: str, after_id: int, limit: int
+    ) -> tuple[int, int, int]:
+        """
+        حدود الدفعة التالية بعد after_id: (أكبر id ضمن أول limit صف، عدد الصفوف، أكبر id
+        في الجدول). كل الصفوف تُحسب (حتى المحذوفة) لأن كل منها يرفع عدّاد التغييرات.
+        """
+        table_ref = self._quote_sqlite_identifier(
+            table_name, allowed=set(self._CASHBOX_AUDIT_SOURCES)
+        )
+        with self.read_cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT MAX(id), COUNT(*), (SELECT MAX(id) FROM {table_ref})
+                FROM (SELECT id FROM {table_ref} WHERE id > ? ORDER BY id LIMIT ?)
+                """,  # nosec B608
+                (int(after_id), max(1, int(limit))),
+            )
+            row = cursor.fetchone()
+        if not row or row[0] is None:
+            max_id = int(row[2]) if row and row[2] is not None else int(after_id)
+            return int(after_id), 0, max_id
+        return int(row[0]), int(row[1] or 0), int(row[2] or row[0])
+
+    def get_cash_movement_groups(
+        self, table_name: str, after_id: int = 0, upto_id: int | None = None
+    ) -> list[tuple]:
+        """
+        ⚡ بصمة الحركات النشطة في (after_id, upto_id] مجمعة حسب مراجع الخزنة (GROUP BY):
+        payments: (account_ref, count, total, weighted)
+        expenses: (payment_ref, account_ref, count, total, weighted)
+        weighted = SUM(id * amount) يكشف تبديل المبالغ بين الصفوف.
+        النسخ المكررة بالتوقيع (كما في get_all_*) مستبعدة مثل get_report_aggregates.
+        """
+        group_sql = self._CASHBOX_AUDIT_SOURCES.get(table_name)
+        if group_sql is None:
+            raise ValueError(f"unsupported cash movement table: {table_name}")
+        params: list[Any] = [int(after_id)]
+        range_sql = "id > ?"
+        if upto_id is not None:
+            range_sql += " AND id <= ?"
+            params.append(int(upto_id))
+        range_sql += " AND id NOT IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps(sorted(self.get_signature_duplicate_ids(table_name))))
+        with self.read_cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT {group_sql}, COUNT(*), TOTAL(amount), TOTAL(id * amount)
+                {self._is_active_filter_sql(table_name)} AND {range_sql}
+                GROUP BY {group_sql}
+                """,  # nosec B608
+                params,
+            )
+            return [tuple(row) for row in cursor.fetchall()]
+
+    def _ensure_project_ref_keys(self) -> None:
+        """
+        ⚡ فهرس مراجع المشاريع (project_ref_keys): كل قيمة project_id مميزة مع مفتاحها المطبّع.
+        الـ triggers تسجل المراجع الجديدة بمفتاح NULL، و _refresh_project_ref_keys يحسبه في Python،
+        فيصبح جلب دفعات/مصروفات مشروع استعلام IN مفهرس بدل مسح الجدول كله.
+        """
+        try:
+            with self._lock:
+                table_existed = self._table_exists("project_ref_keys")
+                self.sqlite_cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS project_ref_keys (
+                        raw_ref TEXT PRIMARY KEY,
+                        ref_key TEXT
+                    )
+                    """
+                )
+                self.sqlite_cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_project_ref_keys_key ON project_ref_keys(ref_key)"
+                )
+
+                expected_triggers = {
+                    f"trg_project_ref_keys_{table}_{suffix}"
+                    for table in self._PROJECT_REF_KEY_SOURCES
+                    for suffix in ("ai", "au")
+                }
+                self.sqlite_cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_project_ref_keys_%'"
+                )
+                existing_triggers = {str(row[0]) for row in self.sqlite_cursor.fetchall()}
+                if table_existed and expected_triggers.issubset(existing_triggers):
+                    return
+
+                allowed_tables = set(self._PROJECT_REF_KEY_SOURCES)
+                for table in self._PROJECT_REF_KEY_SOURCES:
+                    if not self._table_exists(table):
+                        continue
+                    table_ref = self._quote_sqlite_identifier(table, allowed=allowed_tables)
+                    register_sql = (
+                        "INSERT OR IGNORE INTO project_ref_keys (raw_ref) "
+                        "VALUES (COALESCE(NEW.project_id, ''));"
+                    )
+                    self.sqlite_cursor.execute(
+                        f"DROP TRIGGER IF EXISTS trg_project_ref_keys_{table}_ai"
+                    )
+                    self.sqlite_cursor.execute(
+                        f"DROP TRIGGER IF EXISTS trg_project_ref_keys_{table}_au"
+                    )
+                    self.sqlite_cursor.execute(
+                        f"""
+                        CREATE TRIGGER trg_project_ref_keys_{table}_ai AFTER INSERT ON {table_ref}
+                        BEGIN {register_sql} END
+                        """
+                    )
+                    self.sqlite_cursor.execute(
+                        f"""
+                        CREATE TRIGGER trg_project_ref_keys_{table}_au
+                        AFTER UPDATE OF project_id ON {table_ref}
+                        BEGIN {register_sql} END
+                        """
+                    )
+                    self.sqlite_cursor.execute(
+                        f"""
+                        INSERT OR IGNORE INTO project_ref_keys (raw_ref)
+                        SELECT DISTINCT COALESCE(project_id, '') FROM {table_ref}
+                        """  # nosec B608
+                    )
+                self.sqlite_conn.commit()
+                safe_print("INFO: [Repository] ✅ تم تجهيز فهرس مراجع المشاريع")
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] فشل تجهيز فهرس مراجع المشاريع: {e}")
+
+    def _refresh_project_ref_keys(self) -> None:
+        """حساب المفاتيح المطبّعة للمراجع الجديدة فقط (ref_key IS NULL)."""
+        with self._lock:
+            cursor = self.sqlite_conn.cursor()
+            try:
+                cursor.execute("SELECT raw_ref FROM project_ref_keys WHERE ref_key IS NULL")
+                pending_refs = [row[0] for row in cursor.fetchall()]
+                if not pending_refs:
+                    return
+                cursor.executemany(
+                    "UPDATE project_ref_keys SET ref_key = ? WHERE raw_ref = ?",
+                    [(self._project_text_key(raw_ref), raw_ref) for raw_ref in pending_refs],
+                )
+                self.sqlite_conn.commit()
+            finally:
+                cursor.close()
+
+    def _project_ref_candidates(self, canonical_project_name: str, aliases: set[str]) -> list[str]:
+        """
+        كل قيم project_id المخزنة التي قد تشير لهذا المشروع (مطابقة حرفية أو بالمفتاح المطبّع).
+        النتيجة مرشحات فقط؛ التحقق النهائي يبقى عبر _row_matches_project.
+        """
+        self._refresh_project_ref_keys()
+        raw_values = {str(alias).strip() for alias in aliases if str(alias or "").strip()}
+        if canonical_project_name:
+            raw_values.add(str(canonical_project_name).strip())
+        key_values = {self._project_text_key(value) for value in raw_values}
+        key_values.discard("")
+        if not raw_values and not key_values:
+            return []
+
+        raw_list = sorted(raw_values)
+        key_list = sorted(key_values)
+        raw_placeholders = ", ".join("?" for _ in raw_list) or "NULL"
+        key_placeholders = ", ".join("?" for _ in key_list) or "NULL"
+        with self.read_cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT raw_ref FROM project_ref_keys
+                WHERE ref_key IN ({key_placeholders}) OR raw_ref IN ({raw_placeholders})
+                """,  # nosec B608
+                [*key_list, *raw_list],
+            )
+            candidates = {str(row[0]) for row in cursor.fetchall()}
+        candidates.update(raw_list)
+        return sorted(candidates)
+
+    def _select_active_rows_for_project_refs(
+        self, table_name: str, project_refs: list[str]
+    ) -> list[dict[str, Any]]:
+        if not project_refs:
+            return []
+        allowed_tables = set(self._PROJECT_REF_KEY_SOURCES)
+        table_ref = self._quote_sqlite_identifier(table_name, allowed=allowed_tables)
+        rows: list[dict[str, Any]] = []
+        # حد متغيرات SQLite القديم 999 -> نقسم على دفعات
+        chunk_size = 500
+        with self.read_cursor() as cursor:
+            for start in range(0, len(project_refs), chunk_size):
+                chunk = project_refs[start : start + chunk_size]
+                placeholders = ", ".join("?" for _ in chunk)
+                cursor.execute(
+                    f"SELECT * {self._is_active_filter_sql(table_ref)} "
+                    f"AND project_id IN ({placeholders})",  # nosec B608
+                    chunk,
+                )
+                rows.extend(dict(row) for row in cursor.fetchall())
+        return rows
+
+    # ⚡ مصادر دفتر مجاميع الداشبورد: (الجدول، عمود العميل أو None)
+    _DASHBOARD_KPI_LEDGER_SOURCES = (("payments", "client_id"), ("expenses", None))
+
+    @staticmethod
+    def _dashboard_kpi_ledger_trigger_names() -> list[str]:
+        return [
+            f"trg_kpi_ledger_{table}_{suffix}"
+            for table, _client_column in Repository._DASHBOARD_KPI_LEDGER_SOURCES
+            for suffix in ("ai", "au", "ad")
+        ]
+
+    def _ensure_dashboard_kpi_ledger(self) -> None:
+        """
+        ⚡ دفتر مجاميع الداشبورد (dashboard_kpi_ledger).
+        مجموع المبالغ لكل (مصدر، مرجع مشروع، مرجع عميل) يُحدَّث تزايدياً بـ triggers
+        على payments/expenses، فيغطي كل مسارات الكتابة (الواجهة، المزامنة، التنظيف)
+        بدون إعادة مسح الجداول الكاملة. النسخ المكررة تُطرح عند القراءة عبر
+        get_signature_duplicate_ids.
+        """
+        try:
+            with self._lock:
+                ledger_existed = self._table_exists("dashboard_kpi_ledger")
+                if ledger_existed:
+                    self._sqlite_table_columns_cache.pop("dashboard_kpi_ledger", None)
+                    if "dedupe_key" in self._table_columns("dashboard_kpi_ledger"):
+                        # دفتر بصف لكل توقيع (صف لكل دفعة تقريباً) -> يُعاد إنشاؤه مجمّعاً
+                        self.sqlite_cursor.execute("DROP TABLE dashboard_kpi_ledger")
+                        self._sqlite_table_columns_cache.pop("dashboard_kpi_ledger", None)
+                        ledger_existed = False
+                self.sqlite_cursor.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS dashboard_kpi_ledger (
+                        source TEXT NOT NULL,
+                        project_ref TEXT NOT NULL DEFAULT '',
+                        client_ref TEXT NOT NULL DEFAULT '',
+                        amount REAL NOT NULL DEFAULT 0.0,
+                        row_count INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (source, project_ref, client_ref)
+                    )
+                    """
+                )
+
+                self.sqlite_cursor.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_kpi_ledger_%'"
+                )
+                existing_triggers = {str(row[0]) for row in self.sqlite_cursor.fetchall()}
+                triggers_complete = set(self._dashboard_kpi_ledger_trigger_names()).issubset(
+                    existing_triggers
+                )
+                if ledger_existed and triggers_complete:
+                    return
+
+                # أي trigger ناقص (مثلاً بعد migration أعادت بناء الجدول) يعني أن الدفتر
+                # قد فاته تغييرات -> نعيد بناءه مرة واحدة ثم تتكفل الـ triggers بالباقي.
+                for table, client_column in self._DASHBOARD_KPI_LEDGER_SOURCES:
+                    if not self._table_exists(table):
+                        continue
+                    self._create_dashboard_kpi_ledger_triggers(table, client_column)
+                self._rebuild_dashboard_kpi_ledger_rows()
+                self.sqlite_conn.commit()
+                safe_print("INFO: [Repository] ✅ تم تجهيز دفتر مجاميع الداشبورد")
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] فشل تجهيز دفتر مجاميع الداشبورد: {e}")
+
+    def _create_dashboard_kpi_ledger_triggers(self, table: str, client_column: str | None) -> None:
+        allowed_tables = {name for name, _column in self._DASHBOARD_KPI_LEDGER_SOURCES}
+        table_ref = self._quote_sqlite_identifier(table, allowed=allowed_tables)
+
+        def _contribution_sql(alias: str, sign: str) -> str:
+            client_expr = f"COALESCE({alias}.{client_column}, '')" if client_column else "''"
+            return f"""
+                INSERT INTO dashboard_kpi_ledger (source, project_ref, client_ref, amount, row_count)
+                SELECT '{table}', COALESCE({alias}.project_id, ''), {client_expr},
+                       {sign}COALESCE({alias}.amount, 0.0), {sign}1
+                WHERE ({alias}.sync_status != 'deleted' OR {alias}.sync_status IS NULL)
+                  AND ({alias}.is_deleted = 0 OR {alias}.is_deleted IS NULL)
+                ON CONFLICT (source, project_ref, client_ref) DO UPDATE SET
+                    amount = amount + excluded.amount,
+                    row_count = row_count + excluded.row_count;
+            """  # nosec B608
+
+        watched_columns = ["project_id", "amount", "sync_status", "is_deleted"]
+        if client_column:
+            watched_columns.append(client_column)
+
+        for suffix in ("ai", "au", "ad"):
+            self.sqlite_cursor.execute(f"DROP TRIGGER IF EXISTS trg_kpi_ledger_{table}_{suffix}")
+        self.sqlite_cursor.execute(
+            f"""
+            CREATE TRIGGER trg_kpi_ledger_{table}_ai AFTER INSERT ON {table_ref}
+            BEGIN {_contribution_sql("NEW", "")} END
+            """
+        )
+        self.sqlite_cursor.execute(
+            f"""
+            CREATE TRIGGER trg_kpi_ledger_{table}_au
+            AFTER UPDATE OF {", ".join(watched_columns)} ON {table_ref}
+            BEGIN {_contribution_sql("OLD", "-")} {_contribution_sql("NEW", "")} END
+            """
+        )
+        self.sqlite_cursor.execute(
+            f"""
+            CREATE TRIGGER trg_kpi_ledger_{table}_ad AFTER DELETE ON {table_ref}
+            BEGIN {_contribution_sql("OLD", "-")} END
+            """
+        )
+
+    def _rebuild_dashboard_kpi_ledger_rows(self) -> None:
+        self.sqlite_cursor.execute("DELETE FROM dashboard_kpi_ledger")
+        for table, client_column in self._DASHBOARD_KPI_LEDGER_SOURCES:
+            if not self._table_exists(table):
+                continue
+            client_expr = f"COALESCE({client_column}, '')" if client_column else "''"
+            self.sqlite_cursor.execute(
+                f"""
+                INSERT INTO dashboard_kpi_ledger (source, project_ref, client_ref, amount, row_count)
+                SELECT '{table}', COALESCE(project_id, ''), {client_expr},
+                       COALESCE(SUM(amount), 0.0), COUNT(*)
+                {self._is_active_filter_sql(table)}
+                GROUP BY COALESCE(project_id, ''), {client_expr}
+                """  # nosec B608
+            )
+
+    def rebuild_dashboard_kpi_ledger(self) -> bool:
+        """إعادة بناء دفتر مجاميع الداشبورد بالكامل (للتدقيق أو الإصلاح فقط)."""
+        try:
+            with self._lock:
+                self._rebuild_dashboard_kpi_ledger_rows()
+                self.sqlite_conn.commit()
+            Repository._dashboard_cache = None
+            Repository._dashboard_cache_time = 0
+            return True
+        except Exception as e:
+            safe_print(f"ERROR: [Repo] فشل إعادة بناء دفتر مجاميع الداشبورد: {e}")
+            return False
+
+    @staticmethod
+    def _ensure_watermark_index(collection) -> bool:
+        """إنشاء index مركب (last_modified, _id) لو غير موجود؛ يرجع True لو تم إنشاؤه."""
+        keys = [("last_modified", 1), ("_id", 1)]
+        try:
+            existing = collection.index_information()
+        except Exception:
+            existing = {}
+        for info in existing.values():
+            if [(str(field), int(direction)) for field, direction in info.get("key", [])] == keys:
+                return False
+        collection.create_index(keys)
+        return True
+
+    def _init_mongo_indexes(self) -> bool:
+        """
+        إنشاء indexes في MongoDB لتحسين الأداء
+        """
+        with self._lock:
+            if self._closed or self.mongo_db is None:
+                return False
+            mongo_db = self.mongo_db
+
+        try:
+            safe_print("INFO: جاري إنشاء indexes في MongoDB...")
+
+            # sync_queue
+            mongo_db.sync_queue.create_index([("status", 1)])
+            mongo_db.sync_queue.create_index([("priority", 1), ("status", 1)])
+            mongo_db.sync_queue.create_index([("entity_type", 1), ("entity_id", 1)])
+            mongo_db.sync_queue.create_index([("created_at", -1)])
+            mongo_db.sync_queue.create_index([("updated_at", -1)])
+
+            # projects / clients
+            mongo_db.projects.create_index([("client_id", 1)])
+            mongo_db.projects.create_index([("status", 1)])
+            mongo_db.projects.create_index([("start_date", -1)])
+            mongo_db.projects.create_index([("last_modified", -1)])
+            mongo_db.clients.create_index([("name", 1)])
+            mongo_db.clients.create_index([("status", 1)])
+            mongo_db.clients.create_index([("phone", 1)])
+            mongo_db.clients.create_index([("last_modified", -1)])
+
+            # accounting collections
+            mongo_db.accounts.create_index([("code", 1)])
+            mongo_db.accounts.create_index([("type", 1)])
+            mongo_db.accounts.create_index([("last_modified", -1)])
+            mongo_db.invoices.create_index([("invoice_number", 1)])
+            mongo_db.invoices.create_index([("client_id", 1)])
+            mongo_db.invoices.create_index([("status", 1)])
+            mongo_db.invoices.create_index([("issue_date", -1)])
+            mongo_db.invoices.create_index([("last_modified", -1)])
+            mongo_db.payments.create_index([("project_id", 1)])
+            mongo_db.payments.create_index([("client_id", 1)])
+            mongo_db.payments.create_index([("invoice_number", 1)])
+            mongo_db.payments.create_index([("date", -1)])
+            mongo_db.payments.create_index([("account_id", 1)])
+            mongo_db.payments.create_index([("last_modified", -1)])
+            mongo_db.journal_entries.create_index([("date", -1)])
+            mongo_db.journal_entries.create_index([("related_document_id", 1)])
+            mongo_db.journal_entries.create_index([("last_modified", -1)])
+            mongo_db.expenses.create_index([("date", -1)])
+            mongo_db.expenses.create_index([("project_id", 1)])
+            mongo_db.expenses.create_index([("account_id", 1)])
+            mongo_db.expenses.create_index([("payment_account_id", 1)])
+            mongo_db.expenses.create_index([("last_modified", -1)])
+
+            # ui-driven collections
+            mongo_db.notifications.create_index([("is_read", 1)])
+            mongo_db.notifications.create_index([("type", 1)])
+            mongo_db.notifications.create_index([("created_at", -1)])
+            # cursor استعلام NotificationSyncWorker: created_at ثم _id تصاعدياً
+            mongo_db.notifications.create_index([("created_at", 1), ("_id", 1)])
+            mongo_db.notifications.create_index([("expires_at", 1)])
+            mongo_db.notifications.create_index([("entity_type", 1), ("created_at", -1)])
+            mongo_db.tasks.create_index([("status", 1)])
+            mongo_db.tasks.create_index([("due_date", 1)])
+            mongo_db.tasks.create_index([("last_modified", -1)])
+            mongo_db.users.create_index([("username", 1)])
+            mongo_db.users.create_index([("last_modified", -1)])
+            mongo_db.currencies.create_index([("code", 1)])
+            mongo_db.currencies.create_index([("active", 1)])
+
+            # ⚡ index الـ watermark لكل جدول يسحبه الـ delta: ترتيب وصفحات (last_modified, _id)
+            for collection_name in DELTA_PULL_COLLECTIONS:
+                collection = getattr(mongo_db, collection_name, None)
+                if collection is not None:
+                    self._ensure_watermark_index(collection)
+
+            safe_print("INFO: تم إنشاء indexes في MongoDB بنجاح.")
+            return True
+        except Exception as e:
+            safe_print(f"WARNING: فشل إنشاء بعض indexes في MongoDB: {e}")
+            return False
+
+    def is_online(self) -> bool:
+        """دالة بسيطة لمعرفة حالة الاتصال"""
+        return bool(self.online)
+
+    # --- دوال التعامل مع العملاء (كمثال) ---
+
+    def create_client(self, client_data: schemas.Client) -> schemas.Client:
+        """
+        إنشاء عميل جديد (بذكاء)
+        1. يحفظ في SQLite دائماً (بحالة 'new_offline').
+        2. يحاول الحفظ في Mongo لو فيه نت.
+        """
+        # ✅ فحص التكرار قبل الإضافة (بالاسم - exact match)
+        existing_client = self.get_client_by_name(client_data.name)
+        if existing_client:
+            safe_print(f"WARNING: العميل '{client_data.name}' موجود بالفعل!")
+            raise ValueError(f"العميل '{client_data.name}' موجود بالفعل في النظام")
+
+        # ✅ فحص التكرار بالاسم (case insensitive)
+        similar_client = self._get_similar_client(client_data.name)
+        if similar_client:
+            safe_print(f"WARNING: يوجد عميل مشابه '{similar_client.name}'!")
+            raise ValueError(f"يوجد عميل مشابه بالاسم '{similar_client.name}'")
 
         # ✅ فحص التكرار بالهاتف أيضاً
         if client_data.phone:
@@ -2665,7 +4698,14 @@ class Repository:
         client_data.last_modified = now
         client_data.sync_status = "new_offline"
         client_data.status = schemas.ClientStatus.ACTIVE
-        has_logo = bool(getattr(client_data, "has_logo", False) or client_data.logo_data)
+        if client_data.logo_data:
+            # ⚡ الصورة تُحفظ في مخزن blobs وصف العميل يحمل بصمتها فقط
+            client_data.logo_hash = self.store_client_logo(client_data.logo_data)
+        has_logo = bool(
+            getattr(client_data, "has_logo", False)
+            or client_data.logo_data
+            or client_data.logo_hash
+        )
         client_data.has_logo = has_logo
         if has_logo and not getattr(client_data, "logo_last_synced", None):
             client_data.logo_last_synced = now.isoformat()
@@ -2676,9 +4716,9 @@ class Repository:
                 sync_status, created_at, last_modified, name, company_name, email,
                 phone, address, country, vat_number, status,
                 client_type, work_field, logo_path, logo_data, has_logo, logo_last_synced,
-                client_notes, is_vip, dirty_flag, is_deleted
+                logo_hash, client_notes, is_vip, dirty_flag, is_deleted
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, 0)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, 0)
         """
         # ⚡ تحويل is_vip إلى 0 أو 1 لـ SQLite
         is_vip_value = 1 if getattr(client_data, "is_vip", False) else 0
@@ -2700,9 +4740,10 @@ class Repository:
                 client_data.client_type,
                 client_data.work_field,
                 client_data.logo_path,
-                client_data.logo_data,
+                None if client_data.logo_hash else client_data.logo_data,
                 has_logo_value,
                 client_data.logo_last_synced,
+                client_data.logo_hash,
                 client_data.client_notes,
                 is_vip_value,
             ),
@@ -2719,12 +4760,10 @@ class Repository:
                 # نحول الـ Pydantic model لـ dict عشان Mongo يفهمه
                 client_dict = client_data.model_dump(exclude={"_mongo_id"})
 
-                # ⚡ التأكد من حفظ logo_data بشكل صحيح
-                if client_data.logo_data:
-                    client_dict["logo_data"] = client_data.logo_data
-                    safe_print(
-                        f"INFO: [Repo] حفظ logo_data ({len(client_data.logo_data)} حرف) في MongoDB"
-                    )
+                # ⚡ وثيقة العميل تحمل البصمة فقط؛ الصورة تُرفع مرة لكل بصمة لمجموعة الصور
+                if client_data.logo_hash:
+                    self.push_logo_blobs([client_data.logo_hash])
+                    client_dict["logo_data"] = None
 
                 result = self.mongo_db.clients.insert_one(client_dict)
                 mongo_id = str(result.inserted_id)
@@ -2763,14 +4802,24 @@ class Repository:
                     name = ?, company_name = ?, email = ?, phone = ?,
                     address = ?, country = ?, vat_number = ?, status = ?,
                     client_type = ?, work_field = ?, logo_path = ?, logo_data = ?, client_notes = ?,
-                    has_logo = ?, logo_last_synced = ?, is_vip = ?, last_modified = ?, sync_status = 'modified_offline',
-                    dirty_flag = 1
+                    has_logo = ?, logo_last_synced = ?, logo_hash = ?, is_vip = ?, last_modified = ?,
+                    sync_status = 'modified_offline', dirty_flag = 1
                 WHERE id = ? OR _mongo_id = ?
             """
+            if client_data.logo_data:
+                client_data.logo_hash = self.store_client_logo(client_data.logo_data)
+            elif not getattr(client_data, "has_logo", False):
+                client_data.logo_hash = None
             # ⚡ تحويل is_vip إلى 0 أو 1 لـ SQLite
             is_vip_value = 1 if getattr(client_data, "is_vip", False) else 0
             has_logo_value = (
-                1 if bool(getattr(client_data, "has_logo", False) or client_data.logo_data) else 0
+                1
+                if bool(
+                    getattr(client_data, "has_logo", False)
+                    or client_data.logo_data
+                    or client_data.logo_hash
+                )
+                else 0
             )
             params = (
                 client_data.name,
@@ -2784,10 +4833,11 @@ class Repository:
                 client_data.client_type,
                 client_data.work_field,
                 client_data.logo_path,
-                client_data.logo_data,
+                None if client_data.logo_hash else client_data.logo_data,
                 client_data.client_notes,
                 has_logo_value,
                 client_data.logo_last_synced,
+                client_data.logo_hash,
                 is_vip_value,
                 now_iso,
                 client_id,
@@ -2826,18 +4876,14 @@ class Repository:
                     or ""
                 ).strip()
 
-                # ⚡ التعامل الذكي مع logo_data
-                logo_data_value = client_data.logo_data
+                # ⚡ التعامل الذكي مع الصورة: الوثيقة تحمل البصمة فقط والصورة في logo_blobs
                 logo_path_value = client_data.logo_path
 
-                if logo_data_value:
-                    # صورة جديدة - رفعها للسحابة
-                    update_dict["logo_data"] = logo_data_value
+                if client_data.logo_hash:
+                    self.push_logo_blobs([client_data.logo_hash])
+                    update_dict["logo_data"] = None
                     update_dict["has_logo"] = True
                     update_dict["logo_last_synced"] = now_iso
-                    safe_print(
-                        f"INFO: [Repo] � حفظ logo_data ({len(logo_data_value)} حرف) في MongoDB"
-                    )
                 elif not logo_path_value:
                     # logo_data فارغ و logo_path فارغ = حذف صريح للصورة
                     update_dict["logo_data"] = ""
@@ -2919,24 +4965,20 @@ class Repository:
 
         active_status = schemas.ClientStatus.ACTIVE.value
 
-        # ⚡ جلب من SQLite أولاً (سريع جداً) - استخدام cursor جديد لتجنب التعارض
+        # ⚡ جلب من SQLite أولاً (سريع جداً) - cursor من pool القراءة بدون حجز اتصال الكتابة
         try:
-            with self._lock:
-                cursor = self.get_cursor()
-                try:
-                    cursor.execute(
-                        """
-                        SELECT * FROM clients
-                        WHERE status = ?
-                        AND (sync_status != 'deleted' OR sync_status IS NULL)
-                        AND (is_deleted = 0 OR is_deleted IS NULL)
-                        """,
-                        (active_status,),
-                    )
-                    rows = cursor.fetchall()
-                    clients_list = [schemas.Client(**dict(row)) for row in rows]
-                finally:
-                    cursor.close()
+            with self.read_cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT * FROM clients
+                    WHERE status = ?
+                    AND (sync_status != 'deleted' OR sync_status IS NULL)
+                    AND (is_deleted = 0 OR is_deleted IS NULL)
+                    """,
+                    (active_status,),
+                )
+                rows = cursor.fetchall()
+            clients_list = [schemas.Client(**dict(row)) for row in rows]
 
             # ⚡ حفظ في الـ cache
             if CACHE_ENABLED and hasattr(self, "_clients_cache"):
@@ -3009,7 +5051,7 @@ class Repository:
 
         self.sqlite_cursor.execute(
             f"""
-            SELECT * {self._is_active_filter_sql('clients')}
+            SELECT * {self._is_active_filter_sql("clients")}
             AND status = ?
             """,
             (archived_status,),
@@ -3031,7 +5073,8 @@ class Repository:
                 finally:
                     cursor.close()
             if row:
-                client = schemas.Client(**dict(row))
+                # ⚡ عميل واحد: نرجع الشعار كاملاً من مخزن blobs (القوائم تحمل البصمة فقط)
+                client = self._hydrate_client_logo(schemas.Client(**dict(row)))
                 safe_print(f"INFO: تم جلب العميل (ID: {client_id}) من المحلي.")
                 return client
         except Exception as e:
@@ -3101,15 +5144,28 @@ class Repository:
             return False
 
         try:
+            # ⚡ البصمة أولاً: لو نفس الصورة موجودة محلياً (عميل آخر بنفس الشعار) لا نحمّلها ثانية
             remote = self.mongo_db.clients.find_one(
                 self._merge_active_filter_mongo({"$or": selectors}),
-                {"logo_data": 1, "has_logo": 1, "logo_last_synced": 1, "last_modified": 1},
+                {"logo_hash": 1, "has_logo": 1, "logo_last_synced": 1, "last_modified": 1},
             )
             if not remote:
                 return False
 
-            logo_data = remote.get("logo_data") or ""
-            has_logo = bool(remote.get("has_logo", False) or logo_data)
+            remote_hash = str(remote.get("logo_hash") or "").strip()
+            logo_hash = remote_hash if self.has_blob(remote_hash) else None
+            if logo_hash is None and remote_hash:
+                logo_hash = self._fetch_cloud_logo_blob(remote_hash)
+            if logo_hash is None:
+                # وثائق قديمة تحمل الصورة نفسها بدل البصمة
+                logo_data = remote.get("logo_data")
+                if logo_data is None and remote.get("has_logo", True) is not False:
+                    full = self.mongo_db.clients.find_one(
+                        {"_id": remote.get("_id")}, {"logo_data": 1}
+                    )
+                    logo_data = (full or {}).get("logo_data")
+                logo_hash = self.store_client_logo(logo_data) if logo_data else None
+            has_logo = bool(remote.get("has_logo", False) or logo_hash)
             logo_last_synced = remote.get("logo_last_synced") or remote.get("last_modified")
             if hasattr(logo_last_synced, "isoformat"):
                 logo_last_synced = logo_last_synced.isoformat()
@@ -3119,18 +5175,18 @@ class Repository:
                 logo_last_synced = datetime.now().isoformat()
 
             # توحيد metadata في السحابة إذا كان السجل قديماً
-            if has_logo and "has_logo" not in remote:
+            if has_logo and ("has_logo" not in remote or (logo_hash and not remote_hash)):
                 try:
-                    self.mongo_db.clients.update_one(
-                        {"_id": remote.get("_id")},
-                        {"$set": {"has_logo": True, "logo_last_synced": logo_last_synced}},
-                    )
+                    metadata = {"has_logo": True, "logo_last_synced": logo_last_synced}
+                    if logo_hash:
+                        metadata["logo_hash"] = logo_hash
+                    self.mongo_db.clients.update_one({"_id": remote.get("_id")}, {"$set": metadata})
                 except Exception:
                     pass
 
             if local_id is None:
                 # لا يوجد صف محلي لتحديثه
-                return bool(logo_data)
+                return bool(logo_hash)
 
             with self._lock:
                 cursor = self.get_cursor()
@@ -3138,15 +5194,11 @@ class Repository:
                     cursor.execute(
                         """
                         UPDATE clients
-                        SET logo_data = ?, has_logo = ?, logo_last_synced = ?, sync_status = 'synced', dirty_flag = 0
+                        SET logo_hash = ?, logo_data = NULL, has_logo = ?, logo_last_synced = ?,
+                            sync_status = 'synced', dirty_flag = 0
                         WHERE id = ?
                         """,
-                        (
-                            logo_data if logo_data else None,
-                            1 if has_logo else 0,
-                            logo_last_synced,
-                            local_id,
-                        ),
+                        (logo_hash, 1 if has_logo else 0, logo_last_synced, local_id),
                     )
                     self.sqlite_conn.commit()
                 finally:
@@ -3155,7 +5207,7 @@ class Repository:
             if CACHE_ENABLED and hasattr(self, "_clients_cache"):
                 self._clients_cache.invalidate()
 
-            return bool(logo_data)
+            return bool(logo_hash)
 
         except Exception as e:
             safe_print(f"WARNING: [Repository] فشل جلب شعار العميل عند الطلب: {e}")
@@ -3404,6 +5456,78 @@ class Repository:
             "AND (is_deleted = 0 OR is_deleted IS NULL)"
         )
 
+    _SCAN_ORDER_RE = re.compile(
+        r"^\s*([A-Za-z_][A-Za-z0-9_]*)(?:\s+(ASC|DESC))?\s*$", re.IGNORECASE
+    )
+
+    def scan(
+        self,
+        table_name: str,
+        fields: list[str] | tuple[str, ...],
+        where: str | None = None,
+        params: list[Any] | tuple[Any, ...] = (),
+        *,
+        order_by: str | None = None,
+        include_deleted: bool = False,
+        dedupe: bool = False,
+    ) -> list[ScanRecord]:
+        """
+        ⚡ قراءة إسقاطية خفيفة من SQLite: الأعمدة المطلوبة فقط بدون Pydantic أو JSON.
+
+        ترجع ScanRecord (tuple بترتيب fields + وصول بالاسم record.amount).
+        where جزء SQL بعلامات ? وقيمه في params، ويُضاف لفلتر الصفوف النشطة
+        (إلا لو include_deleted). القيم خام كما في SQLite (التواريخ نصوص ISO).
+        dedupe يستبعد صفوف الدفعات/المصروفات المكررة بالتوقيع كما في get_all_*
+        (لازم لأي مجموع أرصدة)؛ بدونه ترجع كل الصفوف.
+        أخطاء SQLite تُرفع للمستدعي (ليرجع لمساره البديل) بدل قائمة فارغة مضللة.
+        """
+        if not fields:
+            raise ValueError("scan requires at least one field")
+        table_columns = self._table_columns(table_name)
+        if not table_columns:
+            raise ValueError(f"Unknown table for scan: {table_name}")
+        table_ref = self._quote_sqlite_identifier(table_name)
+        field_names = tuple(str(field).strip() for field in fields)
+        columns_sql = ", ".join(
+            self._quote_sqlite_identifier(field, allowed=table_columns) for field in field_names
+        )
+
+        conditions: list[str] = []
+        if not include_deleted:
+            if "sync_status" in table_columns:
+                conditions.append("(sync_status != 'deleted' OR sync_status IS NULL)")
+            if "is_deleted" in table_columns:
+                conditions.append("(is_deleted = 0 OR is_deleted IS NULL)")
+        if where:
+            conditions.append(f"({where})")
+        query_params = list(params or ())
+        if dedupe and table_name in self._SIGNATURE_DEDUPE_TABLES:
+            duplicate_ids = self.get_signature_duplicate_ids(table_name)
+            if duplicate_ids:
+                conditions.append("id NOT IN (SELECT value FROM json_each(?))")
+                query_params.append(json.dumps(sorted(duplicate_ids)))
+
+        sql = f"SELECT {columns_sql} FROM {table_ref}"  # nosec B608
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        if order_by:
+            match = self._SCAN_ORDER_RE.fullmatch(order_by)
+            if match is None:
+                raise ValueError(f"Unsupported scan order: {order_by}")
+            order_column = self._quote_sqlite_identifier(match.group(1), allowed=table_columns)
+            sql += f" ORDER BY {order_column} {(match.group(2) or 'ASC').upper()}"
+
+        record_type = scan_record_type(field_names)
+        try:
+            with self.read_cursor() as cursor:
+                cursor.execute(sql, tuple(query_params))
+                return [record_type(row) for row in cursor.fetchall()]
+        except Exception as e:
+            if self._is_sqlite_closed_error(e):
+                return []
+            safe_print(f"ERROR: [Repo] فشل scan للجدول {table_name}: {e}")
+            raise
+
     @staticmethod
     def _active_filter_mongo() -> dict[str, Any]:
         return {
@@ -3432,11 +5556,40 @@ class Repository:
             return {"$and": [*query["$and"], *active_clauses]}
         return {"$and": [query, *active_clauses]}
 
-    def _get_active_project_rows(self) -> list[dict[str, Any]]:
+    def get_identity_resolver(self) -> IdentityResolver:
+        """
+        ⚡ فهرس هويات العملاء والمشاريع (id / _mongo_id / الاسم / الكود / رقم الفاتورة).
+        يُعاد بناؤه فقط عند تغير عدّادات clients أو projects؛ بدون العدّادات يُبنى لكل طلب.
+        لو لم يكتب الاتصال أي صف منذ آخر تحقق (total_changes) يُرجع الفهرس بدون استعلام.
+        """
+        cached = self._identity_resolver
+        write_count = self._sqlite_write_count()
+        if (
+            cached is not None
+            and write_count is not None
+            and write_count == self._identity_resolver_write_count
+        ):
+            return cached
+
+        counters = self.get_change_counters(("clients", "projects"))
+        version = None
+        if counters is not None:
+            version = tuple(counters.get(name, (0, None))[0] for name in ("clients", "projects"))
+            if cached is not None and cached.version == version:
+                self._identity_resolver_write_count = write_count
+                return cached
+
+        client_rows: list[dict[str, Any]] = []
+        project_rows: list[dict[str, Any]] = []
         try:
             with self._lock:
                 cursor = self.sqlite_conn.cursor()
                 try:
+                    cursor.execute(
+                        "SELECT id, COALESCE(_mongo_id, '') AS _mongo_id, name "
+                        f"{self._is_active_filter_sql('clients')} ORDER BY id"
+                    )
+                    client_rows = [dict(row) for row in cursor.fetchall()]
                     cursor.execute(
                         """
                         SELECT id, name, COALESCE(client_id, '') AS client_id,
@@ -3448,37 +5601,165 @@ class Repository:
                         AND (is_deleted = 0 OR is_deleted IS NULL)
                         """
                     )
-                    return [dict(row) for row in cursor.fetchall()]
+                    project_rows = [dict(row) for row in cursor.fetchall()]
                 finally:
                     cursor.close()
+        except Exception as e:
+            safe_print(f"WARNING: [Repository] تعذر بناء فهرس الهويات: {e}")
+            version = None
+
+        resolver = IdentityResolver(
+            version, client_rows, project_rows, self._normalized_key, self._project_text_key
+        )
+        if version is not None:
+            self._identity_resolver = resolver
+            self._identity_resolver_write_count = write_count
+        return resolver
+
+    def _sqlite_write_count(self) -> int | None:
+        """عدد الصفوف المكتوبة على اتصال SQLite منذ فتحه (يشمل الـ triggers والمزامنة)."""
+        try:
+            return int(self.sqlite_conn.total_changes)
         except Exception:
-            return []
+            return None
+
+    _CLIENT_BALANCE_TABLES = ("clients", "projects", "invoices", "payments")
+    _CLIENT_BALANCE_EXCLUDED_PROJECT_STATUSES = ("مؤرشف", "ملغي")
+
+    def _load_client_balance_table(self) -> tuple[dict, dict]:
+        """
+        تجميع واحد لكل جدول (GROUP BY client_id) ثم توحيد المراجع عبر فهرس الهويات،
+        فمشروع مسجل باسم العميل ودفعة مسجلة بالـ id يُجمعان لنفس العميل.
+        """
+        resolver = self.get_identity_resolver()
+        excluded = self._CLIENT_BALANCE_EXCLUDED_PROJECT_STATUSES
+        grouped: dict[str, list] = {}
+        with self.read_cursor() as cursor:
+            for field, table, amount, extra in (
+                ("invoiced", "invoices", "total_amount", ""),
+                (
+                    "projects_total",
+                    "projects",
+                    "total_amount",
+                    f" AND COALESCE(status, '') NOT IN ({', '.join('?' for _ in excluded)})",
+                ),
+                ("paid", "payments", "amount", ""),
+            ):
+                cursor.execute(
+                    f"""
+                    SELECT COALESCE(client_id, ''), TOTAL({amount}), COUNT(*)
+                    {self._is_active_filter_sql(table)}{extra}
+                    GROUP BY COALESCE(client_id, '')
+                    """,  # nosec B608
+                    excluded if extra else (),
+                )
+                grouped[field] = cursor.fetchall()
+
+        table: dict[str, dict[str, Any]] = {}
+        references: dict[str, str] = {}
+
+        def entry_for(raw_ref: Any) -> dict[str, Any] | None:
+            text = str(raw_ref or "").strip()
+            if not text:
+                return None
+            row = resolver.client(text)
+            if row is not None:
+                key = f"id:{row.get('id')}"
+                client_id = str(row.get("_mongo_id") or "").strip() or str(row.get("id"))
+                name = str(row.get("name") or "").strip()
+            else:
+                key = f"ref:{self._normalized_key(text)}"
+                client_id = name = text
+            entry = table.get(key)
+            if entry is None:
+                entry = table[key] = {
+                    "client_id": client_id,
+                    "client_name": name,
+                    "references": set(),
+                    "invoiced": 0.0,
+                    "projects_total": 0.0,
+                    "paid": 0.0,
+                    "projects_count": 0,
+                    "payments_count": 0,
+                }
+                if row is not None:
+                    entry["references"].update(resolver.client_references(text))
+            entry["references"].add(text)
+            return entry
+
+        for field, rows in grouped.items():
+            for raw_ref, total, count in rows:
+                entry = entry_for(raw_ref)
+                if entry is None:
+                    continue
+                entry[field] += float(total or 0.0)
+                if field == "projects_total":
+                    entry["projects_count"] += int(count or 0)
+                elif field == "paid":
+                    entry["payments_count"] += int(count or 0)
+
+        for key, entry in table.items():
+            entry["balance"] = entry["invoiced"] - entry["paid"]
+            entry["projects_remaining"] = entry["projects_total"] - entry["paid"]
+            for reference in entry["references"]:
+                references.setdefault(reference, key)
+                references.setdefault(self._normalized_key(reference), key)
+        return table, references
+
+    def get_client_balance_table(self) -> dict[str, dict[str, Any]]:
+        """
+        ⚡ أرصدة كل العملاء في تمريرة واحدة: {مفتاح العميل: {client_id, client_name, references,
+        invoiced, projects_total, paid, balance, projects_remaining, ...}}.
+        محفوظة حسب عدّادات clients/projects/invoices/payments، فأي كتابة دفعة/مشروع تعيد
+        التجميع عند الطلب التالي فقط. لا تعدّل الصفوف المرجعة.
+        """
+        return self._get_client_balance_table()[0]
+
+    def get_client_balance_entry(self, client_ref: Any) -> dict[str, Any] | None:
+        """رصيد عميل واحد بأي مرجع (id / _mongo_id / الاسم) من الجدول المحفوظ."""
+        text = str(client_ref or "").strip()
+        if not text:
+            return None
+        table, references = self._get_client_balance_table()
+        key = references.get(text) or references.get(self._normalized_key(text))
+        if key is None:
+            row = self.get_identity_resolver().client(text)
+            if row is not None:
+                key = f"id:{row.get('id')}"
+        return table.get(key) if key is not None else None
+
+    def _get_client_balance_table(self) -> tuple[dict, dict]:
+        counters = self.get_change_counters(self._CLIENT_BALANCE_TABLES)
+        version = None
+        if counters is not None:
+            version = tuple(
+                counters.get(name, (0, None))[0] for name in self._CLIENT_BALANCE_TABLES
+            )
+            cached = self._client_balance_table
+            if cached is not None and cached[0] == version:
+                return cached[1], cached[2]
+
+        table, references = self._load_client_balance_table()
+        if version is not None:
+            self._client_balance_table = (version, table, references)
+        return table, references
+
+    def _get_active_project_rows(self) -> list[dict[str, Any]]:
+        return list(self.get_identity_resolver().project_rows)
 
     def _has_ambiguous_project_name_reference(self, project_ref: Any) -> bool:
         reference = normalize_user_text(project_ref)
         if not reference:
             return False
-
-        rows = self._get_active_project_rows()
-        if not rows:
-            return False
-
-        reference_key = self._project_text_key(reference)
-        matches = [
-            row
-            for row in rows
-            if str(row.get("name") or "").strip() == reference
-            or self._project_text_key(row.get("name")) == reference_key
-        ]
-        return len(matches) > 1
+        return self.get_identity_resolver().has_ambiguous_project_name(reference)
 
     def _resolve_project_row(self, project_ref: str, client_id: str = "") -> dict[str, Any] | None:
         reference = normalize_user_text(project_ref)
         if not reference:
             return None
 
-        rows = self._get_active_project_rows()
-        if not rows:
+        resolver = self.get_identity_resolver()
+        if not resolver.project_rows:
             return None
 
         client_keys = {
@@ -3490,55 +5771,9 @@ class Repository:
             client_key = self._project_text_key(client_id)
             if client_key:
                 client_keys = {client_key}
-        ref_key = self._project_text_key(reference)
-
-        def _pick(candidates: list[dict[str, Any]]) -> dict[str, Any] | None:
-            if not candidates:
-                return None
-            if len(candidates) == 1:
-                return candidates[0]
-            if client_keys:
-                by_client = [
-                    row
-                    for row in candidates
-                    if self._project_text_key(row.get("client_id")) in client_keys
-                ]
-                if len(by_client) == 1:
-                    return by_client[0]
-            return None
-
-        # 1) Exact name
-        chosen = _pick([row for row in rows if str(row.get("name") or "") == reference])
-        if chosen:
-            return chosen
-
-        # 2) Numeric local ID
-        if reference.isdigit():
-            chosen = _pick([row for row in rows if str(row.get("id") or "") == reference])
-            if chosen:
-                return chosen
-
-        # 3) Mongo ID
-        chosen = _pick(
-            [row for row in rows if str(row.get("_mongo_id") or "").strip() == reference]
-        )
-        if chosen:
-            return chosen
-
-        # 4) Unique project code / invoice number
-        for field in ("project_code", "invoice_number"):
-            matches = [
-                row
-                for row in rows
-                if self._project_text_key(row.get(field, "")) == ref_key
-                and str(row.get(field) or "").strip()
-            ]
-            chosen = _pick(matches)
-            if chosen:
-                return chosen
 
-        # 5) Normalized name (whitespace/ar variants)
-        return _pick([row for row in rows if self._project_text_key(row.get("name")) == ref_key])
+        chosen = resolver.project(reference, client_keys)
+        return dict(chosen) if chosen is not None else None
 
     def _resolve_project_target_row(
         self,
@@ -3874,7 +6109,9 @@ class Repository:
         if self._table_exists("project_milestones"):
             milestones_ref = self._quote_sqlite_identifier("project_milestones")
             project_id_ref = self._quote_sqlite_identifier("project_id")
-            delete_milestones_sql = f"DELETE FROM {milestones_ref} WHERE {project_id_ref} IN ({placeholders})"  # nosec B608
+            delete_milestones_sql = (
+                f"DELETE FROM {milestones_ref} WHERE {project_id_ref} IN ({placeholders})"  # nosec B608
+            )
             self.sqlite_cursor.execute(delete_milestones_sql, tuple(reference_values))
 
         if self._table_exists("invoice_numbers"):
@@ -3921,14 +6158,16 @@ class Repository:
             {"related_project_id": {"$in": reference_values}}, update_doc
         )
 
-    def _payment_signature(self, row: dict[str, Any]) -> tuple[Any, ...]:
-        project_ref = self._stable_project_reference(
-            self._resolve_project_target_row(
+    def _payment_signature(
+        self, row: dict[str, Any], *, project_row: dict[str, Any] | None = None
+    ) -> tuple[Any, ...]:
+        # project_row: المشروع المحلول مسبقاً (مثلاً عند جلب دفعات مشروع واحد) لتجنب إعادة الحل لكل صف.
+        if project_row is None:
+            project_row = self._resolve_project_target_row(
                 row.get("project_id"),
                 str(row.get("client_id") or ""),
-            ),
-            row.get("project_id"),
-        )
+            )
+        project_ref = self._stable_project_reference(project_row, row.get("project_id"))
         return (
             self._project_text_key(project_ref),
             self._date_key(row.get("date")),
@@ -3938,14 +6177,15 @@ class Repository:
             self._normalized_key(row.get("method")),
         )
 
-    def _expense_signature(self, row: dict[str, Any]) -> tuple[Any, ...]:
+    def _expense_signature(
+        self, row: dict[str, Any], *, project_row: dict[str, Any] | None = None
+    ) -> tuple[Any, ...]:
         account_id = normalize_user_text(str(row.get("account_id") or "")).strip()
         payment_account = normalize_user_text(str(row.get("payment_account_id") or "")).strip()
         effective_payment_account = payment_account or account_id
-        project_ref = self._stable_project_reference(
-            self._resolve_project_target_row(row.get("project_id")),
-            row.get("project_id"),
-        )
+        if project_row is None:
+            project_row = self._resolve_project_target_row(row.get("project_id"))
+        project_ref = self._stable_project_reference(project_row, row.get("project_id"))
         return (
             self._project_text_key(project_ref),
             self._date_key(row.get("date")),
@@ -3987,6 +6227,63 @@ class Repository:
 
         return [deduped[key] for key in order]
 
+    # ⚡ دوال التوقيع لكل جدول يُزال منه التكرار في get_all_*
+    _SIGNATURE_DEDUPE_TABLES = ("payments", "expenses")
+
+    def get_signature_duplicate_ids(self, table_name: str) -> frozenset[int]:
+        """
+        ids الصفوف النشطة التي يحذفها get_all_payments/get_all_expenses كنسخ مكررة
+        (نفس التوقيع مع صف مفضّل آخر)، لتستبعدها المجاميع والمسح الخفيف بنفس القاعدة.
+
+        المرشحون فقط (نفس اليوم والمبلغ) تُحسب توقيعاتهم في Python، والنتيجة تُخزن
+        حسب نسخة change_counters للجدول والمشاريع والعملاء (التوقيع يعتمد على حل كليهما).
+        """
+        normalized = (table_name or "").strip().lower()
+        if normalized not in self._SIGNATURE_DEDUPE_TABLES:
+            return frozenset()
+        version_tables = (normalized, "projects", "clients")
+        counters = self.get_change_counters(version_tables)
+        version = None
+        if counters is not None:
+            version = tuple(counters.get(name, (0, None))[0] for name in version_tables)
+            cached = self._signature_duplicates.get(normalized)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+        table_ref = self._quote_sqlite_identifier(
+            normalized, allowed=set(self._SIGNATURE_DEDUPE_TABLES)
+        )
+        active_sql = self._is_active_filter_sql(table_ref)
+        day_amount = "substr(COALESCE(date, ''), 1, 10), ROUND(COALESCE(amount, 0), 2)"
+        try:
+            with self.read_cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    SELECT * {active_sql}
+                      AND ({day_amount}) IN (
+                          SELECT {day_amount} {active_sql}
+                          GROUP BY 1, 2
+                          HAVING COUNT(*) > 1
+                      )
+                    """  # nosec B608
+                )
+                rows = [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            if not self._is_sqlite_closed_error(e):
+                safe_print(f"WARNING: [Repo] تعذر فحص تكرار {normalized}: {e}")
+            return frozenset()
+
+        signature_fn = (
+            self._payment_signature if normalized == "payments" else self._expense_signature
+        )
+        kept_ids = {int(row["id"]) for row in self._dedupe_rows_by_signature(rows, signature_fn)}
+        duplicate_ids = (
+            frozenset(int(row["id"]) for row in rows if row.get("id") is not None) - kept_ids
+        )
+        if version is not None:
+            self._signature_duplicates[normalized] = (version, duplicate_ids)
+        return duplicate_ids
+
     def _get_duplicate_payment(
         self,
         project_id: str,
@@ -5651,6 +7948,72 @@ class Repository:
             safe_print(f"ERROR: [Repo] فشل تحديث رصيد الحساب: {e}")
             return False
 
+    def apply_account_balance_deltas(self, deltas: dict[str, float]) -> list[str]:
+        """
+        ⚡ إضافة فروق موقّعة لأرصدة حسابات وكل سلسلة آبائها في transaction واحدة
+        (بدل إعادة حساب كل الأرصدة ثم كتابة كل حساب أب على حدة).
+        الرفع للسحابة يتم عبر المزامنة العادية (sync_status = modified_offline).
+
+        Returns:
+            أكواد الحسابات التي تغير رصيدها
+        """
+        pending = {
+            str(code).strip(): float(delta or 0.0)
+            for code, delta in (deltas or {}).items()
+            if str(code or "").strip() and abs(float(delta or 0.0)) > 1e-9
+        }
+        if not pending:
+            return []
+
+        now_iso = datetime.now().isoformat()
+        totals: dict[str, float] = {}
+        with self._lock:
+            cursor = self.sqlite_conn.cursor()
+            try:
+                parents: dict[str, str | None] = {}
+                missing: set[str] = set()
+                for code, delta in pending.items():
+                    current: str | None = code
+                    visited: set[str] = set()
+                    while current and current not in visited and current not in missing:
+                        visited.add(current)
+                        if current not in parents:
+                            cursor.execute(
+                                "SELECT parent_id FROM accounts WHERE code = ? LIMIT 1",
+                                (current,),
+                            )
+                            row = cursor.fetchone()
+                            if row is None:
+                                missing.add(current)
+                                break
+                            parents[current] = str(row[0] or "").strip() or None
+                        totals[current] = totals.get(current, 0.0) + delta
+                        current = parents[current]
+
+                self._add_account_balances(cursor, totals, now_iso)
+                self.sqlite_conn.commit()
+            except Exception:
+                self.sqlite_conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        self.invalidate_table_cache("accounts")
+        return list(totals)
+
+    @staticmethod
+    def _add_account_balances(cursor, totals: dict[str, float], now_iso: str) -> None:
+        """إضافة فروق جاهزة لأرصدة الحسابات بالكود (داخل transaction المستدعي)."""
+        cursor.executemany(
+            """
+            UPDATE accounts
+            SET balance = COALESCE(balance, 0) + ?, last_modified = ?,
+                sync_status = 'modified_offline'
+            WHERE code = ?
+            """,
+            [(delta, now_iso, code) for code, delta in totals.items()],
+        )
+
     def delete_account_permanently(self, account_id: str) -> bool:
         """⚡ حذف حساب نهائياً - محلي أولاً ثم مزامنة في الخلفية"""
         safe_print(f"INFO: [Repo] جاري حذف الحساب نهائياً ID: {account_id}")
@@ -5909,12 +8272,10 @@ class Repository:
 
         references.add(normalized_ref)
 
-        local_client = self._resolve_local_client_row(normalized_ref)
+        resolver = self.get_identity_resolver()
+        local_client = resolver.client(normalized_ref)
         if local_client is not None:
-            for field in ("id", "_mongo_id", "name"):
-                value = str(local_client.get(field) or "").strip()
-                if value:
-                    references.add(value)
+            references.update(resolver.client_references(normalized_ref))
 
         if local_client is None:
             try:
@@ -6054,6 +8415,70 @@ class Repository:
 
         return entry_data
 
+    def create_journal_entries_batch(
+        self,
+        entries: list[schemas.JournalEntry],
+        balance_deltas: dict[str, float] | None = None,
+    ) -> list[schemas.JournalEntry]:
+        """
+        ⚡ حفظ مجموعة قيود يومية مع فروق أرصدة حساباتها في transaction واحدة.
+        لا رفع للسحابة لكل قيد: القيود تُحفظ new_offline وترفعها المزامنة دفعة واحدة.
+
+        Args:
+            entries: القيود المطلوب حفظها
+            balance_deltas: {كود الحساب: فرق الرصيد} يُضاف كما هو (بدون تمرير للآباء)
+        """
+        if not entries:
+            return []
+
+        now_dt = datetime.now()
+        now_iso = now_dt.isoformat()
+        totals = {
+            str(code): float(delta)
+            for code, delta in (balance_deltas or {}).items()
+            if code and abs(float(delta or 0.0)) > 1e-9
+        }
+        sql = """
+            INSERT INTO journal_entries (
+                _mongo_id, sync_status, created_at, last_modified, date,
+                description, lines, related_document_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        with self._lock:
+            cursor = self.sqlite_conn.cursor()
+            try:
+                for entry_data in entries:
+                    entry_data.created_at = now_dt
+                    entry_data.last_modified = now_dt
+                    entry_data.sync_status = "new_offline"
+                    cursor.execute(
+                        sql,
+                        (
+                            None,
+                            entry_data.sync_status,
+                            now_iso,
+                            now_iso,
+                            entry_data.date.isoformat(),
+                            entry_data.description,
+                            json.dumps([line.model_dump() for line in entry_data.lines]),
+                            entry_data.related_document_id,
+                        ),
+                    )
+                    entry_data.id = cursor.lastrowid
+                if totals:
+                    self._add_account_balances(cursor, totals, now_iso)
+                self.sqlite_conn.commit()
+            except Exception:
+                self.sqlite_conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        if totals:
+            self.invalidate_table_cache("accounts")
+        safe_print(f"INFO: [Repository] تم حفظ {len(entries)} قيد يومية محلياً (دفعة واحدة).")
+        return entries
+
     def _row_to_journal_entry(self, row: Any) -> schemas.JournalEntry | None:
         row_dict = dict(row)
         lines_value = row_dict.get("lines")
@@ -6138,7 +8563,7 @@ class Repository:
             try:
                 cursor.execute(
                     f"""
-                    SELECT * {self._is_active_filter_sql('journal_entries')}
+                    SELECT * {self._is_active_filter_sql("journal_entries")}
                     AND date < ?
                     ORDER BY date ASC
                     """,
@@ -6342,7 +8767,7 @@ class Repository:
             except Exception as e:
                 safe_print(f"ERROR: فشل مزامنة الدفعة الجديدة: {e}")
 
-        self.invalidate_table_cache("payments")
+        self.apply_table_cache_delta("payments", [payment_data.id])
 
         return payment_data
 
@@ -6365,13 +8790,8 @@ class Repository:
             return []
 
         try:
-            with self._lock:
-                cursor = self.sqlite_conn.cursor()
-                try:
-                    cursor.execute(f"SELECT * {self._is_active_filter_sql('payments')}")
-                    rows = [dict(row) for row in cursor.fetchall()]
-                finally:
-                    cursor.close()
+            candidate_refs = self._project_ref_candidates(canonical_project_name, aliases)
+            rows = self._select_active_rows_for_project_refs("payments", candidate_refs)
 
             matching_rows = [
                 row
@@ -6384,7 +8804,10 @@ class Repository:
                     row_client_id=row.get("client_id"),
                 )
             ]
-            deduped_rows = self._dedupe_rows_by_signature(matching_rows, self._payment_signature)
+            deduped_rows = self._dedupe_rows_by_signature(
+                matching_rows,
+                lambda row: self._payment_signature(row, project_row=resolved_project),
+            )
             deduped_rows.sort(key=lambda row: str(row.get("date") or ""), reverse=True)
             return [schemas.Payment(**row) for row in deduped_rows]
         except Exception as e:
@@ -6429,7 +8852,12 @@ class Repository:
     def get_all_payments(self) -> list[schemas.Payment]:
         """⚡ جلب كل الدفعات (SQLite أولاً للسرعة) - مع cache ذكي"""
         if CACHE_ENABLED and hasattr(self, "_payments_cache"):
-            cached_result = self._payments_cache.get("all_payments")
+            cached_result = self._payments_cache.build_view(
+                "all_payments",
+                lambda _rows: self._models_from_ordered_entries(
+                    self._payments_cache.ordered_entries(), schemas.Payment
+                ),
+            )
             if cached_result is not None:
                 safe_print(f"INFO: ⚡ تم جلب {len(cached_result)} دفعة من الـ Cache")
                 return cached_result
@@ -6449,14 +8877,15 @@ class Repository:
                 rows = cursor.fetchall()
             finally:
                 cursor.close()
-            deduped_rows = self._dedupe_rows_by_signature(
-                [dict(row) for row in rows],
-                self._payment_signature,
-            )
-            deduped_rows.sort(key=lambda row: str(row.get("date") or ""), reverse=True)
-            payments = [schemas.Payment(**row) for row in deduped_rows]
+            entries = self._load_delta_cache_entries("payments", [dict(row) for row in rows])
             if CACHE_ENABLED and hasattr(self, "_payments_cache"):
-                self._payments_cache.set("all_payments", payments)
+                self._payments_cache.load(entries)
+                payments = self._models_from_ordered_entries(
+                    self._payments_cache.ordered_entries(), schemas.Payment
+                )
+                self._payments_cache.set_view("all_payments", payments)
+            else:
+                payments = self._deduped_models_from_entries(entries, schemas.Payment)
             safe_print(f"INFO: [Repo] تم جلب {len(payments)} دفعة من SQLite.")
             return payments
         except Exception as e:
@@ -6478,8 +8907,6 @@ class Repository:
                 deduped_rows = self._dedupe_rows_by_signature(rows, self._payment_signature)
                 deduped_rows.sort(key=lambda row: str(row.get("date") or ""), reverse=True)
                 payments = [schemas.Payment(**row) for row in deduped_rows]
-                if CACHE_ENABLED and hasattr(self, "_payments_cache"):
-                    self._payments_cache.set("all_payments", payments)
                 safe_print(f"INFO: [Repo] تم جلب {len(payments)} دفعة من MongoDB.")
                 return payments
             except Exception as e:
@@ -6523,7 +8950,7 @@ class Repository:
             try:
                 cursor.execute(
                     f"""
-                    SELECT * {self._is_active_filter_sql('payments')}
+                    SELECT * {self._is_active_filter_sql("payments")}
                     AND account_id = ? AND date >= ? AND date <= ?
                     ORDER BY date ASC
                 """,
@@ -6699,7 +9126,7 @@ class Repository:
                 except Exception:
                     pass  # Ignore sync errors
 
-            self.invalidate_table_cache("payments")
+            self.apply_table_cache_delta("payments", [payment_id])
 
             return True
         except ValueError:
@@ -6790,7 +9217,7 @@ class Repository:
                 )
                 self.sqlite_conn.commit()
 
-            self.invalidate_table_cache("payments")
+            self.apply_table_cache_delta("payments", [payment_id])
 
             return True
         except Exception as e:
@@ -7562,7 +9989,7 @@ class Repository:
             except Exception as e:
                 safe_print(f"ERROR: فشل مزامنة المصروف الجديد '{expense_data.category}': {e}")
 
-        self.invalidate_table_cache("expenses")
+        self.apply_table_cache_delta("expenses", [expense_data.id])
 
         return expense_data
 
@@ -7655,7 +10082,12 @@ class Repository:
     def get_all_expenses(self) -> list[schemas.Expense]:
         """⚡ جلب كل المصروفات (SQLite أولاً للسرعة) - مع cache ذكي"""
         if CACHE_ENABLED and hasattr(self, "_expenses_cache"):
-            cached_result = self._expenses_cache.get("all_expenses")
+            cached_result = self._expenses_cache.build_view(
+                "all_expenses",
+                lambda _rows: self._models_from_ordered_entries(
+                    self._expenses_cache.ordered_entries(), schemas.Expense
+                ),
+            )
             if cached_result is not None:
                 safe_print(f"INFO: ⚡ تم جلب {len(cached_result)} مصروف من الـ Cache")
                 return cached_result
@@ -7675,14 +10107,15 @@ class Repository:
                 rows = cursor.fetchall()
             finally:
                 cursor.close()
-            deduped_rows = self._dedupe_rows_by_signature(
-                [dict(row) for row in rows],
-                self._expense_signature,
-            )
-            deduped_rows.sort(key=lambda row: str(row.get("date") or ""), reverse=True)
-            expenses_list = [schemas.Expense(**row) for row in deduped_rows]
+            entries = self._load_delta_cache_entries("expenses", [dict(row) for row in rows])
             if CACHE_ENABLED and hasattr(self, "_expenses_cache"):
-                self._expenses_cache.set("all_expenses", expenses_list)
+                self._expenses_cache.load(entries)
+                expenses_list = self._models_from_ordered_entries(
+                    self._expenses_cache.ordered_entries(), schemas.Expense
+                )
+                self._expenses_cache.set_view("all_expenses", expenses_list)
+            else:
+                expenses_list = self._deduped_models_from_entries(entries, schemas.Expense)
             safe_print(f"INFO: تم جلب {len(expenses_list)} مصروف من المحلي (SQLite).")
             return expenses_list
         except Exception as e:
@@ -7702,8 +10135,6 @@ class Repository:
                 deduped_rows = self._dedupe_rows_by_signature(rows, self._expense_signature)
                 deduped_rows.sort(key=lambda row: str(row.get("date") or ""), reverse=True)
                 expenses_list = [schemas.Expense(**row) for row in deduped_rows]
-                if CACHE_ENABLED and hasattr(self, "_expenses_cache"):
-                    self._expenses_cache.set("all_expenses", expenses_list)
                 safe_print("INFO: تم جلب المصروفات من الأونلاين (MongoDB).")
                 return expenses_list
             except Exception as e:
@@ -7948,7 +10379,7 @@ class Repository:
                 except Exception:
                     pass  # Ignore sync errors
 
-            self.invalidate_table_cache("expenses")
+            self.apply_table_cache_delta("expenses", [expense_id])
 
             return True
         except ValueError:
@@ -8022,7 +10453,7 @@ class Repository:
                 )
                 self.sqlite_conn.commit()
 
-            self.invalidate_table_cache("expenses")
+            self.apply_table_cache_delta("expenses", [expense_id])
 
             return True
         except Exception as e:
@@ -8216,10 +10647,8 @@ class Repository:
                 else:
                     safe_print(f"ERROR: فشل مزامنة المشروع الجديد: {e}")
 
-        # ⚡ إبطال الـ cache بعد إضافة مشروع جديد
-        if CACHE_ENABLED and hasattr(self, "_projects_cache"):
-            self._projects_cache.invalidate()
-            safe_print("INFO: ⚡ تم إبطال cache المشاريع بعد الإضافة")
+        # ⚡ ترقيع الـ cache بالمشروع الجديد فقط بدل إبطال كل المشاريع
+        self.apply_table_cache_delta("projects", [local_id])
 
         # ⚡ إبطال cache الداشبورد لأن الأرقام تغيرت
         Repository._dashboard_cache = None
@@ -8227,22 +10656,8 @@ class Repository:
 
         return project_data
 
-    def get_all_projects(
-        self,
-        status: schemas.ProjectStatus | None = None,
-        exclude_status: schemas.ProjectStatus | None = None,
-    ) -> list[schemas.Project]:
-        """
-        ⚡ جلب كل المشاريع (SQLite أولاً للسرعة) - مع Cache ذكي
-        """
-        # ⚡ استخدام الـ cache إذا كان متاحاً
-        if CACHE_ENABLED and hasattr(self, "_projects_cache"):
-            cache_key = f"all_projects_{status}_{exclude_status}"
-            cached_result = self._projects_cache.get(cache_key)
-            if cached_result is not None:
-                safe_print(f"INFO: ⚡ تم جلب {len(cached_result)} مشروع من الـ Cache")
-                return cached_result
-
+    def _normalize_project_payload(self, raw: dict[str, Any]) -> dict[str, Any] | None:
+        """تطبيع صف مشروع خام (أرقام/حالة/عملة/JSON) قبل بناء schemas.Project."""
         allowed_statuses = {s.value for s in schemas.ProjectStatus}
         now_iso = datetime.now().isoformat()
 
@@ -8275,101 +10690,109 @@ class Repository:
                     return False
             return False
 
-        def _normalize_project_payload(raw: dict[str, Any]) -> dict[str, Any] | None:
-            payload = dict(raw)
+        payload = dict(raw)
 
-            name = str(payload.get("name") or "").strip()
-            client_id = str(payload.get("client_id") or "").strip()
-            if not name or not client_id:
-                return None
-            payload["name"] = name
-            payload["client_id"] = client_id
+        name = str(payload.get("name") or "").strip()
+        client_id = str(payload.get("client_id") or "").strip()
+        if not name or not client_id:
+            return None
+        payload["name"] = name
+        payload["client_id"] = client_id
 
-            status_value = str(payload.get("status") or schemas.ProjectStatus.ACTIVE.value)
-            if status_value not in allowed_statuses:
-                status_value = schemas.ProjectStatus.ACTIVE.value
-            payload["status"] = status_value
-
-            currency_value = normalize_currency_code(
-                payload.get("currency"),
-                schemas.CurrencyCode.EGP.value,
-            )
-            payload["currency"] = currency_value
-            payload["exchange_rate_snapshot"] = normalize_exchange_rate(
-                payload.get("exchange_rate_snapshot", 1.0),
-                currency_value,
-            )
-
-            payload["created_at"] = str(payload.get("created_at") or now_iso)
-            payload["last_modified"] = str(payload.get("last_modified") or now_iso)
-            payload["status_manually_set"] = _safe_bool(payload.get("status_manually_set"))
-            payload["is_retainer"] = _safe_bool(payload.get("is_retainer"))
-            payload["sequence_number"] = _safe_int(payload.get("sequence_number"), 0)
-
-            for numeric_field in [
-                "subtotal",
-                "discount_rate",
-                "discount_amount",
-                "tax_rate",
-                "tax_amount",
-                "total_amount",
-                "total_estimated_cost",
-                "estimated_profit",
-                "profit_margin",
-                "exchange_rate_snapshot",
-            ]:
-                payload[numeric_field] = _safe_float(payload.get(numeric_field), 0.0)
-
-            for list_field in ["items", "milestones"]:
-                value = payload.get(list_field)
-                if isinstance(value, str):
-                    try:
-                        payload[list_field] = json.loads(value)
-                    except (json.JSONDecodeError, TypeError, ValueError):
-                        payload[list_field] = []
-                elif value is None:
-                    payload[list_field] = []
+        status_value = str(payload.get("status") or schemas.ProjectStatus.ACTIVE.value)
+        if status_value not in allowed_statuses:
+            status_value = schemas.ProjectStatus.ACTIVE.value
+        payload["status"] = status_value
 
-            return payload
+        currency_value = normalize_currency_code(
+            payload.get("currency"),
+            schemas.CurrencyCode.EGP.value,
+        )
+        payload["currency"] = currency_value
+        payload["exchange_rate_snapshot"] = normalize_exchange_rate(
+            payload.get("exchange_rate_snapshot", 1.0),
+            currency_value,
+        )
 
-        sql_query = "SELECT * FROM projects WHERE (sync_status != 'deleted' OR sync_status IS NULL) AND (is_deleted = 0 OR is_deleted IS NULL)"
-        sql_params: list[Any] = []
+        payload["created_at"] = str(payload.get("created_at") or now_iso)
+        payload["last_modified"] = str(payload.get("last_modified") or now_iso)
+        payload["status_manually_set"] = _safe_bool(payload.get("status_manually_set"))
+        payload["is_retainer"] = _safe_bool(payload.get("is_retainer"))
+        payload["sequence_number"] = _safe_int(payload.get("sequence_number"), 0)
+
+        for numeric_field in [
+            "subtotal",
+            "discount_rate",
+            "discount_amount",
+            "tax_rate",
+            "tax_amount",
+            "total_amount",
+            "total_estimated_cost",
+            "estimated_profit",
+            "profit_margin",
+            "exchange_rate_snapshot",
+        ]:
+            payload[numeric_field] = _safe_float(payload.get(numeric_field), 0.0)
+
+        for list_field in ["items", "milestones"]:
+            value = payload.get(list_field)
+            if isinstance(value, str):
+                try:
+                    payload[list_field] = json.loads(value)
+                except (json.JSONDecodeError, TypeError, ValueError):
+                    payload[list_field] = []
+            elif value is None:
+                payload[list_field] = []
 
-        if status:
-            sql_query += " AND status = ?"
-            sql_params.append(status.value)
-        elif exclude_status:
-            sql_query += " AND status != ?"
-            sql_params.append(exclude_status.value)
+        return payload
 
-        sql_query += " ORDER BY created_at DESC"
+    def get_all_projects(
+        self,
+        status: schemas.ProjectStatus | None = None,
+        exclude_status: schemas.ProjectStatus | None = None,
+    ) -> list[schemas.Project]:
+        """
+        ⚡ جلب كل المشاريع (SQLite أولاً للسرعة) - مع Cache ذكي
+        """
+        # ⚡ استخدام الـ cache إذا كان متاحاً (صفوف المشاريع + فلترة الحالة من الذاكرة)
+        cache_key = f"all_projects_{status}_{exclude_status}"
+        if CACHE_ENABLED and hasattr(self, "_projects_cache"):
+            cached_result = self._projects_cache.build_view(
+                cache_key,
+                lambda _rows: self._projects_from_entries(
+                    self._projects_cache.ordered_entries(), status, exclude_status
+                ),
+            )
+            if cached_result is not None:
+                safe_print(f"INFO: ⚡ تم جلب {len(cached_result)} مشروع من الـ Cache")
+                return cached_result
 
-        # ⚡ جلب من SQLite أولاً (سريع جداً)
+        # ⚡ جلب من SQLite أولاً (سريع جداً) - كل المشاريع النشطة مرة واحدة، والفلترة بالحالة من الـ cache
         try:
-            with self._lock:
-                cursor = self.get_cursor()
-                try:
-                    cursor.execute(sql_query, sql_params)
-                    rows = cursor.fetchall()
-                    data_list: list[schemas.Project] = []
-                    for row in rows:
-                        try:
-                            row_dict = _normalize_project_payload(dict(row))
-                            if not row_dict:
-                                continue
-                            data_list.append(schemas.Project(**row_dict))
-                        except Exception:
-                            continue
+            with self.read_cursor() as cursor:
+                cursor.execute(
+                    "SELECT * FROM projects WHERE (sync_status != 'deleted' OR sync_status IS NULL) "
+                    "AND (is_deleted = 0 OR is_deleted IS NULL) ORDER BY created_at DESC"
+                )
+                rows = cursor.fetchall()
+            entries = self._load_delta_cache_entries("projects", [dict(row) for row in rows])
 
-                    # ⚡ حفظ في الـ cache
-                    if CACHE_ENABLED and hasattr(self, "_projects_cache"):
-                        cache_key = f"all_projects_{status}_{exclude_status}"
-                        self._projects_cache.set(cache_key, data_list)
+            # ⚡ حفظ في الـ cache (الترتيب من فهرسه)
+            if CACHE_ENABLED and hasattr(self, "_projects_cache"):
+                self._projects_cache.load(entries)
+                ordered = self._projects_cache.ordered_entries()
+            else:
+                ordered = sorted(
+                    entries.values(),
+                    key=lambda entry: str(entry["row"].get("created_at") or ""),
+                    reverse=True,
+                )
+            data_list = self._projects_from_entries(ordered, status, exclude_status)
+            if CACHE_ENABLED and hasattr(self, "_projects_cache"):
+                self._projects_cache.set_view(cache_key, data_list)
 
-                    safe_print(f"INFO: تم جلب {len(data_list)} مشروع من المحلي.")
-                    return data_list
-                finally:
-                    cursor.close()
+            safe_print(f"INFO: تم جلب {len(data_list)} مشروع من المحلي.")
+            return data_list
         except Exception as e:
             if self._is_sqlite_closed_error(e):
                 return []
@@ -8395,18 +10818,13 @@ class Repository:
                         mongo_id = str(d.pop("_id"))
                         d.pop("_mongo_id", None)
                         d.pop("mongo_id", None)
-                        normalized = _normalize_project_payload(d)
+                        normalized = self._normalize_project_payload(d)
                         if not normalized:
                             continue
                         data_list.append(schemas.Project(**normalized, _mongo_id=mongo_id))
                     except Exception:
                         continue
 
-                # ⚡ حفظ في الـ cache
-                if CACHE_ENABLED and hasattr(self, "_projects_cache"):
-                    cache_key = f"all_projects_{status}_{exclude_status}"
-                    self._projects_cache.set(cache_key, data_list)
-
                 safe_print(f"INFO: تم جلب {len(data_list)} مشروع من الأونلاين.")
                 return data_list
             except Exception as e:
@@ -8670,6 +11088,9 @@ class Repository:
         if CACHE_ENABLED and hasattr(self, "_projects_cache"):
             self._projects_cache.invalidate()
             safe_print("INFO: ⚡ تم إبطال cache المشاريع بعد التحديث")
+        self._refresh_project_dependents(
+            self._project_reference_values(target_row) | {str(project_data.name or "").strip()}
+        )
 
         # ⚡ إبطال cache الداشبورد لأن الأرقام تغيرت
         Repository._dashboard_cache = None
@@ -8798,6 +11219,7 @@ class Repository:
             if CACHE_ENABLED and hasattr(self, "_projects_cache"):
                 self._projects_cache.invalidate()
                 safe_print("INFO: ⚡ تم إبطال cache المشاريع بعد الحذف")
+            self._refresh_project_dependents(project_aliases | {project_name})
 
             # ⚡ إبطال cache الداشبورد لأن الأرقام تغيرت
             Repository._dashboard_cache = None
@@ -8929,13 +11351,8 @@ class Repository:
         name_is_ambiguous = self._has_ambiguous_project_name_reference(canonical_project_name)
 
         try:
-            with self._lock:
-                cursor = self.sqlite_conn.cursor()
-                try:
-                    cursor.execute(f"SELECT * {self._is_active_filter_sql('expenses')}")
-                    rows = [dict(row) for row in cursor.fetchall()]
-                finally:
-                    cursor.close()
+            candidate_refs = self._project_ref_candidates(canonical_project_name, aliases)
+            rows = self._select_active_rows_for_project_refs("expenses", candidate_refs)
 
             matching_rows = [
                 row
@@ -8952,7 +11369,10 @@ class Repository:
                         aliases,
                     )
                 ]
-            deduped_rows = self._dedupe_rows_by_signature(matching_rows, self._expense_signature)
+            deduped_rows = self._dedupe_rows_by_signature(
+                matching_rows,
+                lambda row: self._expense_signature(row, project_row=resolved_project),
+            )
             deduped_rows.sort(key=lambda row: str(row.get("date") or ""), reverse=True)
             return [schemas.Expense(**row) for row in deduped_rows]
         except Exception as e:
@@ -9011,10 +11431,226 @@ class Repository:
     _dashboard_cache_time = 0
     _DASHBOARD_CACHE_TTL = 30  # 30 ثانية
 
+    def _get_dashboard_project_rows(self) -> list[dict[str, Any]]:
+        """صفوف مشاريع خفيفة (بدون Pydantic/JSON) لحساب مؤشرات الداشبورد."""
+        allowed_statuses = {s.value for s in schemas.ProjectStatus}
+        raw_rows = self.scan(
+            "projects",
+            (
+                "id",
+                "name",
+                "client_id",
+                "_mongo_id",
+                "project_code",
+                "invoice_number",
+                "status",
+                "total_amount",
+            ),
+        )
+
+        project_rows: list[dict[str, Any]] = []
+        for raw in raw_rows:
+            name = str(raw.name or "").strip()
+            client_id = str(raw.client_id or "").strip()
+            if not name or not client_id:
+                continue
+            status_value = str(raw.status or schemas.ProjectStatus.ACTIVE.value)
+            if status_value not in allowed_statuses:
+                status_value = schemas.ProjectStatus.ACTIVE.value
+            try:
+                total_amount = float(raw.total_amount or 0.0)
+            except (TypeError, ValueError):
+                total_amount = 0.0
+            project_rows.append(
+                {
+                    "id": str(raw.id or "").strip(),
+                    "name": name,
+                    "client_id": client_id,
+                    "_mongo_id": str(raw._mongo_id or "").strip(),
+                    "project_code": str(raw.project_code or "").strip(),
+                    "invoice_number": str(raw.invoice_number or "").strip(),
+                    "status": schemas.ProjectStatus(status_value),
+                    "total_amount": total_amount,
+                }
+            )
+        return project_rows
+
+    def get_project_kpi_ledger(self) -> dict[tuple[str, str], dict[str, float]]:
+        """
+        ⚡ مجاميع كل مشروع (مدفوع/مصروف/متبقي) بمفتاح نطاق المشروع.
+        تُقرأ من dashboard_kpi_ledger (صف لكل مرجع مميز) بدل مسح كل الدفعات، ثم تُطرح
+        النسخ المكررة (get_signature_duplicate_ids) ويُجمَّع كل مرجع في نطاق مشروعه.
+        """
+        duplicate_ids = {
+            table: self.get_signature_duplicate_ids(table)
+            for table, _client_column in self._DASHBOARD_KPI_LEDGER_SOURCES
+        }
+        ref_amounts: dict[tuple[str, str, str], float] = {}
+        with self._lock:
+            cursor = self.sqlite_conn.cursor()
+            try:
+                cursor.execute(
+                    """
+                    SELECT source, project_ref, client_ref, amount
+                    FROM dashboard_kpi_ledger
+                    WHERE row_count > 0
+                    """
+                )
+                for row in cursor.fetchall():
+                    ref_key = (str(row["source"] or ""), row["project_ref"], row["client_ref"])
+                    ref_amounts[ref_key] = float(row["amount"] or 0.0)
+
+                # النسخ المكررة قليلة: تُطرح من صف مرجعها بدل تخزين توقيع لكل دفعة
+                for table, client_column in self._DASHBOARD_KPI_LEDGER_SOURCES:
+                    if not duplicate_ids[table]:
+                        continue
+                    client_expr = f"COALESCE({client_column}, '')" if client_column else "''"
+                    cursor.execute(
+                        f"""
+                        SELECT COALESCE(project_id, '') AS project_ref,
+                               {client_expr} AS client_ref,
+                               COALESCE(SUM(amount), 0.0) AS amount
+                        FROM {table}
+                        WHERE id IN (SELECT value FROM json_each(?))
+                        GROUP BY 1, 2
+                        """,  # nosec B608
+                        (json.dumps(sorted(duplicate_ids[table])),),
+                    )
+                    for row in cursor.fetchall():
+                        ref_key = (table, row["project_ref"], row["client_ref"])
+                        if ref_key in ref_amounts:
+                            ref_amounts[ref_key] -= float(row["amount"] or 0.0)
+            finally:
+                cursor.close()
+
+        project_rows = self._get_dashboard_project_rows()
+        exact_name_matches: dict[str, list[dict[str, Any]]] = {}
+        local_id_matches: dict[str, list[dict[str, Any]]] = {}
+        mongo_id_matches: dict[str, list[dict[str, Any]]] = {}
+        project_code_matches: dict[str, list[dict[str, Any]]] = {}
+        invoice_number_matches: dict[str, list[dict[str, Any]]] = {}
+        normalized_name_matches: dict[str, list[dict[str, Any]]] = {}
+
+        def _append_match(
+            index: dict[str, list[dict[str, Any]]], key: str, row: dict[str, Any]
+        ) -> None:
+            if not key:
+                return
+            index.setdefault(key, []).append(row)
+
+        for row in project_rows:
+            row["scope_key"] = self._project_scope_key(
+                row["_mongo_id"] or row["id"] or row["name"],
+                row["client_id"],
+                project_row=row,
+            )
+            _append_match(exact_name_matches, row["name"], row)
+            _append_match(local_id_matches, row["id"], row)
+            _append_match(mongo_id_matches, row["_mongo_id"], row)
+            _append_match(project_code_matches, self._project_text_key(row["project_code"]), row)
+            _append_match(
+                invoice_number_matches, self._project_text_key(row["invoice_number"]), row
+            )
+            _append_match(normalized_name_matches, self._project_text_key(row["name"]), row)
+
+        client_keys_cache: dict[str, set[str]] = {}
+
+        def _client_keys(client_id: Any) -> set[str]:
+            cache_key = normalize_user_text(client_id)
+            cached_keys = client_keys_cache.get(cache_key)
+            if cached_keys is not None:
+                return cached_keys
+
+            client_keys = {
+                self._project_text_key(reference)
+                for reference in self._client_reference_values(client_id)
+                if self._project_text_key(reference)
+            }
+            if not client_keys:
+                normalized_client_key = self._project_text_key(client_id)
+                if normalized_client_key:
+                    client_keys = {normalized_client_key}
+            client_keys_cache[cache_key] = client_keys
+            return client_keys
+
+        def _pick_project(
+            candidates: list[dict[str, Any]], client_id: Any
+        ) -> dict[str, Any] | None:
+            if not candidates:
+                return None
+            if len(candidates) == 1:
+                return candidates[0]
+
+            client_keys = _client_keys(client_id)
+            if client_keys:
+                by_client = [
+                    row
+                    for row in candidates
+                    if self._project_text_key(row.get("client_id")) in client_keys
+                ]
+                if len(by_client) == 1:
+                    return by_client[0]
+            return None
+
+        def _resolve_project_row_fast(project_ref: Any, client_id: Any) -> dict[str, Any] | None:
+            normalized_reference = normalize_user_text(project_ref)
+            if not normalized_reference:
+                return None
+
+            reference_key = self._project_text_key(normalized_reference)
+            chosen = _pick_project(exact_name_matches.get(normalized_reference, []), client_id)
+            if chosen is None and normalized_reference.isdigit():
+                chosen = _pick_project(local_id_matches.get(normalized_reference, []), client_id)
+            if chosen is None:
+                chosen = _pick_project(mongo_id_matches.get(normalized_reference, []), client_id)
+            if chosen is None:
+                for alias_index in (project_code_matches, invoice_number_matches):
+                    chosen = _pick_project(alias_index.get(reference_key, []), client_id)
+                    if chosen is not None:
+                        break
+            if chosen is None:
+                chosen = _pick_project(normalized_name_matches.get(reference_key, []), client_id)
+            return chosen
+
+        active_statuses = {
+            schemas.ProjectStatus.ACTIVE,
+            schemas.ProjectStatus.PLANNING,
+            schemas.ProjectStatus.ON_HOLD,
+        }
+        ledger: dict[tuple[str, str], dict[str, float]] = {}
+
+        def _entry(scope_key: tuple[str, str]) -> dict[str, float]:
+            entry = ledger.get(scope_key)
+            if entry is None:
+                entry = {"paid": 0.0, "expensed": 0.0, "total_amount": 0.0, "outstanding": 0.0}
+                ledger[scope_key] = entry
+            return entry
+
+        for project_row in project_rows:
+            entry = _entry(project_row["scope_key"])
+            if project_row["status"] in active_statuses:
+                entry["total_amount"] += project_row["total_amount"]
+
+        for (source, project_ref, client_ref), amount in ref_amounts.items():
+            resolved_project = _resolve_project_row_fast(project_ref, client_ref)
+            if resolved_project is not None:
+                scope_key = resolved_project["scope_key"]
+            else:
+                scope_key = self._project_scope_key(project_ref, client_ref)
+            entry = _entry(scope_key)
+            if source == "payments":
+                entry["paid"] += amount
+            elif source == "expenses":
+                entry["expensed"] += amount
+
+        for entry in ledger.values():
+            entry["outstanding"] = max(0.0, entry["total_amount"] - entry["paid"])
+        return ledger
+
     def get_dashboard_kpis(self, force_refresh: bool = False) -> dict:
         """
         ⚡ (محسّنة للسرعة) تحسب الأرقام الرئيسية للداشبورد.
-        SQLite أولاً (سريع جداً) - مع caching لتحسين الأداء.
+        تُقرأ من dashboard_kpi_ledger (يُحدَّث تزايدياً) - O(المشاريع) بدل مسح كل الدفعات.
         """
         # ⚡ استخدام الـ cache إذا كان صالحاً
         current_time = time.time()
@@ -9026,171 +11662,17 @@ class Repository:
             safe_print("INFO: [Repo] استخدام cache الداشبورد")
             return Repository._dashboard_cache
 
-        safe_print("INFO: [Repo] ⚡ جاري حساب أرقام الداشبورد (SQLite - سريع)...")
+        safe_print("INFO: [Repo] ⚡ جاري حساب أرقام الداشبورد (دفتر المجاميع)...")
         total_collected = 0.0
         total_outstanding = 0.0
         total_expenses = 0.0
         net_profit_cash = 0.0  # ⚡ تهيئة المتغير هنا لتجنب الخطأ
 
         try:
-            payments = self.get_all_payments()
-            expenses = self.get_all_expenses()
-            projects = self.get_all_projects()
-            total_collected = sum(
-                float(getattr(payment, "amount", 0.0) or 0.0) for payment in payments
-            )
-            total_expenses = sum(
-                float(getattr(expense, "amount", 0.0) or 0.0) for expense in expenses
-            )
-
-            project_rows: list[dict[str, Any]] = []
-            exact_name_matches: dict[str, list[dict[str, Any]]] = {}
-            local_id_matches: dict[str, list[dict[str, Any]]] = {}
-            mongo_id_matches: dict[str, list[dict[str, Any]]] = {}
-            project_code_matches: dict[str, list[dict[str, Any]]] = {}
-            invoice_number_matches: dict[str, list[dict[str, Any]]] = {}
-            normalized_name_matches: dict[str, list[dict[str, Any]]] = {}
-
-            def _append_match(
-                index: dict[str, list[dict[str, Any]]], key: str, row: dict[str, Any]
-            ) -> None:
-                if not key:
-                    return
-                index.setdefault(key, []).append(row)
-
-            for project in projects:
-                row = {
-                    "id": str(getattr(project, "id", None) or "").strip(),
-                    "name": str(getattr(project, "name", "") or "").strip(),
-                    "client_id": str(getattr(project, "client_id", "") or "").strip(),
-                    "_mongo_id": str(getattr(project, "_mongo_id", None) or "").strip(),
-                    "project_code": str(getattr(project, "project_code", "") or "").strip(),
-                    "invoice_number": str(getattr(project, "invoice_number", "") or "").strip(),
-                    "status": getattr(project, "status", None),
-                    "total_amount": float(getattr(project, "total_amount", 0.0) or 0.0),
-                }
-                row["scope_key"] = self._project_scope_key(
-                    row["_mongo_id"] or row["id"] or row["name"],
-                    row["client_id"],
-                    project_row=row,
-                )
-                project_rows.append(row)
-                _append_match(exact_name_matches, row["name"], row)
-                _append_match(local_id_matches, row["id"], row)
-                _append_match(mongo_id_matches, row["_mongo_id"], row)
-                _append_match(
-                    project_code_matches, self._project_text_key(row["project_code"]), row
-                )
-                _append_match(
-                    invoice_number_matches, self._project_text_key(row["invoice_number"]), row
-                )
-                _append_match(normalized_name_matches, self._project_text_key(row["name"]), row)
-
-            client_keys_cache: dict[str, set[str]] = {}
-            project_resolution_cache: dict[tuple[str, str], dict[str, Any] | None] = {}
-
-            def _client_keys(client_id: Any) -> set[str]:
-                cache_key = normalize_user_text(client_id)
-                cached_keys = client_keys_cache.get(cache_key)
-                if cached_keys is not None:
-                    return cached_keys
-
-                client_keys = {
-                    self._project_text_key(reference)
-                    for reference in self._client_reference_values(client_id)
-                    if self._project_text_key(reference)
-                }
-                if not client_keys:
-                    normalized_client_key = self._project_text_key(client_id)
-                    if normalized_client_key:
-                        client_keys = {normalized_client_key}
-                client_keys_cache[cache_key] = client_keys
-                return client_keys
-
-            def _pick_project(
-                candidates: list[dict[str, Any]], client_id: Any
-            ) -> dict[str, Any] | None:
-                if not candidates:
-                    return None
-                if len(candidates) == 1:
-                    return candidates[0]
-
-                client_keys = _client_keys(client_id)
-                if client_keys:
-                    by_client = [
-                        row
-                        for row in candidates
-                        if self._project_text_key(row.get("client_id")) in client_keys
-                    ]
-                    if len(by_client) == 1:
-                        return by_client[0]
-                return None
-
-            def _resolve_project_row_fast(
-                project_ref: Any, client_id: Any
-            ) -> dict[str, Any] | None:
-                normalized_reference = normalize_user_text(project_ref)
-                normalized_client = normalize_user_text(client_id)
-                cache_key = (normalized_client, normalized_reference)
-                if cache_key in project_resolution_cache:
-                    return project_resolution_cache[cache_key]
-
-                if not normalized_reference:
-                    project_resolution_cache[cache_key] = None
-                    return None
-
-                reference_key = self._project_text_key(normalized_reference)
-                chosen = _pick_project(exact_name_matches.get(normalized_reference, []), client_id)
-                if chosen is None and normalized_reference.isdigit():
-                    chosen = _pick_project(
-                        local_id_matches.get(normalized_reference, []), client_id
-                    )
-                if chosen is None:
-                    chosen = _pick_project(
-                        mongo_id_matches.get(normalized_reference, []), client_id
-                    )
-                if chosen is None:
-                    for alias_index in (project_code_matches, invoice_number_matches):
-                        chosen = _pick_project(alias_index.get(reference_key, []), client_id)
-                        if chosen is not None:
-                            break
-                if chosen is None:
-                    chosen = _pick_project(
-                        normalized_name_matches.get(reference_key, []), client_id
-                    )
-
-                project_resolution_cache[cache_key] = chosen
-                return chosen
-
-            paid_by_project: dict[tuple[str, str], float] = {}
-            for payment in payments:
-                payment_project_id = getattr(payment, "project_id", "")
-                payment_client_id = getattr(payment, "client_id", "")
-                resolved_project = _resolve_project_row_fast(payment_project_id, payment_client_id)
-                if resolved_project is not None:
-                    project_key = resolved_project["scope_key"]
-                else:
-                    project_key = self._project_scope_key(payment_project_id, payment_client_id)
-                if not project_key[1]:
-                    continue
-                paid_by_project[project_key] = paid_by_project.get(project_key, 0.0) + float(
-                    getattr(payment, "amount", 0.0) or 0.0
-                )
-
-            active_statuses = {
-                schemas.ProjectStatus.ACTIVE,
-                schemas.ProjectStatus.PLANNING,
-                schemas.ProjectStatus.ON_HOLD,
-            }
-            for project_row in project_rows:
-                if project_row["status"] not in active_statuses:
-                    continue
-                project_key = project_row["scope_key"]
-                project_total = project_row["total_amount"]
-                project_paid = float(paid_by_project.get(project_key, 0.0))
-                project_remaining = project_total - project_paid
-                if project_remaining > 0:
-                    total_outstanding += project_remaining
+            for entry in self.get_project_kpi_ledger().values():
+                total_collected += entry["paid"]
+                total_expenses += entry["expensed"]
+                total_outstanding += entry["outstanding"]
 
             net_profit_cash = total_collected - total_expenses
 
@@ -9457,9 +11939,7 @@ class Repository:
             # API 1: Open Exchange Rates
             url = "https://open.er-api.com/v6/latest/USD"
             req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-            with urllib.request.urlopen(
-                req, timeout=10
-            ) as response:  # nosec B310 - URL is hardcoded HTTPS
+            with urllib.request.urlopen(req, timeout=10) as response:  # nosec B310 - URL is hardcoded HTTPS
                 data = json.loads(response.read().decode())
                 if data.get("result") == "success" and "rates" in data:
                     rates = data["rates"]
@@ -9477,9 +11957,7 @@ class Repository:
             # API 2: ExchangeRate-API
             url = f"https://api.exchangerate-api.com/v4/latest/{currency_code}"
             req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-            with urllib.request.urlopen(
-                req, timeout=10
-            ) as response:  # nosec B310 - URL is hardcoded HTTPS
+            with urllib.request.urlopen(req, timeout=10) as response:  # nosec B310 - URL is hardcoded HTTPS
                 data = json.loads(response.read().decode())
                 if "rates" in data:
                     egp_rate = data["rates"].get("EGP", 0)
@@ -10461,7 +12939,7 @@ class Repository:
                 cursor = self.sqlite_conn.cursor()
                 try:
                     cursor.execute(
-                        f"""SELECT * {self._is_active_filter_sql('tasks')}
+                        f"""SELECT * {self._is_active_filter_sql("tasks")}
                            AND due_date < ? AND status NOT IN ('COMPLETED', 'CANCELLED')
                            ORDER BY due_date ASC""",
                         (now_iso,),
@@ -10484,7 +12962,7 @@ class Repository:
                 cursor = self.sqlite_conn.cursor()
                 try:
                     cursor.execute(
-                        f"""SELECT * {self._is_active_filter_sql('tasks')}
+                        f"""SELECT * {self._is_active_filter_sql("tasks")}
                            AND date(due_date) = date(?)
                            ORDER BY due_time ASC""",
                         (today,),
@@ -0,0 +1,38 @@
+"""Lightweight tuple records returned by ``Repository.scan`` projections."""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from operator import itemgetter
+
+_RECORD_TYPES: dict[tuple[str, ...], type[ScanRecord]] = {}
+
+
+class ScanRecord(tuple):
+    """Immutable row projection: plain tuple order plus read-only attribute access."""
+
+    __slots__ = ()
+    _fields: tuple[str, ...] = ()
+
+    def as_dict(self) -> dict[str, object]:
+        return dict(zip(self._fields, self, strict=True))
+
+    def __repr__(self) -> str:
+        values = ", ".join(
+            f"{name}={value!r}" for name, value in zip(self._fields, self, strict=True)
+        )
+        return f"ScanRecord({values})"
+
+
+def scan_record_type(fields: Sequence[str]) -> type[ScanRecord]:
+    """Return the cached ``ScanRecord`` subclass for the given field order."""
+
+    key = tuple(str(field) for field in fields)
+    record_type = _RECORD_TYPES.get(key)
+    if record_type is None:
+        namespace: dict[str, object] = {"__slots__": (), "_fields": key}
+        for index, field in enumerate(key):
+            namespace[field] = property(itemgetter(index))
+        record_type = type("ScanRecord", (ScanRecord,), namespace)
+        _RECORD_TYPES[key] = record_type
+    return record_type
@@ -177,6 +177,7 @@ class Client(BaseSchema):
     logo_data: str | None = None  # بيانات الصورة بصيغة base64 (للمزامنة بين الأجهزة)
     has_logo: bool = False
     logo_last_synced: str | None = None
+    logo_hash: str | None = None  # ⚡ بصمة الصورة في مخزن blobs المحلي (sha256 للمحتوى)
     client_notes: str | None = None
     is_vip: bool = False  # ⚡ عميل مميز VIP
 
@@ -4,6 +4,7 @@
 الإصدار المحسّن مع دعم أفضل للـ threading
 """
 
+import bisect
 import functools
 import threading
 import time
@@ -123,6 +124,252 @@ class LRUCache:
         }
 
 
+class DeltaRowCache:
+    """
+    ⚡ Cache صفوف جدول بمفتاح id يُرقَّع صفاً بصف بدل إبطال الجدول كله.
+    القوائم المشتقة (views) تُبنى من الصفوف المخزنة فقط وتُمسح مع أي ترقيع.
+
+    فهرس اختياري يُحدَّث مع كل ترقيع (بدون إعادة بناء):
+    - group_key + prefer: مجموعات الصفوف المكررة وصفها المفضّل (الفائز) لكل مجموعة
+    - sort_key: ترتيب الفائزين (تصاعدياً؛ ordered_entries تعيده تنازلياً)
+    - ref_keys: مراجع خارجية لكل صف (مثل project_id) لإيجاد الصفوف المتأثرة بتغيرها
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        *,
+        group_key: Callable[[Any], Any] | None = None,
+        prefer: Callable[[Any, Any], bool] | None = None,
+        sort_key: Callable[[Any], Any] | None = None,
+        ref_keys: Callable[[Any], Any] | None = None,
+    ):
+        """
+        Args:
+            ttl_seconds: مدة صلاحية الصفوف منذ آخر تحميل كامل (الترقيع لا يمددها)
+            group_key: entry -> مفتاح المجموعة (None = كل صف مجموعة وحده)
+            prefer: (candidate, current) -> True لو candidate يحل محل الفائز الحالي
+            sort_key: entry -> قيمة الترتيب
+            ref_keys: entry -> مراجع خارجية (iterable من النصوص)
+        """
+        self.ttl = ttl_seconds
+        self._rows: dict[Any, Any] | None = None
+        self._views: dict[str, Any] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+        self._patches = 0
+        self._group_key = group_key
+        self._prefer = prefer
+        self._sort_key = sort_key
+        self._ref_keys = ref_keys
+        self._groups: dict[Any, set] = {}
+        self._group_of: dict[Any, Any] = {}
+        self._winners: dict[Any, Any] = {}
+        self._order: list[tuple[Any, str, Any]] = []
+        self._order_item: dict[Any, tuple[Any, str, Any]] = {}
+        self._by_ref: dict[str, set] = {}
+
+    def _reset_index(self) -> None:
+        self._groups.clear()
+        self._group_of.clear()
+        self._winners.clear()
+        self._order = []
+        self._order_item.clear()
+        self._by_ref.clear()
+
+    def _entry_group(self, key: Any, entry: Any) -> Any:
+        return ("row", key) if self._group_key is None else ("group", self._group_key(entry))
+
+    def _entry_refs(self, entry: Any) -> set[str]:
+        if self._ref_keys is None:
+            return set()
+        return {str(ref).strip() for ref in self._ref_keys(entry) or () if str(ref or "").strip()}
+
+    def _order_item_for(self, key: Any) -> tuple[Any, str, Any]:
+        sort_value = self._sort_key(self._rows[key]) if self._sort_key is not None else ""
+        # str(key) يفك التعادل بترتيب ثابت حتى لو اختلفت أنواع المفاتيح
+        return (sort_value, str(key), key)
+
+    def _elect(self, group: Any) -> Any:
+        winner = None
+        for key in sorted(self._groups[group], key=str):
+            if winner is None or (
+                self._prefer is not None and self._prefer(self._rows[key], self._rows[winner])
+            ):
+                winner = key
+        return winner
+
+    def _set_winner(self, group: Any, winner: Any) -> None:
+        """تحديث فائز مجموعة واحدة وموضعه في الترتيب (bisect بدل إعادة الفرز)."""
+        previous = self._winners.pop(group, None)
+        if previous is not None:
+            item = self._order_item.pop(previous)
+            del self._order[bisect.bisect_left(self._order, item)]
+        if winner is not None:
+            item = self._order_item_for(winner)
+            self._winners[group] = winner
+            self._order_item[winner] = item
+            bisect.insort(self._order, item)
+
+    def _index_add(self, key: Any) -> None:
+        entry = self._rows[key]
+        for ref in self._entry_refs(entry):
+            self._by_ref.setdefault(ref, set()).add(key)
+        group = self._entry_group(key, entry)
+        self._group_of[key] = group
+        self._groups.setdefault(group, set()).add(key)
+        current = self._winners.get(group)
+        if current is None or (
+            self._prefer is not None and self._prefer(entry, self._rows[current])
+        ):
+            self._set_winner(group, key)
+
+    def _index_remove(self, key: Any) -> None:
+        entry = self._rows[key]
+        for ref in self._entry_refs(entry):
+            keys = self._by_ref.get(ref)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_ref[ref]
+        group = self._group_of.pop(key)
+        members = self._groups[group]
+        members.discard(key)
+        if not members:
+            del self._groups[group]
+            self._set_winner(group, None)
+        elif self._winners.get(group) == key:
+            self._set_winner(group, self._elect(group))
+
+    def is_loaded(self) -> bool:
+        """هل الصفوف محملة وصالحة؟"""
+        with self._lock:
+            if self._rows is None:
+                return False
+            if time.time() - self._loaded_at > self.ttl:
+                self._rows = None
+                self._views.clear()
+                self._reset_index()
+                return False
+            return True
+
+    def load(self, rows: dict[Any, Any]) -> None:
+        """تحميل كامل لصفوف الجدول (الفهرس يُبنى مرة ويُرتب مرة واحدة)"""
+        with self._lock:
+            self._rows = dict(rows)
+            self._views.clear()
+            self._reset_index()
+            for key, entry in self._rows.items():
+                for ref in self._entry_refs(entry):
+                    self._by_ref.setdefault(ref, set()).add(key)
+                group = self._entry_group(key, entry)
+                self._group_of[key] = group
+                self._groups.setdefault(group, set()).add(key)
+            for group in self._groups:
+                winner = self._elect(group)
+                self._winners[group] = winner
+                self._order_item[winner] = self._order_item_for(winner)
+            self._order = sorted(self._order_item.values())
+            self._loaded_at = time.time()
+
+    def get_entry(self, key: Any) -> Any | None:
+        with self._lock:
+            return self._rows.get(key) if self._rows is not None else None
+
+    def ordered_entries(self) -> list[Any]:
+        """الصفوف الفائزة (صف لكل مجموعة) مرتبة تنازلياً حسب sort_key من الفهرس مباشرة"""
+        with self._lock:
+            if self._rows is None:
+                return []
+            return [self._rows[key] for *_, key in reversed(self._order)]
+
+    def keys_for_refs(self, refs) -> set[Any]:
+        """مفاتيح الصفوف التي تشير لأي من المراجع (حسب ref_keys)"""
+        with self._lock:
+            keys: set[Any] = set()
+            for ref in refs or ():
+                keys.update(self._by_ref.get(str(ref or "").strip(), ()))
+            return keys
+
+    def get_view(self, name: str) -> Any | None:
+        """جلب قائمة مشتقة (None لو غير محملة أو تحتاج إعادة بناء)"""
+        with self._lock:
+            if not self.is_loaded() or name not in self._views:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return self._views[name]
+
+    def build_view(self, name: str, builder: Callable[[dict[Any, Any]], Any]) -> Any | None:
+        """بناء قائمة مشتقة من الصفوف المخزنة (بدون قراءة الجدول) وحفظها"""
+        with self._lock:
+            if not self.is_loaded():
+                return None
+            if name not in self._views:
+                self._views[name] = builder(self._rows)
+            return self._views[name]
+
+    def set_view(self, name: str, value: Any) -> None:
+        with self._lock:
+            if self._rows is not None:
+                self._views[name] = value
+
+    def upsert(self, key: Any, value: Any) -> None:
+        """إضافة/تحديث صف واحد (لا شيء لو الصفوف غير محملة)"""
+        with self._lock:
+            if self._rows is None:
+                return
+            if key in self._rows:
+                self._index_remove(key)
+            self._rows[key] = value
+            self._index_add(key)
+            self._views.clear()
+            self._patches += 1
+
+    def discard(self, key: Any) -> None:
+        """حذف صف واحد"""
+        with self._lock:
+            if self._rows is None or key not in self._rows:
+                return
+            self._index_remove(key)
+            del self._rows[key]
+            self._views.clear()
+            self._patches += 1
+
+    def discard_where(self, predicate: Callable[[Any, Any], bool]) -> None:
+        """حذف الصفوف المطابقة لشرط (للمراجع التي لم تعد موجودة في الجدول)"""
+        with self._lock:
+            if self._rows is None:
+                return
+            for key in [key for key, value in self._rows.items() if predicate(key, value)]:
+                self.discard(key)
+
+    def invalidate(self, key: Any | None = None) -> None:
+        """إبطال كامل (أو صف محدد) - نفس واجهة LRUCache"""
+        with self._lock:
+            if key is not None:
+                self.discard(key)
+                return
+            self._rows = None
+            self._views.clear()
+            self._reset_index()
+
+    def get_stats(self) -> dict[str, Any]:
+        """إحصائيات الـ cache"""
+        total = self._hits + self._misses
+        hit_rate = (self._hits / total * 100) if total > 0 else 0
+        return {
+            "size": len(self._rows or {}),
+            "views": len(self._views),
+            "patches": self._patches,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": f"{hit_rate:.1f}%",
+        }
+
+
 # ⚡ Cache عام للبيانات - محسّن للسرعة
 _data_cache = LRUCache(maxsize=2000, ttl_seconds=600)  # ⚡ 10 دقائق
 _query_cache = LRUCache(maxsize=1000, ttl_seconds=300)  # ⚡ 5 دقائق
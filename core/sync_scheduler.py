@@ -0,0 +1,421 @@
+"""
+⚡ جدولة المزامنة الموحدة (Sync Scheduler).
+
+طابور أولويات واحد يخدم كل مصادر المزامنة: نبضة Delta الدورية، رفع التغييرات المحلية،
+أحداث الأجهزة الأخرى (change stream / إشعارات)، وطلبات الشاشات. كل الطلبات لنفس الجدول
+تندمج في مهمة واحدة، وتُنفذ على thread واحد فلا تتزاحم دورات المزامنة على قفل الـ repo.
+النبضة الدورية تتباطأ تدريجياً أثناء الخمول، وحالة كل جدول (متسخ / آخر سحب ناجح) تُستخدم
+لإثبات أن الـ Delta كافية قبل أي مزامنة كاملة.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+ALL_TABLES = "__all__"
+
+PRIORITY_LOCAL_CHANGE = 0  # تغيير محلي يجب أن يصل للسحابة بسرعة
+PRIORITY_REMOTE_EVENT = 1  # حدث من جهاز آخر / change stream / فتح شاشة
+PRIORITY_PUSH = 2  # رفع دوري للتغييرات المعلقة
+PRIORITY_PERIODIC = 3  # نبضة Delta الدورية
+
+BUSY_REASONS = frozenset({"delta_busy", "full_sync_in_progress"})
+BUSY_RETRY_SECONDS = 0.15
+DEFAULT_COALESCE_SECONDS = 0.05
+# دورة لجدول واحد لكل طلب؛ أكثر من ذلك معلّق معاً = دورة Delta واحدة لكل الجداول
+MAX_TARGETED_TABLES = 3
+LATENCY_SAMPLES = 200
+
+
+@dataclass
+class SyncTask:
+    """مهمة مدمجة لجدول (أو كل الجداول): push و/أو pull بأعلى أولوية طُلبت."""
+
+    table: str
+    priority: int
+    push: bool = False
+    pull: bool = False
+    reasons: set[str] = field(default_factory=set)
+    requested_at: float = field(default_factory=time.monotonic)
+    not_before: float = 0.0
+    merged: int = 0
+
+    def merge(self, priority: int, push: bool, pull: bool, reason: str) -> None:
+        self.priority = min(self.priority, priority)
+        self.push = self.push or push
+        self.pull = self.pull or pull
+        self.reasons.add(reason)
+        self.merged += 1
+
+
+@dataclass
+class TableSyncState:
+    dirty: bool = False
+    last_pull_mono: float = 0.0
+    last_pull_ok: bool = False
+    last_change_mono: float = 0.0
+    pulls: int = 0
+    failures: int = 0
+
+
+class SyncScheduler:
+    """
+    المنفّذ executor(task) يرجع نتيجة بنفس شكل دورات UnifiedSync
+    (success / reason / pushed / pulled / deleted / errors).
+    """
+
+    def __init__(
+        self,
+        executor: Callable[[SyncTask], dict[str, Any]],
+        tables: Iterable[str],
+        *,
+        interval_seconds: float = 2.0,
+        max_backoff: int = 4,
+        coalesce_seconds: float = DEFAULT_COALESCE_SECONDS,
+        name: str = "unified-sync-scheduler",
+    ):
+        self._executor = executor
+        self._tables = list(tables)
+        self._name = name
+        self._cond = threading.Condition()
+        self._pending: dict[str, SyncTask] = {}
+        self._running_task: SyncTask | None = None
+        self._worker: threading.Thread | None = None
+        self._stopped = False
+
+        self._interval_seconds = max(0.5, float(interval_seconds))
+        self._max_backoff = max(1, int(max_backoff))
+        self._coalesce_seconds = max(0.0, float(coalesce_seconds))
+        self._heartbeat_enabled = False
+        self._idle_streak = 0
+        self._next_heartbeat = 0.0
+
+        self._states: dict[str, TableSyncState] = {t: TableSyncState() for t in self._tables}
+        self._last_full_sync_mono = 0.0
+        self._latencies_ms: list[float] = []
+        self._counters = {
+            "requests": 0,
+            "merged_requests": 0,
+            "tasks_run": 0,
+            "tasks_failed": 0,
+            "busy_retries": 0,
+            "heartbeats": 0,
+            "max_queue_depth": 0,
+            "full_syncs_run": 0,
+            "full_syncs_skipped": 0,
+        }
+
+    # ---------- الطلبات ----------
+
+    def request(
+        self,
+        table: str | None = None,
+        *,
+        push: bool = True,
+        pull: bool = True,
+        priority: int = PRIORITY_REMOTE_EVENT,
+        reason: str = "request",
+    ) -> bool:
+        """
+        إضافة طلب للطابور؛ يرجع False لو اندمج في مهمة معلّقة لنفس الجدول.
+        طلبات جدول محدد تندمج في مهمة "كل الجداول" لو كانت معلّقة.
+        """
+        key = table if table in self._states else ALL_TABLES
+        now = time.monotonic()
+        with self._cond:
+            if self._stopped:
+                return False
+            self._counters["requests"] += 1
+            if push and key != ALL_TABLES:
+                self._states[key].dirty = True
+            target = self._pending.get(key) or self._pending.get(ALL_TABLES)
+            if target is not None:
+                target.merge(priority, push, pull, reason)
+                self._counters["merged_requests"] += 1
+                self._cond.notify()
+                return False
+            # الطلبات المتتالية تنضم لنافذة تجميع الدفعة الحالية فتحسم الأولوية ترتيبها
+            not_before = min(
+                (task.not_before for task in self._pending.values()),
+                default=now + self._coalesce_seconds,
+            )
+            self._pending[key] = SyncTask(
+                table=key,
+                priority=priority,
+                push=push,
+                pull=pull,
+                reasons={reason},
+                requested_at=now,
+                not_before=max(now, not_before),
+            )
+            if key == ALL_TABLES:
+                # مهمة كل الجداول تغطي المعلّق لجداول محددة
+                for table_key in [k for k in self._pending if k != ALL_TABLES]:
+                    self._pending[ALL_TABLES].merge(
+                        self._pending[table_key].priority,
+                        self._pending[table_key].push,
+                        self._pending[table_key].pull,
+                        "merged",
+                    )
+                    del self._pending[table_key]
+            self._counters["max_queue_depth"] = max(
+                self._counters["max_queue_depth"], len(self._pending)
+            )
+            self._idle_streak = 0
+            self._ensure_worker_locked()
+            self._cond.notify()
+            return True
+
+    def is_busy(self) -> bool:
+        with self._cond:
+            return bool(self._pending) or self._running_task is not None
+
+    # ---------- النبضة الدورية ----------
+
+    def start(self, interval_seconds: float | None = None) -> None:
+        """تشغيل النبضة الدورية (Delta) مع تباطؤ تدريجي أثناء الخمول."""
+        with self._cond:
+            if interval_seconds is not None:
+                self._interval_seconds = max(0.5, float(interval_seconds))
+            self._stopped = False
+            self._heartbeat_enabled = True
+            self._idle_streak = 0
+            self._next_heartbeat = time.monotonic() + self._interval_seconds
+            self._ensure_worker_locked()
+            self._cond.notify()
+
+    def stop(self, timeout: float = 0.5) -> None:
+        with self._cond:
+            self._stopped = True
+            self._heartbeat_enabled = False
+            self._pending.clear()
+            self._cond.notify_all()
+            worker = self._worker
+        if worker is not None and worker is not threading.current_thread():
+            worker.join(timeout=timeout)
+
+    def set_max_backoff(self, max_backoff: int) -> None:
+        with self._cond:
+            self._max_backoff = max(1, int(max_backoff))
+
+    def backoff_factor(self) -> int:
+        return min(self._max_backoff, 1 + (self._idle_streak // 2))
+
+    # ---------- حالة الجداول ----------
+
+    def mark_full_sync(self, success: bool) -> None:
+        """مزامنة كاملة ناجحة = نقطة بداية جديدة لإثبات الاتساق."""
+        now = time.monotonic()
+        with self._cond:
+            self._counters["full_syncs_run"] += 1
+            if not success:
+                return
+            self._last_full_sync_mono = now
+            for state in self._states.values():
+                state.last_pull_mono = now
+                state.last_pull_ok = True
+                state.failures = 0
+
+    def note_full_sync_skipped(self) -> None:
+        with self._cond:
+            self._counters["full_syncs_skipped"] += 1
+
+    def delta_is_consistent(self, max_age_seconds: float) -> bool:
+        """
+        هل تكفي الـ Delta: كل جدول سُحب بنجاح خلال max_age_seconds، ولا جدول متسخ
+        أو فشل سحبه منذ آخر نجاح.
+        """
+        now = time.monotonic()
+        with self._cond:
+            for state in self._states.values():
+                if state.dirty or not state.last_pull_ok or state.failures:
+                    return False
+                if (now - state.last_pull_mono) > max_age_seconds:
+                    return False
+        return True
+
+    def _record_result(self, task: SyncTask, result: dict[str, Any]) -> None:
+        now = time.monotonic()
+        tables = self._tables if task.table == ALL_TABLES else [task.table]
+        success = bool(result.get("success"))
+        changed = (
+            int(result.get("pushed", 0) or 0)
+            + int(result.get("pulled", 0) or 0)
+            + int(result.get("deleted", 0) or 0)
+        )
+        errors = int(result.get("errors", 0) or 0)
+        with self._cond:
+            self._counters["tasks_run"] += 1
+            if not success:
+                self._counters["tasks_failed"] += 1
+            for table in tables:
+                state = self._states[table]
+                if success and task.push and not errors:
+                    state.dirty = False
+                if task.pull:
+                    state.pulls += 1
+                    if success and not errors:
+                        state.last_pull_ok = True
+                        state.last_pull_mono = now
+                        state.failures = 0
+                    else:
+                        state.failures += 1
+                if changed:
+                    state.last_change_mono = now
+            if task.priority == PRIORITY_PERIODIC:
+                self._idle_streak = 0 if changed else min(10, self._idle_streak + 1)
+
+    # ---------- التنفيذ ----------
+
+    def _ensure_worker_locked(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(target=self._run, daemon=True, name=self._name)
+        self._worker.start()
+
+    def _pop_ready_locked(self, now: float) -> tuple[SyncTask | None, float | None]:
+        """أعلى أولوية جاهزة (ثم الأقدم)، أو مهلة الانتظار حتى أول مهمة جاهزة."""
+        ready = [task for task in self._pending.values() if task.not_before <= now]
+        if not ready:
+            if not self._pending:
+                return None, None
+            return None, min(task.not_before for task in self._pending.values()) - now
+        tables = [task for task in self._pending.values() if task.table != ALL_TABLES]
+        if len(tables) > MAX_TARGETED_TABLES:
+            merged = SyncTask(
+                table=ALL_TABLES,
+                priority=min(task.priority for task in tables),
+                requested_at=min(task.requested_at for task in tables),
+            )
+            for task in tables:
+                merged.merge(task.priority, task.push, task.pull, "collapsed")
+                merged.reasons |= task.reasons
+                del self._pending[task.table]
+            self._pending[ALL_TABLES] = merged
+            ready = [task for task in self._pending.values() if task.not_before <= now]
+            if not ready:
+                return None, 0.0
+        task = min(ready, key=lambda item: (item.priority, item.requested_at))
+        del self._pending[task.table]
+        return task, None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                task = None
+                while task is None:
+                    if self._stopped:
+                        self._worker = None
+                        return
+                    now = time.monotonic()
+                    task, wait_seconds = self._pop_ready_locked(now)
+                    if task is not None:
+                        break
+                    if self._heartbeat_enabled:
+                        heartbeat_in = self._next_heartbeat - now
+                        if heartbeat_in <= 0:
+                            # الموعد التالي يُحسب عند بدء النبضة: نبضة أُعيدت للطابور لأن
+                            # المزامنة مشغولة لا تولد نبضة جديدة في كل لفة
+                            self._next_heartbeat = now + (
+                                self._interval_seconds * self.backoff_factor()
+                            )
+                            heartbeat_in = self._next_heartbeat - now
+                            # مهمة كل الجداول المعلّقة (مثل نبضة تنتظر إعادة المحاولة) تغني عنها
+                            if ALL_TABLES not in self._pending:
+                                self._counters["heartbeats"] += 1
+                                task = SyncTask(
+                                    table=ALL_TABLES,
+                                    priority=PRIORITY_PERIODIC,
+                                    push=True,
+                                    pull=True,
+                                    reasons={"heartbeat"},
+                                    requested_at=now,
+                                )
+                                break
+                        wait_seconds = (
+                            heartbeat_in
+                            if wait_seconds is None
+                            else min(wait_seconds, heartbeat_in)
+                        )
+                    elif wait_seconds is None:
+                        # لا نبضة ولا مهام: الـ thread ينتهي ويُعاد تشغيله مع أول طلب
+                        self._worker = None
+                        return
+                    self._cond.wait(max(0.005, wait_seconds))
+                self._running_task = task
+                latency_ms = (time.monotonic() - task.requested_at) * 1000.0
+                self._latencies_ms.append(latency_ms)
+                if len(self._latencies_ms) > LATENCY_SAMPLES:
+                    del self._latencies_ms[:-LATENCY_SAMPLES]
+
+            try:
+                result = self._executor(task) or {}
+            except Exception as e:
+                logger.debug("[SyncScheduler] فشل تنفيذ مهمة %s: %s", task.table, e)
+                result = {"success": False, "reason": "error", "error": str(e)}
+
+            with self._cond:
+                self._running_task = None
+                if result.get("reason") in BUSY_REASONS and not self._stopped:
+                    # مزامنة أخرى شغالة: نعيد المهمة للطابور بعد مهلة قصيرة بدل إسقاطها
+                    self._counters["busy_retries"] += 1
+                    task.not_before = time.monotonic() + BUSY_RETRY_SECONDS
+                    existing = self._pending.get(task.table)
+                    if existing is None:
+                        self._pending[task.table] = task
+                    else:
+                        existing.merge(task.priority, task.push, task.pull, "retry")
+                        existing.requested_at = min(existing.requested_at, task.requested_at)
+                    if task.priority == PRIORITY_PERIODIC:
+                        self._idle_streak = max(0, self._idle_streak - 1)
+                    continue
+
+            self._record_result(task, result)
+            if task.table == ALL_TABLES:
+                # أي دورة لكل الجداول تُغني عن النبضة حتى الفترة التالية
+                with self._cond:
+                    self._next_heartbeat = time.monotonic() + (
+                        self._interval_seconds * self.backoff_factor()
+                    )
+
+    # ---------- المقاييس ----------
+
+    def metrics(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._cond:
+            latencies = sorted(self._latencies_ms)
+            metrics: dict[str, Any] = dict(self._counters)
+            metrics["queue_depth"] = len(self._pending)
+            metrics["queued_tables"] = sorted(self._pending)
+            metrics["running"] = self._running_task.table if self._running_task else None
+            metrics["last_latency_ms"] = round(self._latencies_ms[-1], 1) if latencies else 0.0
+            metrics["avg_latency_ms"] = (
+                round(sum(latencies) / len(latencies), 1) if latencies else 0.0
+            )
+            metrics["p95_latency_ms"] = (
+                round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1)
+                if latencies
+                else 0.0
+            )
+            metrics["heartbeat_interval_s"] = self._interval_seconds
+            metrics["idle_backoff_factor"] = self.backoff_factor()
+            metrics["next_heartbeat_in_s"] = (
+                round(max(0.0, self._next_heartbeat - now), 2) if self._heartbeat_enabled else None
+            )
+            metrics["last_full_sync_age_s"] = (
+                round(now - self._last_full_sync_mono, 1) if self._last_full_sync_mono else None
+            )
+            metrics["dirty_tables"] = sorted(t for t, s in self._states.items() if s.dirty)
+            metrics["table_last_pull_age_s"] = {
+                table: round(now - state.last_pull_mono, 1) if state.last_pull_mono else None
+                for table, state in self._states.items()
+            }
+            return metrics
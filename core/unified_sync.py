@@ -21,6 +21,15 @@ from PyQt6.QtCore import QObject, QTimer, pyqtSignal
 from core.device_identity import get_stable_device_id
 from core.logger import get_logger
 from core.sqlite_identifiers import quote_identifier, quote_identifier_list
+from core.sync_scheduler import (
+    ALL_TABLES,
+    BUSY_REASONS,
+    PRIORITY_LOCAL_CHANGE,
+    PRIORITY_PUSH,
+    PRIORITY_REMOTE_EVENT,
+    SyncScheduler,
+    SyncTask,
+)
 
 # استيراد دالة الطباعة الآمنة
 try:
@@ -50,6 +59,20 @@ DEFAULT_SYNC_PING_COOLDOWN_SECONDS = 5.0
 DEFAULT_INSTANT_SYNC_DEDUPE_MS = 900
 DEFAULT_REALTIME_PULL_DEDUPE_MS = 900
 DEFAULT_MIN_FULL_SYNC_WHEN_DELTA_ACTIVE_SECONDS = 1800
+BULK_LOOKUP_CHUNK_SIZE = 500
+BULK_APPLY_SAVEPOINT = "skywave_bulk_apply"
+DEFAULT_BULK_PUSH_ENABLED = True
+DEFAULT_BULK_PUSH_TARGET_LATENCY_MS = 400
+BULK_PUSH_MAX_BATCH = 1000
+DEFAULT_DELTA_PULL_PAGE_SIZE = 500
+DELTA_PULL_SORT = [("last_modified", 1), ("_id", 1)]
+# أعمدة كبيرة لا تُسحب مع صفحة الـ delta، وتُجلب لاحقاً للسجلات التي ستُطبق فعلاً
+PULL_DEFERRED_FIELDS = {
+    "projects": ("items", "milestones"),
+    "quotations": ("items",),
+    "invoices": ("items",),
+    "journal_entries": ("lines",),
+}
 
 
 class UnifiedSyncManagerV3(QObject):
@@ -123,6 +146,16 @@ class UnifiedSyncManagerV3(QObject):
             "failed_syncs": 0,
             "last_sync_time": None,
             "total_records_synced": 0,
+            "pull_rows_applied": 0,
+            "pull_apply_seconds": 0.0,
+            "pull_rows_per_sec": 0.0,
+            "pull_table_rows_per_sec": {},
+            "push_batch_size": DEFAULT_DELTA_PUSH_BATCH_LIMIT,
+            "push_bulk_latency_ms": 0.0,
+            "pull_bytes": 0,
+            "push_bytes": 0,
+            "pull_table_bytes": {},
+            "push_table_bytes": {},
         }
 
         # ⚡ إعدادات المزامنة التلقائية - مفعّلة للمزامنة بين الأجهزة
@@ -140,19 +173,19 @@ class UnifiedSyncManagerV3(QObject):
         self._last_realtime_pull_ms: dict[str, int] = {}
         self._queued_realtime_tables: set[str] = set()
         self._instant_sync_schedule_lock = threading.Lock()
-        self._instant_sync_pending_tables: set[str] = set()
-        self._instant_sync_worker_running = False
         self._instant_sync_dedupe_ms = DEFAULT_INSTANT_SYNC_DEDUPE_MS
         self._last_instant_sync_request_ms: dict[str, int] = {}
         self._device_id = get_stable_device_id()
         self._last_sync_ping_at: dict[str, float] = {}
         self._sync_ping_cooldown_seconds = DEFAULT_SYNC_PING_COOLDOWN_SECONDS
         self._delta_push_batch_limit = DEFAULT_DELTA_PUSH_BATCH_LIMIT
+        self._bulk_push_enabled = DEFAULT_BULK_PUSH_ENABLED
+        self._bulk_push_target_latency_ms = DEFAULT_BULK_PUSH_TARGET_LATENCY_MS
+        self._bulk_push_batch_size = DEFAULT_DELTA_PUSH_BATCH_LIMIT
+        self._delta_pull_page_size = DEFAULT_DELTA_PULL_PAGE_SIZE
         self._min_full_sync_when_delta_active_seconds = (
             DEFAULT_MIN_FULL_SYNC_WHEN_DELTA_ACTIVE_SECONDS
         )
-        self._last_delta_cycle_mono = 0.0
-        self._last_delta_change_mono = 0.0
 
         # ⚡ المؤقتات
         self._auto_sync_timer = None
@@ -160,11 +193,16 @@ class UnifiedSyncManagerV3(QObject):
         self._connection_timer = None
         self._cloud_pull_timer = None
         self._delta_pull_timer = None  # ⚡ NEW: مؤقت السحب التفاضلي
-        self._delta_thread = None
-        self._delta_thread_stop = threading.Event()
 
         self._load_sync_config()
 
+        # ⚡ طابور جدولة واحد لكل مصادر المزامنة (Delta الدورية / الفورية / الرفع / realtime)
+        self._scheduler = SyncScheduler(
+            self._execute_scheduled_sync,
+            self.TABLES,
+            interval_seconds=self._delta_sync_interval_seconds,
+        )
+
         # ⚡ Watermarks للـ Delta Sync
         self._watermarks: dict[str, str] = {}
         self._load_watermarks()
@@ -390,6 +428,22 @@ class UnifiedSyncManagerV3(QObject):
                 minimum=10,
                 maximum=500,
             )
+            self._bulk_push_batch_size = self._delta_push_batch_limit
+            self._delta_pull_page_size = self._safe_int(
+                config.get("delta_pull_page_size", DEFAULT_DELTA_PULL_PAGE_SIZE),
+                DEFAULT_DELTA_PULL_PAGE_SIZE,
+                minimum=50,
+                maximum=5000,
+            )
+            self._bulk_push_enabled = bool(
+                config.get("bulk_push_enabled", DEFAULT_BULK_PUSH_ENABLED)
+            )
+            self._bulk_push_target_latency_ms = self._safe_int(
+                config.get("bulk_push_target_latency_ms", DEFAULT_BULK_PUSH_TARGET_LATENCY_MS),
+                DEFAULT_BULK_PUSH_TARGET_LATENCY_MS,
+                minimum=50,
+                maximum=10000,
+            )
             self._instant_sync_dedupe_ms = self._safe_int(
                 config.get("instant_sync_dedupe_ms", DEFAULT_INSTANT_SYNC_DEDUPE_MS),
                 DEFAULT_INSTANT_SYNC_DEDUPE_MS,
@@ -659,20 +713,21 @@ class UnifiedSyncManagerV3(QObject):
             return sync_ping_filter
         return {"$and": [base_query, sync_ping_filter]}
 
-    def _is_newer_timestamp(self, candidate: Any, reference: Any) -> bool:
+    @classmethod
+    def _is_newer_timestamp(cls, candidate: Any, reference: Any) -> bool:
         """
         True when candidate timestamp is strictly newer than reference timestamp.
         Handles mixed datetime/string formats safely.
         """
-        candidate_iso = self._to_iso_timestamp(candidate)
-        reference_iso = self._to_iso_timestamp(reference)
+        candidate_iso = cls._to_iso_timestamp(candidate)
+        reference_iso = cls._to_iso_timestamp(reference)
         if not candidate_iso:
             return False
         if not reference_iso:
             return True
 
-        candidate_dt = self._normalize_datetime(self._parse_iso_datetime(candidate_iso))
-        reference_dt = self._normalize_datetime(self._parse_iso_datetime(reference_iso))
+        candidate_dt = cls._normalize_datetime(cls._parse_iso_datetime(candidate_iso))
+        reference_dt = cls._normalize_datetime(cls._parse_iso_datetime(reference_iso))
         if candidate_dt is not None and reference_dt is not None:
             return candidate_dt > reference_dt
         return candidate_iso > reference_iso
@@ -884,11 +939,26 @@ class UnifiedSyncManagerV3(QObject):
             unit_idx += 1
         return f"{size:.1f}{units[unit_idx]}"
 
-    def _invalidate_repository_cache(self, table_name: str | None = None) -> None:
-        """Clear repository-level caches so pulled changes become visible immediately."""
+    def _invalidate_repository_cache(
+        self, table_name: str | None = None, changed_refs: list[Any] | None = None
+    ) -> None:
+        """Clear repository-level caches so pulled changes become visible immediately.
+
+        When ``changed_refs`` (local ids) is given and the repository supports it,
+        only those rows are patched in its id-keyed caches.
+        """
         if self.repo is None:
             return
 
+        if changed_refs is not None and table_name:
+            try:
+                apply_delta = getattr(self.repo, "apply_table_cache_delta", None)
+                if callable(apply_delta):
+                    apply_delta(table_name, changed_refs)
+                    return
+            except Exception as e:
+                logger.debug("تعذر ترقيع cache للجدول %s: %s", table_name, e)
+
         try:
             if hasattr(self.repo, "invalidate_table_cache"):
                 self.repo.invalidate_table_cache(table_name)
@@ -986,10 +1056,15 @@ class UnifiedSyncManagerV3(QObject):
             return table
         return "__all__"
 
+    @property
+    def _instant_sync_worker_running(self) -> bool:
+        """Whether the scheduler still has queued or running sync work."""
+        return self._scheduler.is_busy()
+
     def schedule_instant_sync(self, table: str | None = None) -> bool:
         """
         Schedule a non-blocking instant sync cycle.
-        Uses lightweight delta cycle (push+pull) with burst dedupe to avoid UI freezes.
+        Local changes get the highest scheduler priority; bursts merge into one task.
         """
         if self._shutdown:
             return False
@@ -1002,80 +1077,36 @@ class UnifiedSyncManagerV3(QObject):
             if (now_ms - last_ms) < self._instant_sync_dedupe_ms:
                 return False
             self._last_instant_sync_request_ms[table_key] = now_ms
-            self._instant_sync_pending_tables.add(table_key)
-
-            if self._instant_sync_worker_running:
-                return True
-            self._instant_sync_worker_running = True
 
-        threading.Thread(
-            target=self._instant_sync_worker_loop,
-            daemon=True,
-            name="unified-instant-sync",
-        ).start()
+        self._scheduler.request(
+            None if table_key == ALL_TABLES else table_key,
+            priority=PRIORITY_LOCAL_CHANGE,
+            reason="local_change",
+        )
         return True
 
-    def _instant_sync_worker_loop(self):
-        """Drain scheduled instant-sync requests in background without blocking UI thread."""
-        try:
-            # Short batching window to collapse rapid CRUD bursts into one cycle.
-            time.sleep(0.06)
-            while not self._shutdown:
-                with self._instant_sync_schedule_lock:
-                    pending = set(self._instant_sync_pending_tables)
-                    self._instant_sync_pending_tables.clear()
-
-                if not pending:
-                    break
-
-                if not self.is_online:
-                    # Offline mode: skip immediate cycle; periodic sync will recover on reconnect.
-                    continue
-
-                specific_tables = sorted(t for t in pending if t in self.TABLES)
-                run_full_cycle = (
-                    "__all__" in pending or not specific_tables or len(specific_tables) > 3
-                )
-                busy = False
-
-                if run_full_cycle:
-                    result = self._run_delta_cycle()
-                    busy = result.get("reason") in {"delta_busy", "full_sync_in_progress"}
-                else:
-                    for table_name in specific_tables:
-                        result = self._run_table_reconcile_cycle(table_name)
-                        # Fallback for lightweight test repositories that do not expose
-                        # full table-reconcile dependencies.
-                        if not result.get("success", False) and result.get("reason") not in {
-                            "delta_busy",
-                            "full_sync_in_progress",
-                        }:
-                            result = self._run_delta_cycle()
-                        if result.get("reason") in {"delta_busy", "full_sync_in_progress"}:
-                            busy = True
-                            break
-
-                if busy:
-                    with self._instant_sync_schedule_lock:
-                        self._instant_sync_pending_tables.update(pending)
-                    time.sleep(0.15)
-                    continue
+    def _execute_scheduled_sync(self, task: SyncTask) -> dict[str, Any]:
+        """تنفيذ مهمة من طابور الجدولة (دورة واحدة في كل مرة على thread الجدولة)."""
+        if self._shutdown:
+            return {"success": False, "reason": "shutdown"}
+        if self._is_syncing:
+            return {"success": False, "reason": "full_sync_in_progress"}
+        if not self.is_online:
+            # Offline mode: periodic heartbeat recovers on reconnect.
+            return {"success": False, "reason": "offline"}
 
-                # Keep loop cooperative and allow new pending requests to be batched.
-                time.sleep(0.02)
-        finally:
-            restart_worker = False
-            with self._instant_sync_schedule_lock:
-                self._instant_sync_worker_running = False
-                if self._instant_sync_pending_tables and not self._shutdown:
-                    self._instant_sync_worker_running = True
-                    restart_worker = True
-            if restart_worker:
-                threading.Thread(
-                    target=self._instant_sync_worker_loop,
-                    daemon=True,
-                    name="unified-instant-sync",
-                ).start()
+        table = None if task.table == ALL_TABLES else task.table
+        if not task.pull:
+            return self._run_push_cycle({table} if table else None)
+        if table is None:
+            return self._run_delta_cycle()
+
+        result = self._run_table_reconcile_cycle(table)
+        # Fallback for lightweight test repositories that do not expose
+        # full table-reconcile dependencies.
+        if not result.get("success", False) and result.get("reason") not in BUSY_REASONS:
+            result = self._run_delta_cycle()
+        return result
 
     # ==========================================
     # 🚀 المزامنة الفورية - Real-time Sync
@@ -1306,12 +1337,9 @@ class UnifiedSyncManagerV3(QObject):
             pass
 
         try:
-            if self._delta_thread and self._delta_thread.is_alive():
-                self._delta_thread_stop.set()
-                self._delta_thread.join(timeout=0.5)
+            self._scheduler.stop(timeout=0.5)
         except Exception:
             pass
-        self._delta_thread = None
 
         deadline = time.monotonic() + 1.0
         while time.monotonic() < deadline:
@@ -1423,32 +1451,18 @@ class UnifiedSyncManagerV3(QObject):
         if self._shutdown or self._is_syncing or not self.is_online:
             return
 
-        if self._delta_sync_interval_seconds <= 10:
-            now_mono = time.monotonic()
-            delta_is_active = (now_mono - self._last_delta_cycle_mono) <= max(
-                40.0, float(self._delta_sync_interval_seconds) * 6.0
-            )
-            if delta_is_active and self._last_full_sync_at:
-                age_seconds = max(0.0, (datetime.now() - self._last_full_sync_at).total_seconds())
-                if age_seconds < float(self._min_full_sync_when_delta_active_seconds):
-                    logger.debug(
-                        "⏭️ skip periodic full sync while delta is healthy | age=%.1fs threshold=%ss",
-                        age_seconds,
-                        self._min_full_sync_when_delta_active_seconds,
-                    )
-                    return
-
-        self._run_full_sync_async()
+        # الفحص يتم في thread الخلفية: تُتخطى المزامنة الكاملة لو أثبتت الـ Delta الاتساق
+        self._run_full_sync_async(source="periodic")
 
     def _quick_push_changes(self):
-        """⚡ رفع التغييرات المحلية بسرعة"""
+        """⚡ رفع التغييرات المحلية بسرعة (عبر طابور الجدولة)"""
         if self._shutdown or self._is_syncing or not self.is_online:
             return
 
         try:
             # ⚡ إنشاء cursor جديد لتجنب Recursive cursor error
             cursor = self.repo.get_cursor()
-            has_pending = False
+            pending_tables: set[str] = set()
 
             try:
                 for table in self.TABLES:
@@ -1458,27 +1472,17 @@ class UnifiedSyncManagerV3(QObject):
                         cursor.execute(pending_count_sql)
                         count = cursor.fetchone()[0]
                         if count > 0:
-                            has_pending = True
-                            break
+                            pending_tables.add(table)
                     except Exception:
                         # فشل فحص العنصر
                         pass
             finally:
                 cursor.close()  # ⚡ إغلاق الـ cursor
 
-            if has_pending:
-
-                def push_thread():
-                    if self._shutdown:
-                        return
-                    try:
-                        with self._lock:
-                            self._push_pending_changes()
-                        logger.debug("⚡ تم رفع التغييرات المحلية")
-                    except Exception as e:
-                        logger.error("❌ فشل رفع التغييرات: %s", e)
-
-                threading.Thread(target=push_thread, daemon=True).start()
+            for table in sorted(pending_tables):
+                self._scheduler.request(
+                    table, push=True, pull=False, priority=PRIORITY_PUSH, reason="quick_push"
+                )
 
         except Exception as e:
             logger.debug("خطأ في فحص التغييرات: %s", e)
@@ -1550,6 +1554,10 @@ class UnifiedSyncManagerV3(QObject):
             if self._shutdown:
                 return
             try:
+                if source == "periodic" and self._delta_proves_consistency():
+                    self._scheduler.note_full_sync_skipped()
+                    logger.debug("⏭️ skip periodic full sync: delta sync proves consistency")
+                    return
                 result = self.full_sync_from_cloud()
                 if source == "initial":
                     if result.get("success"):
@@ -1579,7 +1587,56 @@ class UnifiedSyncManagerV3(QObject):
         if self._last_full_sync_at:
             if (datetime.now() - self._last_full_sync_at).total_seconds() < 30:
                 return
-        self._run_full_sync_async()
+        self._run_full_sync_async(source="periodic")
+
+    def _delta_proves_consistency(self) -> bool:
+        """
+        الـ Delta تكفي لو كل جدول سُحب بنجاح مؤخراً بدون تغييرات محلية معلقة، وعدد
+        السجلات النشطة محلياً يطابق السحابة (الحذف النهائي في السحابة لا يظهر في الـ Delta).
+        """
+        if not self._scheduler.delta_is_consistent(
+            float(self._min_full_sync_when_delta_active_seconds)
+        ):
+            return False
+        return self._local_counts_match_remote()
+
+    def _local_counts_match_remote(self) -> bool:
+        if self.repo is None or self.repo.mongo_db is None:
+            return False
+        try:
+            cursor = self.repo.get_cursor()
+        except Exception:
+            return False
+        try:
+            for table in self.TABLES:
+                # الإشعارات لها فلترة وتنظيف خاص أثناء السحب
+                if table == "notifications" or not self._sqlite_table_exists(cursor, table):
+                    continue
+                table_columns = self._sqlite_table_columns(cursor, table)
+                if "_mongo_id" not in table_columns:
+                    return False
+                active_sql = f"SELECT COUNT(*) FROM {self._sqlite_table_ref(table)} WHERE _mongo_id IS NOT NULL AND TRIM(_mongo_id) != ''"  # nosec B608
+                if "is_deleted" in table_columns:
+                    active_sql += " AND COALESCE(is_deleted, 0) = 0"
+                cursor.execute(active_sql)
+                local_count = int(cursor.fetchone()[0] or 0)
+                remote_count = int(
+                    self.repo.mongo_db[table].count_documents({"is_deleted": {"$ne": True}})
+                )
+                if local_count != remote_count:
+                    logger.debug(
+                        "Delta لا تثبت اتساق %s: محلي=%s سحابة=%s",
+                        table,
+                        local_count,
+                        remote_count,
+                    )
+                    return False
+            return True
+        except Exception as e:
+            logger.debug("تعذر مطابقة أعداد السجلات مع السحابة: %s", e)
+            return False
+        finally:
+            cursor.close()
 
     def full_sync_from_cloud(self) -> dict[str, Any]:
         """
@@ -1642,6 +1699,9 @@ class UnifiedSyncManagerV3(QObject):
 
             logger.info("✅ اكتملت المزامنة: %s سجل", results["total_synced"])
             self._update_sync_metrics(success=True, records_synced=results["total_synced"])
+            self._scheduler.mark_full_sync(
+                not any("error" in stats for stats in results["tables"].values())
+            )
             self.sync_completed.emit(results)
 
             # ⚡ إعادة حساب أرصدة الحسابات النقدية بعد المزامنة
@@ -1675,6 +1735,7 @@ class UnifiedSyncManagerV3(QObject):
             results["success"] = False
             results["error"] = str(e)
             self._update_sync_metrics(success=False, records_synced=0)
+            self._scheduler.mark_full_sync(False)
             self.sync_error.emit(str(e))
 
         finally:
@@ -1746,6 +1807,8 @@ class UnifiedSyncManagerV3(QObject):
                 logo_clients = 0
                 logo_payload_bytes = 0
 
+                apply_started = time.perf_counter()
+                prepared: list[tuple[str, Any, bool, dict[str, Any]]] = []
                 for i, cloud_item in enumerate(cloud_data):
                     self.sync_progress.emit(table_name, i + 1, len(cloud_data))
 
@@ -1773,19 +1836,70 @@ class UnifiedSyncManagerV3(QObject):
                             if isinstance(raw_logo, str):
                                 logo_payload_bytes += len(raw_logo.encode("utf-8"))
 
-                    # البحث عن السجل المحلي
-                    local_id = self._find_local_record(
-                        cursor, table_name, mongo_id, unique_field, unique_value, table_columns
-                    )
-
                     # تصفية الحقول
                     filtered = {k: v for k, v in item_data.items() if k in table_columns}
+                    prepared.append((mongo_id, unique_value, remote_is_deleted, filtered))
+
+                # ⚡ جلب الصفوف المحلية المطابقة مرة واحدة بدل استعلام لكل سجل
+                compare_columns = sorted({col for *_, filtered in prepared for col in filtered})
+                local_rows = self._prefetch_local_rows_by_mongo_id(
+                    cursor,
+                    table_name,
+                    (item[0] for item in prepared),
+                    ["id", "sync_status", "is_deleted", *compare_columns],
+                )
+                known_unique_values: set = set()
+                if table_name != "notifications":
+                    known_unique_values = self._prefetch_existing_values(
+                        cursor,
+                        table_name,
+                        unique_field,
+                        (item[1] for item in prepared if item[0] not in local_rows),
+                        table_columns,
+                    )
+                duplicate_index = self._build_insert_duplicate_index(cursor, table_name)
+
+                pending_updates: dict[int, dict[str, Any]] = {}
+                pending_inserts: list[dict[str, Any]] = []
+                pending_unique_values: set = set()
+
+                def flush_pending() -> None:
+                    self._flush_pending_updates(cursor, table_name, pending_updates)
+                    self._flush_pending_inserts(
+                        cursor,
+                        table_name,
+                        pending_inserts,
+                        row_fallback=lambda data: self._insert_record(cursor, table_name, data),
+                    )
+                    known_unique_values.update(pending_unique_values)
+                    pending_unique_values.clear()
+
+                for mongo_id, unique_value, remote_is_deleted, filtered in prepared:
+                    local_row = local_rows.get(mongo_id)
+                    local_id = local_row["id"] if local_row else None
+                    if (
+                        local_id is None
+                        and unique_value
+                        and (
+                            unique_value in known_unique_values
+                            or unique_value in pending_unique_values
+                        )
+                    ):
+                        # ربط بالحقل الفريد (نادر) - نطبّق المعلّق أولاً ثم المسار الفردي الأصلي
+                        flush_pending()
+                        local_id = self._find_local_record(
+                            cursor, table_name, mongo_id, unique_field, unique_value, table_columns
+                        )
 
                     if local_id:
                         if not remote_is_deleted:
-                            local_sync_status, local_is_deleted = self._get_local_sync_state(
-                                cursor, table_name, local_id
-                            )
+                            if local_row is not None:
+                                local_sync_status = str(local_row.get("sync_status") or "").lower()
+                                local_is_deleted = bool(local_row.get("is_deleted"))
+                            else:
+                                local_sync_status, local_is_deleted = self._get_local_sync_state(
+                                    cursor, table_name, local_id
+                                )
                             if local_is_deleted or local_sync_status == "deleted":
                                 logger.debug(
                                     "⏭️ skip resurrecting locally deleted row %s/%s during cloud sync",
@@ -1794,21 +1908,51 @@ class UnifiedSyncManagerV3(QObject):
                                 )
                                 continue
                         # تحديث السجل فقط عند وجود فرق حقيقي لتقليل الحمل على SQLite والواجهة.
-                        if self._should_update_local_record(cursor, table_name, local_id, filtered):
-                            self._update_record(cursor, table_name, local_id, filtered)
+                        if local_row is not None:
+                            needs_update = any(
+                                not self._values_equal_for_sync(local_row.get(col), value)
+                                for col, value in filtered.items()
+                            )
+                        else:
+                            needs_update = self._should_update_local_record(
+                                cursor, table_name, local_id, filtered
+                            )
+                        if needs_update:
+                            pending_updates.setdefault(local_id, {}).update(filtered)
                             stats["updated"] += 1
                             stats["synced"] += 1
-                    else:
-                        # إدراج سجل جديد
+                        continue
+
+                    # إدراج سجل جديد (مع فحص تكرار الدفعات/المصروفات من الفهرس المجهّز مسبقاً)
+                    probe = self._insert_duplicate_probe(table_name, filtered)
+                    duplicate = self._match_insert_duplicate(duplicate_index, table_name, probe)
+                    if duplicate is not None and duplicate[0] is not None:
+                        pending_updates.setdefault(duplicate[0], {}).update(filtered)
+                    elif duplicate is not None:
+                        flush_pending()
                         self._insert_record(cursor, table_name, filtered)
-                        stats["inserted"] += 1
-                        stats["synced"] += 1
+                    else:
+                        pending_inserts.append(filtered)
+                        if unique_value and table_name != "notifications":
+                            pending_unique_values.add(unique_value)
+                        if probe is not None and duplicate_index is not None:
+                            group_key, amount_value, _date_short, extra = probe
+                            duplicate_index.setdefault(group_key, []).append(
+                                [None, amount_value, str(filtered.get("date") or ""), extra]
+                            )
+                    stats["inserted"] += 1
+                    stats["synced"] += 1
+
+                flush_pending()
 
                 # حذف السجلات المحلية غير الموجودة في السحابة
                 deleted = self._delete_orphan_records(cursor, table_name, cloud_mongo_ids)
                 stats["deleted"] = deleted
 
                 conn.commit()
+                self._record_pull_throughput(
+                    table_name, len(prepared), time.perf_counter() - apply_started
+                )
                 if stats["inserted"] > 0 or stats["updated"] > 0 or stats["deleted"] > 0:
                     self._invalidate_repository_cache(table_name)
                 if stats["inserted"] > 0 or stats["updated"] > 0 or stats["deleted"] > 0:
@@ -1854,6 +1998,54 @@ class UnifiedSyncManagerV3(QObject):
 
         return stats
 
+    def _record_pull_throughput(self, table_name: str, rows: int, seconds: float) -> None:
+        """Accumulate bulk-apply throughput (rows/sec) for pulled cloud rows."""
+        if rows <= 0:
+            return
+        try:
+            elapsed = max(float(seconds), 1e-6)
+            with self._sync_metrics_lock:
+                metrics = self._sync_metrics
+                metrics["pull_rows_applied"] += int(rows)
+                metrics["pull_apply_seconds"] += elapsed
+                metrics["pull_rows_per_sec"] = round(
+                    metrics["pull_rows_applied"] / max(metrics["pull_apply_seconds"], 1e-6), 1
+                )
+                metrics["pull_table_rows_per_sec"][table_name] = round(rows / elapsed, 1)
+        except Exception:
+            # Metrics are non-critical.
+            pass
+
+    @staticmethod
+    def _document_wire_bytes(documents) -> int:
+        """BSON payload size of the given documents (before wire compression)."""
+        try:
+            from bson import encode as bson_encode
+        except ImportError:
+            bson_encode = None
+        total = 0
+        for document in documents:
+            try:
+                total += len(bson_encode(document))
+            except Exception:
+                total += len(json.dumps(document, default=str, ensure_ascii=False).encode("utf-8"))
+        return total
+
+    def _record_wire_bytes(self, direction: str, table_name: str, documents) -> None:
+        """Accumulate per-table pulled/pushed payload bytes for get_sync_metrics()."""
+        try:
+            size = self._document_wire_bytes(documents)
+            if size <= 0:
+                return
+            with self._sync_metrics_lock:
+                metrics = self._sync_metrics
+                metrics[f"{direction}_bytes"] += size
+                table_bytes = metrics[f"{direction}_table_bytes"]
+                table_bytes[table_name] = table_bytes.get(table_name, 0) + size
+        except Exception:
+            # Metrics are non-critical.
+            pass
+
     def _find_local_record(
         self,
         cursor,
@@ -1886,7 +2078,9 @@ class UnifiedSyncManagerV3(QObject):
             # 2. البحث بالحقل الفريد - وتحديث الـ mongo_id
             if unique_value and unique_field in table_columns:
                 unique_field_ref = self._sqlite_column_ref(unique_field, allowed=table_columns)
-                unique_lookup_sql = f"SELECT id, _mongo_id FROM {table_ref} WHERE {unique_field_ref} = ?"  # nosec B608
+                unique_lookup_sql = (
+                    f"SELECT id, _mongo_id FROM {table_ref} WHERE {unique_field_ref} = ?"  # nosec B608
+                )
                 cursor.execute(
                     unique_lookup_sql,
                     (unique_value,),
@@ -1927,9 +2121,7 @@ class UnifiedSyncManagerV3(QObject):
 
                     # ⚡ إصلاح: تحديث الـ mongo_id إذا كان مختلف (للجداول الأخرى)
                     if existing_mongo_id != mongo_id:
-                        update_mongo_id_sql = (
-                            f"UPDATE {table_ref} SET _mongo_id = ? WHERE id = ?"  # nosec B608
-                        )
+                        update_mongo_id_sql = f"UPDATE {table_ref} SET _mongo_id = ? WHERE id = ?"  # nosec B608
                         cursor.execute(
                             update_mongo_id_sql,
                             (mongo_id, local_id),
@@ -1943,9 +2135,7 @@ class UnifiedSyncManagerV3(QObject):
     def _get_local_sync_state(self, cursor, table_name: str, local_id: int) -> tuple[str, bool]:
         try:
             table_ref = self._sqlite_table_ref(table_name)
-            state_lookup_sql = (
-                f"SELECT sync_status, is_deleted FROM {table_ref} WHERE id = ?"  # nosec B608
-            )
+            state_lookup_sql = f"SELECT sync_status, is_deleted FROM {table_ref} WHERE id = ?"  # nosec B608
             cursor.execute(state_lookup_sql, (local_id,))
             row = cursor.fetchone()
             if not row:
@@ -1964,9 +2154,7 @@ class UnifiedSyncManagerV3(QObject):
 
         # جلب السجلات المحلية التي لها _mongo_id
         table_ref = self._sqlite_table_ref(table_name)
-        local_records_sql = (
-            f"SELECT id, _mongo_id FROM {table_ref} WHERE _mongo_id IS NOT NULL"  # nosec B608
-        )
+        local_records_sql = f"SELECT id, _mongo_id FROM {table_ref} WHERE _mongo_id IS NOT NULL"  # nosec B608
         cursor.execute(local_records_sql)
         local_records = cursor.fetchall()
 
@@ -1983,6 +2171,13 @@ class UnifiedSyncManagerV3(QObject):
 
         return deleted
 
+    def prepare_remote_document(self, document: dict, table_name: str) -> dict | None:
+        """تحضير مستند سحابي للكتابة محلياً (يستخدمه realtime لتطبيق fullDocument مباشرة)."""
+        item = self._prepare_cloud_data(document, table_name=table_name)
+        if item.pop("__skip_sync__", False):
+            return None
+        return item
+
     def _prepare_cloud_data(self, data: dict, table_name: str | None = None) -> dict:
         """تحضير بيانات السحابة للحفظ محلياً."""
         item = dict(data)
@@ -2002,6 +2197,11 @@ class UnifiedSyncManagerV3(QObject):
             else:
                 item["logo_last_synced"] = None
 
+            # ⚡ الصف المحلي يحمل بصمة الصورة فقط؛ الصورة نفسها في مخزن blobs (مرة لكل بصمة)
+            logo_hash = str(data.get("logo_hash") or "").strip() if has_logo else ""
+            item["logo_hash"] = logo_hash or None
+            store_logo = getattr(self.repo, "store_client_logo", None)
+
             if self._lazy_logo_enabled:
                 # Lazy mode: keep metadata only and avoid writing heavy blob in normal pulls/full sync.
                 item.pop("logo_data", None)
@@ -2014,7 +2214,12 @@ class UnifiedSyncManagerV3(QObject):
                         len(str(raw_logo)),
                     )
             elif raw_logo:
-                item["logo_data"] = raw_logo
+                stored_hash = store_logo(raw_logo) if callable(store_logo) else None
+                if isinstance(stored_hash, str) and stored_hash:
+                    item["logo_hash"] = stored_hash
+                    item["logo_data"] = None
+                else:
+                    item["logo_data"] = raw_logo
                 logger.debug(
                     "📷 [%s] logo_data payload synced (%s chars)",
                     data.get("name", "غير معروف"),
@@ -2238,9 +2443,7 @@ class UnifiedSyncManagerV3(QObject):
         placeholders = ", ".join(["?" for _ in data])
 
         try:
-            insert_sql = (
-                f"INSERT INTO {table_ref} ({columns}) VALUES ({placeholders})"  # nosec B608
-            )
+            insert_sql = f"INSERT INTO {table_ref} ({columns}) VALUES ({placeholders})"  # nosec B608
             cursor.execute(insert_sql, list(data.values()))
         except Exception as e:
             # في حالة UNIQUE constraint - نحاول التحديث بدلاً من الإدراج
@@ -2271,9 +2474,7 @@ class UnifiedSyncManagerV3(QObject):
                 # محاولة البحث بـ mongo_id
                 if mongo_id:
                     try:
-                        mongo_lookup_sql = (
-                            f"SELECT id FROM {table_ref} WHERE _mongo_id = ?"  # nosec B608
-                        )
+                        mongo_lookup_sql = f"SELECT id FROM {table_ref} WHERE _mongo_id = ?"  # nosec B608
                         cursor.execute(mongo_lookup_sql, (mongo_id,))
                         row = cursor.fetchone()
                         if row:
@@ -2287,6 +2488,242 @@ class UnifiedSyncManagerV3(QObject):
             else:
                 raise
 
+    def _prefetch_local_rows_by_mongo_id(
+        self, cursor, table_name: str, mongo_ids, columns: list[str]
+    ) -> dict[str, dict[str, Any]]:
+        """⚡ جلب الصفوف المحلية لكل الـ _mongo_id الواردة باستعلامات IN مجمّعة."""
+        ids = list(dict.fromkeys(str(mongo_id) for mongo_id in mongo_ids if mongo_id))
+        if not ids:
+            return {}
+
+        table_ref = self._sqlite_table_ref(table_name)
+        table_columns = self._sqlite_table_columns(cursor, table_name)
+        selected = list(dict.fromkeys(["_mongo_id", *columns]))
+        select_clause = self._sqlite_column_list_sql(selected, table_columns=table_columns)
+        rows_by_mongo_id: dict[str, dict[str, Any]] = {}
+        for start in range(0, len(ids), BULK_LOOKUP_CHUNK_SIZE):
+            chunk = ids[start : start + BULK_LOOKUP_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            lookup_sql = f"SELECT {select_clause} FROM {table_ref} WHERE _mongo_id IN ({placeholders}) ORDER BY id"  # nosec B608
+            cursor.execute(lookup_sql, chunk)
+            for row in cursor.fetchall():
+                row_map = dict(zip(selected, tuple(row), strict=False))
+                rows_by_mongo_id.setdefault(str(row_map["_mongo_id"]), row_map)
+        return rows_by_mongo_id
+
+    def _prefetch_existing_values(
+        self, cursor, table_name: str, column: str, values, table_columns: set
+    ) -> set:
+        """⚡ القيم الموجودة محلياً من عمود معيّن (للربط بالحقل الفريد) باستعلامات مجمّعة."""
+        candidates = list(dict.fromkeys(value for value in values if value))
+        if not candidates or column not in table_columns:
+            return set()
+
+        table_ref = self._sqlite_table_ref(table_name)
+        column_ref = self._sqlite_column_ref(column, allowed=table_columns)
+        existing: set = set()
+        for start in range(0, len(candidates), BULK_LOOKUP_CHUNK_SIZE):
+            chunk = candidates[start : start + BULK_LOOKUP_CHUNK_SIZE]
+            placeholders = ", ".join("?" for _ in chunk)
+            lookup_sql = (
+                f"SELECT {column_ref} FROM {table_ref} WHERE {column_ref} IN ({placeholders})"  # nosec B608
+            )
+            cursor.execute(lookup_sql, chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+        return existing
+
+    @staticmethod
+    def _normalize_duplicate_text(value: Any) -> str:
+        return " ".join(str(value or "").split()).strip().casefold()
+
+    def _insert_duplicate_probe(self, table_name: str, data: dict) -> tuple | None:
+        """
+        مفتاح فحص التكرار الذي يطبقه _insert_record للدفعات والمصروفات.
+        يرجع (group_key, amount, date_prefix, extra) أو None لو الفحص لا ينطبق.
+        """
+        date = data.get("date", "")
+        date_short = str(date)[:10] if date else ""
+        if table_name == "payments":
+            project_id = data.get("project_id")
+            amount = data.get("amount", 0)
+            if not (project_id and amount):
+                return None
+            try:
+                amount_value = float(amount)
+            except (TypeError, ValueError):
+                return None
+            return (str(project_id), amount_value, date_short, None)
+
+        if table_name == "expenses":
+            project_id = str(data.get("project_id") or "").strip()
+            try:
+                amount_value = round(float(data.get("amount", 0) or 0.0), 2)
+            except (TypeError, ValueError):
+                amount_value = 0.0
+            if not (project_id and amount_value):
+                return None
+            account_id = str(data.get("account_id") or "").strip()
+            payment_account_id = str(data.get("payment_account_id") or account_id).strip()
+            extra = (
+                self._normalize_duplicate_text(data.get("category")),
+                self._normalize_duplicate_text(data.get("description")),
+            )
+            return ((project_id, account_id, payment_account_id), amount_value, date_short, extra)
+
+        return None
+
+    def _build_insert_duplicate_index(self, cursor, table_name: str) -> dict | None:
+        """
+        ⚡ فهرس توقيعات الدفعات/المصروفات المحلية مرة واحدة لكل جدول،
+        بدل استعلام SQLite لكل سجل جديد داخل _insert_record.
+        """
+        if table_name == "payments":
+            cursor.execute("SELECT id, project_id, amount, date FROM payments ORDER BY id ASC")
+        elif table_name == "expenses":
+            cursor.execute(
+                """
+                SELECT id, project_id, amount, date, account_id, payment_account_id,
+                       category, description
+                FROM expenses
+                ORDER BY id ASC
+                """
+            )
+        else:
+            return None
+
+        index: dict[Any, list[list[Any]]] = {}
+        for row in cursor.fetchall():
+            values = tuple(row)
+            try:
+                amount_value = float(values[2] or 0.0)
+            except (TypeError, ValueError):
+                continue
+            date_text = str(values[3] or "")
+            if table_name == "payments":
+                group_key: Any = str(values[1] or "")
+                extra = None
+            else:
+                group_key = (str(values[1] or ""), str(values[4] or ""), str(values[5] or ""))
+                extra = (
+                    self._normalize_duplicate_text(values[6]),
+                    self._normalize_duplicate_text(values[7]),
+                )
+            index.setdefault(group_key, []).append([values[0], amount_value, date_text, extra])
+        return index
+
+    @staticmethod
+    def _match_insert_duplicate(
+        index: dict | None, table_name: str, probe: tuple | None
+    ) -> list[Any] | None:
+        """إرجاع مدخل الفهرس المطابق (id قد يكون None لسجل لم يُكتب بعد)."""
+        if index is None or probe is None:
+            return None
+        group_key, amount_value, date_short, extra = probe
+        for entry in index.get(group_key, ()):
+            _entry_id, entry_amount, entry_date, entry_extra = entry
+            if not entry_date.startswith(date_short):
+                continue
+            if table_name == "payments":
+                if entry_amount == amount_value:
+                    return entry
+            elif abs(entry_amount - amount_value) <= 0.01 + 1e-9 and entry_extra == extra:
+                return entry
+        return None
+
+    def _ensure_bulk_transaction(self, cursor) -> None:
+        conn = getattr(self.repo, "sqlite_conn", None)
+        if conn is not None and not conn.in_transaction:
+            cursor.execute("BEGIN")
+
+    def _execute_batched(self, cursor, sql: str, rows: list[list[Any]], row_fallback=None) -> int:
+        """
+        ⚡ executemany داخل savepoint واحد.
+        لو فشلت الدفعة يُتراجع عنها وتُطبّق الصفوف فردياً (row_fallback) حتى لا يُسقط
+        سجل واحد معطوب بقية الجدول. ترجع عدد الصفوف التي فشلت.
+        """
+        if not rows:
+            return 0
+
+        self._ensure_bulk_transaction(cursor)
+        cursor.execute(f"SAVEPOINT {BULK_APPLY_SAVEPOINT}")
+        try:
+            cursor.executemany(sql, rows)
+        except Exception as batch_error:
+            cursor.execute(f"ROLLBACK TO {BULK_APPLY_SAVEPOINT}")
+            cursor.execute(f"RELEASE {BULK_APPLY_SAVEPOINT}")
+            logger.debug(
+                "فشل التطبيق المجمّع (%s صف) - رجوع للتطبيق الفردي: %s", len(rows), batch_error
+            )
+            failed = 0
+            for index, values in enumerate(rows):
+                try:
+                    if row_fallback is not None:
+                        row_fallback(index)
+                    else:
+                        cursor.execute(sql, values)
+                except Exception as row_error:
+                    failed += 1
+                    logger.debug("فشل تطبيق سجل فردي: %s", row_error)
+            return failed
+
+        cursor.execute(f"RELEASE {BULK_APPLY_SAVEPOINT}")
+        return 0
+
+    def _flush_pending_updates(self, cursor, table_name: str, updates: dict[int, dict]) -> int:
+        """تطبيق التحديثات المعلّقة بـ executemany لكل مجموعة أعمدة. ترجع عدد الفاشل."""
+        if not updates:
+            return 0
+
+        table_ref = self._sqlite_table_ref(table_name)
+        table_columns = self._sqlite_table_columns(cursor, table_name)
+        groups: dict[tuple[str, ...], list[list[Any]]] = {}
+        for local_id, data in updates.items():
+            if not data:
+                continue
+            columns = tuple(sorted(data))
+            groups.setdefault(columns, []).append([data[col] for col in columns] + [local_id])
+        updates.clear()
+
+        failed = 0
+        for columns, rows in groups.items():
+            set_clause = self._sqlite_set_clause_sql(list(columns), table_columns=table_columns)
+            update_sql = f"UPDATE {table_ref} SET {set_clause} WHERE id = ?"  # nosec B608
+            failed += self._execute_batched(cursor, update_sql, rows)
+        return failed
+
+    def _flush_pending_inserts(
+        self, cursor, table_name: str, inserts: list[dict], row_fallback=None
+    ) -> int:
+        """
+        تطبيق الإدراجات المعلّقة بـ executemany لكل مجموعة أعمدة.
+        row_fallback(data) يُستخدم لو فشلت الدفعة (مثلاً _insert_record لمعالجة UNIQUE).
+        """
+        if not inserts:
+            return 0
+
+        table_ref = self._sqlite_table_ref(table_name)
+        table_columns = self._sqlite_table_columns(cursor, table_name)
+        groups: dict[tuple[str, ...], list[dict]] = {}
+        for data in inserts:
+            if data:
+                groups.setdefault(tuple(sorted(data)), []).append(data)
+        inserts.clear()
+
+        failed = 0
+        for columns, datas in groups.items():
+            cols = self._sqlite_column_list_sql(list(columns), table_columns=table_columns)
+            placeholders = ", ".join("?" for _ in columns)
+            insert_sql = f"INSERT INTO {table_ref} ({cols}) VALUES ({placeholders})"  # nosec B608
+            rows = [[data[col] for col in columns] for data in datas]
+            fallback = None
+            if row_fallback is not None:
+
+                def fallback(index: int, _datas=datas):
+                    row_fallback(_datas[index])
+
+            failed += self._execute_batched(cursor, insert_sql, rows, row_fallback=fallback)
+        return failed
+
     def _push_pending_changes(self):
         """
         رفع التغييرات المحلية المعلقة للسحابة قبل السحب
@@ -2323,6 +2760,18 @@ class UnifiedSyncManagerV3(QObject):
         except Exception as e:
             logger.error("❌ خطأ في رفع %s: %s", table_name, e)
 
+    def _push_logo_blobs_for(self, table: str, clean_records) -> None:
+        """⚡ العملاء: رفع الصور المشار إليها (مرة لكل بصمة) قبل الوثائق التي تحمل البصمة."""
+        if table != "clients":
+            return
+        push_blobs = getattr(self.repo, "push_logo_blobs", None)
+        if not callable(push_blobs):
+            return
+        try:
+            push_blobs([record.get("logo_hash") for record in clean_records])
+        except Exception as e:
+            logger.debug("تعذر رفع صور العملاء: %s", e)
+
     def _prepare_data_for_cloud(self, data: dict) -> dict:
         """تحضير البيانات للرفع للسحابة"""
         clean = {k: v for k, v in data.items() if k not in ["id", "_mongo_id", "sync_status"]}
@@ -2330,10 +2779,14 @@ class UnifiedSyncManagerV3(QObject):
         # ⚡ التعامل مع logo_data
         # إذا كان logo_data فارغ و logo_path فارغ = المستخدم حذف الصورة صراحة
         # إذا كان logo_data فارغ و logo_path موجود = لا نريد الكتابة فوق السحابة
+        # ⚡ الوثيقة تحمل بصمة الصورة فقط؛ الصورة نفسها تُرفع مرة لكل بصمة لـ logo_blobs
+        if clean.get("logo_hash"):
+            self._push_logo_blobs_for("clients", [clean])
+            clean["logo_data"] = None
         logo_data_value = clean.get("logo_data", None)
         logo_path_value = clean.get("logo_path", None)
 
-        if "logo_data" in clean:
+        if "logo_data" in clean and not clean.get("logo_hash"):
             if logo_data_value:
                 # صورة جديدة - رفعها للسحابة
                 logger.debug("📷 رفع logo_data (%s حرف) للسحابة", len(logo_data_value))
@@ -2631,7 +3084,9 @@ class UnifiedSyncManagerV3(QObject):
                         keep_id = dup[2]
 
                         # حذف التكرارات (الاحتفاظ بالأقدم)
-                        delete_duplicates_sql = f"DELETE FROM {table_ref} WHERE {unique_field_ref} = ? AND id != ?"  # nosec B608
+                        delete_duplicates_sql = (
+                            f"DELETE FROM {table_ref} WHERE {unique_field_ref} = ? AND id != ?"  # nosec B608
+                        )
                         cursor.execute(delete_duplicates_sql, (unique_value, keep_id))
                         deleted += cursor.rowcount
 
@@ -2749,7 +3204,14 @@ class UnifiedSyncManagerV3(QObject):
     def get_sync_metrics(self) -> dict[str, Any]:
         """Legacy-compatible metrics API for settings screens."""
         with self._sync_metrics_lock:
-            return dict(self._sync_metrics)
+            metrics = dict(self._sync_metrics)
+            for key in ("pull_table_rows_per_sec", "pull_table_bytes", "push_table_bytes"):
+                metrics[key] = dict(self._sync_metrics.get(key) or {})
+        metrics["pull_bytes_human"] = self._format_bytes(metrics["pull_bytes"])
+        metrics["push_bytes_human"] = self._format_bytes(metrics["push_bytes"])
+        metrics["wire_compressors"] = list(getattr(self.repo, "mongo_compressors", None) or [])
+        metrics["scheduler"] = self._scheduler.metrics()
+        return metrics
 
     def get_sync_status(self) -> dict[str, Any]:
         """الحصول على حالة المزامنة"""
@@ -2935,6 +3397,413 @@ class UnifiedSyncManagerV3(QObject):
         except Exception as e:
             logger.debug("فشل حفظ Watermarks: %s", e)
 
+    def _push_dirty_record(
+        self,
+        cursor,
+        table: str,
+        table_ref: str,
+        record: dict[str, Any],
+        columns: list[str],
+        collection,
+        server_now_dt,
+        server_now_iso: str,
+        results: dict[str, Any],
+    ) -> None:
+        """رفع سجل محلي واحد إلى MongoDB (المسار الفردي) ثم تعليمه متزامناً محلياً."""
+        table_columns = set(columns)
+        try:
+            local_id = record.get("id")
+            mongo_id = record.get("_mongo_id")
+            sync_status = str(record.get("sync_status") or "").lower()
+            is_deleted = bool(record.get("is_deleted", 0))
+            unique_field = self.UNIQUE_FIELDS.get(table, "name")
+            unique_value = record.get(unique_field)
+
+            if is_deleted or sync_status == "deleted":
+                # حذف منطقي في السحابة لضمان مزامنة الحذف عبر Delta Sync
+                now_dt = server_now_dt
+                remote_error = False
+                remote_matched = False
+
+                if mongo_id:
+                    try:
+                        query = self._mongo_id_query(mongo_id) or {"_id": mongo_id}
+                        result = collection.update_one(
+                            query,
+                            {
+                                "$set": {
+                                    "is_deleted": True,
+                                    "sync_status": "deleted",
+                                    "last_modified": now_dt,
+                                }
+                            },
+                        )
+                        remote_matched = bool(
+                            getattr(result, "matched_count", 0)
+                            or getattr(result, "modified_count", 0)
+                        )
+                    except Exception as del_err:
+                        remote_error = True
+                        logger.debug("تعذر تعليم الحذف في MongoDB: %s", del_err)
+
+                if not remote_matched and unique_value:
+                    try:
+                        result = collection.update_one(
+                            {unique_field: unique_value},
+                            {
+                                "$set": {
+                                    "is_deleted": True,
+                                    "sync_status": "deleted",
+                                    "last_modified": now_dt,
+                                }
+                            },
+                        )
+                        remote_matched = bool(
+                            getattr(result, "matched_count", 0)
+                            or getattr(result, "modified_count", 0)
+                        )
+                    except Exception as del_err:
+                        remote_error = True
+                        logger.debug("تعذر تعليم الحذف بالـ unique field: %s", del_err)
+
+                if remote_error:
+                    results["errors"] += 1
+                    return
+
+                # حذف محلياً بعد نجاح التعليم أو عدم وجود سجل في السحابة
+                delete_local_sql = f"DELETE FROM {table_ref} WHERE id = ?"  # nosec B608
+                cursor.execute(delete_local_sql, (local_id,))
+                results["deleted"] += 1
+            else:
+                record = self._normalize_project_links_for_push(
+                    cursor,
+                    table,
+                    record,
+                    table_columns,
+                    server_now_iso,
+                )
+                record = self._normalize_client_links_for_push(
+                    cursor,
+                    table,
+                    record,
+                    table_columns,
+                    server_now_iso,
+                )
+                # Upsert إلى MongoDB
+                clean_record = {
+                    k: v
+                    for k, v in record.items()
+                    if k not in ["id", "sync_status", "dirty_flag", "is_deleted"]
+                }
+                clean_record["last_modified"] = server_now_iso
+                if table == "notifications" and not clean_record.get("device_id"):
+                    clean_record["device_id"] = self._device_id
+                self._push_logo_blobs_for(table, [clean_record])
+                self._record_wire_bytes("push", table, [clean_record])
+
+                if mongo_id:
+                    resolved_mongo_id = self._push_record_to_remote(
+                        collection,
+                        mongo_id=mongo_id,
+                        clean_record=clean_record,
+                        unique_field=unique_field,
+                        unique_value=unique_value,
+                    )
+                    if resolved_mongo_id and str(mongo_id or "").strip() != resolved_mongo_id:
+                        set_mongo_id_sql = f"UPDATE {table_ref} SET _mongo_id = ? WHERE id = ?"  # nosec B608
+                        cursor.execute(set_mongo_id_sql, (resolved_mongo_id, local_id))
+                else:
+                    mongo_id = self._push_record_to_remote(
+                        collection,
+                        mongo_id=None,
+                        clean_record=clean_record,
+                        unique_field=unique_field,
+                        unique_value=unique_value,
+                    )
+                    set_mongo_id_sql = f"UPDATE {table_ref} SET _mongo_id = ? WHERE id = ?"  # nosec B608
+                    cursor.execute(set_mongo_id_sql, (mongo_id, local_id))
+
+                # تحديث dirty_flag و sync_status
+                if "last_modified" in columns:
+                    mark_synced_sql = f"UPDATE {table_ref} SET dirty_flag = 0, sync_status = 'synced', last_modified = ? WHERE id = ?"  # nosec B608
+                    cursor.execute(mark_synced_sql, (server_now_iso, local_id))
+                else:
+                    mark_synced_sql = f"UPDATE {table_ref} SET dirty_flag = 0, sync_status = 'synced' WHERE id = ?"  # nosec B608
+                    cursor.execute(mark_synced_sql, (local_id,))
+                results["pushed"] += 1
+
+        except Exception as e:
+            logger.debug("خطأ في رفع سجل من %s: %s", table, e)
+            results["errors"] += 1
+
+    def _bulk_push_supported(self, collection) -> bool:
+        if not self._bulk_push_enabled or not callable(getattr(collection, "bulk_write", None)):
+            return False
+        try:
+            import pymongo  # noqa: F401
+        except Exception:
+            return False
+        return True
+
+    def _adapt_bulk_push_batch_size(self, elapsed_seconds: float, op_count: int) -> None:
+        """
+        ⚡ حجم دفعة الرفع يتكيّف مع زمن bulk_write المقاس:
+        يتضاعف لو الدفعة الممتلئة أسرع من نصف الهدف، وينقسم لو تجاوزت الهدف.
+        """
+        target = self._bulk_push_target_latency_ms / 1000.0
+        size = self._bulk_push_batch_size
+        if elapsed_seconds > target:
+            size = max(10, size // 2)
+        elif elapsed_seconds < target / 2 and op_count >= size:
+            size = min(BULK_PUSH_MAX_BATCH, size * 2)
+        self._bulk_push_batch_size = size
+        try:
+            with self._sync_metrics_lock:
+                self._sync_metrics["push_batch_size"] = size
+                self._sync_metrics["push_bulk_latency_ms"] = round(elapsed_seconds * 1000.0, 1)
+        except Exception:
+            pass
+
+    @staticmethod
+    def _find_remote_ids(collection, field: str, values: list[Any]) -> dict[Any, Any]:
+        """قيمة الحقل -> أول `_id` بعيد مطابق، باستعلام $in واحد بدل find لكل سجل."""
+        if not values:
+            return {}
+        try:
+            docs = collection.find({field: {"$in": values}}, {"_id": 1, field: 1})
+        except TypeError:
+            docs = collection.find({field: {"$in": values}})
+        found: dict[Any, Any] = {}
+        for doc in docs or []:
+            if not isinstance(doc, dict) or doc.get("_id") is None:
+                continue
+            key = str(doc["_id"]) if field == "_id" else doc.get(field)
+            try:
+                found.setdefault(key, doc["_id"])
+            except TypeError:
+                continue
+        return found
+
+    def _push_dirty_records_bulk(
+        self,
+        cursor,
+        table: str,
+        table_ref: str,
+        dirty_records: list,
+        columns: list[str],
+        collection,
+        server_now_dt,
+        server_now_iso: str,
+        results: dict[str, Any],
+    ) -> None:
+        """
+        ⚡ رفع دفعة سجلات جدول واحد عبر bulk_write(ordered=False):
+        - استعلامان مجمّعان لتحديد الـ `_id` البعيد (بالـ _mongo_id ثم بالحقل الفريد)
+        - عملية bulk_write واحدة لكل الدفعة بدل update_one/insert_one لكل سجل
+        - تعليم السجلات الناجحة محلياً بـ executemany
+        السجلات المكررة داخل نفس الدفعة تُرفع بعدها بالمسار الفردي للحفاظ على الترتيب.
+        """
+        from pymongo import InsertOne, UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        table_columns = set(columns)
+        unique_field = self.UNIQUE_FIELDS.get(table, "name")
+        entries: list[dict[str, Any]] = []
+        deferred: list[dict[str, Any]] = []
+        seen_keys: set[Any] = set()
+
+        for row in dirty_records:
+            try:
+                record = dict(zip(columns, row, strict=False))
+                mongo_id = str(record.get("_mongo_id") or "").strip()
+                unique_value = record.get(unique_field)
+                batch_keys = {("mongo", mongo_id)} if mongo_id else set()
+                if unique_value not in (None, ""):
+                    batch_keys.add(("unique", unique_value))
+                if batch_keys & seen_keys:
+                    deferred.append(record)
+                    continue
+                seen_keys.update(batch_keys)
+
+                sync_status = str(record.get("sync_status") or "").lower()
+                entry: dict[str, Any] = {
+                    "local_id": record.get("id"),
+                    "mongo_id": mongo_id,
+                    "unique_value": unique_value,
+                    "deleted": bool(record.get("is_deleted", 0)) or sync_status == "deleted",
+                }
+                if not entry["deleted"]:
+                    record = self._normalize_project_links_for_push(
+                        cursor, table, record, table_columns, server_now_iso
+                    )
+                    record = self._normalize_client_links_for_push(
+                        cursor, table, record, table_columns, server_now_iso
+                    )
+                    clean_record = {
+                        k: v
+                        for k, v in record.items()
+                        if k not in ["id", "sync_status", "dirty_flag", "is_deleted"]
+                    }
+                    clean_record["last_modified"] = server_now_iso
+                    if table == "notifications" and not clean_record.get("device_id"):
+                        clean_record["device_id"] = self._device_id
+                    entry["clean_record"] = clean_record
+                entries.append(entry)
+            except Exception as e:
+                logger.debug("خطأ في تجهيز سجل للرفع من %s: %s", table, e)
+                results["errors"] += 1
+
+        # تحديد الـ `_id` البعيد لكل سجل بعمليتي find مجمّعتين
+        id_variants: list[Any] = []
+        for entry in entries:
+            id_variants.extend(self._mongo_id_variants(entry["mongo_id"]))
+        existing_ids = self._find_remote_ids(collection, "_id", id_variants)
+        unresolved_unique = [
+            entry["unique_value"]
+            for entry in entries
+            if entry["mongo_id"] not in existing_ids and entry["unique_value"] not in (None, "")
+        ]
+        unique_ids = self._find_remote_ids(collection, unique_field, unresolved_unique)
+
+        operations: list[Any] = []
+        op_entries: list[dict[str, Any]] = []
+        local_only_deletes: list[dict[str, Any]] = []
+        for entry in entries:
+            mongo_id = entry["mongo_id"]
+            unique_value = entry["unique_value"]
+            if mongo_id in existing_ids:
+                remote_filter = self._mongo_id_query(mongo_id) or {"_id": mongo_id}
+                entry["resolved_id"] = mongo_id
+            elif unique_value not in (None, "") and unique_value in unique_ids:
+                remote_filter = {"_id": unique_ids[unique_value]}
+                entry["resolved_id"] = str(unique_ids[unique_value])
+            else:
+                remote_filter = None
+
+            if entry["deleted"]:
+                if remote_filter is None:
+                    # لا يوجد سجل في السحابة: يكفي الحذف المحلي
+                    local_only_deletes.append(entry)
+                    continue
+                operations.append(
+                    UpdateOne(
+                        remote_filter,
+                        {
+                            "$set": {
+                                "is_deleted": True,
+                                "sync_status": "deleted",
+                                "last_modified": server_now_dt,
+                            }
+                        },
+                    )
+                )
+            elif remote_filter is not None:
+                operations.append(UpdateOne(remote_filter, {"$set": entry["clean_record"]}))
+            else:
+                insert_payload = dict(entry["clean_record"])
+                preferred_id = None
+                for variant in self._mongo_id_variants(mongo_id):
+                    if not isinstance(variant, str):
+                        preferred_id = variant
+                        break
+                if preferred_id is None:
+                    preferred_id = mongo_id or None
+                if preferred_id is None:
+                    from bson import ObjectId
+
+                    preferred_id = ObjectId()
+                insert_payload["_id"] = preferred_id
+                entry["resolved_id"] = str(preferred_id)
+                operations.append(InsertOne(insert_payload))
+            op_entries.append(entry)
+
+        failed_indexes: set[int] = set()
+        if operations:
+            pushed_records = [entry["clean_record"] for entry in op_entries if not entry["deleted"]]
+            self._push_logo_blobs_for(table, pushed_records)
+            self._record_wire_bytes("push", table, pushed_records)
+            started = time.perf_counter()
+            try:
+                collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as bulk_err:
+                details = getattr(bulk_err, "details", None) or {}
+                for write_error in details.get("writeErrors") or []:
+                    failed_indexes.add(int(write_error.get("index", -1)))
+                logger.debug("bulk_write جزئي في %s: %s خطأ", table, len(failed_indexes))
+            except Exception as e:
+                logger.debug("فشل bulk_write في %s: %s", table, e)
+                failed_indexes = set(range(len(operations)))
+            self._adapt_bulk_push_batch_size(time.perf_counter() - started, len(operations))
+
+        delete_rows: list[list[Any]] = [[entry["local_id"]] for entry in local_only_deletes]
+        mongo_id_rows: list[list[Any]] = []
+        synced_ids: list[Any] = []
+        for index, entry in enumerate(op_entries):
+            if index in failed_indexes:
+                results["errors"] += 1
+                continue
+            if entry["deleted"]:
+                delete_rows.append([entry["local_id"]])
+                continue
+            if entry["resolved_id"] != entry["mongo_id"]:
+                mongo_id_rows.append([entry["resolved_id"], entry["local_id"]])
+            synced_ids.append(entry["local_id"])
+
+        if delete_rows:
+            cursor.executemany(f"DELETE FROM {table_ref} WHERE id = ?", delete_rows)  # nosec B608
+            results["deleted"] += len(delete_rows)
+        if mongo_id_rows:
+            cursor.executemany(
+                f"UPDATE {table_ref} SET _mongo_id = ? WHERE id = ?",
+                mongo_id_rows,  # nosec B608
+            )
+        if synced_ids:
+            if "last_modified" in table_columns:
+                mark_synced_sql = f"UPDATE {table_ref} SET dirty_flag = 0, sync_status = 'synced', last_modified = ? WHERE id = ?"  # nosec B608
+                cursor.executemany(
+                    mark_synced_sql, [[server_now_iso, local_id] for local_id in synced_ids]
+                )
+            else:
+                mark_synced_sql = (
+                    f"UPDATE {table_ref} SET dirty_flag = 0, sync_status = 'synced' WHERE id = ?"  # nosec B608
+                )
+                cursor.executemany(mark_synced_sql, [[local_id] for local_id in synced_ids])
+            results["pushed"] += len(synced_ids)
+
+        for record in deferred:
+            self._push_dirty_record(
+                cursor,
+                table,
+                table_ref,
+                record,
+                columns,
+                collection,
+                server_now_dt,
+                server_now_iso,
+                results,
+            )
+
+    def _pending_journal_ids(self, table_name: str, limit: int) -> list[int] | None:
+        """ids المعلّقة من دفتر تغييرات الـ repository، أو None لو غير مدعوم."""
+        getter = getattr(self.repo, "get_pending_journal_ids", None)
+        if not callable(getter):
+            return None
+        try:
+            pending_ids = getter(table_name, limit)
+        except Exception as e:
+            logger.debug("تعذر قراءة دفتر التغييرات لـ %s: %s", table_name, e)
+            return None
+        return pending_ids if isinstance(pending_ids, list) else None
+
+    def _acknowledge_journal(self, table_name: str, local_ids: list[int]) -> None:
+        acknowledge = getattr(self.repo, "acknowledge_journal_entries", None)
+        if not callable(acknowledge):
+            return
+        try:
+            acknowledge(table_name, local_ids)
+        except Exception as e:
+            logger.debug("تعذر تحديث دفتر التغييرات لـ %s: %s", table_name, e)
+
     def push_local_changes(self, target_tables: set[str] | None = None) -> dict[str, Any]:
         """
         ⚡ Push all locally modified records to MongoDB
@@ -2974,152 +3843,64 @@ class UnifiedSyncManagerV3(QObject):
 
                     # جلب كل السجلات المحلية غير المتزامنة
                     # ملاحظة: بعض العمليات تضبط sync_status فقط بدون dirty_flag.
-                    dirty_records_sql = f"SELECT * FROM {table_ref} WHERE dirty_flag = 1 OR sync_status IS NULL OR sync_status IN ('new_offline', 'modified_offline', 'pending', 'deleted') OR _mongo_id IS NULL LIMIT ?"  # nosec B608
-                    cursor.execute(dirty_records_sql, (self._delta_push_batch_limit,))
+                    collection = self.repo.mongo_db[table]
+                    bulk_mode = self._bulk_push_supported(collection)
+                    batch_limit = (
+                        self._bulk_push_batch_size if bulk_mode else self._delta_push_batch_limit
+                    )
+                    # ⚡ دفتر التغييرات (sync_queue) يحدد الصفوف المعلّقة بقراءة مفهرسة واحدة؛
+                    # بدونه نرجع لمسح الجدول بشرط dirty_flag/sync_status.
+                    dirty_predicate = "dirty_flag = 1 OR sync_status IS NULL OR sync_status IN ('new_offline', 'modified_offline', 'pending', 'deleted') OR _mongo_id IS NULL"
+                    journal_ids = self._pending_journal_ids(table, batch_limit)
+                    if journal_ids is None:
+                        dirty_records_sql = (
+                            f"SELECT * FROM {table_ref} WHERE {dirty_predicate} LIMIT ?"  # nosec B608
+                        )
+                        cursor.execute(dirty_records_sql, (batch_limit,))
+                    elif journal_ids:
+                        placeholders = ", ".join("?" for _ in journal_ids)
+                        dirty_records_sql = f"SELECT * FROM {table_ref} WHERE id IN ({placeholders}) AND ({dirty_predicate}) ORDER BY id"  # nosec B608
+                        cursor.execute(dirty_records_sql, journal_ids)
+                    else:
+                        continue
                     dirty_records = cursor.fetchall()
 
                     if not dirty_records:
+                        if journal_ids:
+                            self._acknowledge_journal(table, journal_ids)
                         continue
 
                     columns = [desc[0] for desc in cursor.description]
-                    table_columns = set(columns)
-                    collection = self.repo.mongo_db[table]
 
-                    for row in dirty_records:
-                        try:
-                            record = dict(zip(columns, row, strict=False))
-                            local_id = record.get("id")
-                            mongo_id = record.get("_mongo_id")
-                            sync_status = str(record.get("sync_status") or "").lower()
-                            is_deleted = bool(record.get("is_deleted", 0))
-                            unique_field = self.UNIQUE_FIELDS.get(table, "name")
-                            unique_value = record.get(unique_field)
-
-                            if is_deleted or sync_status == "deleted":
-                                # حذف منطقي في السحابة لضمان مزامنة الحذف عبر Delta Sync
-                                now_dt = server_now_dt
-                                remote_error = False
-                                remote_matched = False
-
-                                if mongo_id:
-                                    try:
-                                        query = self._mongo_id_query(mongo_id) or {"_id": mongo_id}
-                                        result = collection.update_one(
-                                            query,
-                                            {
-                                                "$set": {
-                                                    "is_deleted": True,
-                                                    "sync_status": "deleted",
-                                                    "last_modified": now_dt,
-                                                }
-                                            },
-                                        )
-                                        remote_matched = bool(
-                                            getattr(result, "matched_count", 0)
-                                            or getattr(result, "modified_count", 0)
-                                        )
-                                    except Exception as del_err:
-                                        remote_error = True
-                                        logger.debug("تعذر تعليم الحذف في MongoDB: %s", del_err)
-
-                                if not remote_matched and unique_value:
-                                    try:
-                                        result = collection.update_one(
-                                            {unique_field: unique_value},
-                                            {
-                                                "$set": {
-                                                    "is_deleted": True,
-                                                    "sync_status": "deleted",
-                                                    "last_modified": now_dt,
-                                                }
-                                            },
-                                        )
-                                        remote_matched = bool(
-                                            getattr(result, "matched_count", 0)
-                                            or getattr(result, "modified_count", 0)
-                                        )
-                                    except Exception as del_err:
-                                        remote_error = True
-                                        logger.debug(
-                                            "تعذر تعليم الحذف بالـ unique field: %s", del_err
-                                        )
-
-                                if remote_error:
-                                    results["errors"] += 1
-                                    continue
-
-                                # حذف محلياً بعد نجاح التعليم أو عدم وجود سجل في السحابة
-                                delete_local_sql = (
-                                    f"DELETE FROM {table_ref} WHERE id = ?"  # nosec B608
-                                )
-                                cursor.execute(delete_local_sql, (local_id,))
-                                results["deleted"] += 1
-                            else:
-                                record = self._normalize_project_links_for_push(
-                                    cursor,
-                                    table,
-                                    record,
-                                    table_columns,
-                                    server_now_iso,
-                                )
-                                record = self._normalize_client_links_for_push(
-                                    cursor,
-                                    table,
-                                    record,
-                                    table_columns,
-                                    server_now_iso,
-                                )
-                                # Upsert إلى MongoDB
-                                clean_record = {
-                                    k: v
-                                    for k, v in record.items()
-                                    if k not in ["id", "sync_status", "dirty_flag", "is_deleted"]
-                                }
-                                clean_record["last_modified"] = server_now_iso
-                                if table == "notifications" and not clean_record.get("device_id"):
-                                    clean_record["device_id"] = self._device_id
-
-                                if mongo_id:
-                                    resolved_mongo_id = self._push_record_to_remote(
-                                        collection,
-                                        mongo_id=mongo_id,
-                                        clean_record=clean_record,
-                                        unique_field=unique_field,
-                                        unique_value=unique_value,
-                                    )
-                                    if (
-                                        resolved_mongo_id
-                                        and str(mongo_id or "").strip() != resolved_mongo_id
-                                    ):
-                                        set_mongo_id_sql = f"UPDATE {table_ref} SET _mongo_id = ? WHERE id = ?"  # nosec B608
-                                        cursor.execute(
-                                            set_mongo_id_sql, (resolved_mongo_id, local_id)
-                                        )
-                                else:
-                                    mongo_id = self._push_record_to_remote(
-                                        collection,
-                                        mongo_id=None,
-                                        clean_record=clean_record,
-                                        unique_field=unique_field,
-                                        unique_value=unique_value,
-                                    )
-                                    set_mongo_id_sql = f"UPDATE {table_ref} SET _mongo_id = ? WHERE id = ?"  # nosec B608
-                                    cursor.execute(set_mongo_id_sql, (mongo_id, local_id))
-
-                                # تحديث dirty_flag و sync_status
-                                if "last_modified" in columns:
-                                    mark_synced_sql = f"UPDATE {table_ref} SET dirty_flag = 0, sync_status = 'synced', last_modified = ? WHERE id = ?"  # nosec B608
-                                    cursor.execute(mark_synced_sql, (server_now_iso, local_id))
-                                else:
-                                    mark_synced_sql = f"UPDATE {table_ref} SET dirty_flag = 0, sync_status = 'synced' WHERE id = ?"  # nosec B608
-                                    cursor.execute(mark_synced_sql, (local_id,))
-                                results["pushed"] += 1
-
-                        except Exception as e:
-                            logger.debug("خطأ في رفع سجل من %s: %s", table, e)
-                            results["errors"] += 1
+                    if bulk_mode:
+                        self._push_dirty_records_bulk(
+                            cursor,
+                            table,
+                            table_ref,
+                            dirty_records,
+                            columns,
+                            collection,
+                            server_now_dt,
+                            server_now_iso,
+                            results,
+                        )
+                    else:
+                        for row in dirty_records:
+                            self._push_dirty_record(
+                                cursor,
+                                table,
+                                table_ref,
+                                dict(zip(columns, row, strict=False)),
+                                columns,
+                                collection,
+                                server_now_dt,
+                                server_now_iso,
+                                results,
+                            )
 
                     self.repo.sqlite_conn.commit()
+                    if journal_ids:
+                        self._acknowledge_journal(table, journal_ids)
 
                 except Exception as e:
                     logger.debug("خطأ في رفع جدول %s: %s", table, e)
@@ -3178,6 +3959,120 @@ class UnifiedSyncManagerV3(QObject):
         cursor.execute(delete_sql, stale_ids)
         return int(cursor.rowcount or 0)
 
+    def _delta_pull_projection(self, table_name: str) -> dict[str, int] | None:
+        """Projection for delta pages: large columns are excluded and loaded on demand."""
+        excluded = list(PULL_DEFERRED_FIELDS.get(table_name, ()))
+        if table_name == "clients" and self._lazy_logo_enabled:
+            excluded.append("logo_data")
+        return dict.fromkeys(excluded, 0) or None
+
+    @staticmethod
+    def _delta_pull_keyset_after(last_modified: Any, last_id: Any) -> dict[str, Any] | None:
+        """Keyset condition for documents sorted after (last_modified, _id)."""
+        if last_modified is None or last_id is None:
+            return None
+        branches: list[dict[str, Any]] = [
+            {"last_modified": {"$gt": last_modified}},
+            {"last_modified": last_modified, "_id": {"$gt": last_id}},
+        ]
+        if isinstance(last_modified, str):
+            # BSON يرتب النصوص قبل التواريخ و $gt لا يقارن بين نوعين مختلفين
+            branches.append({"last_modified": {"$type": "date"}})
+        return {"$or": branches}
+
+    def _iter_delta_pull_pages(self, collection, table_name: str, query: dict[str, Any]):
+        """
+        ⚡ Yield delta pages sorted by (last_modified, _id) using keyset pagination,
+        so a large catch-up never loads the whole change set into memory at once.
+        """
+        projection = self._delta_pull_projection(table_name)
+        page_size = self._delta_pull_page_size
+        page_query = query
+        while True:
+            try:
+                page = list(
+                    collection.find(page_query, projection, sort=DELTA_PULL_SORT, limit=page_size)
+                )
+            except TypeError:
+                # توافق مع Fakes قديمة في الاختبارات: صفحة واحدة بدون ترتيب أو حد
+                page = None
+            if page is None:
+                if projection is None:
+                    page = list(collection.find(query))
+                else:
+                    try:
+                        page = list(collection.find(query, projection))
+                    except TypeError:
+                        page = list(collection.find(query))
+                if page:
+                    yield page
+                return
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            keyset = self._delta_pull_keyset_after(
+                page[-1].get("last_modified"), page[-1].get("_id")
+            )
+            if keyset is None:
+                return
+            page_query = {"$and": [query, keyset]}
+
+    def _hydrate_deferred_pull_fields(
+        self, collection, table_name: str, remote_records: list[dict], local_rows: dict
+    ) -> int:
+        """
+        ⚡ Load deferred large columns (items/milestones/lines) only for records the pull
+        will actually write; echoes of our own pushes and stale rows never transfer them.
+        """
+        deferred = PULL_DEFERRED_FIELDS.get(table_name)
+        if not deferred:
+            return 0
+
+        pending: dict[str, dict[str, Any]] = {}
+        for remote in remote_records:
+            if remote.get("is_deleted", False) or all(field in remote for field in deferred):
+                continue
+            local_row = local_rows.get(str(remote.get("_id")))
+            if local_row:
+                if bool(local_row["is_deleted"]) or (
+                    str(local_row["sync_status"] or "").lower() == "deleted"
+                ):
+                    continue
+                remote_ts = self._to_iso_timestamp(remote.get("last_modified", ""))
+                local_ts = self._to_iso_timestamp(local_row["last_modified"])
+                if remote_ts and local_ts and not self._is_newer_timestamp(remote_ts, local_ts):
+                    continue
+            pending[str(remote["_id"])] = remote
+        if not pending:
+            return 0
+
+        raw_ids = [remote["_id"] for remote in pending.values()]
+        projection = dict.fromkeys(deferred, 1)
+        hydrated = 0
+        for start in range(0, len(raw_ids), BULK_LOOKUP_CHUNK_SIZE):
+            chunk = raw_ids[start : start + BULK_LOOKUP_CHUNK_SIZE]
+            try:
+                documents = collection.find({"_id": {"$in": chunk}}, projection)
+            except TypeError:
+                # توافق مع Fakes قديمة في الاختبارات
+                documents = collection.find({"_id": {"$in": chunk}})
+            for document in documents:
+                target = pending.get(str(document.get("_id")))
+                if target is None:
+                    continue
+                for field in deferred:
+                    target[field] = document.get(field)
+                hydrated += 1
+        logger.debug(
+            "[%s] delta pull loaded deferred fields for %s/%s records",
+            table_name,
+            hydrated,
+            len(remote_records),
+        )
+        return hydrated
+
     def pull_remote_changes(self) -> dict[str, Any]:
         """
         ⚡ Pull changes from MongoDB since last sync (watermark-based delta sync)
@@ -3209,6 +4104,8 @@ class UnifiedSyncManagerV3(QObject):
                 try:
                     before_pulled = results["pulled"]
                     before_deleted = results["deleted"]
+                    # ids المحلية المتغيرة لترقيع cache الـ repo (None = تغييرات غير معروفة)
+                    changed_refs: list[Any] | None = []
 
                     # الحصول على Watermark لهذا الجدول
                     watermark = str(self._watermarks.get(table) or "1970-01-01T00:00:00").strip()
@@ -3230,18 +4127,6 @@ class UnifiedSyncManagerV3(QObject):
                     )
                     if table == "notifications":
                         query = self._merge_query_with_notification_filter(query)
-                    projection = None
-                    if table == "clients" and self._lazy_logo_enabled:
-                        projection = {"logo_data": 0}
-                    if projection is None:
-                        remote_records = list(collection.find(query))
-                    else:
-                        try:
-                            remote_records = list(collection.find(query, projection))
-                        except TypeError:
-                            # توافق مع Fakes قديمة في الاختبارات
-                            remote_records = list(collection.find(query))
-
                     # التحقق من وجود الجدول محلياً
                     if not self._sqlite_table_exists(cursor, table):
                         continue
@@ -3264,105 +4149,154 @@ class UnifiedSyncManagerV3(QObject):
                             )
                             if deleted_missing_count > 0:
                                 results["deleted"] += deleted_missing_count
+                                changed_refs = None
                         except Exception as prune_err:
                             logger.debug(
                                 "تعذر تنظيف الإشعارات المحلية المحذوفة من السحابة: %s",
                                 prune_err,
                             )
 
-                    if not remote_records:
-                        continue
-
                     logo_clients = 0
+                    deferred_fields = PULL_DEFERRED_FIELDS.get(table, ())
+                    # ⚡ صفحات محدودة مرتبة بـ (last_modified, _id) بدل تحميل كل التغييرات مرة واحدة
+                    for remote_records in self._iter_delta_pull_pages(collection, table, query):
+                        apply_started = time.perf_counter()
+
+                        # ⚡ جلب الصفوف المحلية لكل السجلات الواردة باستعلام مجمّع واحد
+                        local_rows = self._prefetch_local_rows_by_mongo_id(
+                            cursor,
+                            table,
+                            (remote.get("_id") for remote in remote_records),
+                            ["id", "last_modified", "sync_status", "is_deleted"],
+                        )
+                        self._hydrate_deferred_pull_fields(
+                            collection, table, remote_records, local_rows
+                        )
+                        self._record_wire_bytes("pull", table, remote_records)
+                        pending_deletes: list[int] = []
+                        pending_updates: dict[int, dict[str, Any]] = {}
+                        pending_inserts: dict[str, dict[str, Any]] = {}
+
+                        for remote in remote_records:
+                            try:
+                                mongo_id = str(remote["_id"])
+                                is_deleted = remote.get("is_deleted", False)
+                                last_modified_iso = self._to_iso_timestamp(
+                                    remote.get("last_modified", "")
+                                )
 
-                    for remote in remote_records:
-                        try:
-                            mongo_id = str(remote["_id"])
-                            is_deleted = remote.get("is_deleted", False)
-                            last_modified_iso = self._to_iso_timestamp(
-                                remote.get("last_modified", "")
-                            )
+                                # البحث عن السجل المحلي
+                                local_row = local_rows.get(mongo_id)
+                                local_id = local_row["id"] if local_row else None
+                                local_last_modified = (
+                                    self._to_iso_timestamp(local_row["last_modified"])
+                                    if local_row
+                                    else ""
+                                )
+                                local_sync_status = (
+                                    str(local_row["sync_status"] or "").lower() if local_row else ""
+                                )
+                                local_is_deleted = (
+                                    bool(local_row["is_deleted"]) if local_row else False
+                                )
 
-                            # البحث عن السجل المحلي
-                            local_lookup_sql = f"SELECT id, last_modified, sync_status, is_deleted FROM {table_ref} WHERE _mongo_id = ?"  # nosec B608
-                            cursor.execute(local_lookup_sql, (mongo_id,))
-                            local_row = cursor.fetchone()
-                            local_id = local_row[0] if local_row else None
-                            local_last_modified = (
-                                self._to_iso_timestamp(local_row[1]) if local_row else ""
+                                if is_deleted:
+                                    # حذف من MongoDB -> حذف محلياً
+                                    if local_id:
+                                        pending_deletes.append(local_id)
+                                        local_rows.pop(mongo_id, None)
+                                        results["deleted"] += 1
+                                        if changed_refs is not None:
+                                            changed_refs.append(local_id)
+                                else:
+                                    # لا نعيد إحياء صف محلي محذوف قبل أن تُدفَع حذفه إلى السحابة.
+                                    if local_id and (
+                                        local_is_deleted or local_sync_status == "deleted"
+                                    ):
+                                        continue
+
+                                    # تحضير البيانات
+                                    item_data = self._prepare_cloud_data(remote, table_name=table)
+                                    if item_data.pop("__skip_sync__", False):
+                                        logger.warning(
+                                            "⚠️ تم تجاهل سجل projects غير صالح أثناء delta pull (mongo_id=%s)",
+                                            mongo_id,
+                                        )
+                                        continue
+                                    item_data["_mongo_id"] = mongo_id
+                                    item_data["sync_status"] = "synced"
+                                    item_data["dirty_flag"] = 0
+                                    item_data["is_deleted"] = 0
+                                    if table == "clients" and bool(item_data.get("has_logo", 0)):
+                                        logo_clients += 1
+
+                                    # تصفية الحقول
+                                    filtered = {
+                                        k: v for k, v in item_data.items() if k in table_columns
+                                    }
+
+                                    # Extra safety: when query returns broad sets, skip no-op rows.
+                                    if (
+                                        local_id
+                                        and last_modified_iso
+                                        and local_last_modified
+                                        and not self._is_newer_timestamp(
+                                            last_modified_iso, local_last_modified
+                                        )
+                                    ):
+                                        continue
+
+                                    if any(field not in remote for field in deferred_fields):
+                                        # الأعمدة الكبيرة المؤجلة تعذر تحميلها: لا نكتب صفاً ناقصاً
+                                        continue
+
+                                    if local_id:
+                                        # تحديث السجل الموجود
+                                        pending_updates.setdefault(local_id, {}).update(filtered)
+                                        if changed_refs is not None:
+                                            changed_refs.append(local_id)
+                                    elif mongo_id in pending_inserts:
+                                        # نفس السجل تكرر في الدفعة: آخر نسخة هي المعتمدة
+                                        pending_inserts[mongo_id].update(filtered)
+                                    else:
+                                        # إدراج سجل جديد
+                                        pending_inserts[mongo_id] = filtered
+                                    results["pulled"] += 1
+
+                            except Exception as e:
+                                logger.debug("خطأ في سحب سجل من %s: %s", table, e)
+                                results["errors"] += 1
+
+                        # ⚡ تطبيق كل التغييرات بـ executemany داخل transaction واحدة للجدول
+                        # (الحالة تُحفظ قبل التطبيق لأن _flush_pending_updates يفرّغ القاموس)
+                        page_dirty = bool(pending_deletes or pending_updates or pending_inserts)
+                        if pending_deletes:
+                            delete_local_sql = f"DELETE FROM {table_ref} WHERE id = ?"  # nosec B608
+                            failed = self._execute_batched(
+                                cursor,
+                                delete_local_sql,
+                                [[local_id] for local_id in pending_deletes],
                             )
-                            local_sync_status = str(local_row[2] or "").lower() if local_row else ""
-                            local_is_deleted = bool(local_row[3]) if local_row else False
-
-                            if is_deleted:
-                                # حذف من MongoDB -> حذف محلياً
-                                if local_id:
-                                    delete_local_sql = (
-                                        f"DELETE FROM {table_ref} WHERE id = ?"  # nosec B608
-                                    )
-                                    cursor.execute(delete_local_sql, (local_id,))
-                                    results["deleted"] += 1
-                            else:
-                                # لا نعيد إحياء صف محلي محذوف قبل أن تُدفَع حذفه إلى السحابة.
-                                if local_id and (
-                                    local_is_deleted or local_sync_status == "deleted"
-                                ):
-                                    continue
-
-                                # تحضير البيانات
-                                item_data = self._prepare_cloud_data(remote, table_name=table)
-                                if item_data.pop("__skip_sync__", False):
-                                    logger.warning(
-                                        "⚠️ تم تجاهل سجل projects غير صالح أثناء delta pull (mongo_id=%s)",
-                                        mongo_id,
-                                    )
-                                    continue
-                                item_data["_mongo_id"] = mongo_id
-                                item_data["sync_status"] = "synced"
-                                item_data["dirty_flag"] = 0
-                                item_data["is_deleted"] = 0
-                                if table == "clients" and bool(item_data.get("has_logo", 0)):
-                                    logo_clients += 1
-
-                                # تصفية الحقول
-                                filtered = {
-                                    k: v for k, v in item_data.items() if k in table_columns
-                                }
+                            results["deleted"] -= failed
+                            results["errors"] += failed
+                        failed = self._flush_pending_updates(cursor, table, pending_updates)
+                        failed += self._flush_pending_inserts(
+                            cursor, table, list(pending_inserts.values())
+                        )
+                        results["pulled"] -= failed
+                        results["errors"] += failed
+                        if pending_inserts and changed_refs is not None:
+                            inserted_rows = self._prefetch_local_rows_by_mongo_id(
+                                cursor, table, pending_inserts.keys(), ["id"]
+                            )
+                            changed_refs.extend(row["id"] for row in inserted_rows.values())
+                        self._record_pull_throughput(
+                            table, len(remote_records), time.perf_counter() - apply_started
+                        )
+                        if page_dirty:
+                            # كل صفحة في transaction مستقلة قبل تقديم الـ watermark بعدها
+                            self.repo.sqlite_conn.commit()
 
-                                # Extra safety: when query returns broad sets, skip no-op rows.
-                                if (
-                                    local_id
-                                    and last_modified_iso
-                                    and local_last_modified
-                                    and not self._is_newer_timestamp(
-                                        last_modified_iso, local_last_modified
-                                    )
-                                ):
-                                    continue
-
-                                if local_id:
-                                    # تحديث السجل الموجود
-                                    set_clause = self._sqlite_set_clause_sql(
-                                        list(filtered.keys()), table_columns=table_columns
-                                    )
-                                    values = list(filtered.values()) + [local_id]
-                                    update_local_sql = f"UPDATE {table_ref} SET {set_clause} WHERE id = ?"  # nosec B608
-                                    cursor.execute(update_local_sql, values)
-                                else:
-                                    # إدراج سجل جديد
-                                    cols = self._sqlite_column_list_sql(
-                                        list(filtered.keys()), table_columns=table_columns
-                                    )
-                                    placeholders = ", ".join(["?" for _ in filtered])
-                                    insert_local_sql = f"INSERT INTO {table_ref} ({cols}) VALUES ({placeholders})"  # nosec B608
-                                    cursor.execute(insert_local_sql, list(filtered.values()))
-                                results["pulled"] += 1
-
-                        except Exception as e:
-                            logger.debug("خطأ في سحب سجل من %s: %s", table, e)
-                            results["errors"] += 1
-
-                    if remote_records:
                         # ⚡ CRITICAL: Update watermark based on the LATEST record found
                         try:
                             latest_ts = ""
@@ -3390,7 +4324,7 @@ class UnifiedSyncManagerV3(QObject):
                             logo_clients,
                         )
                     if table_changed:
-                        self._invalidate_repository_cache(table)
+                        self._invalidate_repository_cache(table, changed_refs)
                         changed_tables.add(table)
 
                 except Exception as e:
@@ -3455,6 +4389,23 @@ class UnifiedSyncManagerV3(QObject):
         finally:
             self._delta_cycle_lock.release()
 
+    def _run_push_cycle(self, target_tables: set[str] | None = None) -> dict[str, Any]:
+        """Run one guarded push-only cycle (no pull) for pending local changes."""
+        if self.repo is None:
+            return {"success": False, "reason": "sqlite_closed"}
+        if self._shutdown:
+            return {"success": False, "reason": "shutdown"}
+        if self._is_syncing:
+            return {"success": False, "reason": "full_sync_in_progress"}
+
+        if not self._delta_cycle_lock.acquire(blocking=False):
+            return {"success": False, "reason": "delta_busy"}
+
+        try:
+            return self.push_local_changes(target_tables)
+        finally:
+            self._delta_cycle_lock.release()
+
     def _run_table_reconcile_cycle(self, table: str) -> dict[str, Any]:
         """
         Run one guarded targeted cycle for a single table.
@@ -3518,25 +4469,14 @@ class UnifiedSyncManagerV3(QObject):
         if self._shutdown or self._is_syncing or not self.is_online:
             return
 
-        def pull_thread():
-            if self._shutdown:
-                return
-            try:
-                target_table = table if isinstance(table, str) and table in self.TABLES else None
-                if target_table:
-                    self._run_table_reconcile_cycle(target_table)
-                else:
-                    # Fallback: full delta cycle for broad refresh.
-                    self._run_delta_cycle()
-            except Exception as e:
-                logger.debug("خطأ في force_pull: %s", e)
-
-        threading.Thread(target=pull_thread, daemon=True).start()
+        target_table = table if isinstance(table, str) and table in self.TABLES else None
+        # جدول محدد -> reconcile موجّه؛ بدونه دورة Delta كاملة
+        self._scheduler.request(target_table, priority=PRIORITY_REMOTE_EVENT, reason="force_pull")
 
     def start_delta_sync(self, interval_seconds: int = DEFAULT_DELTA_SYNC_INTERVAL_SECONDS):
         """
         ⚡ بدء نظام المزامنة التفاضلية (Delta Sync)
-        يقوم بسحب التغييرات الجديدة كل فترة محددة
+        نبضة دورية داخل طابور الجدولة تسحب التغييرات الجديدة وتتباطأ أثناء الخمول
         """
         if self._delta_pull_timer:
             try:
@@ -3545,58 +4485,14 @@ class UnifiedSyncManagerV3(QObject):
                 pass
             self._delta_pull_timer = None
 
-        if self._delta_thread and self._delta_thread.is_alive():
-            try:
-                self._delta_thread_stop.set()
-                self._delta_thread.join(timeout=0.5)
-            except Exception:
-                pass
-        self._delta_thread_stop = threading.Event()
-
         interval_seconds = self._safe_int(
             interval_seconds, DEFAULT_DELTA_SYNC_INTERVAL_SECONDS, 1, 300
         )
         self._delta_sync_interval_seconds = interval_seconds
-        interval_seconds = max(1, int(interval_seconds))
-
-        def delta_loop():
-            idle_streak = 0
-            while not self._shutdown and not self._delta_thread_stop.is_set():
-                backoff_factor = 1
-                if self._realtime_enabled and idle_streak >= 2:
-                    backoff_factor = min(4, 1 + (idle_streak // 2))
-                wait_seconds = float(interval_seconds * backoff_factor)
-                if self._delta_thread_stop.wait(wait_seconds):
-                    break
-                if self._shutdown or self._delta_thread_stop.is_set():
-                    break
-                if self._is_syncing or not self.is_online:
-                    continue
-                try:
-                    result = self._run_delta_cycle()
-                    self._last_delta_cycle_mono = time.monotonic()
-                    changed = (
-                        int(result.get("pushed", 0))
-                        + int(result.get("pulled", 0))
-                        + int(result.get("deleted", 0))
-                    )
-                    if changed > 0:
-                        self._last_delta_change_mono = self._last_delta_cycle_mono
-                        idle_streak = 0
-                    elif result.get("reason") in {"delta_busy", "full_sync_in_progress"}:
-                        idle_streak = max(0, idle_streak - 1)
-                    else:
-                        idle_streak = min(10, idle_streak + 1)
-                except Exception as e:
-                    logger.debug("خطأ في periodic delta sync: %s", e)
 
-        self._delta_thread = threading.Thread(
-            target=delta_loop,
-            daemon=True,
-            name="unified-delta-sync",
-        )
-        self._last_delta_cycle_mono = time.monotonic()
-        self._delta_thread.start()
+        # مع realtime تصل التغييرات فوراً، فالنبضة تتباطأ حتى 4 أضعاف أثناء الخمول
+        self._scheduler.set_max_backoff(4 if self._realtime_enabled else 1)
+        self._scheduler.start(interval_seconds)
 
         logger.info("⏰ بدء Delta Sync كل %s ثانية (Adaptive idle backoff مفعّل)", interval_seconds)
 
@@ -620,7 +620,12 @@ class SkyWaveERPApp:
                         try:
                             from core.realtime_sync import setup_realtime_sync
 
-                            manager = setup_realtime_sync(self.repository)
+                            manager = setup_realtime_sync(
+                                self.repository,
+                                document_preparer=getattr(
+                                    self.unified_sync, "prepare_remote_document", None
+                                ),
+                            )
                             if manager is not None:
                                 self.realtime_manager = manager
                                 self.realtime_manager.data_updated.connect(
@@ -716,6 +721,9 @@ class SkyWaveERPApp:
     def _on_realtime_data_updated(self, table_name: str, _payload: dict):
         """معالجة event فوري من Change Streams بدون ازدواج مع delta/full sync."""
         try:
+            if isinstance(_payload, dict) and _payload.get("applied"):
+                # المستندات طُبّقت محلياً من change stream؛ لا حاجة لسحب الجدول.
+                return
             known_tables = set(getattr(self.unified_sync, "TABLES", []))
             if isinstance(table_name, str) and table_name in known_tables:
                 # Realtime change should trigger a targeted pull only.
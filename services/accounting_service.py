@@ -3,6 +3,7 @@
 
 from __future__ import annotations
 
+import copy
 import os
 import sys
 import threading
@@ -10,12 +11,17 @@ import time
 import traceback
 from datetime import datetime, timedelta
 from heapq import heappush, heappushpop
+from types import SimpleNamespace
 from typing import TYPE_CHECKING, Any
 
+from core.account_tree import apply_account_tree_deltas, build_account_tree
+from core.analytics_engine import AnalyticsSnapshot, DatedColumn
 from core.cache_manager import get_cache, invalidate_cache
+from core.identity_resolver import IdentityResolver
 from core.logger import get_logger
 from core.signals import app_signals
 from core.text_utils import normalize_user_text
+from services.cashbox_audit_job import CashboxAuditJob
 
 if TYPE_CHECKING:
     from core.event_bus import EventBus
@@ -137,6 +143,9 @@ class AccountingService:
     _hierarchy_cache = None
     _hierarchy_cache_time = 0
     _HIERARCHY_CACHE_TTL = 300  # ⚡ 5 دقائق بدلاً من 60 ثانية
+    _hierarchy_cache_lock = threading.Lock()
+    # ⚡ آخر تغيير في الشجرة كان ترقيعاً بفروق حركة نقدية (لا يحتاج إعادة بناء)
+    _hierarchy_cache_patched = False
 
     @staticmethod
     def _has_qapplication() -> bool:
@@ -163,6 +172,12 @@ class AccountingService:
         self.bus = event_bus
         self._cash_recalc_in_flight = False
         self._cash_recalc_lock = threading.Lock()
+        # ⚡ لقطة أعمدة التحليلات (NumPy) مربوطة بنسخة البيانات من change_counters
+        self._analytics_snapshot: AnalyticsSnapshot | None = None
+        # ⚡ نتائج التقارير المجمعة: (التقرير، الفترة) -> (نسخة البيانات، النتيجة)
+        self._report_cache: dict[tuple, tuple[Any, dict]] = {}
+        # ⚡ مراجعة الخزن التزايدية (تُنشأ عند أول طلب)
+        self._cashbox_audit_job = None
         logger.info("الروبوت المحاسبي (AccountingService) جاهز")
 
         # أهم خطوة: الروبوت بيشترك في الأحداث أول ما يشتغل
@@ -298,8 +313,14 @@ class AccountingService:
     ) -> tuple[dict[str, float], dict[str, float]]:
         """Ø§Ø´ØªÙ‚Ø§Ù‚ Ø¥Ø¬Ù…Ø§Ù„ÙŠØ§Øª Ø§Ù„ÙˆØ§Ø±Ø¯ ÙˆØ§Ù„ØµØ§Ø¯Ø± Ù„Ù„Ø®Ø²Ù† Ø¨Ø±Ø¨Ø· Ù…Ø±Ù† Ù„Ù„Ù…Ø±Ø§Ø¬Ø¹ Ø§Ù„Ù‚Ø¯ÙŠÙ…Ø© ÙˆØ§Ù„Ø­Ø§Ù„ÙŠØ©."""
         accounts = accounts if accounts is not None else self._safe_repo_list("get_all_accounts")
-        payments = payments if payments is not None else self._safe_repo_list("get_all_payments")
-        expenses = expenses if expenses is not None else self._safe_repo_list("get_all_expenses")
+        if payments is None:
+            payments = self._scan_repo_records(
+                "payments", self._CASH_FLOW_PAYMENT_FIELDS, "get_all_payments"
+            )
+        if expenses is None:
+            expenses = self._scan_repo_records(
+                "expenses", self._CASH_FLOW_EXPENSE_FIELDS, "get_all_expenses"
+            )
         reference_map = self._build_account_reference_map(accounts)
 
         inflow_by_code: dict[str, float] = {}
@@ -460,6 +481,17 @@ class AccountingService:
 
         return result
 
+    def get_cashbox_audit_job(self):
+        """
+        ⚡ مهمة مراجعة الخزن التزايدية (نقاط تحقق في SQLite)؛ None لو المخزن لا يدعمها.
+        audit_cashbox_integrity تبقى للمراجعة الكاملة مع الإصلاح.
+        """
+        if self._cashbox_audit_job is None:
+            if not callable(getattr(self.repo, "get_cash_movement_groups", None)):
+                return None
+            self._cashbox_audit_job = CashboxAuditJob(self)
+        return self._cashbox_audit_job
+
     def _select_preferred_leaf_code(
         self, candidate_codes: set[str], *preferred_codes: str
     ) -> str | None:
@@ -489,8 +521,12 @@ class AccountingService:
         if not cash_leaf_codes:
             return {}
 
-        payments = self.repo.get_all_payments() if hasattr(self.repo, "get_all_payments") else []
-        expenses = self.repo.get_all_expenses() if hasattr(self.repo, "get_all_expenses") else []
+        payments = self._scan_repo_records(
+            "payments", self._CASH_FLOW_PAYMENT_FIELDS, "get_all_payments"
+        )
+        expenses = self._scan_repo_records(
+            "expenses", self._CASH_FLOW_EXPENSE_FIELDS, "get_all_expenses"
+        )
 
         overrides: dict[str, float] = {}
 
@@ -740,6 +776,8 @@ class AccountingService:
     def _recalculate_cash_balances(self) -> None:
         """
         إعادة حساب أرصدة الخزن من الحركة الفعلية للدفعات والمصروفات.
+        ⚠️ تدقيق/إصلاح كامل فقط (بدء التشغيل أو طلب يدوي)؛ أحداث الدفعات والمصروفات
+        تطبق فروقاً تزايدية عبر _apply_cash_balance_deltas.
         """
         try:
             accounts = self._safe_repo_list("get_all_accounts")
@@ -1018,13 +1056,32 @@ class AccountingService:
             traceback.print_exc()
             return False
 
+    @staticmethod
+    def invalidate_hierarchy_cache() -> None:
+        """إبطال شجرة الحسابات المخزنة لتُعاد بناؤها عند الطلب التالي."""
+        with AccountingService._hierarchy_cache_lock:
+            AccountingService._hierarchy_cache = None
+            AccountingService._hierarchy_cache_time = 0
+            AccountingService._hierarchy_cache_patched = False
+
+    @staticmethod
+    def consume_hierarchy_patch() -> bool:
+        """
+        هل رُقّعت الشجرة بفروق حركة نقدية منذ آخر استدعاء؟
+        يستخدمها معالج accounting_changed ليُبطل الشجرة لأي تغيير آخر.
+        """
+        with AccountingService._hierarchy_cache_lock:
+            patched = AccountingService._hierarchy_cache_patched
+            AccountingService._hierarchy_cache_patched = False
+            return patched
+
     def get_hierarchy_with_balances(self, force_refresh: bool = False) -> dict[str, dict]:
         """
         ⚡ جلب شجرة الحسابات مع حساب الأرصدة التراكمية للمجموعات (مع cache)
         ⚡ محسّن للسرعة: يستخدم الأرصدة المخزنة مباشرة بدلاً من حساب القيود
 
         Returns:
-            Dict[code, {obj: Account, total: float, children: []}]
+            Dict[code, {obj: Account, total: float, children: [], parent: code}]
         """
 
         # ⚡ استخدام الـ cache إذا كان صالحاً
@@ -1043,78 +1100,9 @@ class AccountingService:
             if not accounts:
                 return {}
 
-            # ⚡ إنشاء قاموس للوصول السريع O(1)
-            tree_map: dict[str, dict] = {}
-            for acc in accounts:
-                if acc.code:
-                    # ⚡ استخدام الرصيد المخزن مباشرة (أسرع بكثير)
-                    stored_balance = getattr(acc, "balance", 0.0) or 0.0
-                    tree_map[acc.code] = {
-                        "obj": acc,
-                        "total": stored_balance,
-                        "children": [],
-                        "is_group": getattr(acc, "is_group", False),
-                    }
-
             operational_overrides = self._build_operational_balance_overrides(accounts)
-            for code, balance in operational_overrides.items():
-                if code in tree_map:
-                    tree_map[code]["total"] = float(balance)
-
-            # ⚡ دالة استنتاج كود الأب
-            def get_parent_code_from_code(code: str) -> str | None:
-                if not code:
-                    return None
-                code_len = len(code)
-                if code_len == 6:
-                    if code.endswith("00000"):
-                        return None
-                    elif code.endswith("0000"):
-                        return code[0] + "00000"
-                    elif code.endswith("000"):
-                        return code[:2] + "0000"
-                    elif code.endswith("00"):
-                        return code[:3] + "000"
-                    else:
-                        return code[:4] + "00"
-                elif code_len == 4:
-                    if code.endswith("000"):
-                        return None
-                    elif code.endswith("00"):
-                        return code[0] + "000"
-                    else:
-                        return code[:2] + "00"
-                return None
-
-            # ⚡ ربط الحسابات بالآباء
-            for acc in accounts:
-                if not acc.code:
-                    continue
-                code_len = len(acc.code)
-                if (code_len == 6 and acc.code.endswith("00000")) or (
-                    code_len == 4 and acc.code.endswith("000")
-                ):
-                    continue
-                parent_code = getattr(acc, "parent_id", None) or getattr(acc, "parent_code", None)
-                if not parent_code:
-                    parent_code = get_parent_code_from_code(acc.code)
-                if parent_code and parent_code in tree_map and parent_code != acc.code:
-                    tree_map[parent_code]["children"].append(tree_map[acc.code])
-
-            # ⚡ حساب الأرصدة التراكمية للمجموعات
-            def calculate_total(node: dict) -> float:
-                if not node["children"]:
-                    return float(node["total"])
-                total = sum(calculate_total(child) for child in node["children"])
-                node["total"] = total
-                return float(total)
-
-            # ⚡ حساب الجذور
-            for _, node in tree_map.items():
-                acc = node["obj"]
-                parent_id = getattr(acc, "parent_id", None) or getattr(acc, "parent_code", None)
-                if not parent_id or parent_id not in tree_map:
-                    calculate_total(node)
+            # ⚡ الشجرة تحمل مؤشر الأب لكل عقدة فتُرقَّع لاحقاً بالفروق بدل إعادة البناء
+            tree_map = build_account_tree(accounts, operational_overrides)
 
             # ⚡ حفظ في الـ cache
             AccountingService._hierarchy_cache = tree_map
@@ -1131,7 +1119,52 @@ class AccountingService:
         جلب ملخص تشغيلي مبسّط بعد تعطيل المحاسبة الداخلية.
 
         القيم الآن مبنية على الخزن الفعلية وحركة الدفعات والمصروفات فقط.
+        ⚡ من مجاميع SQL (مع cache حسب نسخة البيانات)، والمسح الكامل احتياطي فقط.
         """
+
+        def build(aggregates: dict[str, list]) -> dict[str, float]:
+            payments, expenses, _journal = self._resolve_report_accounts(aggregates)
+            payments_by_cash: dict[str, float] = {}
+            expenses_by_cash: dict[str, float] = {}
+            for _account, code, total, _count, _journaled in payments:
+                if code:
+                    payments_by_cash[code] = payments_by_cash.get(code, 0.0) + total
+            for _cash, code, _charged, _category, total, _count, _journaled in expenses:
+                if code:
+                    expenses_by_cash[code] = expenses_by_cash.get(code, 0.0) + total
+
+            assets = 0.0
+            for account in self.get_all_accounts_cached():
+                if not (self._is_leaf_account(account) and self._is_cash_account_like(account)):
+                    continue
+                code = str(getattr(account, "code", "") or "")
+                derived_balance = payments_by_cash.get(code, 0.0) - expenses_by_cash.get(code, 0.0)
+                if abs(derived_balance) > 0.01:
+                    assets += derived_balance
+                else:
+                    assets += self._safe_amount(getattr(account, "balance", 0.0))
+
+            revenue = sum(payment[2] for payment in payments)
+            opex = sum(expense[4] for expense in expenses)
+            return {
+                "assets": assets,
+                "liabilities": 0.0,
+                "equity": assets,
+                "revenue": revenue,
+                "cogs": 0.0,
+                "opex": opex,
+                "expenses": opex,
+                "gross_profit": revenue,
+                "net_profit": revenue - opex,
+            }
+
+        try:
+            summary = self._cached_report("financial_summary", None, None, build)
+            if summary is not None:
+                return summary
+        except Exception as e:
+            safe_print(f"WARNING: [AccountingService] فشل الملخص المالي المجمع: {e}")
+
         try:
             accounts = (
                 self.repo.get_all_accounts() if hasattr(self.repo, "get_all_accounts") else []
@@ -1228,53 +1261,111 @@ class AccountingService:
         # ⚠️ معطل - لا يتم تحديث قيود محاسبية
         pass
 
-    def handle_new_expense(self, data):
+    @staticmethod
+    def _event_record(data, key: str, model_name: str):
+        """استخراج السجل من payload الحدث (dict أو الكائن مباشرة)."""
+        record = data.get(key) if isinstance(data, dict) else data
+        if isinstance(record, dict):
+            try:
+                record = getattr(schemas, model_name)(**record)
+            except Exception:
+                return None
+        return record
+
+    def _apply_cash_balance_deltas(
+        self, kind: str, new=None, previous=None
+    ) -> dict[str, float] | None:
         """
-        معالج إنشاء مصروف جديد - يعيد حساب رصيد الحساب
+        ⚡ تطبيق أثر دفعة/مصروف على رصيد الخزنة وآبائها كفرق موقّع (transaction واحدة)
+        بدل إعادة حساب كل الأرصدة من كل الدفعات والمصروفات.
+        new يُضاف أثره و previous يُطرح (التعديل = الاثنين معاً).
 
-        عند إنشاء مصروف:
-        - يتم إعادة حساب رصيد حساب الدفع من جميع الدفعات والمصروفات
+        Returns:
+            فروق الحسابات الورقية المطبقة، أو None لو تعذر التطبيق التزايدي
+            (يرجع المستدعي لإعادة الحساب الكاملة)
         """
-        # دعم استقبال البيانات كـ dict أو كـ Expense مباشرة
-        if isinstance(data, dict):
-            expense = data.get("expense", data)
-            if isinstance(expense, dict):
-                expense = schemas.Expense(**expense)
-        else:
-            expense = data
+        apply_deltas = getattr(self.repo, "apply_account_balance_deltas", None)
+        if not callable(apply_deltas):
+            return None
+        reference_map = self._build_account_reference_map(self.get_all_accounts_cached())
 
-        safe_print(
-            f"INFO: [AccountingService] تم استقبال حدث مصروف جديد: {expense.category} - {expense.amount} جنيه"
-        )
+        deltas: dict[str, float] = {}
+        for record, sign in ((new, 1.0), (previous, -1.0)):
+            if record is None:
+                continue
+            if kind == "payment":
+                account = self._resolve_account_reference(
+                    getattr(record, "account_id", None), reference_map, cash_only=True
+                )
+                direction = 1.0
+            else:
+                account, _needs_repair, _needs_backfill = self._resolve_expense_cash_account(
+                    record, reference_map
+                )
+                direction = -1.0
+            if account is None or not self._is_leaf_account(account):
+                continue
+            code = str(getattr(account, "code", "") or "")
+            if not code or code.endswith("000"):
+                continue
+            amount = self._safe_amount(getattr(record, "amount", 0.0))
+            deltas[code] = deltas.get(code, 0.0) + sign * direction * amount
 
         try:
-            # ⚡ إبطال الـ cache أولاً
-            AccountingService._hierarchy_cache = None
-            AccountingService._hierarchy_cache_time = 0
-
-            # تحديد حساب الدفع
-            payment_account_code = getattr(expense, "account_id", None) or getattr(
-                expense, "payment_account_id", None
-            )
+            apply_deltas(deltas)
+        except Exception as e:
+            safe_print(f"WARNING: [AccountingService] فشل تطبيق فروق الأرصدة: {e}")
+            return None
+        return deltas
 
-            if not payment_account_code:
-                safe_print("WARNING: [AccountingService] لم يتم تحديد حساب الدفع!")
+    @staticmethod
+    def _patch_hierarchy_cache(deltas: dict[str, float]) -> None:
+        """
+        ⚡ ترقيع شجرة الحسابات المخزنة بفروق الأرصدة (مسار الأسلاف فقط)
+        بدل إبطالها وإعادة بنائها بالكامل مع كل حركة.
+        """
+        with AccountingService._hierarchy_cache_lock:
+            tree_map = AccountingService._hierarchy_cache
+            if not tree_map:
                 return
+            if not apply_account_tree_deltas(tree_map, deltas):
+                # حساب غير موجود في الشجرة -> إعادة بناء عند الطلب التالي
+                AccountingService._hierarchy_cache = None
+                AccountingService._hierarchy_cache_time = 0
+                return
+            AccountingService._hierarchy_cache_patched = True
+
+    def _handle_cash_movement(self, kind: str, data_type: str, new=None, previous=None) -> None:
+        """تحديث أرصدة الخزن بعد حدث دفعة/مصروف ثم إرسال إشارات التحديث."""
+        deltas = None
+        if new is not None or previous is not None:
+            deltas = self._apply_cash_balance_deltas(kind, new=new, previous=previous)
+        if deltas is None:
+            # بيانات الحدث ناقصة -> إبطال الشجرة وإعادة الحساب الكاملة في الخلفية
+            AccountingService._hierarchy_cache = None
+            AccountingService._hierarchy_cache_time = 0
+            self._schedule_cash_recalc(["accounting", data_type])
+            return
 
-            # ⚡ إعادة حساب رصيد الحساب من جميع الدفعات والمصروفات
-            new_balance = self.recalculate_account_balance(payment_account_code)
-
-            safe_print(
-                f"SUCCESS: [AccountingService] ✅ تم تحديث رصيد {payment_account_code} = {new_balance}"
-            )
+        self._patch_hierarchy_cache(deltas)
 
-            # ⚡ إرسال إشارات التحديث الفوري
-            try:
-                app_signals.emit_data_changed("accounting")
-                app_signals.emit_data_changed("expenses")
-            except Exception as sig_err:
-                safe_print(f"WARNING: [AccountingService] فشل إرسال الإشارات: {sig_err}")
+        try:
+            app_signals.emit_data_changed("accounting")
+            app_signals.emit_data_changed(data_type)
+        except Exception as sig_err:
+            safe_print(f"WARNING: [AccountingService] فشل إرسال الإشارات: {sig_err}")
 
+    def handle_new_expense(self, data):
+        """
+        معالج إنشاء مصروف جديد - يخصم المبلغ من رصيد خزنة الدفع وآبائها
+        """
+        try:
+            expense = self._event_record(data, "expense", "Expense")
+            if expense is not None:
+                safe_print(
+                    f"INFO: [AccountingService] تم استقبال حدث مصروف جديد: {expense.category} - {expense.amount} جنيه"
+                )
+            self._handle_cash_movement("expense", "expenses", new=expense)
         except Exception as e:
             safe_print(f"ERROR: [AccountingService] فشل معالجة المصروف: {e}")
 
@@ -1282,87 +1373,84 @@ class AccountingService:
 
     def handle_updated_expense(self, data):
         """
-        ✅ معالج تعديل مصروف - يعيد حساب أرصدة جميع الحسابات النقدية
+        ✅ معالج تعديل مصروف - يطرح أثر النسخة السابقة ويضيف أثر الجديدة
         """
         try:
-            # ⚡ إبطال الـ cache أولاً
-            AccountingService._hierarchy_cache = None
-            AccountingService._hierarchy_cache_time = 0
-
-            # ⚡ إعادة حساب جميع الحسابات النقدية (لأن الحساب القديم قد يكون مختلفاً)
-            self._schedule_cash_recalc(["accounting", "expenses"])
-
+            previous = self._event_record(data, "previous", "Expense")
+            expense = self._event_record(data, "expense", "Expense")
+            if previous is None:
+                # بدون النسخة السابقة لا يمكن معرفة الخزنة القديمة
+                expense = None
+            self._handle_cash_movement("expense", "expenses", new=expense, previous=previous)
         except Exception:
             pass
 
     def handle_deleted_expense(self, data: dict):
         """
-        ✅ معالج حذف مصروف - يعيد حساب أرصدة جميع الحسابات النقدية
+        ✅ معالج حذف مصروف - يعيد المبلغ لرصيد الخزنة وآبائها
         """
         try:
-            # ⚡ إبطال الـ cache أولاً
-            AccountingService._hierarchy_cache = None
-            AccountingService._hierarchy_cache_time = 0
-
-            self._schedule_cash_recalc(["accounting", "expenses"])
+            expense = self._event_record(data, "expense", "Expense")
+            self._handle_cash_movement("expense", "expenses", previous=expense)
         except Exception:
             pass
 
     def handle_new_payment(self, data: dict):
         """معالج استلام دفعة جديدة"""
         try:
-            # ⚡ إبطال الـ cache أولاً
-            AccountingService._hierarchy_cache = None
-            AccountingService._hierarchy_cache_time = 0
-            self._schedule_cash_recalc(["accounting", "payments"])
+            payment = self._event_record(data, "payment", "Payment")
+            self._handle_cash_movement("payment", "payments", new=payment)
         except Exception:
             pass
 
     def handle_updated_payment(self, data: dict):
         """معالج تعديل دفعة"""
         try:
-            # ⚡ إبطال الـ cache أولاً
-            AccountingService._hierarchy_cache = None
-            AccountingService._hierarchy_cache_time = 0
-            self._schedule_cash_recalc(["accounting", "payments"])
+            previous = self._event_record(data, "previous", "Payment")
+            payment = self._event_record(data, "payment", "Payment") if previous else None
+            self._handle_cash_movement("payment", "payments", new=payment, previous=previous)
         except Exception:
             pass
 
     def handle_deleted_payment(self, data: dict):
         """معالج حذف دفعة"""
         try:
-            # ⚡ إبطال الـ cache أولاً
-            AccountingService._hierarchy_cache = None
-            AccountingService._hierarchy_cache_time = 0
-            self._schedule_cash_recalc(["accounting", "payments"])
+            payment = self._event_record(data, "payment", "Payment")
+            self._handle_cash_movement("payment", "payments", previous=payment)
         except Exception:
             pass
 
+    @staticmethod
+    def _signed_balance_delta(account, amount: float, is_debit: bool) -> float:
+        """
+        أثر مبلغ مدين/دائن على رصيد الحساب حسب نوعه:
+        الأصول والمصروفات: المدين يزيد، الدائن ينقص
+        الخصوم والإيرادات وحقوق الملكية: الدائن يزيد، المدين ينقص
+        """
+        # ⚡ دعم كل من enum و string
+        account_type = account.type
+        if hasattr(account_type, "value"):
+            account_type_str = account_type.value
+        else:
+            account_type_str = str(account_type)
+
+        # الأنواع التي تزيد بالمدين
+        debit_increase_types = ["ASSET", "CASH", "EXPENSE", "أصول", "أصول نقدية", "مصروفات"]
+
+        if account_type_str in debit_increase_types:
+            return amount if is_debit else -amount
+        return -amount if is_debit else amount
+
     def _update_account_balance(self, account, amount: float, is_debit: bool):
         """تحديث رصيد الحساب"""
         try:
             old_balance = account.balance or 0.0
 
-            # الأصول والمصروفات: المدين يزيد، الدائن ينقص
-            # الخصوم والإيرادات وحقوق الملكية: الدائن يزيد، المدين ينقص
-
-            # ⚡ دعم كل من enum و string
             account_type = account.type
-            if hasattr(account_type, "value"):
-                account_type_str = account_type.value
-            else:
-                account_type_str = str(account_type)
-
-            # الأنواع التي تزيد بالمدين
-            debit_increase_types = ["ASSET", "CASH", "EXPENSE", "أصول", "أصول نقدية", "مصروفات"]
-
-            is_debit_increase_type = account_type_str in debit_increase_types
-
-            if is_debit_increase_type:
-                new_balance = old_balance + amount if is_debit else old_balance - amount
-            else:
-                # الإيرادات والخصوم تزيد بالدائن
-                new_balance = old_balance - amount if is_debit else old_balance + amount
+            account_type_str = (
+                account_type.value if hasattr(account_type, "value") else str(account_type)
+            )
+            new_balance = old_balance + self._signed_balance_delta(account, amount, is_debit)
 
             safe_print(f"DEBUG: [AccountingService] تحديث رصيد {account.name} ({account.code}):")
             safe_print(f"  - نوع الحساب: {account_type_str}")
@@ -1397,9 +1485,363 @@ class AccountingService:
 
             traceback.print_exc()
 
+    # ==================== التقارير المالية (مجاميع SQL) ====================
+
+    _REPORT_TABLES = ("payments", "expenses", "journal_entries", "accounts")
+    _REPORT_CACHE_LIMIT = 32
+    _COLLECTIONS_LABEL = "تحصيلات المشاريع"
+
+    @staticmethod
+    def _report_bounds(
+        start_date: datetime | None, end_date: datetime | None
+    ) -> tuple[str | None, str | None]:
+        """حدود [start, end] كنصوص ISO لمقارنة أعمدة التاريخ: بداية شاملة ونهاية مفتوحة."""
+        start_iso = end_iso = None
+        if start_date is not None:
+            start_date = start_date.replace(tzinfo=None)
+            if start_date.time() == datetime.min.time():
+                start_iso = start_date.date().isoformat()
+            else:
+                start_iso = start_date.isoformat()
+        if end_date is not None:
+            end_iso = (end_date.replace(tzinfo=None) + timedelta(microseconds=1)).isoformat()
+        return start_iso, end_iso
+
+    def _get_report_aggregates(
+        self, start_iso: str | None, end_iso: str | None
+    ) -> dict[str, list] | None:
+        getter = getattr(self.repo, "get_report_aggregates", None)
+        if not callable(getter):
+            return None
+        try:
+            aggregates = getter(start_iso, end_iso)
+        except Exception as e:
+            safe_print(f"WARNING: [AccountingService] فشل جلب مجاميع التقارير: {e}")
+            return None
+        return aggregates if isinstance(aggregates, dict) else None
+
+    def _cached_report(self, report: str, start_date, end_date, builder) -> dict | None:
+        """
+        ⚡ نتيجة تقرير لكل (تقرير، فترة، نسخة بيانات)؛ تُحسب بالمجاميع مرة واحدة
+        وتُخدم من الذاكرة حتى تتغير الدفعات/المصروفات/القيود/الحسابات.
+        """
+        start_iso, end_iso = self._report_bounds(start_date, end_date)
+        key = (report, start_iso, end_iso)
+        version = self._analytics_data_version(self._REPORT_TABLES)
+        cached = self._report_cache.get(key)
+        if cached is not None and version is not None and cached[0] == version:
+            return copy.deepcopy(cached[1])
+
+        aggregates = self._get_report_aggregates(start_iso, end_iso)
+        if aggregates is None:
+            return None
+        result = builder(aggregates)
+        if result is None:
+            return None
+        if version is not None:
+            if (
+                key not in self._report_cache
+                and len(self._report_cache) >= self._REPORT_CACHE_LIMIT
+            ):
+                self._report_cache.pop(next(iter(self._report_cache)))
+            self._report_cache[key] = (version, result)
+        return copy.deepcopy(result)
+
+    def _resolve_report_accounts(self, aggregates: dict[str, list]):
+        """
+        حل مراجع الصفوف المجمعة إلى الحسابات (مرة لكل مرجع مميز لا لكل سجل).
+        آخر عنصر في كل دفعة/مصروف = journaled (للحركة قيد يحمل أثرها في أسطر القيود).
+        """
+        reference_map = self._build_account_reference_map(self.get_all_accounts_cached())
+
+        def cash_code(account) -> str | None:
+            if account is None or not self._is_leaf_account(account):
+                return None
+            code = str(getattr(account, "code", "") or "")
+            return code if code and not code.endswith("000") else None
+
+        payments = []
+        for account_ref, total, count, *journaled in aggregates.get("payments") or []:
+            account = self._resolve_account_reference(account_ref, reference_map, cash_only=True)
+            payments.append(
+                (
+                    account,
+                    cash_code(account),
+                    self._safe_amount(total),
+                    int(count),
+                    bool(journaled and journaled[0]),
+                )
+            )
+
+        expenses = []
+        for payment_ref, account_ref, category, total, count, *journaled in (
+            aggregates.get("expenses") or []
+        ):
+            cash_account, charged = self._resolve_report_expense_accounts(
+                payment_ref, account_ref, reference_map
+            )
+            expenses.append(
+                (
+                    cash_account,
+                    cash_code(cash_account),
+                    charged,
+                    str(category or "").strip(),
+                    self._safe_amount(total),
+                    int(count),
+                    bool(journaled and journaled[0]),
+                )
+            )
+
+        journal = None
+        if aggregates.get("journal") is not None:
+            journal = []
+            for account_code, account_id, debit, credit in aggregates["journal"]:
+                account = self._resolve_account_reference(
+                    account_code, reference_map
+                ) or self._resolve_account_reference(account_id, reference_map)
+                journal.append(
+                    (
+                        account,
+                        str(account_code or account_id or ""),
+                        self._safe_amount(debit),
+                        self._safe_amount(credit),
+                    )
+                )
+        return payments, expenses, journal
+
+    def _resolve_report_expense_accounts(self, payment_ref, account_ref, reference_map):
+        """(خزنة الدفع، حساب المصروف المحمّل) لمصروف؛ المحمّل None لو كان خزنة."""
+        cash_account, _needs_repair, _needs_backfill = self._resolve_expense_cash_account(
+            SimpleNamespace(payment_account_id=payment_ref, account_id=account_ref),
+            reference_map,
+        )
+        charged = self._resolve_account_reference(account_ref, reference_map)
+        if charged is not None and (charged is cash_account or self._is_cash_account_like(charged)):
+            charged = None
+        return cash_account, charged
+
+    @staticmethod
+    def _report_expense_name(charged, category: str) -> str:
+        return charged.name if charged is not None else category or "مصروفات أخرى"
+
+    @staticmethod
+    def _report_account_type(account) -> str:
+        account_type = getattr(account, "type", "")
+        return str(getattr(account_type, "value", account_type) or "")
+
+    def get_trial_balance(
+        self, start_date: datetime | None = None, end_date: datetime | None = None
+    ) -> dict:
+        """
+        ⚡ ميزان المراجعة لفترة (أو لكل الفترات): مجموع المدين والدائن لكل حساب من
+        الدفعات (مدين الخزنة / دائن التحصيلات) والمصروفات (مدين المصروف / دائن الخزنة)
+        وأسطر القيود. الحركات التي لها قيد تُؤخذ من أسطر قيدها فقط (نفس قاعدة P&L).
+
+        Returns:
+            {"rows": [{code, name, type, debit, credit, balance}],
+             "total_debit", "total_credit", "balanced"}
+        """
+
+        def build(aggregates: dict[str, list]) -> dict:
+            payments, expenses, journal = self._resolve_report_accounts(aggregates)
+            rows: dict[tuple[str, str], dict] = {}
+
+            def post(account, fallback_name: str, fallback_type: str, debit=0.0, credit=0.0):
+                if account is not None:
+                    key = ("account", str(account.code or ""))
+                    name = account.name
+                    account_type = self._report_account_type(account)
+                else:
+                    key = ("virtual", fallback_name)
+                    name = fallback_name
+                    account_type = fallback_type
+                row = rows.setdefault(
+                    key,
+                    {
+                        "code": key[1] if key[0] == "account" else "",
+                        "name": name,
+                        "type": account_type,
+                        "debit": 0.0,
+                        "credit": 0.0,
+                    },
+                )
+                row["debit"] += debit
+                row["credit"] += credit
+
+            revenue_type = schemas.AccountType.REVENUE.value
+            expense_type = schemas.AccountType.EXPENSE.value
+            for account, _code, total, _count, journaled in payments:
+                if journaled:
+                    continue
+                post(account, "خزنة غير محددة", schemas.AccountType.CASH.value, debit=total)
+                post(None, self._COLLECTIONS_LABEL, revenue_type, credit=total)
+            for cash_account, _code, charged, category, total, _count, journaled in expenses:
+                if journaled:
+                    continue
+                post(charged, self._report_expense_name(None, category), expense_type, debit=total)
+                post(cash_account, "خزنة غير محددة", schemas.AccountType.CASH.value, credit=total)
+            for account, reference, debit, credit in journal or []:
+                post(account, reference or "حساب غير معروف", "", debit=debit, credit=credit)
+
+            ordered = sorted(
+                rows.values(), key=lambda row: (row["code"] == "", row["code"], row["name"])
+            )
+            for row in ordered:
+                row["balance"] = row["debit"] - row["credit"]
+            total_debit = sum(row["debit"] for row in ordered)
+            total_credit = sum(row["credit"] for row in ordered)
+            return {
+                "rows": ordered,
+                "total_debit": total_debit,
+                "total_credit": total_credit,
+                "balanced": abs(total_debit - total_credit) < 0.01,
+            }
+
+        result = self._cached_report("trial_balance", start_date, end_date, build)
+        if result is None:
+            return {"rows": [], "total_debit": 0.0, "total_credit": 0.0, "balanced": True}
+        return result
+
     def get_profit_and_loss(self, start_date: datetime, end_date: datetime) -> dict:
-        """حساب تقرير الأرباح والخسائر لفترة محددة مع التفاصيل"""
+        """
+        حساب تقرير الأرباح والخسائر لفترة محددة مع التفاصيل.
+        ⚡ الإيرادات = دائن حسابات الإيرادات، والمصروفات = مدين حسابات المصروفات
+        من أسطر القيود (مجاميع SQL مع cache حسب نسخة البيانات)، بنفس قاعدة المسار القديم.
+        الدفعات والمصروفات بدون قيد مرتبط تُضاف كتحصيلات/مصروفات؛ التي لها قيد لا تُضاف
+        فوقه لأن أسطر القيد تحمل نفس الأثر (نفس قاعدة ميزان المراجعة والميزانية).
+        """
         safe_print(f"INFO: [AccountingService] جاري حساب P&L من {start_date} إلى {end_date}")
+
+        def build(aggregates: dict[str, list]) -> dict | None:
+            payments, expenses, journal = self._resolve_report_accounts(aggregates)
+            if journal is None:
+                return None
+            revenue_breakdown: dict[str, float] = {}
+            expense_breakdown: dict[str, float] = {}
+
+            for _account, _code, total, _count, journaled in payments:
+                if not journaled:
+                    revenue_breakdown[self._COLLECTIONS_LABEL] = (
+                        revenue_breakdown.get(self._COLLECTIONS_LABEL, 0.0) + total
+                    )
+            for _cash, _code, charged, category, total, _count, journaled in expenses:
+                if not journaled:
+                    name = self._report_expense_name(charged, category)
+                    expense_breakdown[name] = expense_breakdown.get(name, 0.0) + total
+
+            for account, _reference, debit, credit in journal:
+                if account is None:
+                    continue
+                if account.type == schemas.AccountType.REVENUE:
+                    revenue_breakdown[account.name] = (
+                        revenue_breakdown.get(account.name, 0.0) + credit
+                    )
+                elif account.type == schemas.AccountType.EXPENSE:
+                    expense_breakdown[account.name] = (
+                        expense_breakdown.get(account.name, 0.0) + debit
+                    )
+
+            total_revenue = sum(revenue_breakdown.values())
+            total_expenses = sum(expense_breakdown.values())
+            return {
+                "total_revenue": total_revenue,
+                "total_expenses": total_expenses,
+                "net_profit": total_revenue - total_expenses,
+                "revenue_breakdown": revenue_breakdown,
+                "expense_breakdown": expense_breakdown,
+            }
+
+        result = self._cached_report("profit_and_loss", start_date, end_date, build)
+        if result is None:
+            return self._get_profit_and_loss_from_entries(start_date, end_date)
+        return result
+
+    def get_balance_sheet(self, as_of: datetime | None = None) -> dict:
+        """
+        ⚡ الميزانية حتى تاريخ: الخزن من صافي الدفعات والمصروفات، باقي حسابات الأصول
+        والخصوم وحقوق الملكية من أسطر القيود، والأرباح المحتجزة من الإيرادات - المصروفات.
+        الحركات التي لها قيد تُؤخذ من أسطر قيدها فقط (نفس قاعدة P&L).
+
+        Returns:
+            {"assets"/"liabilities"/"equity": [{code, name, balance}],
+             "total_assets", "total_liabilities", "total_equity", "retained_earnings"}
+        """
+
+        def build(aggregates: dict[str, list]) -> dict:
+            payments, expenses, journal = self._resolve_report_accounts(aggregates)
+            sections: dict[str, dict[str, dict]] = {"assets": {}, "liabilities": {}, "equity": {}}
+
+            def add(section: str, account, amount: float) -> None:
+                code = str(getattr(account, "code", "") or "")
+                row = sections[section].setdefault(
+                    code, {"code": code, "name": account.name, "balance": 0.0}
+                )
+                row["balance"] += amount
+
+            revenue = 0.0
+            expenses_total = 0.0
+            for account, code, total, _count, journaled in payments:
+                if journaled:
+                    continue
+                revenue += total
+                if code:
+                    add("assets", account, total)
+            for cash_account, code, _charged, _category, total, _count, journaled in expenses:
+                if journaled:
+                    continue
+                expenses_total += total
+                if code:
+                    add("assets", cash_account, -total)
+
+            asset_types = {
+                schemas.AccountType.ASSET.value,
+                schemas.AccountType.CASH.value,
+            }
+            for account, _reference, debit, credit in journal or []:
+                if account is None:
+                    continue
+                account_type = self._report_account_type(account)
+                if account_type == schemas.AccountType.REVENUE.value:
+                    revenue += credit - debit
+                elif account_type == schemas.AccountType.EXPENSE.value:
+                    expenses_total += debit - credit
+                elif account_type in asset_types:
+                    add("assets", account, debit - credit)
+                elif account_type == schemas.AccountType.LIABILITY.value:
+                    add("liabilities", account, credit - debit)
+                elif account_type == schemas.AccountType.EQUITY.value:
+                    add("equity", account, credit - debit)
+
+            result: dict[str, Any] = {}
+            for section, rows in sections.items():
+                result[section] = sorted(rows.values(), key=lambda row: row["code"])
+            retained_earnings = revenue - expenses_total
+            result["retained_earnings"] = retained_earnings
+            result["total_assets"] = sum(row["balance"] for row in result["assets"])
+            result["total_liabilities"] = sum(row["balance"] for row in result["liabilities"])
+            result["total_equity"] = (
+                sum(row["balance"] for row in result["equity"]) + retained_earnings
+            )
+            return result
+
+        result = self._cached_report("balance_sheet", None, as_of, build)
+        if result is None:
+            return {
+                "assets": [],
+                "liabilities": [],
+                "equity": [],
+                "retained_earnings": 0.0,
+                "total_assets": 0.0,
+                "total_liabilities": 0.0,
+                "total_equity": 0.0,
+            }
+        return result
+
+    def _get_profit_and_loss_from_entries(self, start_date: datetime, end_date: datetime) -> dict:
+        """
+        المسار القديم (مسح كل القيود في Python) عند غياب مجاميع SQL؛ الدفعات والمصروفات
+        بدون قيد مرتبط تُضاف كتحصيلات/مصروفات بنفس قاعدة مسار المجاميع.
+        """
         try:
             total_revenue = 0.0
             total_expenses = 0.0
@@ -1446,6 +1888,50 @@ class AccountingService:
                                 expense_breakdown[acc_name] = 0.0
                             expense_breakdown[acc_name] += line.debit
 
+            # نفس ربط مسار المجاميع: مرجع القيد + سطر يحرك خزنة الحركة بنفس المبلغ
+            linked_lines: dict[str, list] = {}
+            for entry in all_entries:
+                if getattr(entry, "related_document_id", None):
+                    linked_lines.setdefault(str(entry.related_document_id), []).extend(entry.lines)
+
+            def is_journaled(record, side: str, cash_refs) -> bool:
+                refs = {str(getattr(record, "id", "") or ""), str(record._mongo_id or "")}
+                cash_refs = {str(ref) for ref in cash_refs if ref}
+                amount = self._safe_amount(record.amount)
+                return any(
+                    abs(self._safe_amount(getattr(line, side, 0.0)) - amount) < 0.01
+                    and bool(
+                        {str(line.account_id or ""), str(getattr(line, "account_code", "") or "")}
+                        & cash_refs
+                    )
+                    for ref in refs & set(linked_lines)
+                    for line in linked_lines[ref]
+                )
+
+            reference_map = self._build_account_reference_map(all_accounts)
+            for payment in self._safe_repo_list("get_all_payments"):
+                if not (start_date <= payment.date <= end_date) or is_journaled(
+                    payment, "debit", (payment.account_id,)
+                ):
+                    continue
+                amount = self._safe_amount(payment.amount)
+                total_revenue += amount
+                revenue_breakdown[self._COLLECTIONS_LABEL] = (
+                    revenue_breakdown.get(self._COLLECTIONS_LABEL, 0.0) + amount
+                )
+            for expense in self._safe_repo_list("get_all_expenses"):
+                if not (start_date <= expense.date <= end_date) or is_journaled(
+                    expense, "credit", (expense.payment_account_id, expense.account_id)
+                ):
+                    continue
+                _cash_account, charged = self._resolve_report_expense_accounts(
+                    expense.payment_account_id, expense.account_id, reference_map
+                )
+                name = self._report_expense_name(charged, str(expense.category or "").strip())
+                amount = self._safe_amount(expense.amount)
+                total_expenses += amount
+                expense_breakdown[name] = expense_breakdown.get(name, 0.0) + amount
+
             net_profit = total_revenue - total_expenses
 
             return {
@@ -1706,6 +2192,31 @@ class AccountingService:
                 return None
         return None
 
+    _CASH_FLOW_PAYMENT_FIELDS = ("date", "amount", "account_id")
+    _CASH_FLOW_EXPENSE_FIELDS = ("date", "amount", "account_id", "payment_account_id")
+
+    def _scan_repo_records(
+        self, table_name: str, fields: tuple[str, ...], getter_name: str
+    ) -> list:
+        """
+        ⚡ قراءة خفيفة عبر repo.scan (بدون بناء Pydantic) لمسارات التحليلات.
+        الدفعات والمصروفات تُقرأ بعد إزالة التكرار بالتوقيع مثل get_all_*.
+        لو الـ repo لا يدعم scan نرجع لـ get_all_* بنفس أسماء الحقول كـ attributes.
+        """
+        scan = getattr(self.repo, "scan", None)
+        if callable(scan):
+            try:
+                if table_name in ("payments", "expenses"):
+                    records = scan(table_name, fields, dedupe=True)
+                else:
+                    records = scan(table_name, fields)
+            except Exception as exc:
+                safe_print(f"WARNING: [AccountingService] فشل scan لـ {table_name}: {exc}")
+                records = None
+            if isinstance(records, list):
+                return records
+        return self._safe_repo_list(getter_name)
+
     def _safe_repo_list(self, getter_name: str) -> list:
         getter = getattr(self.repo, getter_name, None)
         if not callable(getter):
@@ -1913,6 +2424,15 @@ class AccountingService:
             client_lookup: dict[str, str] | None = None
             project_lookup_by_client: dict[tuple[str, str], str] | None = None
             project_lookup_generic: dict[str, str] | None = None
+            identity_resolver = None
+            resolver_getter = getattr(self.repo, "get_identity_resolver", None)
+            if callable(resolver_getter):
+                try:
+                    identity_resolver = resolver_getter()
+                except Exception:
+                    identity_resolver = None
+                if not isinstance(identity_resolver, IdentityResolver):
+                    identity_resolver = None
 
             def push_recent_candidate(
                 timestamp: datetime, sequence: int, kind: str, item: Any
@@ -1934,8 +2454,10 @@ class AccountingService:
                     return cached_name
 
                 name = ""
+                if identity_resolver is not None:
+                    name = self._clean_activity_text(identity_resolver.client_name(ref))
                 getter = getattr(self.repo, "get_client_by_id", None)
-                if callable(getter):
+                if not name and callable(getter):
                     try:
                         client = getter(ref)
                         name = self._clean_activity_text(self._activity_attr(client, "name", ""))
@@ -1977,8 +2499,13 @@ class AccountingService:
                     return cached_name
 
                 name = ""
+                if identity_resolver is not None:
+                    project = identity_resolver.project(
+                        ref, identity_resolver.client_keys(client_key)
+                    )
+                    name = self._clean_activity_text(self._activity_attr(project, "name", ""))
                 getter = getattr(self.repo, "get_project_by_number", None)
-                if callable(getter):
+                if not name and callable(getter):
                     try:
                         project = getter(ref, client_key or None)
                         name = self._clean_activity_text(self._activity_attr(project, "name", ""))
@@ -2136,6 +2663,7 @@ class AccountingService:
             # تحديث علامات is_group للحسابات
             if hasattr(self.repo, "update_is_group_flags"):
                 self.repo.update_is_group_flags()
+            self.invalidate_hierarchy_cache()
 
             # إرسال إشارة التحديث العامة
             app_signals.emit_data_changed("accounts")
@@ -2212,6 +2740,7 @@ class AccountingService:
             # تحديث علامات is_group للحسابات
             if hasattr(self.repo, "update_is_group_flags"):
                 self.repo.update_is_group_flags()
+            self.invalidate_hierarchy_cache()
 
             if saved_account is not None:
                 # ⚡ إرسال إشارة التحديث الفوري
@@ -2261,6 +2790,7 @@ class AccountingService:
 
             result = self.repo.delete_account_permanently(account_id)
             if result:
+                self.invalidate_hierarchy_cache()
                 # ⚡ إرسال إشارة التحديث الفوري
                 app_signals.emit_data_changed("accounts")
                 invalidate_cache("accounts")
@@ -2369,6 +2899,116 @@ class AccountingService:
             traceback.print_exc()
             return False
 
+    def post_transactions_batch(self, transactions: list[dict]) -> dict:
+        """
+        ⚡ ترحيل مجموعة معاملات (نفس حقول post_transaction) دفعة واحدة:
+        التحقق من كل المعاملات على خريطة حسابات محمّلة مرة واحدة، ثم حفظ كل القيود
+        وفروق الأرصدة (للحساب وآبائه) في transaction واحدة، وإشارة تحديث واحدة.
+
+        Args:
+            transactions: قائمة dicts بالمفاتيح date, description, amount,
+                debit_account_code, credit_account_code واختيارياً currency,
+                exchange_rate, ref_type, ref_id
+
+        Returns:
+            {"success": bool, "posted": int, "errors": [str]}
+            المعاملات غير الصالحة تُتخطى وتُذكر في errors
+        """
+        accounts_by_code = {
+            str(acc.code): acc for acc in (self.repo.get_all_accounts() or []) if acc.code
+        }
+        entries: list[schemas.JournalEntry] = []
+        deltas: dict[str, float] = {}
+        errors: list[str] = []
+
+        def add_delta(account, amount_egp: float, is_debit: bool) -> None:
+            visited: set[str] = set()
+            current = account
+            while current is not None and current.code not in visited:
+                visited.add(current.code)
+                deltas[current.code] = deltas.get(current.code, 0.0) + self._signed_balance_delta(
+                    current, amount_egp, is_debit
+                )
+                current = accounts_by_code.get(str(current.parent_code or ""))
+
+        for index, tx in enumerate(transactions or []):
+            try:
+                date = tx["date"]
+                description = str(tx.get("description") or "")
+                amount = float(tx["amount"])
+                currency = str(tx.get("currency") or "EGP")
+                exchange_rate = float(tx.get("exchange_rate") or 1.0)
+                debit_code = str(tx["debit_account_code"])
+                credit_code = str(tx["credit_account_code"])
+            except (KeyError, TypeError, ValueError) as e:
+                errors.append(f"#{index}: invalid transaction ({e})")
+                continue
+
+            debit_account = accounts_by_code.get(debit_code)
+            credit_account = accounts_by_code.get(credit_code)
+            if not debit_account:
+                errors.append(f"#{index}: Debit account {debit_code} not found")
+                continue
+            if not credit_account:
+                errors.append(f"#{index}: Credit account {credit_code} not found")
+                continue
+
+            amount_egp = amount * exchange_rate
+            ref_type = tx.get("ref_type") or "manual"
+            try:
+                entry = schemas.JournalEntry(
+                    date=date,
+                    description=f"{description} ({amount:,.2f} {currency})",
+                    lines=[
+                        schemas.JournalEntryLine(
+                            account_id=debit_account.code,
+                            account_code=debit_account.code,
+                            account_name=debit_account.name,
+                            debit=amount_egp,
+                            credit=0.0,
+                            description=f"مدين: {debit_account.name}",
+                        ),
+                        schemas.JournalEntryLine(
+                            account_id=credit_account.code,
+                            account_code=credit_account.code,
+                            account_name=credit_account.name,
+                            debit=0.0,
+                            credit=amount_egp,
+                            description=f"دائن: {credit_account.name}",
+                        ),
+                    ],
+                    related_document_id=tx.get("ref_id")
+                    or f"{ref_type}-{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                )
+            except (TypeError, ValueError) as e:
+                # ValidationError من pydantic (تاريخ غير صالح مثلاً) هو ValueError
+                errors.append(f"#{index}: invalid transaction ({e})")
+                continue
+            entries.append(entry)
+            add_delta(debit_account, amount_egp, is_debit=True)
+            add_delta(credit_account, amount_egp, is_debit=False)
+
+        if entries:
+            try:
+                self.repo.create_journal_entries_batch(entries, deltas)
+            except Exception as e:
+                safe_print(f"ERROR: [AccountingService] فشل ترحيل دفعة المعاملات: {e}")
+                traceback.print_exc()
+                return {"success": False, "posted": 0, "errors": errors + [str(e)]}
+
+            AccountingService._hierarchy_cache = None
+            AccountingService._hierarchy_cache_time = 0
+            invalidate_cache("accounts")
+            try:
+                app_signals.emit_data_changed("accounting")
+            except Exception as sig_err:
+                safe_print(f"WARNING: [AccountingService] فشل إرسال الإشارات: {sig_err}")
+
+        safe_print(
+            f"INFO: [AccountingService] تم ترحيل {len(entries)} معاملة دفعة واحدة ({len(errors)} مرفوضة)"
+        )
+        return {"success": not errors, "posted": len(entries), "errors": errors}
+
     def _update_parent_balance_recursive(self, parent_code: str):
         """
         تحديث رصيد الحساب الأب بناءً على مجموع أرصدة الأبناء
@@ -2630,6 +3270,120 @@ class AccountingService:
             traceback.print_exc()
             return False
 
+    def _get_indexed_journal_lines(
+        self, identifiers, start_iso: str | None, end_iso: str | None
+    ) -> list[dict] | None:
+        """أسطر القيود من journal_lines في الـ repository، أو None للرجوع للمسح القديم."""
+        getter = getattr(self.repo, "get_journal_lines_for_accounts", None)
+        if not callable(getter):
+            return None
+        refs = {str(value) for value in identifiers if value not in (None, "")}
+        try:
+            rows = getter(refs, start_iso, end_iso)
+        except Exception:
+            return None
+        return rows if isinstance(rows, list) else None
+
+    def _get_account_opening_snapshot(
+        self, account_code: str, identifiers, before_iso: str, cash_refs=None
+    ) -> dict[str, float] | None:
+        """مكوّنات الرصيد الافتتاحي من لقطات الأرصدة في الـ repository، أو None."""
+        getter = getattr(self.repo, "get_account_opening_components", None)
+        if not callable(getter):
+            return None
+        try:
+            if cash_refs is None:
+                components = getter(account_code, identifiers, before_iso)
+            else:
+                components = getter(account_code, identifiers, before_iso, cash_refs=cash_refs)
+        except Exception:
+            return None
+        if not isinstance(components, dict):
+            return None
+        try:
+            return {
+                name: float(components.get(name) or 0.0)
+                for name in (
+                    "payments",
+                    "expenses_paid",
+                    "expenses_charged",
+                    "journal_debit",
+                    "journal_credit",
+                )
+            }
+        except (TypeError, ValueError):
+            return None
+
+    def _get_cash_account_references(self, matches_reference) -> list[str] | None:
+        """المراجع الخام في الحركات التي تُحل لحساب الخزنة، أو None للرجوع للمسح الكامل."""
+        getter = getattr(self.repo, "get_cash_reference_values", None)
+        if not callable(getter):
+            return None
+        try:
+            values = getter()
+        except Exception:
+            return None
+        if not isinstance(values, list):
+            return None
+        return sorted({str(value) for value in values if matches_reference(value)})
+
+    _CASH_MOVEMENT_SCAN_FIELDS = {
+        "payments": ("id", "_mongo_id", "date", "amount", "account_id", "method", "client_id"),
+        "expenses": (
+            "id",
+            "_mongo_id",
+            "date",
+            "amount",
+            "account_id",
+            "payment_account_id",
+            "category",
+            "description",
+        ),
+    }
+
+    def _get_cash_movements_between(
+        self, table_name: str, cash_refs: list[str], start_date: datetime, end_date: datetime
+    ) -> list:
+        """دفعات/مصروفات خزنة في الفترة (بمراجعها المحلولة وبدون النسخ المكررة) عبر repo.scan."""
+        if not cash_refs:
+            return []
+        refs_sql = ", ".join("?" for _ in cash_refs)
+        ref_condition = f"account_id IN ({refs_sql})"
+        ref_params = list(cash_refs)
+        if table_name == "expenses":
+            ref_condition = f"(payment_account_id IN ({refs_sql}) OR {ref_condition})"
+            ref_params = [*cash_refs, *cash_refs]
+        # حدود بالأيام (مجموعة أوسع) ثم المقارنة الدقيقة بالتاريخ في الحلقات
+        day_after_end = (end_date.date() + timedelta(days=1)).isoformat()
+        try:
+            records = self.repo.scan(
+                table_name,
+                self._CASH_MOVEMENT_SCAN_FIELDS[table_name],
+                f"date >= ? AND date < ? AND {ref_condition}",
+                [start_date.date().isoformat(), day_after_end, *ref_params],
+                order_by="date",
+                dedupe=True,
+            )
+        except Exception as exc:
+            safe_print(f"WARNING: [AccountingService] فشل scan لـ {table_name}: {exc}")
+            return []
+        movements = []
+        for record in records:
+            values = record.as_dict()
+            values["date"] = self._parse_journal_line_date(values.get("date"))
+            if isinstance(values["date"], datetime):
+                movements.append(SimpleNamespace(**values))
+        return movements
+
+    @staticmethod
+    def _parse_journal_line_date(value):
+        if isinstance(value, datetime) or not value:
+            return value
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            return value
+
     def get_account_ledger(
         self, account_id: str, start_date: datetime, end_date: datetime
     ) -> list[dict]:
@@ -2658,6 +3412,26 @@ class AccountingService:
                 safe_print(f"ERROR: الحساب {account_id} غير موجود")
                 return []
 
+            # ⚡ مسح محدود من journal_lines (فهرس الحساب + التاريخ) بدل فك كل القيود
+            indexed_lines = self._get_indexed_journal_lines(
+                {account._mongo_id, account.id, account.code},
+                start_date.isoformat(),
+                end_date.isoformat(),
+            )
+            if indexed_lines is not None:
+                ledger_transactions = [
+                    {
+                        "date": self._parse_journal_line_date(line.get("date")),
+                        "description": line.get("description"),
+                        "reference": line.get("related_document_id") or "-",
+                        "debit": float(line.get("debit") or 0.0),
+                        "credit": float(line.get("credit") or 0.0),
+                    }
+                    for line in indexed_lines
+                ]
+                safe_print(f"INFO: تم جلب {len(ledger_transactions)} معاملة للحساب {account.name}")
+                return ledger_transactions
+
             # جلب جميع قيود اليومية في الفترة المحددة
             all_entries = self.repo.get_all_journal_entries()
 
@@ -2827,11 +3601,32 @@ class AccountingService:
             end_iso = end_date.isoformat()
 
             opening_balance = 0.0
+            # ⚡ الخزن تُطابق حركاتها بالمراجع الخام المحلولة لهذا الحساب
+            cash_refs = (
+                self._get_cash_account_references(_matches_cash_account_reference)
+                if is_cash_account
+                else None
+            )
+            # ⚡ لقطة بداية الشهر + مسح قصير بدل جمع كل الحركات السابقة
+            opening_snapshot = None
+            if not is_cash_account or cash_refs is not None:
+                opening_snapshot = self._get_account_opening_snapshot(
+                    account.code, identifiers, start_iso, cash_refs
+                )
 
-            all_payments = self._safe_repo_list("get_all_payments") if is_cash_account else []
-            all_expenses = self._safe_repo_list("get_all_expenses") if is_cash_account else []
+            if is_cash_account and opening_snapshot is not None:
+                # حركات الفترة فقط بدل كل الدفعات والمصروفات
+                all_payments = self._get_cash_movements_between(
+                    "payments", cash_refs, start_date, end_date
+                )
+                all_expenses = self._get_cash_movements_between(
+                    "expenses", cash_refs, start_date, end_date
+                )
+            else:
+                all_payments = self._safe_repo_list("get_all_payments") if is_cash_account else []
+                all_expenses = self._safe_repo_list("get_all_expenses") if is_cash_account else []
 
-            if is_cash_account:
+            if is_cash_account and opening_snapshot is None:
                 for payment in all_payments:
                     payment_date = getattr(payment, "date", None)
                     if not payment_date or payment_date >= start_date:
@@ -2849,6 +3644,10 @@ class AccountingService:
                         opening_balance += _delta(
                             type_str, 0.0, float(getattr(expense, "amount", 0) or 0)
                         )
+            elif opening_snapshot is not None:
+                opening_balance += _delta(type_str, opening_snapshot["payments"], 0.0)
+                opening_balance += _delta(type_str, 0.0, opening_snapshot["expenses_paid"])
+                opening_balance += _delta(type_str, opening_snapshot["expenses_charged"], 0.0)
             else:
                 opening_payments = float(
                     self.repo.sum_payments_before(account.code, start_iso) or 0.0
@@ -2865,10 +3664,28 @@ class AccountingService:
                 )
                 opening_balance += _delta(type_str, opening_exp_charged, 0.0)
 
-            try:
-                entries_before = self.repo.get_journal_entries_before(start_iso) or []
-            except Exception:
+            indexed_opening = None
+            sum_before = getattr(self.repo, "sum_journal_lines_before", None)
+            if opening_snapshot is not None:
+                indexed_opening = (
+                    opening_snapshot["journal_debit"],
+                    opening_snapshot["journal_credit"],
+                )
+            elif callable(sum_before):
+                try:
+                    indexed_opening = sum_before(identifiers, start_iso)
+                except Exception:
+                    indexed_opening = None
+            if isinstance(indexed_opening, tuple) and len(indexed_opening) == 2:
+                opening_balance += _delta(
+                    type_str, float(indexed_opening[0] or 0), float(indexed_opening[1] or 0)
+                )
                 entries_before = []
+            else:
+                try:
+                    entries_before = self.repo.get_journal_entries_before(start_iso) or []
+                except Exception:
+                    entries_before = []
 
             for entry in entries_before:
                 entry_date = getattr(entry, "date", None)
@@ -2889,10 +3706,26 @@ class AccountingService:
 
             raw_movements: list[dict] = []
 
-            try:
-                entries_in_range = self.repo.get_journal_entries_between(start_iso, end_iso) or []
-            except Exception:
+            indexed_lines = self._get_indexed_journal_lines(identifiers, start_iso, end_iso)
+            if indexed_lines is not None:
                 entries_in_range = []
+                for line in indexed_lines:
+                    raw_movements.append(
+                        {
+                            "date": self._parse_journal_line_date(line.get("date")),
+                            "description": line.get("description") or "",
+                            "reference": line.get("related_document_id") or "",
+                            "debit": float(line.get("debit") or 0),
+                            "credit": float(line.get("credit") or 0),
+                        }
+                    )
+            else:
+                try:
+                    entries_in_range = (
+                        self.repo.get_journal_entries_between(start_iso, end_iso) or []
+                    )
+                except Exception:
+                    entries_in_range = []
 
             for entry in entries_in_range:
                 entry_date = getattr(entry, "date", None)
@@ -3072,157 +3905,55 @@ class AccountingService:
         safe_print("=" * 60)
 
         created_count = 0
-        errors = []
+        errors: list[str] = []
 
         try:
-            # التحقق من وجود الحسابات المطلوبة
-            accounts_needed = {
-                "1111": "الخزنة الرئيسية",
-                "1121": "البنك الأهلي",
-                "1140": "العملاء",
-                "4100": "إيرادات الخدمات",
-                "5110": "الرواتب والأجور",
-                "1131": "فودافون كاش",
-            }
-
-            for code, name in accounts_needed.items():
-                account = self.repo.get_account_by_code(code)
-                if not account:
-                    safe_print(f"WARNING: الحساب {code} - {name} غير موجود")
-
-            # معاملة 1: إيداع نقدي في البنك (10000 جنيه)
-            try:
-                bank_account = self.repo.get_account_by_code("1121")
-                cash_account = self.repo.get_account_by_code("1111")
-
-                if bank_account and cash_account:
-                    entry1 = schemas.JournalEntry(
-                        date=datetime.now() - timedelta(days=30),
-                        description="إيداع نقدي في البنك الأهلي",
-                        lines=[
-                            schemas.JournalEntryLine(
-                                account_id=bank_account._mongo_id or str(bank_account.id),
-                                debit=10000.0,
-                                credit=0.0,
-                                description="إيداع في البنك الأهلي",
-                            ),
-                            schemas.JournalEntryLine(
-                                account_id=cash_account._mongo_id or str(cash_account.id),
-                                debit=0.0,
-                                credit=10000.0,
-                                description="سحب من الخزينة الرئيسية",
-                            ),
-                        ],
-                        related_document_id="DEP-001",
-                    )
-                    self.repo.create_journal_entry(entry1)
-                    safe_print("✅ تم إنشاء معاملة: إيداع في البنك (10000 جنيه)")
-                    created_count += 1
-            except Exception as e:
-                error_msg = f"فشل إنشاء معاملة الإيداع: {e}"
-                safe_print(f"❌ {error_msg}")
-                errors.append(error_msg)
-
-            # معاملة 2: بيع خدمة (1500 جنيه)
-            try:
-                receivable_account = self.repo.get_account_by_code("1140")
-                revenue_account = self.repo.get_account_by_code("4100")
-
-                if receivable_account and revenue_account:
-                    entry2 = schemas.JournalEntry(
-                        date=datetime.now() - timedelta(days=20),
-                        description="بيع خدمة تطوير موقع",
-                        lines=[
-                            schemas.JournalEntryLine(
-                                account_id=receivable_account._mongo_id
-                                or str(receivable_account.id),
-                                debit=1500.0,
-                                credit=0.0,
-                                description="مستحق من العميل - شركة ABC",
-                            ),
-                            schemas.JournalEntryLine(
-                                account_id=revenue_account._mongo_id or str(revenue_account.id),
-                                debit=0.0,
-                                credit=1500.0,
-                                description="إيراد خدمة تطوير موقع",
-                            ),
-                        ],
-                        related_document_id="INV-001",
-                    )
-                    self.repo.create_journal_entry(entry2)
-                    safe_print("✅ تم إنشاء معاملة: بيع خدمة (1500 جنيه)")
-                    created_count += 1
-            except Exception as e:
-                error_msg = f"فشل إنشاء معاملة بيع الخدمة: {e}"
-                safe_print(f"❌ {error_msg}")
-                errors.append(error_msg)
-
-            # معاملة 3: دفع راتب (2000 جنيه)
-            try:
-                salary_account = self.repo.get_account_by_code("5110")
-                vodafone_account = self.repo.get_account_by_code("1131")
-
-                if salary_account and vodafone_account:
-                    entry3 = schemas.JournalEntry(
-                        date=datetime.now() - timedelta(days=10),
-                        description="دفع راتب شهر نوفمبر",
-                        lines=[
-                            schemas.JournalEntryLine(
-                                account_id=salary_account._mongo_id or str(salary_account.id),
-                                debit=2000.0,
-                                credit=0.0,
-                                description="راتب الموظف - أحمد محمد",
-                            ),
-                            schemas.JournalEntryLine(
-                                account_id=vodafone_account._mongo_id or str(vodafone_account.id),
-                                debit=0.0,
-                                credit=2000.0,
-                                description="دفع عبر فودافون كاش",
-                            ),
-                        ],
-                        related_document_id="SAL-001",
-                    )
-                    self.repo.create_journal_entry(entry3)
-                    safe_print("✅ تم إنشاء معاملة: دفع راتب (2000 جنيه)")
-                    created_count += 1
-            except Exception as e:
-                error_msg = f"فشل إنشاء معاملة دفع الراتب: {e}"
-                safe_print(f"❌ {error_msg}")
-                errors.append(error_msg)
+            # ⚡ كل المعاملات تُرحّل دفعة واحدة (transaction واحدة وإشارة تحديث واحدة)
+            now = datetime.now()
+            transactions = [
+                {
+                    # معاملة 1: إيداع نقدي في البنك (10000 جنيه)
+                    "date": now - timedelta(days=30),
+                    "description": "إيداع نقدي في البنك الأهلي",
+                    "amount": 10000.0,
+                    "debit_account_code": "1121",
+                    "credit_account_code": "1111",
+                    "ref_id": "DEP-001",
+                },
+                {
+                    # معاملة 2: بيع خدمة (1500 جنيه)
+                    "date": now - timedelta(days=20),
+                    "description": "بيع خدمة تطوير موقع",
+                    "amount": 1500.0,
+                    "debit_account_code": "1140",
+                    "credit_account_code": "4100",
+                    "ref_id": "INV-001",
+                },
+                {
+                    # معاملة 3: دفع راتب (2000 جنيه)
+                    "date": now - timedelta(days=10),
+                    "description": "دفع راتب شهر نوفمبر",
+                    "amount": 2000.0,
+                    "debit_account_code": "5110",
+                    "credit_account_code": "1131",
+                    "ref_id": "SAL-001",
+                },
+                {
+                    # معاملة 4: تحصيل من العميل (1500 جنيه)
+                    "date": now - timedelta(days=5),
+                    "description": "تحصيل من العميل - شركة ABC",
+                    "amount": 1500.0,
+                    "debit_account_code": "1111",
+                    "credit_account_code": "1140",
+                    "ref_id": "REC-001",
+                },
+            ]
 
-            # معاملة 4: تحصيل من العميل (1500 جنيه)
-            try:
-                receivable_account = self.repo.get_account_by_code("1140")
-                cash_account = self.repo.get_account_by_code("1111")
-
-                if receivable_account and cash_account:
-                    entry4 = schemas.JournalEntry(
-                        date=datetime.now() - timedelta(days=5),
-                        description="تحصيل من العميل - شركة ABC",
-                        lines=[
-                            schemas.JournalEntryLine(
-                                account_id=cash_account._mongo_id or str(cash_account.id),
-                                debit=1500.0,
-                                credit=0.0,
-                                description="تحصيل نقدي",
-                            ),
-                            schemas.JournalEntryLine(
-                                account_id=receivable_account._mongo_id
-                                or str(receivable_account.id),
-                                debit=0.0,
-                                credit=1500.0,
-                                description="سداد من العميل - شركة ABC",
-                            ),
-                        ],
-                        related_document_id="REC-001",
-                    )
-                    self.repo.create_journal_entry(entry4)
-                    safe_print("✅ تم إنشاء معاملة: تحصيل من العميل (1500 جنيه)")
-                    created_count += 1
-            except Exception as e:
-                error_msg = f"فشل إنشاء معاملة التحصيل: {e}"
+            batch_result = self.post_transactions_batch(transactions)
+            created_count = batch_result.get("posted", 0)
+            errors = list(batch_result.get("errors", []))
+            for error_msg in errors:
                 safe_print(f"❌ {error_msg}")
-                errors.append(error_msg)
 
             safe_print("\n" + "=" * 60)
             safe_print(f"✅ تم إنشاء {created_count} معاملة اختبارية")
@@ -3875,6 +4606,10 @@ class AccountingService:
         Returns:
             رصيد العميل (موجب = مستحق على العميل، سالب = مستحق للعميل)
         """
+        entry = self._client_balance_entry(client_id)
+        if entry is not None:
+            return float(entry.get("balance", 0.0) or 0.0)
+
         try:
             # جلب جميع الفواتير للعميل
             invoices = (
@@ -3907,16 +4642,53 @@ class AccountingService:
             safe_print(f"ERROR: [AccountingService] فشل حساب رصيد العميل {client_id}: {e}")
             return 0.0
 
+    def _client_balance_entry(self, client_id: str) -> dict | None:
+        """⚡ رصيد العميل من جدول الأرصدة المجمّع في المخزن (None = غير متاح)."""
+        getter = getattr(self.repo, "get_client_balance_entry", None)
+        if not callable(getter):
+            return None
+        try:
+            entry = getter(client_id)
+        except Exception as e:
+            safe_print(f"WARNING: [AccountingService] تعذر قراءة جدول أرصدة العملاء: {e}")
+            return None
+        if entry is None:
+            # العميل بلا فواتير ولا دفعات: رصيده صفر بدون مسح الجداول
+            return {"balance": 0.0}
+        return entry if isinstance(entry, dict) else None
+
+    def _client_balance_index(self) -> dict[str, dict] | None:
+        """{أي مرجع للعميل: صف الرصيد} من جدول الأرصدة (قراءة واحدة لكل العملاء)."""
+        getter = getattr(self.repo, "get_client_balance_table", None)
+        if not callable(getter):
+            return None
+        try:
+            table = getter()
+        except Exception as e:
+            safe_print(f"WARNING: [AccountingService] تعذر قراءة جدول أرصدة العملاء: {e}")
+            return None
+        if not isinstance(table, dict):
+            return None
+        return {
+            str(reference): entry
+            for entry in table.values()
+            for reference in entry.get("references", ())
+        }
+
     def get_all_clients_balances(self) -> list[dict]:
         """
         جلب أرصدة جميع العملاء
 
+        ⚡ تمريرة واحدة: جدول الأرصدة المجمّع (GROUP BY بمراجع موحّدة) بدل استعلامين
+        لكل عميل.
+
         Returns:
             قائمة بأرصدة العملاء [{client_id, client_name, balance}, ...]
         """
         try:
             # جلب جميع العملاء
             clients = self.repo.get_all_clients() if hasattr(self.repo, "get_all_clients") else []
+            balance_index = self._client_balance_index()
 
             balances = []
             for client in clients:
@@ -3925,7 +4697,18 @@ class AccountingService:
                     if hasattr(client, "_mongo_id")
                     else str(client.id)
                 )
-                balance = self.get_client_balance(client_id)
+                if balance_index is not None:
+                    entry = next(
+                        (
+                            balance_index[reference]
+                            for reference in (client_id, str(client.id), client.name)
+                            if reference in balance_index
+                        ),
+                        None,
+                    )
+                    balance = float(entry["balance"]) if entry else 0.0
+                else:
+                    balance = self.get_client_balance(client_id)
 
                 balances.append(
                     {
@@ -4258,6 +5041,156 @@ class AccountingService:
     # ==================== Enhanced Dashboard Methods ====================
     # Requirements: 1.2, 1.4, 2.1, 2.2, 4.2
 
+    _ANALYTICS_TABLES = ("payments", "expenses", "projects", "journal_entries", "accounts")
+    _ANALYTICS_PAYMENT_FIELDS = (
+        "id",
+        "_mongo_id",
+        "project_id",
+        "client_id",
+        "invoice_number",
+        "date",
+        "amount",
+        "account_id",
+        "method",
+    )
+    _ANALYTICS_EXPENSE_FIELDS = (
+        "id",
+        "_mongo_id",
+        "project_id",
+        "date",
+        "category",
+        "amount",
+        "description",
+        "account_id",
+        "payment_account_id",
+    )
+
+    def _analytics_data_version(self, tables: tuple[str, ...] | None = None):
+        """نسخة بيانات التحليلات من change_counters، أو None (بدون cache) لو غير متاحة."""
+        getter = getattr(self.repo, "get_change_counters", None)
+        if not callable(getter):
+            return None
+        try:
+            counters = getter(tables or self._ANALYTICS_TABLES)
+        except Exception:
+            return None
+        if not isinstance(counters, dict):
+            return None
+        return tuple(sorted((str(name), int(value[0])) for name, value in counters.items()))
+
+    def _get_analytics_snapshot(self) -> AnalyticsSnapshot:
+        """⚡ لقطة الأعمدة الحالية؛ تُعاد بناؤها فقط عند تغير نسخة البيانات."""
+        version = self._analytics_data_version()
+        snapshot = self._analytics_snapshot
+        if snapshot is not None and version is not None and snapshot.version == version:
+            return snapshot
+        snapshot = self._build_analytics_snapshot(version)
+        self._analytics_snapshot = snapshot
+        return snapshot
+
+    def _build_analytics_snapshot(self, version) -> AnalyticsSnapshot:
+        """تحميل أعمدة (التاريخ، المبلغ) مرة واحدة لكل مصدر."""
+        coerce = self._coerce_activity_datetime
+        inflows = outflows = DatedColumn.from_pairs(())
+        payments: list = []
+        expenses: list = []
+        if hasattr(self.repo, "get_all_payments"):
+            payments = self._scan_repo_records(
+                "payments", self._ANALYTICS_PAYMENT_FIELDS, "get_all_payments"
+            )
+            inflows = DatedColumn.from_pairs(
+                (index, coerce(p.date), self._safe_amount(p.amount))
+                for index, p in enumerate(payments)
+            )
+        if hasattr(self.repo, "get_all_expenses"):
+            expenses = self._scan_repo_records(
+                "expenses", self._ANALYTICS_EXPENSE_FIELDS, "get_all_expenses"
+            )
+            outflows = DatedColumn.from_pairs(
+                (index, coerce(e.date), self._safe_amount(e.amount))
+                for index, e in enumerate(expenses)
+            )
+
+        # أسطر القيود: دائن الإيرادات ومدين المصروفات حسب نوع الحساب
+        account_types = {
+            acc.code: acc.type for acc in self._safe_repo_list("get_all_accounts") if acc.code
+        }
+        revenue_pairs: list[tuple[int, datetime, float]] = []
+        expense_pairs: list[tuple[int, datetime, float]] = []
+        journal_records = self._safe_repo_list("get_all_journal_entries")
+        for index, entry in enumerate(journal_records):
+            entry_date = getattr(entry, "date", None)
+            if not entry_date:
+                continue
+            for line in entry.lines:
+                acc_type = account_types.get(
+                    getattr(line, "account_code", None) or str(line.account_id)
+                )
+                if acc_type == schemas.AccountType.REVENUE:
+                    revenue_pairs.append((index, entry_date, line.credit))
+                elif acc_type == schemas.AccountType.EXPENSE:
+                    expense_pairs.append((index, entry_date, line.debit))
+
+        project_records: list = []
+        if hasattr(self.repo, "get_all_projects"):
+            project_records = [
+                project
+                for project in self._scan_repo_records(
+                    "projects",
+                    ("id", "_mongo_id", "name", "client_id", "total_amount", "start_date"),
+                    "get_all_projects",
+                )
+                if str(getattr(project, "name", "") or "").strip()
+                and str(getattr(project, "client_id", "") or "").strip()
+            ]
+        projects = DatedColumn.from_pairs(
+            (index, coerce(getattr(project, "start_date", None)), 0.0)
+            for index, project in enumerate(project_records)
+        )
+
+        return AnalyticsSnapshot(
+            version,
+            inflows=inflows,
+            outflows=outflows,
+            revenue=DatedColumn.from_pairs(revenue_pairs),
+            expense_lines=DatedColumn.from_pairs(expense_pairs),
+            projects=projects,
+            project_records=project_records,
+            payment_records=payments,
+            expense_records=expenses,
+            journal_entries=DatedColumn.from_pairs(
+                (index, coerce(getattr(entry, "date", None)), 0.0)
+                for index, entry in enumerate(journal_records)
+            ),
+            journal_records=journal_records,
+        )
+
+    def _project_receivable(self, project) -> float:
+        """المستحقات = إجمالي المشروع - المدفوع."""
+        project_total = self._safe_amount(getattr(project, "total_amount", 0))
+        project_ref = (
+            getattr(project, "_mongo_id", None)
+            or getattr(project, "id", None)
+            or getattr(project, "name", "")
+        )
+        project_client_id = getattr(project, "client_id", None)
+        project_payments = 0.0
+        if hasattr(self.repo, "get_total_paid_for_project"):
+            project_payments = float(
+                self.repo.get_total_paid_for_project(
+                    str(project_ref or ""),
+                    client_id=str(project_client_id or "") or None,
+                )
+                or 0.0
+            )
+        elif hasattr(self.repo, "get_payments_for_project"):
+            payments = self.repo.get_payments_for_project(
+                str(project_ref or ""),
+                client_id=str(project_client_id or "") or None,
+            )
+            project_payments = sum(float(getattr(p, "amount", 0.0) or 0.0) for p in payments)
+        return max(0, project_total - project_payments)
+
     def get_kpis_with_trends(self, start_date: datetime, end_date: datetime) -> dict:
         """
         جلب KPIs مع بيانات الفترة السابقة للمقارنة
@@ -4291,11 +5224,12 @@ class AccountingService:
             previous_end = start_date - timedelta(days=1)
             previous_start = previous_end - timedelta(days=period_length - 1)
 
-            # جلب بيانات الفترة الحالية
-            current_data = self._calculate_period_kpis(start_date, end_date)
-
-            # جلب بيانات الفترة السابقة
-            previous_data = self._calculate_period_kpis(previous_start, previous_end)
+            # ⚡ الفترتان من نفس لقطة الأعمدة (تحميل واحد للبيانات)
+            snapshot = self._get_analytics_snapshot()
+            current_data = self._calculate_period_kpis(start_date, end_date, snapshot=snapshot)
+            previous_data = self._calculate_period_kpis(
+                previous_start, previous_end, snapshot=snapshot
+            )
 
             return {
                 "total_revenue": {
@@ -4332,88 +5266,38 @@ class AccountingService:
                 "receivables": {"current": 0.0, "previous": 0.0},
             }
 
-    def _calculate_period_kpis(self, start_date: datetime, end_date: datetime) -> dict:
+    def _calculate_period_kpis(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        snapshot: AnalyticsSnapshot | None = None,
+    ) -> dict:
         """
         حساب KPIs لفترة محددة
 
         Args:
             start_date: تاريخ البداية
             end_date: تاريخ النهاية
+            snapshot: لقطة أعمدة جاهزة (اختياري) لتفادي إعادة التحميل
 
         Returns:
             dict مع قيم KPIs للفترة
         """
         try:
-            total_revenue = 0.0
-            total_expenses = 0.0
-            cash_collected = 0.0
-
-            # جلب قيود اليومية للفترة
-            all_entries = self.repo.get_all_journal_entries()
+            snapshot = snapshot or self._get_analytics_snapshot()
+            total_revenue = snapshot.revenue.total(start_date, end_date)
+            total_expenses = snapshot.expense_lines.total(start_date, end_date)
+            cash_collected = snapshot.inflows.total(start_date, end_date)
 
-            # جلب معلومات الحسابات
-            all_accounts = self.repo.get_all_accounts()
-            account_types = {acc.code: acc.type for acc in all_accounts if acc.code}
-
-            for entry in all_entries:
-                entry_date = entry.date
-                if not entry_date:
-                    continue
-
-                # التحقق من أن القيد ضمن الفترة
-                if not start_date <= entry_date <= end_date:
-                    continue
-
-                for line in entry.lines:
-                    acc_code = getattr(line, "account_code", None) or str(line.account_id)
-                    acc_type = account_types.get(acc_code)
-
-                    if acc_type == schemas.AccountType.REVENUE:
-                        total_revenue += line.credit
-                    elif acc_type == schemas.AccountType.EXPENSE:
-                        total_expenses += line.debit
-
-            # جلب الدفعات المحصلة للفترة
-            if hasattr(self.repo, "get_all_payments"):
-                all_payments = self.repo.get_all_payments()
-                for payment in all_payments:
-                    payment_date = payment.date
-                    if payment_date and start_date <= payment_date <= end_date:
-                        cash_collected += payment.amount
-
-            # حساب المستحقات (من المشاريع)
+            # حساب المستحقات (من المشاريع التي بدأت في الفترة)
             receivables = 0.0
-            if hasattr(self.repo, "get_all_projects"):
-                all_projects = self.repo.get_all_projects()
-                for project in all_projects:
-                    project_start = getattr(project, "start_date", None)
-                    if project_start and start_date <= project_start <= end_date:
-                        # المستحقات = إجمالي المشروع - المدفوع
-                        project_total = getattr(project, "total_amount", 0) or 0
-                        project_ref = (
-                            getattr(project, "_mongo_id", None)
-                            or getattr(project, "id", None)
-                            or getattr(project, "name", "")
-                        )
-                        project_client_id = getattr(project, "client_id", None)
-                        project_payments = 0.0
-                        if hasattr(self.repo, "get_total_paid_for_project"):
-                            project_payments = float(
-                                self.repo.get_total_paid_for_project(
-                                    str(project_ref or ""),
-                                    client_id=str(project_client_id or "") or None,
-                                )
-                                or 0.0
-                            )
-                        elif hasattr(self.repo, "get_payments_for_project"):
-                            payments = self.repo.get_payments_for_project(
-                                str(project_ref or ""),
-                                client_id=str(project_client_id or "") or None,
-                            )
-                            project_payments = sum(
-                                float(getattr(p, "amount", 0.0) or 0.0) for p in payments
-                            )
-                        receivables += max(0, project_total - project_payments)
+            for position in snapshot.projects.positions_between(start_date, end_date):
+                position = int(position)
+                receivable = snapshot.project_receivables.get(position)
+                if receivable is None:
+                    receivable = self._project_receivable(snapshot.project_records[position])
+                    snapshot.project_receivables[position] = receivable
+                receivables += receivable
 
             net_profit = total_revenue - total_expenses
 
@@ -4461,46 +5345,7 @@ class AccountingService:
         )
 
         try:
-            # جمع البيانات الخام
-            raw_inflows: list[tuple[datetime, float]] = []
-            raw_outflows: list[tuple[datetime, float]] = []
-
-            # جلب الدفعات (التدفقات الداخلة)
-            if hasattr(self.repo, "get_all_payments"):
-                all_payments = self.repo.get_all_payments()
-                for payment in all_payments:
-                    payment_date = payment.date
-                    if payment_date and start_date <= payment_date <= end_date:
-                        raw_inflows.append((payment_date, payment.amount))
-
-            # جلب المصروفات (التدفقات الخارجة)
-            if hasattr(self.repo, "get_all_expenses"):
-                all_expenses = self.repo.get_all_expenses()
-                for expense in all_expenses:
-                    expense_date = expense.date
-                    if expense_date and start_date <= expense_date <= end_date:
-                        raw_outflows.append((expense_date, expense.amount))
-
-            # تجميع البيانات حسب الفترة
-            aggregated_inflows = self._aggregate_cash_flow_by_period(raw_inflows, period)
-            aggregated_outflows = self._aggregate_cash_flow_by_period(raw_outflows, period)
-
-            # حساب صافي التدفق
-            all_periods = set(aggregated_inflows.keys()) | set(aggregated_outflows.keys())
-            net_flow = {}
-            for period_key in all_periods:
-                inflow = aggregated_inflows.get(period_key, 0.0)
-                outflow = aggregated_outflows.get(period_key, 0.0)
-                net_flow[period_key] = inflow - outflow
-
-            # تحويل إلى قوائم مرتبة
-            sorted_periods = sorted(all_periods)
-
-            return {
-                "inflows": [(p, aggregated_inflows.get(p, 0.0)) for p in sorted_periods],
-                "outflows": [(p, aggregated_outflows.get(p, 0.0)) for p in sorted_periods],
-                "net_flow": [(p, net_flow.get(p, 0.0)) for p in sorted_periods],
-            }
+            return self._get_analytics_snapshot().cash_flow(start_date, end_date, period)
 
         except Exception as e:
             safe_print(f"ERROR: [AccountingService] فشل جلب بيانات التدفق النقدي: {e}")
@@ -4523,25 +5368,14 @@ class AccountingService:
 
         Requirements: 2.2
         """
-        aggregated: dict[str, float] = {}
-
-        for date_val, amount in data:
-            if period == "daily":
-                # التجميع اليومي: YYYY-MM-DD
-                period_key = date_val.strftime("%Y-%m-%d")
-            elif period == "weekly":
-                # التجميع الأسبوعي: YYYY-WXX (رقم الأسبوع)
-                year, week, _ = date_val.isocalendar()
-                period_key = f"{year}-W{week:02d}"
-            else:  # monthly
-                # التجميع الشهري: YYYY-MM
-                period_key = date_val.strftime("%Y-%m")
-
-            if period_key not in aggregated:
-                aggregated[period_key] = 0.0
-            aggregated[period_key] += amount
-
-        return aggregated
+        column = DatedColumn.from_pairs(
+            (index, date_val, amount) for index, (date_val, amount) in enumerate(data)
+        )
+        if not len(column):
+            return {}
+        return column.buckets(
+            column.dates[0].astype(datetime), column.dates[-1].astype(datetime), period
+        )
 
     def get_filtered_data_by_date_range(
         self, start_date: datetime, end_date: datetime, data_type: str = "all"
@@ -4566,35 +5400,11 @@ class AccountingService:
         result = {"payments": [], "expenses": [], "projects": [], "journal_entries": []}
 
         try:
-            # فلترة الدفعات
-            if data_type in ["all", "payments"] and hasattr(self.repo, "get_all_payments"):
-                all_payments = self.repo.get_all_payments()
-                result["payments"] = [
-                    p for p in all_payments if p.date and start_date <= p.date <= end_date
-                ]
-
-            # فلترة المصروفات
-            if data_type in ["all", "expenses"] and hasattr(self.repo, "get_all_expenses"):
-                all_expenses = self.repo.get_all_expenses()
-                result["expenses"] = [
-                    e for e in all_expenses if e.date and start_date <= e.date <= end_date
-                ]
-
-            # فلترة المشاريع
-            if data_type in ["all", "projects"] and hasattr(self.repo, "get_all_projects"):
-                all_projects = self.repo.get_all_projects()
-                result["projects"] = [
-                    p
-                    for p in all_projects
-                    if (getattr(p, "start_date", None) and start_date <= p.start_date <= end_date)
-                ]
-
-            # فلترة قيود اليومية
-            if data_type in ["all", "journal_entries"]:
-                all_entries = self.repo.get_all_journal_entries()
-                result["journal_entries"] = [
-                    e for e in all_entries if e.date and start_date <= e.date <= end_date
-                ]
+            # ⚡ نفس لقطة أعمدة التحليلات: لا تحميل جديد طالما البيانات لم تتغير
+            snapshot = self._get_analytics_snapshot()
+            for key in result:
+                if data_type in ("all", key):
+                    result[key] = snapshot.records_between(key, start_date, end_date)
 
             safe_print(
                 f"INFO: [AccountingService] تم فلترة: {len(result['payments'])} دفعة، "
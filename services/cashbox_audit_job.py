@@ -0,0 +1,495 @@
+"""
+⚡ مراجعة تكامل الخزن كمهمة خلفية تزايدية قابلة للاستئناف.
+
+لكل خزنة نقطة تحقق محفوظة في SQLite (آخر id دفعة/مصروف تمت مراجعته + بصمة حركاتها).
+كل خطوة تراجع دفعة محدودة من الصفوف الجديدة فقط (GROUP BY حسب مراجع الخزنة)، وتُحفظ
+نقطة التحقق بعدها، فتُستأنف المراجعة من حيث توقفت حتى بعد إعادة التشغيل.
+الحركات القديمة لا يُعاد فحصها إلا لو تغيرت: عدّادات حركات الخزن في change_counters
+تكشف أي تعديل/حذف لا تفسره الصفوف الجديدة (تحديثات المزامنة لا ترفعها)، وحينها تُقارن
+بصمة كل خزنة ويُستبدل ما تغير فقط. النتيجة قبل اكتمال المراجعة جزئية (partial) ولا تقارن
+الأرصدة، و add_completion_listener يُبلغ الواجهة عند اكتمال الجولة الخلفية.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any
+
+from core.logger import get_logger
+
+logger = get_logger(__name__)
+
+_SOURCES = ("payments", "expenses")
+_CHECKPOINT_KEYS = {"payments": "last_payment_id", "expenses": "last_expense_id"}
+# الكود الفارغ = حركات لا تُحل لخزنة ورقية (تحمل عدّادات المراجع غير المحلولة)
+_UNASSIGNED = ""
+
+
+def _empty_fingerprint() -> dict[str, Any]:
+    return {
+        "payments": [0, 0.0, 0.0],
+        "expenses": [0, 0.0, 0.0],
+        "unresolved_payments": 0,
+        "unresolved_expenses": 0,
+        "repair": 0,
+        "backfill": 0,
+    }
+
+
+def _movements_hash(fingerprint: dict[str, Any]) -> str:
+    normalized = {
+        key: (
+            [int(value[0]), round(float(value[1]), 4), round(float(value[2]), 4)]
+            if isinstance(value, list)
+            else int(value)
+        )
+        for key, value in fingerprint.items()
+    }
+    payload = json.dumps(normalized, sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+class CashboxAuditJob:
+    """
+    مهمة مراجعة الخزن: run() تتقدم بخطوات محدودة (ضمن مهلة اختيارية) وترجع أحدث نتيجة،
+    و start() تكملها في thread خلفي بدون حجز الواجهة.
+    """
+
+    def __init__(self, service, chunk_size: int = 5000):
+        self.service = service
+        self.repo = service.repo
+        self.chunk_size = max(1, int(chunk_size))
+        self._run_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        self._checkpoints: dict[str, dict[str, Any]] | None = None
+        self._watermarks = dict.fromkeys(_SOURCES, 0)
+        self._max_ids = dict.fromkeys(_SOURCES, 0)
+        # نسخ change_counters عند آخر مراجعة مكتملة (None = لم تكتمل مراجعة بعد)
+        self._verified_versions: dict[str, int] | None = None
+        self._pass_versions: dict[str, int] | None = None
+        self._reverified_accounts = 0
+        self._rows_verified = 0
+        self._busy_seconds = 0.0
+        self._complete = False
+        self._last_result: dict[str, Any] | None = None
+        self._completion_listeners: list[Callable[[dict[str, Any]], None]] = []
+
+    # ---------- التشغيل ----------
+
+    def run(
+        self,
+        budget_seconds: float | None = None,
+        progress: Callable[[dict[str, Any]], None] | None = None,
+    ) -> dict[str, Any]:
+        """
+        التقدم في المراجعة حتى تكتمل أو تنفد المهلة، ثم إرجاع النتيجة الحالية.
+        لو مراجعة أخرى شغالة في thread آخر تُرجع آخر نتيجة فوراً بدل الانتظار.
+        """
+        if not self._run_lock.acquire(blocking=False):
+            return self.result()
+        try:
+            deadline = None if budget_seconds is None else time.monotonic() + budget_seconds
+            while True:
+                started = time.monotonic()
+                done = self._step()
+                self._busy_seconds += time.monotonic() - started
+                if progress is not None:
+                    try:
+                        progress(self.progress())
+                    except Exception as e:
+                        logger.debug("[CashboxAudit] progress callback failed: %s", e)
+                if done or (deadline is not None and time.monotonic() >= deadline):
+                    break
+            self._last_result = self._build_result()
+            return dict(self._last_result)
+        finally:
+            self._run_lock.release()
+
+    def start(self, interval_seconds: float = 30.0) -> None:
+        """تشغيل مستمر في thread خلفي: يكمل المراجعة ثم يعيد الفحص كل interval_seconds."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+
+        def loop() -> None:
+            while not self._stop_event.is_set():
+                was_complete = self._complete
+                try:
+                    result = self.run(budget_seconds=1.0)
+                except Exception as e:
+                    logger.debug("[CashboxAudit] background step failed: %s", e)
+                else:
+                    if result.get("complete") and not was_complete:
+                        self._notify_completed(result)
+                self._stop_event.wait(0.05 if not self._complete else interval_seconds)
+
+        self._thread = threading.Thread(target=loop, name="CashboxAuditJob", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def add_completion_listener(self, callback: Callable[[dict[str, Any]], None]) -> None:
+        """
+        callback(result) عند اكتمال جولة خلفية كانت جزئية؛ تُستدعى من thread المهمة
+        فعلى الواجهة نقلها لـ thread الواجهة بنفسها.
+        """
+        if callback not in self._completion_listeners:
+            self._completion_listeners.append(callback)
+
+    def remove_completion_listener(self, callback: Callable[[dict[str, Any]], None]) -> None:
+        if callback in self._completion_listeners:
+            self._completion_listeners.remove(callback)
+
+    def _notify_completed(self, result: dict[str, Any]) -> None:
+        for callback in list(self._completion_listeners):
+            try:
+                callback(dict(result))
+            except Exception as e:
+                logger.debug("[CashboxAudit] completion listener failed: %s", e)
+
+    def result(self) -> dict[str, Any]:
+        if self._last_result is None:
+            return self.run(budget_seconds=0.0)
+        return dict(self._last_result)
+
+    def progress(self) -> dict[str, Any]:
+        total = sum(self._max_ids.values())
+        done = sum(min(self._watermarks[name], self._max_ids[name]) for name in _SOURCES)
+        return {
+            "complete": self._complete,
+            "progress": 1.0 if self._complete or not total else done / total,
+            "rows_verified": self._rows_verified,
+            "rows_per_second": (
+                self._rows_verified / self._busy_seconds if self._busy_seconds > 0 else 0.0
+            ),
+            "reverified_accounts": self._reverified_accounts,
+        }
+
+    # ---------- الخطوات ----------
+
+    def _current_versions(self) -> dict[str, Any] | None:
+        """
+        نسخ حركات الدفعات/المصروفات (تتجاهل تحديثات المزامنة) + توقيع مراجع الحسابات؛
+        الأرصدة مستبعدة من التوقيع لأن كل دفعة تعدّل رصيد خزنتها ولا تغير ربط المراجع.
+        """
+        counters: dict[str, int] | None = None
+        movement_getter = getattr(self.repo, "get_cash_movement_versions", None)
+        try:
+            if callable(movement_getter):
+                counters = movement_getter()
+            if counters is None:
+                getter = getattr(self.repo, "get_change_counters", None)
+                raw = getter(_SOURCES) if callable(getter) else None
+                if isinstance(raw, dict):
+                    counters = {name: int(raw.get(name, (0, None))[0]) for name in _SOURCES}
+        except Exception:
+            return None
+        if not isinstance(counters, dict):
+            return None
+        versions: dict[str, Any] = {name: int(counters.get(name, 0)) for name in _SOURCES}
+        versions["accounts"] = self._accounts_signature()
+        versions["duplicates"] = self._duplicates_signature()
+        return versions
+
+    def _duplicates_signature(self) -> str:
+        """
+        توقيع النسخ المكررة المستبعدة من المجموعات: تغيّرها (صف جديد يُفضَّل على قديم
+        مثلاً) يغير مساهمة صفوف سبق التحقق منها فتلزم إعادة المقارنة.
+        """
+        getter = getattr(self.repo, "get_signature_duplicate_ids", None)
+        if not callable(getter):
+            return ""
+        parts = [sorted(getter(name)) for name in _SOURCES]
+        return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+    def _accounts_signature(self) -> str:
+        service = self.service
+        parts = sorted(
+            (
+                str(getattr(account, "id", "") or ""),
+                str(getattr(account, "_mongo_id", "") or getattr(account, "mongo_id", "") or ""),
+                str(getattr(account, "code", "") or ""),
+                str(getattr(account, "name", "") or ""),
+                str(getattr(account, "type", "") or ""),
+                service._is_leaf_account(account),
+            )
+            for account in service.get_all_accounts_cached()
+        )
+        return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+    def _load_checkpoints(self) -> None:
+        checkpoints = self.repo.get_cashbox_audit_checkpoints() or {}
+        self._checkpoints = checkpoints
+        for name in _SOURCES:
+            key = _CHECKPOINT_KEYS[name]
+            self._watermarks[name] = max(
+                (int(checkpoint.get(key) or 0) for checkpoint in checkpoints.values()), default=0
+            )
+        # النسخ محفوظة مع نقاط التحقق فلا تُعاد مراجعة القديم بعد إعادة تشغيل البرنامج
+        self._verified_versions = next(
+            (
+                checkpoint["verified_versions"]
+                for checkpoint in checkpoints.values()
+                if checkpoint.get("verified_versions")
+            ),
+            None,
+        )
+
+    def _step(self) -> bool:
+        """خطوة واحدة محدودة؛ ترجع True لو المراجعة مكتملة ومطابقة لآخر نسخة بيانات."""
+        if self._checkpoints is None:
+            self._load_checkpoints()
+
+        if self._pass_versions is None:
+            versions = self._current_versions()
+            if (
+                versions is not None
+                and self._verified_versions is not None
+                and versions == self._verified_versions
+            ):
+                self._complete = True
+                return True
+            self._begin_pass(versions)
+
+        reference_map = self._reference_map()
+        advanced = False
+        for name in _SOURCES:
+            after_id = self._watermarks[name]
+            bound, rows, max_id = self.repo.get_cash_movement_chunk_bound(
+                name, after_id, self.chunk_size
+            )
+            self._max_ids[name] = max_id
+            if bound <= after_id:
+                continue
+            groups = self.repo.get_cash_movement_groups(name, after_id, bound)
+            fresh = self._group_by_account(name, groups, reference_map)
+            for code, fingerprint in fresh.items():
+                self._merge_into_checkpoint(code, fingerprint)
+            self._watermarks[name] = bound
+            self._rows_verified += rows
+            advanced = True
+
+        if advanced:
+            self._save_checkpoints()
+            self._complete = False
+            return False
+
+        # لا صفوف جديدة متبقية -> المراجعة مكتملة لنسخة بداية الجولة
+        self._verified_versions = self._pass_versions or None
+        self._pass_versions = None
+        self._complete = True
+        self._save_checkpoints()
+        return True
+
+    def _begin_pass(self, versions: dict[str, int] | None) -> None:
+        """
+        بداية جولة: لو كل تغيير منذ آخر مراجعة تفسره صفوف جديدة فقط (إضافات) يكفي
+        مراجعة ما بعد آخر id؛ غير ذلك (تعديل/حذف/تغير الحسابات) تُقارن بصمة كل خزنة
+        للحركات القديمة ويُستبدل ما تغير فقط.
+        """
+        self._pass_versions = versions or {}
+        if self._only_inserts_since_verified(versions):
+            return
+
+        reference_map = self._reference_map()
+        fresh: dict[str, dict[str, Any]] = {}
+        for name in _SOURCES:
+            if self._watermarks[name] <= 0:
+                continue
+            groups = self.repo.get_cash_movement_groups(name, 0, self._watermarks[name])
+            for code, fingerprint in self._group_by_account(name, groups, reference_map).items():
+                target = fresh.setdefault(code, _empty_fingerprint())
+                self._add_fingerprint(target, fingerprint)
+
+        checkpoints = self._checkpoints or {}
+        reverified = 0
+        for code in set(fresh) | set(checkpoints):
+            fingerprint = fresh.get(code, _empty_fingerprint())
+            checkpoint = checkpoints.get(code)
+            if checkpoint is not None and checkpoint.get("movements_hash") == _movements_hash(
+                fingerprint
+            ):
+                continue
+            reverified += 1
+            self._set_checkpoint(code, fingerprint)
+        self._reverified_accounts += reverified
+        if reverified:
+            logger.debug(
+                "[CashboxAudit] re-verified %s cashboxes with changed movements", reverified
+            )
+
+    def _only_inserts_since_verified(self, versions: dict[str, int] | None) -> bool:
+        verified = self._verified_versions
+        if versions is None or verified is None:
+            return False
+        for key in ("accounts", "duplicates"):
+            if versions.get(key) != verified.get(key):
+                return False
+        for name in _SOURCES:
+            # كل إضافة ترفع العدّاد مرة واحدة؛ أي زيادة أخرى = تعديل/حذف لصف قديم
+            _bound, rows, _max_id = self.repo.get_cash_movement_chunk_bound(
+                name, self._watermarks[name], 1 << 62
+            )
+            if versions.get(name, 0) - verified.get(name, 0) != rows:
+                return False
+        return True
+
+    # ---------- التجميع ----------
+
+    def _reference_map(self) -> dict:
+        return self.service._build_account_reference_map(self.service.get_all_accounts_cached())
+
+    def _cash_code(self, account) -> str:
+        if account is None or not self.service._is_leaf_account(account):
+            return _UNASSIGNED
+        code = str(getattr(account, "code", "") or "")
+        return code if code and not code.endswith("000") else _UNASSIGNED
+
+    def _group_by_account(
+        self, name: str, groups: list[tuple], reference_map: dict
+    ) -> dict[str, dict[str, Any]]:
+        """ربط مجموعات المراجع بالخزن (حل كل مرجع مميز مرة واحدة)."""
+        result: dict[str, dict[str, Any]] = {}
+        for group in groups:
+            if name == "payments":
+                account_ref, count, total, weighted = group
+                account = self.service._resolve_account_reference(
+                    account_ref, reference_map, cash_only=True
+                )
+                fingerprint = result.setdefault(self._cash_code(account), _empty_fingerprint())
+                if account is None:
+                    fingerprint["unresolved_payments"] += int(count)
+            else:
+                payment_ref, account_ref, count, total, weighted = group
+                account, needs_repair, needs_backfill = self.service._resolve_expense_cash_account(
+                    SimpleNamespace(payment_account_id=payment_ref, account_id=account_ref),
+                    reference_map,
+                )
+                fingerprint = result.setdefault(self._cash_code(account), _empty_fingerprint())
+                if account is None:
+                    if str(payment_ref or "").strip():
+                        fingerprint["unresolved_expenses"] += int(count)
+                elif needs_repair:
+                    fingerprint["repair"] += int(count)
+                elif needs_backfill:
+                    fingerprint["backfill"] += int(count)
+            component = fingerprint[name]
+            component[0] += int(count)
+            component[1] += float(total or 0.0)
+            component[2] += float(weighted or 0.0)
+        return result
+
+    @staticmethod
+    def _add_fingerprint(target: dict[str, Any], source: dict[str, Any]) -> None:
+        for key, value in source.items():
+            if isinstance(value, list):
+                target[key] = [
+                    current + delta for current, delta in zip(target[key], value, strict=False)
+                ]
+            else:
+                target[key] = int(target.get(key, 0)) + int(value)
+
+    def _set_checkpoint(self, code: str, fingerprint: dict[str, Any]) -> None:
+        checkpoints = self._checkpoints if self._checkpoints is not None else {}
+        checkpoints[code] = {
+            "fingerprint": fingerprint,
+            "inflow": fingerprint["payments"][1],
+            "outflow": fingerprint["expenses"][1],
+            "movements_hash": _movements_hash(fingerprint),
+            "verified_at": datetime.now().isoformat(),
+        }
+        self._checkpoints = checkpoints
+
+    def _merge_into_checkpoint(self, code: str, fingerprint: dict[str, Any]) -> None:
+        existing = (self._checkpoints or {}).get(code)
+        merged = _empty_fingerprint()
+        if existing is not None:
+            self._add_fingerprint(merged, existing.get("fingerprint") or {})
+        self._add_fingerprint(merged, fingerprint)
+        self._set_checkpoint(code, merged)
+
+    def _save_checkpoints(self) -> None:
+        checkpoints = self._checkpoints or {}
+        for checkpoint in checkpoints.values():
+            checkpoint["last_payment_id"] = self._watermarks["payments"]
+            checkpoint["last_expense_id"] = self._watermarks["expenses"]
+            checkpoint["verified_versions"] = self._verified_versions or {}
+        if not checkpoints:
+            # لا خزن بعد: نقطة تحقق فارغة تحفظ موضع المراجعة
+            self._set_checkpoint(_UNASSIGNED, _empty_fingerprint())
+            return self._save_checkpoints()
+        self.repo.save_cashbox_audit_checkpoints(checkpoints)
+
+    # ---------- النتيجة ----------
+
+    def _build_result(self) -> dict[str, Any]:
+        """نفس مفاتيح audit_cashbox_integrity + حالة التقدم."""
+        service = self.service
+        accounts = service.get_all_accounts_cached()
+        checkpoints = self._checkpoints or {}
+        totals = _empty_fingerprint()
+        for checkpoint in checkpoints.values():
+            self._add_fingerprint(totals, checkpoint.get("fingerprint") or {})
+
+        parent_codes = {
+            str(
+                getattr(account, "parent_id", None) or getattr(account, "parent_code", None) or ""
+            ).strip()
+            for account in accounts
+        }
+        result: dict[str, Any] = {
+            "cashbox_count": sum(
+                1
+                for account in accounts
+                if service._is_cash_account_like(account)
+                and str(getattr(account, "code", "") or "") not in parent_codes
+                and not str(getattr(account, "code", "") or "").endswith("000")
+            ),
+            "payments_reviewed": totals["payments"][0],
+            "expenses_reviewed": totals["expenses"][0],
+            "unresolved_payment_account_refs": totals["unresolved_payments"],
+            "unresolved_expense_payment_refs": totals["unresolved_expenses"],
+            "fixed_expense_payment_refs": totals["repair"],
+            "backfilled_expense_payment_refs": totals["backfill"],
+            "stale_cash_balance_count": 0,
+            "stale_cash_balances": [],
+            # قبل اكتمال المراجعة العدّادات ناقصة ولا تُقارن الأرصدة بنقاط تحقق جزئية
+            "partial": not self._complete,
+        }
+
+        for account in accounts if self._complete else ():
+            code = str(getattr(account, "code", "") or "")
+            if (
+                not code.startswith("111")
+                or not service._is_cash_account_like(account)
+                or not service._is_leaf_account(account)
+                or bool(getattr(account, "is_group", False))
+            ):
+                continue
+            checkpoint = checkpoints.get(code) or {}
+            derived_balance = float(checkpoint.get("inflow", 0.0)) - float(
+                checkpoint.get("outflow", 0.0)
+            )
+            stored_balance = float(getattr(account, "balance", 0.0) or 0.0)
+            if abs(stored_balance - derived_balance) <= 0.01:
+                continue
+            result["stale_cash_balances"].append(
+                {
+                    "code": code,
+                    "name": getattr(account, "name", ""),
+                    "stored_balance": stored_balance,
+                    "derived_balance": derived_balance,
+                }
+            )
+        result["stale_cash_balance_count"] = len(result["stale_cash_balances"])
+        result.update(self.progress())
+        return result
@@ -216,6 +216,34 @@ class ClientService:
             logger.error("[ClientService] فشل جلب شعار العميل عند الطلب %s: %s", client_id, e)
             return False
 
+    def has_local_logo(self, logo_hash: str | None) -> bool:
+        """هل صورة البصمة موجودة في مخزن blobs المحلي (بدون تحميل من السحابة)."""
+        try:
+            return bool(logo_hash) and self.repo.has_blob(logo_hash) is True
+        except Exception:
+            return False
+
+    def get_logo_thumbnail(self, logo_hash: str | None) -> bytes | None:
+        """⚡ الصورة المصغرة الجاهزة (PNG) لعرض قوائم العملاء."""
+        try:
+            thumbnail = self.repo.get_blob_thumbnail(logo_hash)
+        except Exception:
+            return None
+        return thumbnail if isinstance(thumbnail, bytes) else None
+
+    def get_logo_blob(self, logo_hash: str | None) -> tuple[bytes, str] | None:
+        try:
+            blob = self.repo.get_blob(logo_hash)
+        except Exception:
+            return None
+        return blob if isinstance(blob, tuple) else None
+
+    def save_logo_thumbnail(self, logo_hash: str, thumbnail: bytes) -> None:
+        try:
+            self.repo.save_blob_thumbnail(logo_hash, thumbnail)
+        except Exception as e:
+            logger.debug("[ClientService] تعذر حفظ الصورة المصغرة للشعار: %s", e)
+
     def get_client_by_name(self, name: str) -> schemas.Client | None:
         """
         جلب عميل واحد بالاسم
@@ -373,7 +401,26 @@ class ClientService:
             tuple: (client_projects_total, client_payments_total)
                 - client_projects_total: {client_id: total_amount}
                 - client_payments_total: {client_id: total_paid}
+
+        ⚡ المفاتيح تشمل كل مراجع العميل (id / _mongo_id / الاسم) من جدول الأرصدة المجمّع،
+        فلا يهم إن سُجل المشروع أو الدفعة باسم العميل أو بالـ id.
         """
+        getter = getattr(self.repo, "get_client_balance_table", None)
+        if callable(getter):
+            try:
+                table = getter()
+            except Exception as e:
+                logger.debug("[ClientService] تعذر قراءة جدول أرصدة العملاء: %s", e)
+                table = None
+            if isinstance(table, dict):
+                client_projects_total: dict[str, float] = {}
+                client_payments_total: dict[str, float] = {}
+                for entry in table.values():
+                    for reference in entry.get("references", ()):
+                        client_projects_total[str(reference)] = float(entry["projects_total"])
+                        client_payments_total[str(reference)] = float(entry["paid"])
+                return client_projects_total, client_payments_total
+
         try:
             cursor = self.repo.get_cursor()
             try:
@@ -245,7 +245,9 @@ class ExpenseService:
                 # ⚡ إبطال الـ cache
                 self.invalidate_cache()
                 # ⚡ إرسال البيانات بالشكل الصحيح
-                self.bus.publish("EXPENSE_UPDATED", {"expense": expense_data})
+                self.bus.publish(
+                    "EXPENSE_UPDATED", {"expense": expense_data, "previous": existing_expense}
+                )
                 # ⚡ إرسال إشارة التحديث
                 app_signals.emit_data_changed("expenses")
                 app_signals.emit_data_changed("accounting")
@@ -423,7 +425,11 @@ class ExpenseService:
             قائمة الفئات الفريدة
         """
         try:
-            all_expenses = self.repo.get_all_expenses()
+            # ⚡ عمود الفئة فقط عبر repo.scan بدل بناء كل موديلات المصروفات
+            scan = getattr(self.repo, "scan", None)
+            all_expenses = scan("expenses", ("category",)) if callable(scan) else None
+            if not isinstance(all_expenses, list):
+                all_expenses = self.repo.get_all_expenses()
             categories = {e.category for e in all_expenses if e.category}
             return sorted(categories)
         except Exception as e:
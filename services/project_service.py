@@ -904,7 +904,10 @@ class ProjectService:
 
             if result:
                 # ✅ إبلاغ الروبوت المحاسبي بتعديل الدفعة (يحدث القيد تلقائياً)
-                self.bus.publish("PAYMENT_UPDATED", {"payment": payment_data, "project": project})
+                self.bus.publish(
+                    "PAYMENT_UPDATED",
+                    {"payment": payment_data, "project": project, "previous": existing_payment},
+                )
 
                 # ⚡ تحديث حالة المشروع أوتوماتيك
                 self._auto_update_project_status(
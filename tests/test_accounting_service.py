@@ -1,3 +1,4 @@
+import threading
 from datetime import datetime
 from types import SimpleNamespace
 from unittest.mock import patch
@@ -5,6 +6,7 @@ from unittest.mock import patch
 import pytest
 
 from core import schemas
+from core.cache_manager import invalidate_cache
 from core.event_bus import EventBus
 from services.accounting_service import AccountingService
 
@@ -30,6 +32,23 @@ def sqlite_repo(tmp_path, monkeypatch):
         repo.close()
 
 
+def _duplicate_row(repo, table_name: str, row_id, **overrides) -> int:
+    """نسخة خام من صف (id جديد) كما تتركها مزامنة قديمة مكررة."""
+    cursor = repo.sqlite_conn.cursor()
+    cursor.execute(f"SELECT * FROM {table_name} WHERE id = ?", (row_id,))
+    row = dict(cursor.fetchone())
+    row.pop("id")
+    row.update(overrides)
+    columns = ", ".join(row)
+    placeholders = ", ".join("?" for _ in row)
+    cursor.execute(
+        f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})", tuple(row.values())
+    )
+    repo.sqlite_conn.commit()
+    repo.invalidate_table_cache(table_name)
+    return int(cursor.lastrowid)
+
+
 class TestAccountingService:
     @pytest.fixture
     def service(self, mock_repo, mock_event_bus):
@@ -709,6 +728,148 @@ class TestAccountingService:
         mock_repo.get_total_paid_for_project.assert_called_with("17", client_id="CLIENT-R1")
         assert kpis["receivables"] == pytest.approx(300.0)
 
+    def test_get_cash_flow_data_reads_scan_projection_without_models(self, sqlite_repo):
+        service = AccountingService(sqlite_repo, EventBus())
+        sqlite_repo.create_payment(
+            schemas.Payment(
+                project_id="P-1",
+                client_id="C-1",
+                date=datetime(2026, 1, 5, 10, 0, 0),
+                amount=1000.0,
+                account_id="111001",
+                method="Cash",
+            )
+        )
+        sqlite_repo.create_expense(
+            schemas.Expense(
+                date=datetime(2026, 1, 20, 10, 0, 0),
+                category="Ops",
+                amount=400.0,
+                account_id="RENT",
+                payment_account_id="111001",
+            )
+        )
+
+        with (
+            patch.object(sqlite_repo, "get_all_payments", side_effect=AssertionError),
+            patch.object(sqlite_repo, "get_all_expenses", side_effect=AssertionError),
+        ):
+            data = service.get_cash_flow_data(
+                datetime(2026, 1, 1), datetime(2026, 1, 31, 23, 59, 59), "monthly"
+            )
+
+        assert data["inflows"] == [("2026-01", 1000.0)]
+        assert data["outflows"] == [("2026-01", 400.0)]
+        assert data["net_flow"] == [("2026-01", 600.0)]
+
+    def test_cash_flow_totals_ignore_signature_duplicates_like_get_all_payments(self, sqlite_repo):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        sqlite_repo.create_account(
+            schemas.Account(name="خزنة", code="111001", type=schemas.AccountType.CASH)
+        )
+        project = sqlite_repo.create_project(schemas.Project(name="Project One", client_id="C-1"))
+        created = sqlite_repo.create_payment(
+            schemas.Payment(
+                project_id="Project One",
+                client_id="C-1",
+                date=datetime(2026, 1, 5, 10, 0, 0),
+                amount=300.0,
+                account_id="111001",
+                method="Cash",
+            )
+        )
+        assert created.project_id == str(project.id)
+        # نفس الدفعة بمرجع اسم المشروع بدل الـ id المحلي (نسخة مزامنة قديمة)
+        _duplicate_row(sqlite_repo, "payments", created.id, project_id="Project One")
+        invalidate_cache("accounts")
+
+        assert len(sqlite_repo.get_all_payments()) == 1
+        assert len(sqlite_repo.scan("payments", ("amount",))) == 2
+        assert [row.amount for row in sqlite_repo.scan("payments", ("amount",), dedupe=True)] == [
+            300.0
+        ]
+
+        accounts = sqlite_repo.get_all_accounts()
+        inflow, _outflow = service._build_cash_flow_totals(accounts)
+        baseline_inflow, _baseline_outflow = service._build_cash_flow_totals(
+            accounts, sqlite_repo.get_all_payments(), sqlite_repo.get_all_expenses()
+        )
+        assert inflow == baseline_inflow == {"111001": pytest.approx(300.0)}
+
+    def test_cash_flow_buckets_match_calendar_keys_and_reuse_snapshot(self, sqlite_repo):
+        service = AccountingService(sqlite_repo, EventBus())
+        dates = [datetime(2025, 12, 29, 9, 0), datetime(2026, 1, 4, 18, 0), datetime(2026, 1, 5)]
+        for index, payment_date in enumerate(dates, start=1):
+            sqlite_repo.create_payment(
+                schemas.Payment(
+                    project_id=f"P-{index}",
+                    client_id="C-1",
+                    date=payment_date,
+                    amount=100.0 * index,
+                    account_id="111001",
+                    method="Cash",
+                )
+            )
+
+        start, end = datetime(2025, 12, 1), datetime(2026, 1, 31, 23, 59, 59)
+        weekly = service.get_cash_flow_data(start, end, "weekly")
+        expected_weeks: dict[str, float] = {}
+        for index, payment_date in enumerate(dates, start=1):
+            year, week, _ = payment_date.isocalendar()
+            key = f"{year}-W{week:02d}"
+            expected_weeks[key] = expected_weeks.get(key, 0.0) + 100.0 * index
+        assert dict(weekly["inflows"]) == expected_weeks
+
+        with patch.object(sqlite_repo, "scan", side_effect=AssertionError):
+            daily = service.get_cash_flow_data(start, end, "daily")
+            kpis = service.get_kpis_with_trends(datetime(2026, 1, 1), end)
+        assert daily["inflows"] == [
+            ("2025-12-29", 100.0),
+            ("2026-01-04", 200.0),
+            ("2026-01-05", 300.0),
+        ]
+        assert kpis["cash_collected"] == {"current": 500.0, "previous": 100.0}
+
+    def test_filtered_data_by_date_range_reads_the_analytics_snapshot(self, sqlite_repo):
+        service = AccountingService(sqlite_repo, EventBus())
+        for day, amount in ((3, 100.0), (20, 250.0)):
+            sqlite_repo.create_payment(
+                schemas.Payment(
+                    project_id="P-1",
+                    client_id="C-1",
+                    date=datetime(2026, 2, day, 10, 0),
+                    amount=amount,
+                    account_id="111001",
+                    method="Cash",
+                )
+            )
+        sqlite_repo.create_expense(
+            schemas.Expense(
+                date=datetime(2026, 2, 10),
+                category="Ads",
+                amount=40.0,
+                account_id="510001",
+            )
+        )
+
+        start, end = datetime(2026, 2, 1), datetime(2026, 2, 15, 23, 59, 59)
+        service.get_cash_flow_data(start, end, "daily")
+        getters = ("get_all_payments", "get_all_expenses", "get_all_projects")
+        with patch.object(sqlite_repo, "scan", side_effect=AssertionError):
+            with patch.multiple(
+                sqlite_repo, **{name: lambda: pytest.fail("full reload") for name in getters}
+            ):
+                filtered = service.get_filtered_data_by_date_range(start, end)
+                payments_only = service.get_filtered_data_by_date_range(start, end, "payments")
+
+        assert [(p.amount, p.client_id, p.method) for p in filtered["payments"]] == [
+            (100.0, "C-1", "Cash")
+        ]
+        assert [(e.amount, e.category) for e in filtered["expenses"]] == [(40.0, "Ads")]
+        assert [p.amount for p in payments_only["payments"]] == [100.0]
+        assert payments_only["expenses"] == []
+
     def test_get_financial_summary_derives_operational_balances_from_business_records(
         self, service, mock_repo
     ):
@@ -855,6 +1016,746 @@ class TestAccountingService:
         assert balances[0]["balance"] == pytest.approx(750.0)
         assert balances[0]["status"] == "مستحق"
 
+    def test_client_balances_come_from_one_grouped_pass_with_normalized_references(
+        self, sqlite_repo
+    ):
+        from services.client_service import ClientService
+
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+
+        first = sqlite_repo.create_client(schemas.Client(name="Alpha Co"))
+        second = sqlite_repo.create_client(schemas.Client(name="Beta Co"))
+        # مراجع مختلطة: مشروع بالاسم وآخر بالـ id، ودفعة بالاسم بمسافات زائدة
+        for client_ref, amount in (("Alpha Co", 1000.0), (str(first.id), 500.0)):
+            sqlite_repo.create_project(
+                schemas.Project(name=f"P-{amount}", client_id=client_ref, total_amount=amount)
+            )
+        sqlite_repo.create_invoice(
+            schemas.Invoice(
+                invoice_number="INV-GROUPED-001",
+                client_id=str(first.id),
+                project_id="P-1000.0",
+                issue_date=datetime(2026, 1, 5),
+                due_date=datetime(2026, 1, 12),
+                items=[],
+                subtotal=1500.0,
+                total_amount=1500.0,
+            )
+        )
+        sqlite_repo.create_payment(
+            schemas.Payment(
+                project_id="P-1000.0",
+                client_id=" Alpha Co ",
+                date=datetime(2026, 1, 6),
+                amount=400.0,
+                account_id="111001",
+            )
+        )
+
+        with (
+            patch.object(sqlite_repo, "get_invoices_by_client", side_effect=AssertionError),
+            patch.object(sqlite_repo, "get_payments_by_client", side_effect=AssertionError),
+        ):
+            balances = {row["client_name"]: row for row in service.get_all_clients_balances()}
+            assert service.get_client_balance("Alpha Co") == pytest.approx(1100.0)
+            assert service.get_client_balance(str(second.id)) == 0.0
+        assert balances["Alpha Co"]["balance"] == pytest.approx(1100.0)
+        assert balances["Beta Co"]["balance"] == 0.0
+
+        projects_total, payments_total = ClientService(sqlite_repo).get_client_financial_totals()
+        assert projects_total["Alpha Co"] == pytest.approx(1500.0)
+        assert projects_total[str(first.id)] == pytest.approx(1500.0)
+        assert payments_total["Alpha Co"] == pytest.approx(400.0)
+        assert "Beta Co" not in projects_total
+
+        with patch.object(sqlite_repo, "_load_client_balance_table", side_effect=AssertionError):
+            assert sqlite_repo.get_client_balance_entry("alpha co")["paid"] == pytest.approx(400.0)
+
+        sqlite_repo.create_payment(
+            schemas.Payment(
+                project_id="P-500.0",
+                client_id=str(second.id),
+                date=datetime(2026, 1, 7),
+                amount=50.0,
+                account_id="111001",
+            )
+        )
+        assert service.get_client_balance("Beta Co") == pytest.approx(-50.0)
+
+    def test_payment_and_expense_events_apply_balance_deltas_to_cash_chain(self, sqlite_repo):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        invalidate_cache("accounts")
+        for name, code, parent in (("الخزن", "111000", None), ("خزنة", "111001", "111000")):
+            sqlite_repo.create_account(
+                schemas.Account(
+                    name=name,
+                    code=code,
+                    type=schemas.AccountType.CASH,
+                    parent_code=parent,
+                    balance=0.0,
+                )
+            )
+        payment = schemas.Payment(
+            project_id="P-1",
+            client_id="C-1",
+            date=datetime(2026, 1, 5),
+            amount=1000.0,
+            account_id="111001",
+        )
+        expense = schemas.Expense(
+            date=datetime(2026, 1, 6),
+            category="Ops",
+            amount=300.0,
+            account_id="RENT",
+            payment_account_id="111001",
+        )
+
+        with patch.object(service, "_schedule_cash_recalc", side_effect=AssertionError):
+            service.handle_new_payment({"payment": payment})
+            service.handle_new_expense({"expense": expense})
+            service.handle_updated_payment(
+                {"payment": payment.model_copy(update={"amount": 1200.0}), "previous": payment}
+            )
+            service.handle_deleted_expense({"id": 1, "expense": expense})
+
+        balances = {acc.code: acc.balance for acc in sqlite_repo.get_all_accounts()}
+        assert balances["111001"] == pytest.approx(1200.0)
+        assert balances["111000"] == pytest.approx(1200.0)
+
+    def test_hierarchy_cache_is_patched_along_parent_chain_on_cash_events(self, sqlite_repo):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        invalidate_cache("accounts")
+        AccountingService._hierarchy_cache = None
+        for name, code, parent in (
+            ("الأصول", "100000", None),
+            ("الخزن", "111000", "100000"),
+            ("خزنة", "111001", "111000"),
+            ("بنك", "111002", "111000"),
+        ):
+            sqlite_repo.create_account(
+                schemas.Account(
+                    name=name,
+                    code=code,
+                    type=schemas.AccountType.CASH,
+                    parent_code=parent,
+                    balance=0.0,
+                )
+            )
+        tree = service.get_hierarchy_with_balances(force_refresh=True)
+        assert tree["111001"]["parent"] == "111000"
+        assert tree["111000"]["parent"] == "100000"
+        service.get_all_accounts_cached()
+
+        payment = schemas.Payment(
+            project_id="P-1",
+            client_id="C-1",
+            date=datetime(2026, 1, 5),
+            amount=500.0,
+            account_id="111001",
+        )
+        sqlite_repo.create_payment(payment)
+        with (
+            patch.object(service, "_schedule_cash_recalc", side_effect=AssertionError),
+            patch.object(sqlite_repo, "get_all_accounts", side_effect=AssertionError),
+        ):
+            service.handle_new_payment({"payment": payment})
+            patched = service.get_hierarchy_with_balances()
+
+        assert patched is tree
+        assert patched["111001"]["total"] == pytest.approx(500.0)
+        assert patched["111002"]["total"] == pytest.approx(0.0)
+        assert patched["111000"]["total"] == pytest.approx(500.0)
+        assert patched["100000"]["total"] == pytest.approx(500.0)
+        assert patched["111000"]["obj"].balance == pytest.approx(500.0)
+
+        rebuilt = service.get_hierarchy_with_balances(force_refresh=True)
+        assert {code: node["total"] for code, node in rebuilt.items()} == pytest.approx(
+            {code: node["total"] for code, node in patched.items()}
+        )
+        AccountingService._hierarchy_cache = None
+
+    def test_post_transactions_batch_writes_entries_and_parent_deltas_once(self, sqlite_repo):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        for name, code, parent, acc_type in (
+            ("الخزن", "111000", None, schemas.AccountType.CASH),
+            ("خزنة", "111001", "111000", schemas.AccountType.CASH),
+            ("إيرادات", "410001", None, schemas.AccountType.REVENUE),
+        ):
+            sqlite_repo.create_account(
+                schemas.Account(
+                    name=name, code=code, type=acc_type, parent_code=parent, balance=0.0
+                )
+            )
+        transactions = [
+            {
+                "date": datetime(2026, 2, day),
+                "description": f"Sale {day}",
+                "amount": 100.0 * day,
+                "debit_account_code": "111001",
+                "credit_account_code": "410001",
+            }
+            for day in (1, 2, 3)
+        ]
+        transactions.append(
+            {
+                "date": datetime(2026, 2, 4),
+                "description": "Broken",
+                "amount": 50.0,
+                "debit_account_code": "999999",
+                "credit_account_code": "410001",
+            }
+        )
+
+        with (
+            patch.object(sqlite_repo, "create_journal_entry", side_effect=AssertionError),
+            patch.object(sqlite_repo, "update_account", side_effect=AssertionError),
+            patch("services.accounting_service.app_signals.emit_data_changed") as emit,
+        ):
+            result = service.post_transactions_batch(transactions)
+
+        assert result["posted"] == 3
+        assert result["success"] is False
+        assert len(result["errors"]) == 1 and "999999" in result["errors"][0]
+        emit.assert_called_once_with("accounting")
+        assert len(sqlite_repo.get_all_journal_entries()) == 3
+        balances = {acc.code: acc.balance for acc in sqlite_repo.get_all_accounts()}
+        assert balances["111001"] == pytest.approx(600.0)
+        assert balances["111000"] == pytest.approx(600.0)
+        assert balances["410001"] == pytest.approx(600.0)
+
+    def test_post_transactions_batch_skips_row_with_invalid_date(self, sqlite_repo):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        for name, code, acc_type in (
+            ("خزنة", "111001", schemas.AccountType.CASH),
+            ("إيرادات", "410001", schemas.AccountType.REVENUE),
+        ):
+            sqlite_repo.create_account(
+                schemas.Account(name=name, code=code, type=acc_type, balance=0.0)
+            )
+        transactions = [
+            {
+                "date": date,
+                "description": f"Sale {index}",
+                "amount": 100.0,
+                "debit_account_code": "111001",
+                "credit_account_code": "410001",
+            }
+            for index, date in enumerate((datetime(2026, 2, 1), "not-a-date", datetime(2026, 2, 3)))
+        ]
+
+        with patch("services.accounting_service.app_signals.emit_data_changed"):
+            result = service.post_transactions_batch(transactions)
+
+        assert result["posted"] == 2
+        assert result["success"] is False
+        assert len(result["errors"]) == 1 and result["errors"][0].startswith("#1:")
+        assert len(sqlite_repo.get_all_journal_entries()) == 2
+        balances = {acc.code: acc.balance for acc in sqlite_repo.get_all_accounts()}
+        assert balances["111001"] == pytest.approx(200.0)
+
+    def test_seed_test_transactions_posts_through_one_batch(self, sqlite_repo):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        for name, code, acc_type in (
+            ("الخزنة الرئيسية", "1111", schemas.AccountType.CASH),
+            ("البنك الأهلي", "1121", schemas.AccountType.CASH),
+            ("فودافون كاش", "1131", schemas.AccountType.CASH),
+            ("العملاء", "1140", schemas.AccountType.ASSET),
+            ("إيرادات الخدمات", "4100", schemas.AccountType.REVENUE),
+        ):
+            sqlite_repo.create_account(
+                schemas.Account(name=name, code=code, type=acc_type, balance=0.0)
+            )
+
+        with (
+            patch.object(sqlite_repo, "create_journal_entry", side_effect=AssertionError),
+            patch.object(
+                sqlite_repo,
+                "create_journal_entries_batch",
+                wraps=sqlite_repo.create_journal_entries_batch,
+            ) as batch,
+            patch("services.accounting_service.app_signals.emit_data_changed") as emit,
+        ):
+            result = service.seed_test_transactions()
+
+        batch.assert_called_once()
+        emit.assert_called_once_with("accounting")
+        # حساب الرواتب 5110 غير موجود: معاملة الراتب وحدها تُرفض
+        assert result["created"] == 3
+        assert len(result["errors"]) == 1 and "5110" in result["errors"][0]
+        assert len(sqlite_repo.get_all_journal_entries()) == 3
+        balances = {acc.code: acc.balance for acc in sqlite_repo.get_all_accounts()}
+        assert balances["1121"] == pytest.approx(10000.0)
+        assert balances["1111"] == pytest.approx(-8500.0)
+        assert balances["1140"] == pytest.approx(0.0)
+
+    def test_reports_use_sql_aggregates_and_cache_per_data_version(self, sqlite_repo):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        invalidate_cache("accounts")
+        for name, code, parent in (("الخزن", "111000", None), ("خزنة", "111001", "111000")):
+            sqlite_repo.create_account(
+                schemas.Account(
+                    name=name,
+                    code=code,
+                    type=schemas.AccountType.CASH,
+                    parent_code=parent,
+                    balance=0.0,
+                )
+            )
+        for day, amount in ((5, 3000.0), (20, 500.0)):
+            sqlite_repo.create_payment(
+                schemas.Payment(
+                    project_id="P-1",
+                    client_id="C-1",
+                    date=datetime(2026, 1, day, 10, 0, 0),
+                    amount=amount,
+                    account_id="111001",
+                )
+            )
+        for day, category, amount in (
+            (6, "إيجار", 700.0),
+            (7, "إيجار", 100.0),
+            (25, "نثريات", 50.0),
+        ):
+            sqlite_repo.create_expense(
+                schemas.Expense(
+                    date=datetime(2026, 1, day, 9, 0, 0),
+                    category=category,
+                    amount=amount,
+                    account_id="RENT",
+                    payment_account_id="111001",
+                )
+            )
+
+        start, end = datetime(2026, 1, 1), datetime(2026, 1, 10, 23, 59, 59)
+        trial = service.get_trial_balance(start, end)
+        assert trial["balanced"] is True
+        rows = {row["code"] or row["name"]: row for row in trial["rows"]}
+        assert rows["111001"]["debit"] == pytest.approx(3000.0)
+        assert rows["111001"]["credit"] == pytest.approx(800.0)
+
+        sheet = service.get_balance_sheet(datetime(2026, 1, 31, 23, 59, 59))
+        assert sheet["total_assets"] == pytest.approx(2650.0)
+        assert sheet["total_equity"] == pytest.approx(sheet["total_assets"])
+
+        with patch.object(sqlite_repo, "get_report_aggregates", side_effect=AssertionError):
+            assert service.get_trial_balance(start, end) == trial
+            assert service.get_balance_sheet(datetime(2026, 1, 31, 23, 59, 59)) == sheet
+
+        sqlite_repo.create_payment(
+            schemas.Payment(
+                project_id="P-1",
+                client_id="C-1",
+                date=datetime(2026, 1, 8),
+                amount=250.0,
+                account_id="111001",
+            )
+        )
+        trial = service.get_trial_balance(start, end)
+        rows = {row["code"] or row["name"]: row for row in trial["rows"]}
+        assert rows["111001"]["debit"] == pytest.approx(3250.0)
+        assert service.get_financial_summary()["assets"] == pytest.approx(2900.0)
+
+    def test_report_aggregates_agree_with_full_scan_paths_on_duplicates_and_journal(
+        self, sqlite_repo
+    ):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        invalidate_cache("accounts")
+        for name, code, account_type, parent in (
+            ("الخزن", "111000", schemas.AccountType.CASH, None),
+            ("خزنة", "111001", schemas.AccountType.CASH, "111000"),
+            ("إيرادات المشاريع", "410001", schemas.AccountType.REVENUE, None),
+            ("إيجار", "510001", schemas.AccountType.EXPENSE, None),
+        ):
+            sqlite_repo.create_account(
+                schemas.Account(name=name, code=code, type=account_type, parent_code=parent)
+            )
+        project = sqlite_repo.create_project(schemas.Project(name="Report One", client_id="C-1"))
+        payment = sqlite_repo.create_payment(
+            schemas.Payment(
+                project_id=project.name,
+                client_id="C-1",
+                date=datetime(2026, 1, 5, 10, 0, 0),
+                amount=300.0,
+                account_id="111001",
+                method="Cash",
+            )
+        )
+        _duplicate_row(sqlite_repo, "payments", payment.id, project_id=project.name)
+        expense = sqlite_repo.create_expense(
+            schemas.Expense(
+                date=datetime(2026, 1, 6, 9, 0, 0),
+                category="إيجار",
+                amount=100.0,
+                account_id="510001",
+                payment_account_id="111001",
+            )
+        )
+        _duplicate_row(sqlite_repo, "expenses", expense.id)
+        # قيد الدفعة القديم يحمل نفس الإيراد: لا يُضاف فوق التحصيلات
+        sqlite_repo.create_journal_entry(
+            schemas.JournalEntry(
+                date=datetime(2026, 1, 5, 10, 0, 0),
+                description="قيد تحصيل قديم",
+                lines=[
+                    schemas.JournalEntryLine(
+                        account_id="111001", account_code="111001", debit=300.0
+                    ),
+                    schemas.JournalEntryLine(
+                        account_id="410001", account_code="410001", credit=300.0
+                    ),
+                ],
+                related_document_id=str(payment.id),
+            )
+        )
+        invalidate_cache("accounts")
+
+        start, end = datetime(2026, 1, 1), datetime(2026, 1, 31, 23, 59, 59)
+        pnl = service.get_profit_and_loss(start, end)
+        assert pnl == service._get_profit_and_loss_from_entries(start, end)
+        assert pnl["total_revenue"] == pytest.approx(300.0)
+        assert pnl["net_profit"] == pytest.approx(200.0)
+
+        # ميزان المراجعة والميزانية يطبقان نفس القاعدة: الدفعة ذات القيد تُؤخذ من قيدها فقط
+        trial = service.get_trial_balance(start, end)
+        assert trial["balanced"] is True
+        rows = {row["code"] or row["name"]: row for row in trial["rows"]}
+        assert service._COLLECTIONS_LABEL not in rows
+        assert rows["111001"]["debit"] == pytest.approx(300.0)
+        assert rows["111001"]["credit"] == pytest.approx(100.0)
+        assert sum(
+            row["credit"] - row["debit"]
+            for row in trial["rows"]
+            if row["type"] == schemas.AccountType.REVENUE.value
+        ) == pytest.approx(pnl["total_revenue"])
+        sheet = service.get_balance_sheet(end)
+        assert sheet["total_assets"] == pytest.approx(200.0)
+        assert sheet["retained_earnings"] == pytest.approx(pnl["net_profit"])
+        assert sheet["total_equity"] == pytest.approx(sheet["total_assets"])
+
+        summary = service.get_financial_summary()
+        assert summary["revenue"] == pytest.approx(300.0)
+        assert summary["opex"] == pytest.approx(100.0)
+        with patch.object(sqlite_repo, "get_report_aggregates", return_value=None):
+            service._report_cache.clear()
+            assert service.get_financial_summary() == pytest.approx(summary)
+
+    def test_cashbox_audit_job_resumes_from_checkpoints_and_reverifies_changes(self, sqlite_repo):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        invalidate_cache("accounts")
+        for name, code, parent in (
+            ("الخزن", "111000", None),
+            ("خزنة", "111001", "111000"),
+            ("بنك", "111002", "111000"),
+        ):
+            sqlite_repo.create_account(
+                schemas.Account(
+                    name=name,
+                    code=code,
+                    type=schemas.AccountType.CASH,
+                    parent_code=parent,
+                    balance=0.0,
+                )
+            )
+        payments = []
+        for index in range(7):
+            payments.append(
+                sqlite_repo.create_payment(
+                    schemas.Payment(
+                        project_id="P-1",
+                        client_id="C-1",
+                        date=datetime(2026, 1, index + 1),
+                        amount=100.0 * (index + 1),
+                        account_id="111001" if index % 2 else "111002",
+                    )
+                )
+            )
+        for payment_ref, account_ref in (("111001", "RENT"), ("", "111002"), ("OLD", "X")):
+            sqlite_repo.create_expense(
+                schemas.Expense(
+                    date=datetime(2026, 1, 9),
+                    category="إيجار",
+                    amount=50.0,
+                    account_id=account_ref,
+                    payment_account_id=payment_ref,
+                )
+            )
+
+        job = service.get_cashbox_audit_job()
+        job.chunk_size = 3
+        first = job.run(budget_seconds=0.0)
+        assert first["complete"] is False
+        assert 0 < first["progress"] < 1
+
+        result = job.run()
+        full = service.audit_cashbox_integrity()
+        assert result["complete"] is True
+        for key in (
+            "cashbox_count",
+            "payments_reviewed",
+            "expenses_reviewed",
+            "unresolved_payment_account_refs",
+            "unresolved_expense_payment_refs",
+            "backfilled_expense_payment_refs",
+            "stale_cash_balance_count",
+        ):
+            assert result[key] == full[key], key
+        stale = {row["code"]: row["derived_balance"] for row in result["stale_cash_balances"]}
+        assert stale == {
+            row["code"]: pytest.approx(row["derived_balance"])
+            for row in full["stale_cash_balances"]
+        }
+        checkpoints = sqlite_repo.get_cashbox_audit_checkpoints()
+        assert checkpoints["111001"]["last_payment_id"] == payments[-1].id
+        assert checkpoints["111001"]["inflow"] == pytest.approx(1200.0)
+
+        # إعادة التشغيل (مهمة جديدة) تكمل من نقاط التحقق بدون مسح أي حركة
+        resumed = service._cashbox_audit_job = type(job)(service)
+        with patch.object(sqlite_repo, "get_cash_movement_groups", side_effect=AssertionError):
+            assert resumed.run()["payments_reviewed"] == 7
+            assert resumed.run()["stale_cash_balances"] == result["stale_cash_balances"]
+
+        groups_calls = []
+        original_groups = sqlite_repo.get_cash_movement_groups
+
+        def spy_groups(table_name, after_id=0, upto_id=None):
+            groups_calls.append((table_name, after_id))
+            return original_groups(table_name, after_id, upto_id)
+
+        sqlite_repo.create_payment(
+            schemas.Payment(
+                project_id="P-1",
+                client_id="C-1",
+                date=datetime(2026, 1, 10),
+                amount=1000.0,
+                account_id="111001",
+            )
+        )
+        with patch.object(sqlite_repo, "get_cash_movement_groups", side_effect=spy_groups):
+            appended = resumed.run()
+        assert groups_calls == [("payments", payments[-1].id)]
+        assert appended["payments_reviewed"] == 8
+
+        sqlite_repo.update_payment(payments[1].id, payments[1].model_copy(update={"amount": 5.0}))
+        edited = resumed.run()
+        assert edited["reverified_accounts"] == 1
+        stale = {row["code"]: row["derived_balance"] for row in edited["stale_cash_balances"]}
+        assert stale["111001"] == pytest.approx(2200.0 - 200.0 + 5.0 - 50.0)
+
+    def test_cashbox_audit_job_ignores_sync_updates_and_reports_completion(self, sqlite_repo):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        invalidate_cache("accounts")
+        for name, code, parent in (("الخزن", "111000", None), ("خزنة", "111001", "111000")):
+            sqlite_repo.create_account(
+                schemas.Account(
+                    name=name,
+                    code=code,
+                    type=schemas.AccountType.CASH,
+                    parent_code=parent,
+                    balance=0.0,
+                )
+            )
+        payments = [
+            sqlite_repo.create_payment(
+                schemas.Payment(
+                    project_id="P-1",
+                    client_id="C-1",
+                    date=datetime(2026, 1, index + 1),
+                    amount=100.0,
+                    account_id="111001",
+                )
+            )
+            for index in range(4)
+        ]
+
+        job = service.get_cashbox_audit_job()
+        job.chunk_size = 1
+        partial = job.run(budget_seconds=0.0)
+        assert partial["complete"] is False
+        assert partial["partial"] is True
+        assert partial["stale_cash_balances"] == []
+
+        completed = threading.Event()
+        results = []
+        job.add_completion_listener(lambda result: (results.append(result), completed.set()))
+        job.start(interval_seconds=60.0)
+        try:
+            assert completed.wait(10)
+        finally:
+            job.stop()
+        assert results[0]["complete"] is True
+        assert results[0]["partial"] is False
+        assert results[0]["stale_cash_balance_count"] == 1
+
+        # تحديث المزامنة بعد push لا يفرض إعادة مراجعة الحركات القديمة
+        sqlite_repo.sqlite_cursor.execute(
+            "UPDATE payments SET sync_status = 'synced', dirty_flag = 0, _mongo_id = 'm-' || id"
+        )
+        sqlite_repo.sqlite_conn.commit()
+        with patch.object(sqlite_repo, "get_cash_movement_groups", side_effect=AssertionError):
+            synced = job.run()
+        assert synced["complete"] is True
+        assert synced["payments_reviewed"] == 4
+
+        sqlite_repo.sqlite_cursor.execute(
+            "UPDATE payments SET sync_status = 'deleted' WHERE id = ?", (payments[0].id,)
+        )
+        sqlite_repo.sqlite_conn.commit()
+        deleted = job.run()
+        assert deleted["reverified_accounts"] == 1
+        assert deleted["payments_reviewed"] == 3
+
+    def test_cashbox_audit_job_excludes_signature_duplicates(self, sqlite_repo):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        invalidate_cache("accounts")
+        for name, code, parent, balance in (
+            ("الخزن", "111000", None, 300.0),
+            ("خزنة", "111001", "111000", 300.0),
+        ):
+            sqlite_repo.create_account(
+                schemas.Account(
+                    name=name,
+                    code=code,
+                    type=schemas.AccountType.CASH,
+                    parent_code=parent,
+                    balance=balance,
+                )
+            )
+        project = sqlite_repo.create_project(schemas.Project(name="Audit One", client_id="C-1"))
+        payment = sqlite_repo.create_payment(
+            schemas.Payment(
+                project_id=project.name,
+                client_id="C-1",
+                date=datetime(2026, 1, 5, 10, 0, 0),
+                amount=300.0,
+                account_id="111001",
+                method="Cash",
+            )
+        )
+        _duplicate_row(sqlite_repo, "payments", payment.id, project_id=project.name)
+        invalidate_cache("accounts")
+
+        job = service.get_cashbox_audit_job()
+        result = job.run()
+        full = service.audit_cashbox_integrity()
+        assert result["complete"] is True
+        assert result["payments_reviewed"] == full["payments_reviewed"] == 1
+        assert result["stale_cash_balances"] == full["stale_cash_balances"] == []
+
+        # نسخة مكررة جديدة لصف سبق التحقق منه لا تُضاف فوق نقطة التحقق
+        _duplicate_row(sqlite_repo, "payments", payment.id, project_id=f" {project.name} ")
+        assert job.run()["payments_reviewed"] == 1
+
+    def test_cash_ledger_report_uses_snapshots_and_matches_full_scan(self, sqlite_repo):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        invalidate_cache("accounts")
+        sqlite_repo.create_account(
+            schemas.Account(name="خزنة رئيسية", code="111001", type=schemas.AccountType.CASH)
+        )
+        project = sqlite_repo.create_project(schemas.Project(name="Ledger One", client_id="C-1"))
+        for day, amount, account_ref in (
+            (3, 500.0, "111001"),
+            (20, 70.0, "خزنة رئيسية"),  # مرجع قديم باسم الخزنة
+        ):
+            sqlite_repo.create_payment(
+                schemas.Payment(
+                    project_id=project.name,
+                    client_id="C-1",
+                    date=datetime(2025, 12, day, 10, 0, 0),
+                    amount=amount,
+                    account_id=account_ref,
+                    method="Cash",
+                )
+            )
+        in_range = sqlite_repo.create_payment(
+            schemas.Payment(
+                project_id=project.name,
+                client_id="C-1",
+                date=datetime(2026, 1, 10, 10, 0, 0),
+                amount=200.0,
+                account_id="111001",
+                method="Cash",
+            )
+        )
+        _duplicate_row(sqlite_repo, "payments", in_range.id, project_id=project.name)
+        for day, payment_account, account_ref, amount in (
+            (5, "111001", "5101", 40.0),
+            (12, "1001", "111001", 15.0),  # payment_account_id قديم + account_id للخزنة
+        ):
+            for month in (12, 1):
+                sqlite_repo.create_expense(
+                    schemas.Expense(
+                        date=datetime(2025 if month == 12 else 2026, month, day, 9, 0, 0),
+                        category="Ops",
+                        amount=amount,
+                        account_id=account_ref,
+                        payment_account_id=payment_account,
+                    )
+                )
+
+        start, end = datetime(2026, 1, 1), datetime(2026, 1, 31, 23, 59, 59)
+        with (
+            patch.object(sqlite_repo, "get_all_payments", side_effect=AssertionError),
+            patch.object(sqlite_repo, "get_all_expenses", side_effect=AssertionError),
+        ):
+            snapshot_report = service.get_account_ledger_report("111001", start, end)
+        with patch.object(sqlite_repo, "get_cash_reference_values", side_effect=RuntimeError):
+            full_report = service.get_account_ledger_report("111001", start, end)
+
+        assert full_report["opening_balance"] == pytest.approx(570.0 - 55.0)
+        assert full_report["total_debit"] == pytest.approx(200.0)
+        assert full_report["total_credit"] == pytest.approx(55.0)
+        for key in ("opening_balance", "ending_balance", "total_debit", "total_credit"):
+            assert snapshot_report[key] == pytest.approx(full_report[key])
+        assert len(snapshot_report["movements"]) == len(full_report["movements"]) == 3
+        snapshot_rows = sqlite_repo.sqlite_conn.execute(
+            "SELECT COUNT(*) FROM account_balance_snapshots WHERE account_code = '111001'"
+        ).fetchone()[0]
+        assert snapshot_rows == 1
+
+    def test_account_crud_invalidates_cached_hierarchy(self, sqlite_repo):
+        with patch.object(AccountingService, "_ensure_default_accounts_exist"):
+            service = AccountingService(sqlite_repo, EventBus())
+        invalidate_cache("accounts")
+        AccountingService._hierarchy_cache = None
+        for name, code, parent in (("الخزن", "111000", None), ("خزنة", "111001", "111000")):
+            sqlite_repo.create_account(
+                schemas.Account(
+                    name=name, code=code, type=schemas.AccountType.CASH, parent_code=parent
+                )
+            )
+        assert set(service.get_hierarchy_with_balances(force_refresh=True)) == {
+            "111000",
+            "111001",
+        }
+
+        service.create_account(
+            {"name": "بنك", "code": "111002", "type": "أصول نقدية", "parent_code": "111000"}
+        )
+        tree = service.get_hierarchy_with_balances()
+        assert set(tree) == {"111000", "111001", "111002"}
+        assert "111002" in [child["obj"].code for child in tree["111000"]["children"]]
+
+        service.delete_account("111002")
+        assert "111002" not in service.get_hierarchy_with_balances()
+
+        # ترقيع فروق الحركة لا يُستهلك إلا مرة واحدة؛ أي إشارة أخرى تُبطل الشجرة
+        AccountingService._patch_hierarchy_cache({"111001": 50.0})
+        assert AccountingService.consume_hierarchy_patch() is True
+        assert AccountingService.consume_hierarchy_patch() is False
+        AccountingService._hierarchy_cache = None
+
     def test_reset_and_seed_agency_accounts_only_purges_internal_layer(self, sqlite_repo):
         with patch.object(AccountingService, "_ensure_default_accounts_exist"):
             service = AccountingService(sqlite_repo, EventBus())
@@ -687,3 +687,131 @@ def test_check_new_notifications_keeps_activity_notifications_silent(monkeypatch
     assert result is True
     assert emitted == []
     assert sync_calls == [{"clients", "notifications"}]
+
+
+def test_check_new_notifications_polls_with_monotonic_cursor_or_change_stream(monkeypatch):
+    emitted: list[dict] = []
+    finds: list[tuple[dict, object]] = []
+
+    class _Cursor:
+        def __init__(self, docs):
+            self._docs = list(docs)
+
+        def sort(self, spec, *_args, **_kwargs):
+            finds[-1] = (finds[-1][0], spec)
+            return self
+
+        def limit(self, size):
+            return self._docs[:size]
+
+    class _Collection:
+        def __init__(self):
+            self.docs: list[dict] = []
+
+        def find(self, query=None):
+            finds.append((query, None))
+            excluded = next(
+                (c["_id"]["$nin"] for c in query.get("$and", []) if "_id" in c),
+                [],
+            )
+            return _Cursor([doc for doc in self.docs if doc["_id"] not in excluded])
+
+    session_started_at = datetime.now() - timedelta(minutes=1)
+    collection = _Collection()
+    collection.docs.append(
+        {
+            "_id": "n-1",
+            "title": "First",
+            "message": "One",
+            "type": "info",
+            "device_id": "DEVICE-OTHER",
+            "created_at": (session_started_at + timedelta(seconds=20)).isoformat(),
+        }
+    )
+
+    worker = ns.NotificationSyncWorker()
+    worker.repo = types.SimpleNamespace(mongo_db=types.SimpleNamespace(notifications=collection))
+    worker._session_started_at = session_started_at
+    worker._poll_clock_skew_seconds = 5
+    worker.new_notification.connect(emitted.append)
+    worker._trigger_instant_sync = lambda tables: None
+    worker._trigger_settings_sync = lambda: None
+    worker._last_cleanup = float("inf")
+    monkeypatch.setattr(ns, "DEVICE_ID", "DEVICE-LOCAL", raising=True)
+
+    assert worker._check_new_notifications() is True
+    first_query, sort_spec = finds[0]
+    assert sort_spec == [("created_at", 1), ("_id", 1)]
+    assert {"created_at": {"$gt": (session_started_at - timedelta(seconds=5)).isoformat()}} in (
+        first_query["$and"][0]["$or"]
+    )
+
+    # الاستعلام التالي يبدأ من آخر مستند ويستبعد ما رُئي داخل هامش الساعات -> لا شيء جديد
+    assert worker._check_new_notifications() is False
+    second_query, _ = finds[1]
+    cursor_floor = (session_started_at + timedelta(seconds=15)).isoformat()
+    assert {"created_at": {"$gt": cursor_floor}} in second_query["$and"][0]["$or"]
+    assert {"_id": {"$nin": ["n-1"]}} in second_query["$and"]
+    assert [item["title"] for item in emitted] == ["First"]
+
+    class _Manager:
+        def __init__(self):
+            self.listeners = {}
+
+        def is_streaming(self):
+            return True
+
+        def add_insert_listener(self, collection_name, callback):
+            self.listeners[collection_name] = callback
+
+        def remove_insert_listener(self, collection_name, _callback):
+            self.listeners.pop(collection_name, None)
+
+    manager = _Manager()
+    import core.realtime_sync as realtime_sync
+
+    monkeypatch.setattr(realtime_sync, "get_realtime_manager", lambda: manager)
+    # أُدرج بعد آخر استعلام وقبل ربط الـ listener: لا يصل إلا عبر الاستعلام التعويضي
+    collection.docs.append(
+        {
+            "_id": "n-gap",
+            "title": "Gap",
+            "message": "Between",
+            "type": "info",
+            "device_id": "DEVICE-OTHER",
+            "created_at": datetime.now().isoformat(),
+        }
+    )
+    worker._sync_change_stream_subscription()
+    manager.listeners["notifications"](
+        {
+            "_id": "n-2",
+            "title": "Pushed",
+            "message": "Two",
+            "type": "info",
+            "device_id": "DEVICE-OTHER",
+            "created_at": datetime.now().isoformat(),
+        }
+    )
+
+    assert worker._check_new_notifications() is True
+    assert worker._check_new_notifications() is False
+    assert len(finds) == 3  # one catch-up poll after subscribing, then no Mongo polling
+    assert [item["title"] for item in emitted] == ["First", "Gap", "Pushed"]
+
+    monkeypatch.setattr(realtime_sync, "get_realtime_manager", lambda: None)
+    worker._sync_change_stream_subscription()
+    assert manager.listeners == {}
+    worker._check_new_notifications()
+    assert len(finds) == 4
+    # الرجوع للاستعلام يكمل من cursor الـ stream (n-1 خرج من هامش الساعات)
+    excluded = next(c["_id"]["$nin"] for c in finds[-1][0]["$and"] if "_id" in c)
+    assert sorted(excluded) == ["n-2", "n-gap"]
+
+    # إعادة الاشتراك تعيد الاستعلام التعويضي مرة واحدة
+    monkeypatch.setattr(realtime_sync, "get_realtime_manager", lambda: manager)
+    worker._sync_change_stream_subscription()
+    assert "notifications" in manager.listeners
+    worker._check_new_notifications()
+    worker._check_new_notifications()
+    assert len(finds) == 5
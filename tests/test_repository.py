@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import sqlite3
+import threading
 import types
 from datetime import datetime
 
@@ -75,7 +77,7 @@ def test_fetch_client_logo_on_demand_updates_sqlite(repo):
     verify = repo.get_cursor()
     try:
         verify.execute(
-            "SELECT logo_data, has_logo, logo_last_synced FROM clients WHERE id = ?",
+            "SELECT logo_data, logo_hash, has_logo, logo_last_synced FROM clients WHERE id = ?",
             (int(created.id),),
         )
         row = verify.fetchone()
@@ -83,7 +85,8 @@ def test_fetch_client_logo_on_demand_updates_sqlite(repo):
         verify.close()
 
     assert row is not None
-    assert bool(row["logo_data"])
+    assert row["logo_data"] is None
+    assert repo.get_client_logo_data(row["logo_hash"]) == "data:image/png;base64,ZmFrZQ=="
     assert row["has_logo"] == 1
     assert row["logo_last_synced"] is not None
 
@@ -139,6 +142,118 @@ def test_fetch_client_logo_on_demand_ignores_deleted_remote_client(repo):
     assert row["has_logo"] == 0
 
 
+def test_client_logos_live_once_in_blob_store_and_rows_carry_hash_only(repo):
+    logo = "data:image/png;base64,U0hBUkVE"
+    first = repo.create_client(schemas.Client(name="Blob Client A", logo_data=logo))
+    second = repo.create_client(schemas.Client(name="Blob Client B", logo_data=logo))
+    assert first.logo_hash and first.logo_hash == second.logo_hash
+
+    cursor = repo.get_cursor()
+    try:
+        cursor.execute(
+            "SELECT logo_data, logo_hash, has_logo FROM clients WHERE logo_hash = ?",
+            (first.logo_hash,),
+        )
+        rows = cursor.fetchall()
+        cursor.execute("SELECT COUNT(*) FROM blobs")
+        blob_count = cursor.fetchone()[0]
+        # صف قديم يحمل الصورة داخل العميل يُنقل للمخزن
+        cursor.execute(
+            "UPDATE clients SET logo_data = ?, logo_hash = NULL WHERE id = ?",
+            ("data:image/png;base64,TEVHQUNZ", int(second.id)),
+        )
+        repo.sqlite_conn.commit()
+    finally:
+        cursor.close()
+    assert len(rows) == 2
+    assert all(row["logo_data"] is None and row["has_logo"] == 1 for row in rows)
+    assert blob_count == 1
+
+    assert repo._move_client_logos_to_blobs() == 1
+    listed = {client.name: client for client in repo.get_all_clients()}
+    assert listed["Blob Client A"].logo_data is None
+    assert listed["Blob Client A"].logo_hash == first.logo_hash
+    assert listed["Blob Client B"].logo_hash != first.logo_hash
+
+    loaded = repo.get_client_by_id(str(first.id))
+    assert loaded.logo_data == logo
+    assert repo.get_client_by_id(str(second.id)).logo_data == "data:image/png;base64,TEVHQUNZ"
+
+    projections = []
+
+    class _FakeClientsCollection:
+        def find_one(self, _query, projection):
+            projections.append(dict(projection))
+            return {"_id": "mongo-blob-a", "logo_hash": first.logo_hash, "has_logo": True}
+
+        def update_one(self, *_args, **_kwargs):
+            return types.SimpleNamespace(modified_count=1)
+
+    repo.online = True
+    repo.mongo_client = object()
+    repo.mongo_db = types.SimpleNamespace(clients=_FakeClientsCollection())
+    assert repo.fetch_client_logo_on_demand(str(second.id)) is True
+    assert projections and all("logo_data" not in projection for projection in projections)
+    assert repo.get_client_by_id(str(second.id)).logo_data == logo
+
+
+def test_client_pushes_carry_logo_hash_and_upload_each_blob_once(repo):
+    class _FakeCollection:
+        def __init__(self):
+            self.docs: dict = {}
+            self.finds: list = []
+            self.upserts: list = []
+
+        def find(self, query, _projection=None):
+            self.finds.append(query)
+            return [{"_id": key} for key in query["_id"]["$in"] if key in self.docs]
+
+        def find_one(self, query, _projection=None):
+            return self.docs.get(query["_id"])
+
+        def update_one(self, query, update, upsert=False):
+            self.upserts.append(query["_id"])
+            self.docs.setdefault(query["_id"], {"_id": query["_id"], **update["$setOnInsert"]})
+
+        def insert_one(self, doc):
+            key = f"mongo-{len(self.docs) + 1}"
+            self.docs[key] = dict(doc)
+            return types.SimpleNamespace(inserted_id=key)
+
+    class _FakeMongoDB(dict):
+        __getattr__ = dict.__getitem__
+
+    clients, blobs = _FakeCollection(), _FakeCollection()
+    repo.online = True
+    repo.mongo_client = object()
+    repo.mongo_db = _FakeMongoDB(clients=clients, logo_blobs=blobs)
+
+    logo = "data:image/png;base64,T05DRQ=="
+    first = repo.create_client(schemas.Client(name="Push Logo A", logo_data=logo))
+    repo.create_client(schemas.Client(name="Push Logo B", logo_data=logo))
+
+    pushed = list(clients.docs.values())
+    assert [doc["logo_hash"] for doc in pushed] == [first.logo_hash, first.logo_hash]
+    assert all(doc["logo_data"] is None for doc in pushed)
+    assert blobs.upserts == [first.logo_hash]
+    assert len(blobs.finds) == 1
+    assert blobs.docs[first.logo_hash]["logo_data"] == logo
+
+    # جهاز آخر: الوثيقة تحمل البصمة فقط فتُجلب الصورة من logo_blobs
+    cursor = repo.get_cursor()
+    try:
+        cursor.execute("DELETE FROM blobs")
+        cursor.execute("UPDATE clients SET logo_hash = NULL, _mongo_id = 'mongo-1'")
+        repo.sqlite_conn.commit()
+    finally:
+        cursor.close()
+    clients.docs["mongo-1"]["_id"] = "mongo-1"
+    clients.find_one = lambda _query, _projection=None: clients.docs["mongo-1"]
+    clients.update_one = lambda *_args, **_kwargs: None
+    assert repo.fetch_client_logo_on_demand(str(first.id)) is True
+    assert repo.get_client_by_id(str(first.id)).logo_data == logo
+
+
 def test_mongo_client_options_are_bounded(repo, monkeypatch):
     monkeypatch.setenv("SKYWAVE_MONGO_MAX_POOL_SIZE", "99")
     monkeypatch.setenv("SKYWAVE_MONGO_MIN_POOL_SIZE", "3")
@@ -153,6 +268,29 @@ def test_mongo_client_options_are_bounded(repo, monkeypatch):
     assert options["waitQueueTimeoutMS"] == 15000
 
 
+def test_mongo_client_options_enable_only_installed_wire_compressors(repo, monkeypatch):
+    import core.repository as repo_mod
+
+    real_find_spec = repo_mod.importlib.util.find_spec
+    monkeypatch.setattr(
+        repo_mod.importlib.util,
+        "find_spec",
+        lambda name, *args: None if name == "zstandard" else real_find_spec(name, *args),
+    )
+    monkeypatch.setenv("SKYWAVE_MONGO_COMPRESSORS", "zstd, zlib, zlib, bogus")
+    monkeypatch.setenv("SKYWAVE_MONGO_ZLIB_LEVEL", "4")
+
+    options = repo._mongo_client_options()
+
+    assert options["compressors"] == ["zlib"]
+    assert options["zlibCompressionLevel"] == 4
+
+    monkeypatch.setenv("SKYWAVE_MONGO_COMPRESSORS", "none")
+    options = repo._mongo_client_options()
+    assert "compressors" not in options
+    assert "zlibCompressionLevel" not in options
+
+
 def test_update_account_balance_updates_all_remote_rows_with_same_code(repo):
     created = repo.create_account(
         schemas.Account(
@@ -507,6 +645,356 @@ def test_get_all_payments_uses_cache_and_reloads_after_invalidation(repo, monkey
     assert call_count["value"] == 2
 
 
+def test_scan_returns_lightweight_projection_of_active_rows(repo):
+    first = repo.create_payment(
+        schemas.Payment(
+            project_id="project-1",
+            client_id="client-1",
+            date=datetime(2026, 3, 12, 10, 0, 0),
+            amount=1500.0,
+            account_id="111001",
+            method="Cash",
+        )
+    )
+    repo.create_payment(
+        schemas.Payment(
+            project_id="project-2",
+            client_id="client-1",
+            date=datetime(2026, 3, 13, 10, 0, 0),
+            amount=250.0,
+            account_id="111002",
+            method="Cash",
+        )
+    )
+    assert repo.delete_payment(first.id) is True
+
+    rows = repo.scan("payments", ("amount", "account_id"))
+    assert rows == [(250.0, "111002")]
+    assert rows[0].amount == 250.0
+    assert rows[0].as_dict() == {"amount": 250.0, "account_id": "111002"}
+
+    filtered = repo.scan(
+        "payments",
+        ["project_id", "amount"],
+        "account_id = ?",
+        ("111002",),
+        include_deleted=True,
+        order_by="date DESC",
+    )
+    assert [tuple(row) for row in filtered] == [("project-2", 250.0)]
+    assert len(repo.scan("payments", ["id"], include_deleted=True)) == 2
+
+    with pytest.raises(ValueError):
+        repo.scan("payments", ["amount; DROP TABLE payments"])
+    with pytest.raises(ValueError):
+        repo.scan("payments", ["amount"], order_by="amount; --")
+
+
+def test_scan_raises_sqlite_errors_so_callers_can_fall_back(repo, monkeypatch):
+    from services.accounting_service import AccountingService
+
+    repo.create_payment(
+        schemas.Payment(
+            project_id="project-1",
+            client_id="client-1",
+            date=datetime(2026, 3, 14, 10, 0, 0),
+            amount=125.0,
+            account_id="111001",
+            method="Cash",
+        )
+    )
+
+    def _broken_read_cursor():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(repo, "read_cursor", _broken_read_cursor)
+    with pytest.raises(sqlite3.OperationalError):
+        repo.scan("payments", ("amount",))
+
+    service = AccountingService.__new__(AccountingService)
+    service.repo = repo
+    records = service._scan_repo_records("payments", ("amount",), "get_all_payments")
+    assert [record.amount for record in records] == [125.0]
+
+
+def test_signature_duplicate_ids_are_recomputed_when_clients_change(repo, monkeypatch):
+    repo.create_client(schemas.Client(name="Dedupe Client"))
+    computed: list[int] = []
+    original_dedupe = repo._dedupe_rows_by_signature
+
+    def _counting_dedupe(rows, signature_fn):
+        computed.append(len(rows))
+        return original_dedupe(rows, signature_fn)
+
+    monkeypatch.setattr(repo, "_dedupe_rows_by_signature", _counting_dedupe)
+    repo.get_signature_duplicate_ids("payments")
+    repo.get_signature_duplicate_ids("payments")
+    assert len(computed) == 1
+
+    cursor = repo.sqlite_conn.cursor()
+    cursor.execute("UPDATE clients SET name = 'Renamed Dedupe Client'")
+    repo.sqlite_conn.commit()
+    cursor.close()
+    repo.get_signature_duplicate_ids("payments")
+    assert len(computed) == 2
+
+
+def test_delta_caches_patch_changed_rows_without_reloading_tables(repo, monkeypatch):
+    kept = repo.create_payment(
+        schemas.Payment(
+            project_id="project-1",
+            client_id="client-1",
+            date=datetime(2026, 3, 12, 10, 0, 0),
+            amount=100.0,
+            account_id="111001",
+            method="Cash",
+        )
+    )
+    removed = repo.create_payment(
+        schemas.Payment(
+            project_id="project-1",
+            client_id="client-1",
+            date=datetime(2026, 3, 13, 10, 0, 0),
+            amount=200.0,
+            account_id="111001",
+            method="Cash",
+        )
+    )
+    repo.create_project(
+        schemas.Project(
+            name="Delta Active", client_id="client-1", status=schemas.ProjectStatus.ACTIVE
+        )
+    )
+    assert len(repo.get_all_payments()) == 2
+    assert [project.name for project in repo.get_all_projects()] == ["Delta Active"]
+
+    def _no_full_reload(*_args, **_kwargs):
+        raise AssertionError("cache should be patched, not reloaded")
+
+    monkeypatch.setattr(repo, "_load_delta_cache_entries", _no_full_reload)
+
+    # Sync-style raw writes followed by a targeted patch.
+    cursor = repo.sqlite_conn.cursor()
+    try:
+        cursor.execute("UPDATE payments SET amount = 150.0 WHERE id = ?", (kept.id,))
+        cursor.execute(
+            """
+            INSERT INTO payments (
+                _mongo_id, sync_status, created_at, last_modified, project_id, client_id,
+                date, amount, account_id, method, dirty_flag, is_deleted
+            ) VALUES ('remote-delta-pay', 'synced', '2026-03-14', '2026-03-14', 'project-1',
+                      'client-1', '2026-03-14T10:00:00', 300.0, '111001', 'Cash', 0, 0)
+            """
+        )
+        repo.sqlite_conn.commit()
+        assert repo.apply_table_cache_delta("payments", [kept.id, "remote-delta-pay"]) is True
+        assert [payment.amount for payment in repo.get_all_payments()] == [300.0, 200.0, 150.0]
+
+        cursor.execute("DELETE FROM payments WHERE _mongo_id = 'remote-delta-pay'")
+        repo.sqlite_conn.commit()
+        repo.apply_table_cache_delta("payments", ["remote-delta-pay"])
+    finally:
+        cursor.close()
+
+    assert repo.delete_payment(removed.id) is True
+    assert [payment.amount for payment in repo.get_all_payments()] == [150.0]
+
+    repo.create_project(
+        schemas.Project(
+            name="Delta Done", client_id="client-1", status=schemas.ProjectStatus.COMPLETED
+        )
+    )
+    assert {project.name for project in repo.get_all_projects()} == {"Delta Active", "Delta Done"}
+    assert [
+        project.name for project in repo.get_all_projects(status=schemas.ProjectStatus.COMPLETED)
+    ] == ["Delta Done"]
+    assert [
+        project.name
+        for project in repo.get_all_projects(exclude_status=schemas.ProjectStatus.COMPLETED)
+    ] == ["Delta Active"]
+
+
+def test_delta_cache_index_patches_winners_and_refreshes_project_signatures(repo, monkeypatch):
+    def _payment(project_id: str, amount: float = 100.0, day: int = 12):
+        return repo.create_payment(
+            schemas.Payment(
+                project_id=project_id,
+                client_id="client-1",
+                date=datetime(2026, 3, day, 10, 0, 0),
+                amount=amount,
+                account_id="111001",
+                method="Cash",
+            )
+        )
+
+    # مرجع باسم المشروع ومرجع بالـ id: نفس الدفعة بعد أن يوجد المشروع
+    by_name = _payment("Index Project")
+    _payment("1")
+    assert len(repo.get_all_payments()) == 2
+
+    def _no_rebuild(*_args, **_kwargs):
+        raise AssertionError("cache index should be patched, not rebuilt")
+
+    monkeypatch.setattr(repo, "_load_delta_cache_entries", _no_rebuild)
+    monkeypatch.setattr(repo, "_dedupe_rows_by_signature", _no_rebuild)
+
+    project = repo.create_project(schemas.Project(name="Index Project", client_id="client-1"))
+    assert str(project.id) == "1"
+    assert [payment.id for payment in repo.get_all_payments()] == [by_name.id]
+
+    later = _payment("Index Project", amount=50.0, day=20)
+    assert [payment.amount for payment in repo.get_all_payments()] == [50.0, 100.0]
+    assert repo.delete_payment(by_name.id) is True
+    remaining = repo.get_all_payments()
+    assert [payment.amount for payment in remaining] == [50.0, 100.0]
+    assert remaining[0].id == later.id and str(remaining[1].project_id) == "1"
+
+
+def test_read_cursor_uses_read_only_pool_without_waiting_for_writer_lock(repo):
+    repo.create_client(schemas.Client(name="Pool Client"))
+    assert [client.name for client in repo.get_all_clients()] == ["Pool Client"]
+    repo.invalidate_table_cache("clients")
+
+    lock_held = threading.Event()
+    release = threading.Event()
+
+    def hold_writer_lock():
+        with repo._lock:
+            lock_held.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_writer_lock)
+    holder.start()
+    assert lock_held.wait(5)
+    try:
+        result = {}
+        reader = threading.Thread(target=lambda: result.update(clients=repo.get_all_clients()))
+        reader.start()
+        reader.join(3)
+        assert not reader.is_alive()
+        assert [client.name for client in result["clients"]] == ["Pool Client"]
+    finally:
+        release.set()
+        holder.join()
+
+    with repo.read_cursor() as cursor:
+        with pytest.raises(sqlite3.OperationalError):
+            cursor.execute("DELETE FROM clients")
+
+
+def test_read_cursor_sees_uncommitted_writer_transaction(repo):
+    cursor = repo.sqlite_conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT INTO clients (sync_status, created_at, last_modified, name, status) "
+            "VALUES ('new_offline', '2026-03-01', '2026-03-01', 'Pending Client', 'نشط')"
+        )
+        assert repo.sqlite_conn.in_transaction
+        with repo.read_cursor() as reader:
+            reader.execute("SELECT COUNT(*) FROM clients WHERE name = 'Pending Client'")
+            assert reader.fetchone()[0] == 1
+    finally:
+        repo.sqlite_conn.rollback()
+        cursor.close()
+
+
+def test_read_cursor_checks_writer_transaction_under_lock(repo):
+    in_transaction = threading.Event()
+    release = threading.Event()
+
+    def write_under_lock():
+        with repo._lock:
+            cursor = repo.sqlite_conn.cursor()
+            try:
+                cursor.execute(
+                    "INSERT INTO clients (sync_status, created_at, last_modified, name, status) "
+                    "VALUES ('new_offline', '2026-03-01', '2026-03-01', 'Other Thread', 'نشط')"
+                )
+                in_transaction.set()
+                release.wait(5)
+            finally:
+                repo.sqlite_conn.rollback()
+                cursor.close()
+
+    writer = threading.Thread(target=write_under_lock)
+    writer.start()
+    assert in_transaction.wait(5)
+    try:
+        result = {}
+
+        def read_count():
+            with repo.read_cursor() as reader:
+                reader.execute("SELECT COUNT(*) FROM clients WHERE name = 'Other Thread'")
+                result["count"] = reader.fetchone()[0]
+
+        reader_thread = threading.Thread(target=read_count)
+        reader_thread.start()
+        reader_thread.join(3)
+        # transaction خيط آخر: لا انتظار لقفله ولا رؤية لتغييراته غير المؤكدة
+        assert not reader_thread.is_alive()
+        assert result["count"] == 0
+    finally:
+        release.set()
+        writer.join()
+
+
+def test_change_journal_coalesces_pending_rows_and_acknowledges_synced_ones(repo):
+    created = repo.create_client(schemas.Client(name="Journal Client"))
+    client_id = int(created.id)
+    cursor = repo.sqlite_conn.cursor()
+    for phone in ("0100", "0111"):
+        cursor.execute(
+            "UPDATE clients SET phone = ?, sync_status = 'modified_offline', dirty_flag = 1 "
+            "WHERE id = ?",
+            (phone, client_id),
+        )
+    repo.sqlite_conn.commit()
+
+    assert repo.has_change_journal()
+    assert repo.get_pending_journal_ids("clients", 50) == [client_id]
+    cursor.execute(
+        "SELECT operation FROM sync_queue WHERE entity_type = 'clients' AND status = 'pending'"
+    )
+    assert [row[0] for row in cursor.fetchall()] == ["create"]
+
+    # الصف ما زال dirty فيبقى مدخله معلّقاً
+    assert repo.acknowledge_journal_entries("clients", [client_id]) == 0
+
+    cursor.execute(
+        "UPDATE clients SET sync_status = 'synced', dirty_flag = 0, _mongo_id = 'm-1' WHERE id = ?",
+        (client_id,),
+    )
+    repo.sqlite_conn.commit()
+    assert repo.get_pending_journal_ids("clients", 50) == [client_id]
+    assert repo.acknowledge_journal_entries("clients", [client_id]) == 1
+    assert repo.get_pending_journal_ids("clients", 50) == []
+
+
+def test_change_journal_moves_rows_that_keep_failing_behind_newer_ones(repo):
+    failing = [int(repo.create_client(schemas.Client(name=f"Stuck {i}")).id) for i in range(2)]
+    fresh = int(repo.create_client(schemas.Client(name="Fresh")).id)
+
+    assert repo.get_pending_journal_ids("clients", 2) == failing
+    # فشل الرفع: الصفان ما زالا dirty فيتأخران خلف الصف الأحدث
+    assert repo.acknowledge_journal_entries("clients", failing) == 0
+    assert repo.get_pending_journal_ids("clients", 2) == [fresh, failing[0]]
+    assert repo.get_pending_journal_ids("clients", 50) == [fresh, *failing]
+
+
+def test_change_journal_tracks_projects_created_on_a_brand_new_database(repo):
+    created = repo.create_project(schemas.Project(name="First Session", client_id="client-1"))
+    project_id = int(created.id)
+
+    assert repo.has_change_journal()
+    assert repo.get_pending_journal_ids("projects", 50) == [project_id]
+
+
+def test_change_journal_falls_back_to_scan_for_tables_without_triggers(repo):
+    repo._change_journal_tables.discard("projects")
+
+    assert repo.get_pending_journal_ids("projects", 50) is None
+
+
 def test_invalidate_table_cache_always_clears_dashboard_cache(repo, monkeypatch):
     import core.repository as repo_mod
 
@@ -633,3 +1121,166 @@ def test_update_all_exchange_rates_skips_base_currency_alias(monkeypatch):
     assert result["updated"] == 1
     assert result["failed"] == 0
     assert "EGY" not in result["results"]
+
+
+def test_change_counters_feed_live_watcher_without_table_scans(repo, monkeypatch):
+    from core.live_watcher import LiveDataWatcher
+
+    watcher = LiveDataWatcher(repo)
+    monkeypatch.setattr(watcher, "_schedule_emit", lambda: None)
+    watcher._init_counts()
+    emitted = []
+    watcher.data_changed.connect(emitted.append)
+
+    created = repo.create_client(schemas.Client(name="Counter Client"))
+    watcher._check_local_changes()
+    assert watcher._pending_changes == {"clients"}
+    watcher._emit_pending_changes()
+    assert emitted == ["clients"]
+
+    cursor = repo.sqlite_conn.cursor()
+    cursor.execute("UPDATE clients SET phone = '0100' WHERE id = ?", (int(created.id),))
+    cursor.execute("UPDATE clients SET phone = '0111' WHERE id = ?", (int(created.id),))
+    repo.sqlite_conn.commit()
+    watcher._check_local_changes()
+    assert watcher._pending_changes == {"clients"}
+
+    watcher._emit_pending_changes()
+    watcher._check_local_changes()
+    assert not watcher._pending_changes
+    assert emitted == ["clients", "clients"]
+
+
+def test_identity_resolver_is_reused_until_clients_or_projects_change(repo, monkeypatch):
+    client = repo.create_client(schemas.Client(name="Resolver Client"))
+    project = repo.create_project(
+        schemas.Project(name="Resolver Project", client_id=str(client.id))
+    )
+    invoice_number = project.invoice_number
+    assert invoice_number
+
+    resolver = repo.get_identity_resolver()
+    assert repo.get_identity_resolver() is resolver
+    assert resolver.client_name(str(client.id)) == "Resolver Client"
+    assert resolver.client_name("  resolver client ") == "Resolver Client"
+    assert repo._resolve_project_row(invoice_number)["name"] == "Resolver Project"
+    assert repo.resolve_project_name(invoice_number.lower()) == "Resolver Project"
+
+    # Writes to unrelated tables keep the same snapshot.
+    repo.create_expense(
+        schemas.Expense(date=datetime(2026, 1, 5), category="Ops", amount=5.0, account_id="RENT")
+    )
+    assert repo.get_identity_resolver() is resolver
+
+    # Without writes in between, per-reference lookups don't query change_counters.
+    counter_reads: list[object] = []
+    original_get_change_counters = repo.get_change_counters
+
+    def _counting_get_change_counters(table_names=None):
+        counter_reads.append(table_names)
+        return original_get_change_counters(table_names)
+
+    monkeypatch.setattr(repo, "get_change_counters", _counting_get_change_counters)
+    for _ in range(20):
+        assert repo.resolve_project_name(invoice_number) == "Resolver Project"
+        assert repo.get_identity_resolver() is resolver
+    assert counter_reads == []
+
+    cursor = repo.sqlite_conn.cursor()
+    cursor.execute("UPDATE clients SET name = 'Renamed Client' WHERE id = ?", (int(client.id),))
+    repo.sqlite_conn.commit()
+    cursor.close()
+    refreshed = repo.get_identity_resolver()
+    assert refreshed is not resolver
+    assert refreshed.client_name(str(client.id)) == "Renamed Client"
+
+
+def test_journal_lines_index_tracks_entry_writes_for_ledger_queries(repo):
+    entry = schemas.JournalEntry(
+        date=datetime(2026, 1, 10, 10, 0, 0),
+        description="قيد تحصيل",
+        lines=[
+            schemas.JournalEntryLine(account_id="1111", account_code="1111", debit=150.0),
+            schemas.JournalEntryLine(account_id="4100", account_code="4100", credit=150.0),
+        ],
+        related_document_id="PAY-1",
+    )
+    repo.create_journal_entry(entry)
+
+    rows = repo.get_journal_lines_for_accounts(
+        {"1111"}, "2026-01-01T00:00:00", "2026-01-31T23:59:59"
+    )
+    assert [(row["debit"], row["credit"], row["related_document_id"]) for row in rows] == [
+        (150.0, 0.0, "PAY-1")
+    ]
+    assert rows[0]["description"] == "قيد تحصيل"
+    assert repo.sum_journal_lines_before({"4100"}, "2026-02-01T00:00:00") == (0.0, 150.0)
+
+    repo.update_journal_entry_by_doc_id(
+        "PAY-1",
+        [
+            schemas.JournalEntryLine(account_id="1111", account_code="1111", debit=90.0),
+            schemas.JournalEntryLine(account_id="4200", account_code="4200", credit=90.0),
+        ],
+        "قيد معدل",
+    )
+    assert repo.get_journal_lines_for_accounts({"4100"}) == []
+    assert [row["debit"] for row in repo.get_journal_lines_for_accounts({"1111"})] == [90.0]
+
+    repo.sqlite_conn.execute(
+        "UPDATE journal_entries SET is_deleted = 1 WHERE related_document_id = 'PAY-1'"
+    )
+    repo.sqlite_conn.commit()
+    assert repo.get_journal_lines_for_accounts({"1111"}) == []
+
+
+def test_account_opening_snapshots_match_full_sums_and_invalidate_on_backdated_rows(repo):
+    cursor = repo.sqlite_conn.cursor()
+    now_iso = "2026-01-01T00:00:00"
+
+    def _add_payment(date_iso: str, amount: float):
+        cursor.execute(
+            """
+            INSERT INTO payments (
+                created_at, last_modified, project_id, client_id, date, amount, account_id
+            ) VALUES (?, ?, 'p1', 'c1', ?, ?, '1111')
+            """,
+            (now_iso, now_iso, date_iso, amount),
+        )
+        repo.sqlite_conn.commit()
+
+    _add_payment("2025-11-03T10:00:00", 100.0)
+    _add_payment("2026-01-20T10:00:00", 40.0)
+    cursor.execute(
+        """
+        INSERT INTO expenses (
+            created_at, last_modified, date, category, amount, account_id, payment_account_id
+        ) VALUES (?, ?, '2025-12-05T09:00:00', 'rent', 30.0, '5100', '1111')
+        """,
+        (now_iso, now_iso),
+    )
+    repo.sqlite_conn.commit()
+
+    before_iso = "2026-02-10T00:00:00"
+    components = repo.get_account_opening_components("1111", {"1111"}, before_iso)
+    assert components["payments"] == repo.sum_payments_before("1111", before_iso) == 140.0
+    assert components["expenses_paid"] == repo.sum_expenses_paid_before("1111", before_iso)
+    cursor.execute("SELECT boundary FROM account_balance_snapshots WHERE account_code = '1111'")
+    assert [row[0] for row in cursor.fetchall()] == ["2026-02-01"]
+
+    # دفعة بتاريخ قديم تُبطل اللقطة ثم يُعاد بناؤها بالقيمة الصحيحة
+    _add_payment("2025-10-01T08:00:00", 5.0)
+    cursor.execute("SELECT COUNT(*) FROM account_balance_snapshots")
+    assert cursor.fetchone()[0] == 0
+    components = repo.get_account_opening_components("1111", {"1111"}, before_iso)
+    assert components["payments"] == 145.0
+
+    # لقطات مجموعات مراجع مختلفة لنفس الحساب والشهر لا تستبدل بعضها
+    repo.get_account_opening_components("1111", {"1111", "acc-mongo-1"}, before_iso)
+    cursor.execute(
+        "SELECT COUNT(*) FROM account_balance_snapshots "
+        "WHERE account_code = '1111' AND boundary = '2026-02-01'"
+    )
+    assert cursor.fetchone()[0] == 2
+    components = repo.get_account_opening_components("1111", {"1111"}, before_iso)
+    assert components["payments"] == 145.0
@@ -1584,6 +1584,257 @@ def test_dashboard_outstanding_resolves_project_aliases_with_client_scope(repo):
     )
 
 
+def _kpi_ledger_snapshot(repo) -> dict[tuple[str, str, str], float]:
+    cursor = repo.sqlite_conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT source, project_ref, client_ref, amount FROM dashboard_kpi_ledger "
+            "WHERE row_count > 0"
+        )
+        return {(row[0], row[1], row[2]): round(float(row[3]), 2) for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+
+def test_dashboard_kpi_ledger_tracks_payment_and_expense_writes_incrementally(repo):
+    project = repo.create_project(
+        schemas.Project(
+            name="Ledger Project",
+            client_id="CLIENT-LEDGER",
+            total_amount=1000.0,
+            status=schemas.ProjectStatus.ACTIVE,
+        )
+    )
+    payment = repo.create_payment(
+        schemas.Payment(
+            project_id=project.name,
+            client_id=project.client_id,
+            date=datetime(2026, 3, 1, 10, 0, 0),
+            amount=300.0,
+            account_id="1101",
+            method="Cash",
+        )
+    )
+    repo.create_expense(
+        schemas.Expense(
+            date=datetime(2026, 3, 2, 10, 0, 0),
+            category="Ops",
+            amount=50.0,
+            account_id="5101",
+            payment_account_id="1101",
+            project_id=str(project.id),
+        )
+    )
+
+    kpis = repo.get_dashboard_kpis(force_refresh=True)
+    assert kpis["total_collected"] == pytest.approx(300.0)
+    assert kpis["total_expenses"] == pytest.approx(50.0)
+    assert kpis["total_outstanding"] == pytest.approx(700.0)
+
+    payment.amount = 450.0
+    assert repo.update_payment(payment.id, payment) is True
+    kpis = repo.get_dashboard_kpis(force_refresh=True)
+    assert kpis["total_collected"] == pytest.approx(450.0)
+    assert kpis["total_outstanding"] == pytest.approx(550.0)
+
+    ledger = repo.get_project_kpi_ledger()
+    project_entry = next(entry for entry in ledger.values() if entry["total_amount"] == 1000.0)
+    assert project_entry["paid"] == pytest.approx(450.0)
+    assert project_entry["expensed"] == pytest.approx(50.0)
+
+    assert repo.delete_payment(payment.id) is True
+    kpis = repo.get_dashboard_kpis(force_refresh=True)
+    assert kpis["total_collected"] == pytest.approx(0.0)
+    assert kpis["total_outstanding"] == pytest.approx(1000.0)
+
+
+def test_dashboard_kpi_ledger_follows_raw_sync_writes_and_matches_rebuild(repo):
+    project = _create_project(repo, "Ledger Sync Project", client_id="CLIENT-LEDGER-SYNC")
+    repo.create_payment(
+        schemas.Payment(
+            project_id=project.name,
+            client_id=project.client_id,
+            date=datetime(2026, 3, 3, 10, 0, 0),
+            amount=200.0,
+            account_id="1101",
+            method="Cash",
+        )
+    )
+
+    # Simulate sync pull paths that write SQLite directly.
+    cursor = repo.sqlite_conn.cursor()
+    try:
+        cursor.execute(
+            """
+            INSERT INTO payments (
+                _mongo_id, sync_status, created_at, last_modified, project_id, client_id,
+                date, amount, account_id, method, dirty_flag, is_deleted
+            ) VALUES ('remote-pay-1', 'synced', '2026-03-04', '2026-03-04', ?, ?,
+                      '2026-03-04T10:00:00', 125.0, '1101', 'Bank', 0, 0)
+            """,
+            (str(project.id), project.client_id),
+        )
+        cursor.execute("UPDATE payments SET amount = 175.0 WHERE _mongo_id = 'remote-pay-1'")
+        repo.sqlite_conn.commit()
+    finally:
+        cursor.close()
+
+    kpis = repo.get_dashboard_kpis(force_refresh=True)
+    assert kpis["total_collected"] == pytest.approx(375.0)
+    assert kpis["total_outstanding"] == pytest.approx(625.0)
+
+    incremental = _kpi_ledger_snapshot(repo)
+    assert repo.rebuild_dashboard_kpi_ledger() is True
+    assert _kpi_ledger_snapshot(repo) == incremental
+
+
+def test_dashboard_kpi_ledger_counts_signature_duplicates_once(repo):
+    project = repo.create_project(
+        schemas.Project(
+            name="Ledger Duplicate Project",
+            client_id="CLIENT-LEDGER-DUP",
+            total_amount=1000.0,
+            status=schemas.ProjectStatus.ACTIVE,
+        )
+    )
+    repo.create_payment(
+        schemas.Payment(
+            project_id=project.name,
+            client_id=project.client_id,
+            date=datetime(2026, 3, 5, 10, 0, 0),
+            amount=300.0,
+            account_id="1101",
+            method="Cash",
+        )
+    )
+    repo.create_payment(
+        schemas.Payment(
+            project_id=project.name,
+            client_id=project.client_id,
+            date=datetime(2026, 3, 7, 10, 0, 0),
+            amount=100.0,
+            account_id="1101",
+            method="Cash",
+        )
+    )
+    repo.create_expense(
+        schemas.Expense(
+            date=datetime(2026, 3, 6, 10, 0, 0),
+            category="Ops",
+            amount=50.0,
+            account_id="5101",
+            payment_account_id="1101",
+            project_id=str(project.id),
+        )
+    )
+
+    # Same payment and expense pulled again by an old sync under the project name.
+    cursor = repo.sqlite_conn.cursor()
+    try:
+        cursor.execute(
+            """
+            INSERT INTO payments (
+                _mongo_id, sync_status, created_at, last_modified, project_id, client_id,
+                date, amount, account_id, method, dirty_flag, is_deleted
+            ) VALUES ('dup-pay-1', 'synced', '2026-03-05', '2026-03-05', ?, ?,
+                      '2026-03-05T18:00:00', 300.0, '1101', 'Cash', 0, 0)
+            """,
+            (project.name, project.client_id),
+        )
+        cursor.execute(
+            """
+            INSERT INTO expenses (
+                _mongo_id, sync_status, created_at, last_modified, date, category, amount,
+                account_id, payment_account_id, project_id, dirty_flag, is_deleted
+            ) VALUES ('dup-exp-1', 'synced', '2026-03-06', '2026-03-06', '2026-03-06T12:00:00',
+                      'Ops', 50.0, '5101', '1101', ?, 0, 0)
+            """,
+            (project.name,),
+        )
+        repo.sqlite_conn.commit()
+    finally:
+        cursor.close()
+    repo.invalidate_table_cache("payments")
+    repo.invalidate_table_cache("expenses")
+
+    baseline_collected = sum(payment.amount for payment in repo.get_all_payments())
+    baseline_expenses = sum(expense.amount for expense in repo.get_all_expenses())
+    assert baseline_collected == pytest.approx(400.0)
+    assert baseline_expenses == pytest.approx(50.0)
+
+    kpis = repo.get_dashboard_kpis(force_refresh=True)
+    assert kpis["total_collected"] == pytest.approx(baseline_collected)
+    assert kpis["total_expenses"] == pytest.approx(baseline_expenses)
+    assert kpis["total_outstanding"] == pytest.approx(600.0)
+
+    # One ledger row per (source, project ref, client ref), not one per movement.
+    incremental = _kpi_ledger_snapshot(repo)
+    assert sorted(incremental) == sorted(
+        [
+            ("payments", str(project.id), project.client_id),
+            ("payments", project.name, project.client_id),
+            ("expenses", str(project.id), ""),
+            ("expenses", project.name, ""),
+        ]
+    )
+    assert repo.rebuild_dashboard_kpi_ledger() is True
+    assert _kpi_ledger_snapshot(repo) == incremental
+
+
+def test_project_ref_keys_index_normalized_refs_written_by_raw_sql(repo):
+    project = _create_project(repo, "Ref Key Project", client_id="CLIENT-REFKEY")
+    other = _create_project(repo, "Other Ref Project", client_id="CLIENT-REFKEY")
+
+    cursor = repo.sqlite_conn.cursor()
+    try:
+        for mongo_id, project_ref, amount in (
+            ("ref-pay-1", "  REF   key project ", 100.0),
+            ("ref-pay-2", str(project.id), 40.0),
+            ("ref-pay-3", other.name, 999.0),
+        ):
+            cursor.execute(
+                """
+                INSERT INTO payments (
+                    _mongo_id, sync_status, created_at, last_modified, project_id, client_id,
+                    date, amount, account_id, method, dirty_flag, is_deleted
+                ) VALUES (?, 'synced', '2026-03-05', '2026-03-05', ?, ?,
+                          '2026-03-05T10:00:00', ?, '1101', 'Cash', 0, 0)
+                """,
+                (mongo_id, project_ref, project.client_id, amount),
+            )
+        cursor.execute(
+            """
+            INSERT INTO expenses (
+                _mongo_id, sync_status, created_at, last_modified, date, category,
+                amount, account_id, payment_account_id, project_id
+            ) VALUES ('ref-exp-1', 'synced', '2026-03-06', '2026-03-06', '2026-03-06T10:00:00',
+                      'Ops', 25.0, '5101', '1101', 'ref key PROJECT')
+            """
+        )
+        repo.sqlite_conn.commit()
+
+        cursor.execute("SELECT COUNT(*) FROM project_ref_keys WHERE ref_key IS NULL")
+        assert cursor.fetchone()[0] > 0
+    finally:
+        cursor.close()
+
+    payments = repo.get_payments_for_project(project.name)
+    assert sorted(payment.amount for payment in payments) == [40.0, 100.0]
+    expenses = repo.get_expenses_for_project(project.name)
+    assert [expense.amount for expense in expenses] == [25.0]
+
+    cursor = repo.sqlite_conn.cursor()
+    try:
+        cursor.execute("SELECT COUNT(*) FROM project_ref_keys WHERE ref_key IS NULL")
+        assert cursor.fetchone()[0] == 0
+        cursor.execute(
+            "SELECT ref_key FROM project_ref_keys WHERE raw_ref = ?", ("  REF   key project ",)
+        )
+        assert cursor.fetchone()[0] == repo._project_text_key(project.name)
+    finally:
+        cursor.close()
+
+
 def test_duplicate_project_names_keep_tasks_scoped_to_stable_reference(repo):
     p1 = _create_project(repo, "Shared Tasks", client_id="CLIENT-T1")
     p2 = _create_project(repo, "Shared Tasks", client_id="CLIENT-T2")
@@ -1,3 +1,4 @@
+import json
 import sqlite3
 import time
 from datetime import datetime
@@ -5,6 +6,7 @@ from pathlib import Path
 from types import SimpleNamespace
 
 import pytest
+from pymongo import InsertOne
 
 import core.realtime_sync as realtime_mod
 import core.unified_sync as unified_sync_mod
@@ -82,6 +84,33 @@ class _MutableFakeCollection(_FakeCollection):
         return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
 
 
+class _BulkFakeCollection(_MutableFakeCollection):
+    def __init__(self, records: list[dict] | None = None):
+        super().__init__(records)
+        self.bulk_calls: list[tuple[list, bool]] = []
+
+    def find(self, query=None, _projection=None):
+        return [dict(doc) for doc in self._records if _matches_mongo_query(doc, query)]
+
+    def update_one(self, *_args, **_kwargs):
+        raise AssertionError("bulk push should not issue per-record update_one")
+
+    def insert_one(self, *_args, **_kwargs):
+        raise AssertionError("bulk push should not issue per-record insert_one")
+
+    def bulk_write(self, operations, ordered=True):
+        self.bulk_calls.append((list(operations), ordered))
+        for operation in operations:
+            if isinstance(operation, InsertOne):
+                self._records.append(dict(operation._doc))
+                continue
+            for index, document in enumerate(self._records):
+                if _matches_mongo_query(document, operation._filter):
+                    self._records[index] = {**document, **operation._doc["$set"]}
+                    break
+        return SimpleNamespace(acknowledged=True)
+
+
 class _FakeMongoDB(dict):
     def __getitem__(self, key):
         if key not in self:
@@ -105,6 +134,21 @@ def _matches_mongo_query(document: dict, query: dict | None) -> bool:
                     return False
             if "$ne" in expected and document.get(key) == expected["$ne"]:
                 return False
+            if "$in" in expected and document.get(key) not in expected["$in"]:
+                return False
+            if "$type" in expected:
+                bson_type = {"date": datetime, "string": str}[expected["$type"]]
+                if not isinstance(document.get(key), bson_type):
+                    return False
+            for operator, compare in (("$gt", lambda a, b: a > b), ("$lte", lambda a, b: a <= b)):
+                if operator not in expected:
+                    continue
+                value = document.get(key)
+                # BSON لا يقارن بين نوعين مختلفين
+                if type(value) is not type(expected[operator]):
+                    return False
+                if not compare(value, expected[operator]):
+                    return False
             continue
 
         if document.get(key) != expected:
@@ -1073,6 +1117,35 @@ def test_pull_remote_changes_emits_ui_table_signal_for_changed_tables(tmp_path,
     assert "clients" in seen
 
 
+def test_pull_remote_changes_patches_repository_cache_with_changed_local_ids(tmp_path):
+    ts = datetime(2026, 2, 9, 13, 0, 0)
+    repo = _FakeRepoWithSqlite(
+        db_path=tmp_path / "sync_delta_cache_test.db",
+        remote_clients=[
+            {
+                "_id": "mongo-client-delta",
+                "name": "Delta Co",
+                "created_at": ts,
+                "last_modified": ts,
+                "is_deleted": False,
+            }
+        ],
+    )
+    patched = []
+    repo.apply_table_cache_delta = lambda table, refs: patched.append((table, list(refs)))
+    repo.invalidate_table_cache = lambda table=None: pytest.fail("full invalidation")
+    manager = UnifiedSyncManagerV3(repo)
+    manager.TABLES = ["clients"]
+
+    result = manager.pull_remote_changes()
+
+    assert result["pulled"] == 1
+    cursor = repo.sqlite_conn.cursor()
+    cursor.execute("SELECT id FROM clients WHERE _mongo_id = 'mongo-client-delta'")
+    local_id = cursor.fetchone()[0]
+    assert patched == [("clients", [local_id])]
+
+
 def test_pull_remote_changes_does_not_resurrect_locally_deleted_rows(tmp_path):
     ts = datetime(2026, 2, 9, 12, 50, 0)
     repo = _FakeRepoWithSqlite(
@@ -1124,6 +1197,201 @@ def test_pull_remote_changes_does_not_resurrect_locally_deleted_rows(tmp_path):
     assert row["is_deleted"] == 1
 
 
+class _PagedFakeCollection(_FakeCollection):
+    def __init__(self, records: list[dict] | None = None):
+        super().__init__(records)
+        self.find_calls: list[dict] = []
+
+    def find(self, query=None, projection=None, sort=None, limit=0):
+        self.find_calls.append(
+            {"query": query, "projection": projection, "sort": sort, "limit": limit}
+        )
+        matched = [dict(doc) for doc in self._records if _matches_mongo_query(doc, query)]
+        if sort:
+            # ترتيب BSON: النصوص قبل التواريخ
+            matched.sort(
+                key=lambda doc: (
+                    isinstance(doc["last_modified"], datetime),
+                    doc["last_modified"],
+                    doc["_id"],
+                )
+            )
+        if limit:
+            matched = matched[:limit]
+        if projection:
+            included = {field for field, flag in projection.items() if flag}
+            for doc in matched:
+                for field in list(doc):
+                    if included and field not in included and field != "_id":
+                        doc.pop(field)
+                    elif not included and field in projection:
+                        doc.pop(field)
+        return matched
+
+
+def test_pull_remote_changes_pages_by_watermark_and_defers_large_fields(tmp_path):
+    def project(mongo_id, last_modified, name):
+        return {
+            "_id": mongo_id,
+            "name": name,
+            "client_id": "client-1",
+            "status": "active",
+            "created_at": "2026-02-01T09:00:00",
+            "last_modified": last_modified,
+            "items": [{"description": name, "quantity": 1, "unit_price": 100.0}],
+            "milestones": [{"name": f"{name} milestone"}],
+            "is_deleted": False,
+        }
+
+    remote_projects = [
+        project("p1", "2026-02-10T08:00:00", "Echo"),
+        project("p2", "2026-02-10T09:00:00", "Alpha"),
+        project("p3", "2026-02-10T09:00:00", "Beta"),
+        project("p4", datetime(2026, 2, 10, 10, 0, 0), "Gamma"),
+        project("p5", datetime(2026, 2, 10, 11, 0, 0), "Delta"),
+    ]
+    repo = _FakeRepoWithSqlite(db_path=tmp_path / "sync_paged_pull.db", remote_clients=[])
+    collection = _PagedFakeCollection(remote_projects)
+    repo.mongo_db["projects"] = collection
+    cursor = repo.sqlite_conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE projects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, _mongo_id TEXT, name TEXT, client_id TEXT,
+            status TEXT, created_at TEXT, last_modified TEXT, items TEXT, milestones TEXT,
+            sync_status TEXT, dirty_flag INTEGER DEFAULT 0, is_deleted INTEGER DEFAULT 0
+        )
+        """
+    )
+    # p1 عاد من السحابة بعد رفعه من هذا الجهاز: نفس last_modified = لا حاجة لأعمدته الكبيرة
+    cursor.execute(
+        """
+        INSERT INTO projects (_mongo_id, name, client_id, status, last_modified, items, sync_status)
+        VALUES ('p1', 'Echo', 'client-1', 'active', '2026-02-10T08:00:00', '[]', 'synced')
+        """
+    )
+    repo.sqlite_conn.commit()
+
+    manager = UnifiedSyncManagerV3(repo)
+    manager.TABLES = ["projects"]
+    manager._watermarks["projects"] = "2026-02-01T00:00:00"
+    manager._delta_pull_page_size = 2
+    manager._get_mongo_server_now = lambda: datetime(2026, 2, 11, 0, 0, 0)
+
+    result = manager.pull_remote_changes()
+
+    assert result["success"] is True
+    assert result["pulled"] == 4
+    page_calls = [call for call in collection.find_calls if call["limit"]]
+    hydrate_calls = [call for call in collection.find_calls if not call["limit"]]
+    assert len(page_calls) == 3
+    assert all(call["limit"] == 2 for call in page_calls)
+    assert all(call["sort"] == [("last_modified", 1), ("_id", 1)] for call in page_calls)
+    assert all(call["projection"] == {"items": 0, "milestones": 0} for call in page_calls)
+    hydrated_ids = [mongo_id for call in hydrate_calls for mongo_id in call["query"]["_id"]["$in"]]
+    assert sorted(hydrated_ids) == ["p2", "p3", "p4", "p5"]
+
+    cursor.execute("SELECT _mongo_id, items, milestones FROM projects ORDER BY _mongo_id")
+    rows = {row["_mongo_id"]: row for row in cursor.fetchall()}
+    assert set(rows) == {"p1", "p2", "p3", "p4", "p5"}
+    assert json.loads(rows["p1"]["items"]) == []
+    assert json.loads(rows["p3"]["items"])[0]["description"] == "Beta"
+    assert json.loads(rows["p5"]["milestones"]) == [{"name": "Delta milestone"}]
+    assert manager._watermarks["projects"] == "2026-02-10T11:00:00"
+
+
+def test_pull_remote_changes_commits_update_only_pages_before_the_next_page(tmp_path):
+    class _FailingSecondPage(_PagedFakeCollection):
+        def find(self, query=None, projection=None, sort=None, limit=0):
+            if limit and any(call["limit"] for call in self.find_calls):
+                raise RuntimeError("connection dropped")
+            return super().find(query, projection, sort, limit)
+
+    db_path = tmp_path / "sync_update_pages.db"
+    repo = _FakeRepoWithSqlite(db_path=db_path, remote_clients=[])
+    repo.mongo_db["clients"] = _FailingSecondPage(
+        [
+            {"_id": "c1", "name": "Renamed One", "last_modified": "2026-02-10T08:00:00"},
+            {"_id": "c2", "name": "Renamed Two", "last_modified": "2026-02-10T09:00:00"},
+        ]
+    )
+    repo.sqlite_conn.executemany(
+        "INSERT INTO clients (_mongo_id, name, last_modified, sync_status) "
+        "VALUES (?, ?, '2026-02-01T00:00:00', 'synced')",
+        [("c1", "One"), ("c2", "Two")],
+    )
+    repo.sqlite_conn.commit()
+
+    manager = UnifiedSyncManagerV3(repo)
+    manager.TABLES = ["clients"]
+    manager._watermarks["clients"] = "2026-02-01T00:00:00"
+    manager._delta_pull_page_size = 1
+    manager._get_mongo_server_now = lambda: datetime(2026, 2, 11, 0, 0, 0)
+
+    manager.pull_remote_changes()
+
+    # الصفحة الأولى (تحديثات فقط) ثُبّتت قبل تقديم الـ watermark رغم فشل الصفحة الثانية
+    reader = sqlite3.connect(str(db_path))
+    try:
+        names = dict(reader.execute("SELECT _mongo_id, name FROM clients").fetchall())
+    finally:
+        reader.close()
+    assert names == {"c1": "Renamed One", "c2": "Two"}
+    assert manager._watermarks["clients"] == "2026-02-10T08:00:00"
+
+
+def test_sync_metrics_report_per_table_wire_bytes(tmp_path):
+    ts = datetime(2026, 2, 9, 14, 0, 0)
+    repo = _FakeRepoWithSqlite(
+        db_path=tmp_path / "sync_bytes.db",
+        remote_clients=[
+            {
+                "_id": "mongo-client-bytes",
+                "name": "Bytes Co",
+                "created_at": ts,
+                "last_modified": ts,
+                "is_deleted": False,
+            }
+        ],
+    )
+    repo.mongo_compressors = ["zstd", "zlib"]
+    manager = UnifiedSyncManagerV3(repo)
+    manager.TABLES = ["clients"]
+
+    assert manager.pull_remote_changes()["pulled"] == 1
+    manager._record_wire_bytes("push", "projects", [{"name": "P", "items": [{"x": 1}] * 50}])
+    metrics = manager.get_sync_metrics()
+
+    assert metrics["pull_table_bytes"]["clients"] > 0
+    assert metrics["pull_bytes"] == metrics["pull_table_bytes"]["clients"]
+    assert metrics["push_table_bytes"]["projects"] == metrics["push_bytes"] > 500
+    assert metrics["pull_bytes_human"] == manager._format_bytes(metrics["pull_bytes"])
+    assert metrics["wire_compressors"] == ["zstd", "zlib"]
+
+
+def test_mongo_watermark_index_is_created_only_when_missing():
+    from core.repository import Repository
+
+    class _IndexedCollection:
+        def __init__(self, indexes):
+            self.indexes = dict(indexes)
+            self.created = []
+
+        def index_information(self):
+            return self.indexes
+
+        def create_index(self, keys):
+            self.created.append(keys)
+            self.indexes["_".join(f"{field}_{direction}" for field, direction in keys)] = {
+                "key": list(keys)
+            }
+
+    collection = _IndexedCollection({"_id_": {"key": [("_id", 1)]}})
+    assert Repository._ensure_watermark_index(collection) is True
+    assert Repository._ensure_watermark_index(collection) is False
+    assert collection.created == [[("last_modified", 1), ("_id", 1)]]
+
+
 def test_push_local_changes_includes_modified_offline_without_dirty_flag(tmp_path):
     repo = _FakeRepoWithSqlite(db_path=tmp_path / "sync_push_modified.db", remote_clients=[])
     manager = UnifiedSyncManagerV3(repo)
@@ -2287,3 +2555,494 @@ def test_realtime_manager_rechecks_after_remote_uri_fix(monkeypatch):
     assert started is True
     assert manager.is_running is True
     assert detect_calls["count"] == 2
+
+
+def test_sync_table_from_cloud_bulk_applies_payments_with_prefetched_indexes(tmp_path):
+    ts = datetime(2026, 2, 9, 14, 0, 0)
+    repo = _FakeProjectPaymentRepoWithSqlite(tmp_path / "sync_bulk_payments.db")
+    cursor = repo.sqlite_conn.cursor()
+    cursor.executemany(
+        """
+        INSERT INTO payments (_mongo_id, project_id, date, amount, created_at, last_modified, sync_status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            ("mongo-pay-known", "P-1", "2026-02-01", 100.0, "2026-02-01", "2026-02-01", "synced"),
+            (None, "P-1", "2026-02-02T09:00:00", 250.0, "2026-02-02", "2026-02-02", "new_offline"),
+        ],
+    )
+    repo.sqlite_conn.commit()
+
+    def _payment(mongo_id, date, amount, method="cash"):
+        return {
+            "_id": mongo_id,
+            "project_id": "P-1",
+            "date": date,
+            "amount": amount,
+            "method": method,
+            "created_at": ts,
+            "last_modified": ts,
+        }
+
+    repo.mongo_db["payments"] = _FakeCollection(
+        [
+            _payment("mongo-pay-known", "2026-02-01", 100.0, method="bank"),
+            _payment("mongo-pay-offline", "2026-02-02", 250.0),
+            _payment("mongo-pay-new", "2026-02-03", 75.0),
+            _payment("mongo-pay-new-dup", "2026-02-03", 75.0, method="card"),
+            *[_payment(f"mongo-pay-bulk-{i}", f"2026-03-{i + 1:02d}", 10.0 + i) for i in range(20)],
+        ]
+    )
+    manager = UnifiedSyncManagerV3(repo)
+
+    stats = manager._sync_table_from_cloud("payments")
+
+    rows = [
+        dict(row)
+        for row in repo.sqlite_conn.execute(
+            "SELECT _mongo_id, amount, method, sync_status FROM payments ORDER BY id"
+        ).fetchall()
+    ]
+    assert len(rows) == 23
+    assert rows[0] == {
+        "_mongo_id": "mongo-pay-known",
+        "amount": 100.0,
+        "method": "bank",
+        "sync_status": "synced",
+    }
+    # الدفعة المحلية بنفس التوقيع تُربط بدل تكرارها
+    assert rows[1]["_mongo_id"] == "mongo-pay-offline"
+    assert rows[1]["sync_status"] == "synced"
+    new_rows = [row for row in rows if row["amount"] == 75.0]
+    assert len(new_rows) == 1
+    assert new_rows[0]["_mongo_id"] == "mongo-pay-new-dup"
+    assert new_rows[0]["method"] == "card"
+    assert stats["updated"] == 1
+    assert stats["inserted"] == 23
+
+    metrics = manager.get_sync_metrics()
+    assert metrics["pull_rows_applied"] == 24
+    assert metrics["pull_rows_per_sec"] > 0
+    assert metrics["pull_table_rows_per_sec"]["payments"] > 0
+
+
+def test_push_local_changes_uses_single_unordered_bulk_write(tmp_path):
+    repo = _FakeRepoWithSqlite(db_path=tmp_path / "sync_push_bulk.db", remote_clients=[])
+    collection = _BulkFakeCollection(
+        [
+            {"_id": "remote-known", "name": "Known Co"},
+            {"_id": "remote-by-name", "name": "Linked By Name"},
+            {"_id": "remote-deleted", "name": "Deleted Co"},
+        ]
+    )
+    repo.mongo_db["clients"] = collection
+    manager = UnifiedSyncManagerV3(repo)
+    manager.TABLES = ["clients"]
+    manager._bulk_push_batch_size = 10
+
+    cursor = repo.sqlite_conn.cursor()
+    cursor.executemany(
+        """
+        INSERT INTO clients (_mongo_id, name, created_at, last_modified, sync_status, dirty_flag, is_deleted)
+        VALUES (?, ?, '2026-02-09T10:00:00', '2026-02-09T10:05:00', ?, ?, ?)
+        """,
+        [
+            ("remote-known", "Known Co", "modified_offline", 1, 0),
+            (None, "Linked By Name", "new_offline", 1, 0),
+            (None, "Brand New", "new_offline", 1, 0),
+            ("remote-deleted", "Deleted Co", "deleted", 1, 1),
+        ],
+    )
+    repo.sqlite_conn.commit()
+
+    result = manager.push_local_changes()
+
+    assert result["success"] is True
+    assert result["pushed"] == 3
+    assert result["deleted"] == 1
+    assert result["errors"] == 0
+    assert len(collection.bulk_calls) == 1
+    operations, ordered = collection.bulk_calls[0]
+    assert ordered is False
+    assert len(operations) == 4
+
+    rows = {
+        row["name"]: dict(row)
+        for row in repo.sqlite_conn.execute(
+            "SELECT name, _mongo_id, sync_status, dirty_flag FROM clients"
+        ).fetchall()
+    }
+    assert set(rows) == {"Known Co", "Linked By Name", "Brand New"}
+    assert rows["Linked By Name"]["_mongo_id"] == "remote-by-name"
+    new_remote = next(doc for doc in collection._records if doc.get("name") == "Brand New")
+    assert rows["Brand New"]["_mongo_id"] == str(new_remote["_id"])
+    assert all(row["sync_status"] == "synced" and row["dirty_flag"] == 0 for row in rows.values())
+    deleted_remote = next(doc for doc in collection._records if doc["_id"] == "remote-deleted")
+    assert deleted_remote["is_deleted"] is True
+    # الدفعة أسرع بكثير من الهدف لكنها لم تمتلئ، فلا يتغير حجمها
+    assert manager.get_sync_metrics()["push_batch_size"] == 10
+
+    manager._adapt_bulk_push_batch_size(0.01, 10)
+    assert manager._bulk_push_batch_size == 20
+    manager._adapt_bulk_push_batch_size(5.0, 20)
+    assert manager._bulk_push_batch_size == 10
+
+
+def test_push_local_client_changes_send_logo_hash_and_upload_blobs_once(tmp_path):
+    repo = _FakeRepoWithSqlite(db_path=tmp_path / "sync_push_logos.db", remote_clients=[])
+    collection = _BulkFakeCollection([])
+    repo.mongo_db["clients"] = collection
+    uploads: list[list] = []
+    repo.push_logo_blobs = lambda hashes: uploads.append(list(hashes)) or 0
+    cursor = repo.sqlite_conn.cursor()
+    cursor.execute("ALTER TABLE clients ADD COLUMN logo_data TEXT")
+    cursor.execute("ALTER TABLE clients ADD COLUMN logo_hash TEXT")
+    cursor.executemany(
+        """
+        INSERT INTO clients (name, created_at, last_modified, sync_status, dirty_flag, logo_hash)
+        VALUES (?, '2026-02-09T10:00:00', '2026-02-09T10:05:00', 'new_offline', 1, ?)
+        """,
+        [("Logo A", "hash-1"), ("Logo B", "hash-1"), ("Logo C", "hash-2"), ("No Logo", None)],
+    )
+    repo.sqlite_conn.commit()
+    manager = UnifiedSyncManagerV3(repo)
+    manager.TABLES = ["clients"]
+    manager._bulk_push_batch_size = 10
+
+    result = manager.push_local_changes()
+
+    assert result["pushed"] == 4
+    assert uploads == [["hash-1", "hash-1", "hash-2", None]]
+    docs = {doc["name"]: doc for doc in collection._records}
+    assert docs["Logo A"]["logo_hash"] == docs["Logo B"]["logo_hash"] == "hash-1"
+    assert all(doc["logo_data"] is None for doc in docs.values())
+
+
+def test_push_local_changes_reads_only_journaled_rows_and_acknowledges_them(tmp_path):
+    repo = _FakeRepoWithSqlite(db_path=tmp_path / "sync_push_journal.db", remote_clients=[])
+    cursor = repo.sqlite_conn.cursor()
+    cursor.executemany(
+        """
+        INSERT INTO clients (_mongo_id, name, created_at, last_modified, sync_status, dirty_flag)
+        VALUES (NULL, ?, '2026-02-09T10:00:00', '2026-02-09T10:05:00', 'new_offline', 1)
+        """,
+        [("Journaled",), ("Not Journaled",)],
+    )
+    repo.sqlite_conn.commit()
+    journaled_id = cursor.execute("SELECT id FROM clients WHERE name = 'Journaled'").fetchone()[0]
+    acknowledged = []
+    repo.get_pending_journal_ids = lambda table, limit: [journaled_id, 999]
+    repo.acknowledge_journal_entries = lambda table, ids: acknowledged.append((table, list(ids)))
+    manager = UnifiedSyncManagerV3(repo)
+    manager.TABLES = ["clients"]
+
+    result = manager.push_local_changes()
+
+    assert result["pushed"] == 1
+    assert [doc["name"] for doc in repo.mongo_db["clients"].inserted] == ["Journaled"]
+    assert acknowledged == [("clients", [journaled_id, 999])]
+
+
+class _FakeChangeStream:
+    def __init__(self, changes: list[dict]):
+        self._changes = list(changes)
+        self.resume_token = None
+
+    @property
+    def alive(self):
+        return bool(self._changes)
+
+    def try_next(self):
+        if not self._changes:
+            return None
+        change = self._changes.pop(0)
+        self.resume_token = {"_data": f"token-{change['documentKey']['_id']}"}
+        return change
+
+
+def test_realtime_change_stream_applies_full_documents_and_saves_resume_token(
+    tmp_path, monkeypatch
+):
+    db_path = tmp_path / "realtime_apply.db"
+    repo = _FakeRepoWithSqlite(db_path=db_path, remote_clients=[])
+    cursor = repo.sqlite_conn.cursor()
+    cursor.executemany(
+        """
+        INSERT INTO clients (_mongo_id, name, created_at, last_modified, sync_status, dirty_flag, is_deleted)
+        VALUES (?, ?, ?, ?, 'synced', 0, 0)
+        """,
+        [
+            ("rt-existing", "Old Name", "2026-03-01T10:00:00", "2026-03-01T10:00:00"),
+            ("rt-removed", "Removed", "2026-03-01T10:00:00", "2026-03-01T10:00:00"),
+        ],
+    )
+    repo.sqlite_conn.commit()
+
+    manager = RealtimeSyncManager(repo)
+    scheduled = []
+    monkeypatch.setattr(manager, "_schedule_emit_changes", lambda: scheduled.append("emit"))
+    stream = _FakeChangeStream(
+        [
+            {
+                "operationType": "insert",
+                "ns": {"coll": "clients"},
+                "documentKey": {"_id": "rt-new"},
+                "fullDocument": {
+                    "_id": "rt-new",
+                    "name": "New Client",
+                    "created_at": "2026-03-02T09:00:00",
+                    "last_modified": "2026-03-02T09:00:00",
+                },
+            },
+            {
+                "operationType": "update",
+                "ns": {"coll": "clients"},
+                "documentKey": {"_id": "rt-existing"},
+                "fullDocument": {
+                    "_id": "rt-existing",
+                    "name": "New Name",
+                    "created_at": "2026-03-01T10:00:00",
+                    "last_modified": "2026-03-02T10:00:00",
+                },
+            },
+            {
+                "operationType": "delete",
+                "ns": {"coll": "clients"},
+                "documentKey": {"_id": "rt-removed"},
+            },
+        ]
+    )
+
+    manager._consume_change_stream(stream)
+
+    rows = {
+        row["_mongo_id"]: row
+        for row in repo.sqlite_conn.execute(
+            "SELECT _mongo_id, name, sync_status, dirty_flag FROM clients"
+        ).fetchall()
+    }
+    assert set(rows) == {"rt-existing", "rt-new"}
+    assert rows["rt-existing"]["name"] == "New Name"
+    assert rows["rt-new"]["name"] == "New Client"
+    assert rows["rt-new"]["sync_status"] == "synced"
+    assert rows["rt-new"]["dirty_flag"] == 0
+
+    assert scheduled == ["emit"]
+    with manager._pending_changes_lock:
+        assert manager._pending_applied_changes == {"clients"}
+        assert not manager._pending_changes
+
+    token_path = tmp_path / realtime_mod.RESUME_TOKEN_FILENAME
+    assert token_path.exists()
+    reloaded = RealtimeSyncManager(repo)
+    assert reloaded._load_resume_token() == {"_data": "token-rt-removed"}
+
+
+def test_realtime_apply_compares_last_modified_as_timestamps(tmp_path, monkeypatch):
+    repo = _FakeRepoWithSqlite(db_path=tmp_path / "realtime_timestamps.db", remote_clients=[])
+    repo.sqlite_conn.executemany(
+        """
+        INSERT INTO clients (_mongo_id, name, created_at, last_modified, sync_status, dirty_flag, is_deleted)
+        VALUES (?, ?, ?, ?, 'synced', 0, 0)
+        """,
+        [
+            ("rt-space", "Local Space", "2026-03-01T10:00:00", "2026-03-02 10:00:00"),
+            ("rt-offset", "Local Offset", "2026-03-01T10:00:00", "2026-03-02T10:00:00"),
+        ],
+    )
+    repo.sqlite_conn.commit()
+    manager = RealtimeSyncManager(repo)
+    monkeypatch.setattr(manager, "_schedule_emit_changes", lambda: None)
+
+    changed = manager._apply_documents_to_local(
+        "clients",
+        {
+            # Older than the local row, but "T" sorts after " " as a raw string.
+            "rt-space": {
+                "_id": "rt-space",
+                "name": "Stale Remote",
+                "created_at": "2026-03-01T10:00:00",
+                "last_modified": "2026-03-02T09:30:00Z",
+            },
+            # Same instant as the local row, written with a UTC offset.
+            "rt-offset": {
+                "_id": "rt-offset",
+                "name": "Same Remote",
+                "created_at": "2026-03-01T10:00:00",
+                "last_modified": "2026-03-02T12:00:00+02:00",
+            },
+        },
+    )
+
+    assert changed == []
+    names = dict(repo.sqlite_conn.execute("SELECT _mongo_id, name FROM clients").fetchall())
+    assert names == {"rt-space": "Local Space", "rt-offset": "Local Offset"}
+
+
+def test_realtime_change_without_full_document_falls_back_to_pull(tmp_path, monkeypatch):
+    repo = _FakeRepoWithSqlite(db_path=tmp_path / "realtime_fallback.db", remote_clients=[])
+    manager = RealtimeSyncManager(repo)
+    monkeypatch.setattr(manager, "_schedule_emit_changes", lambda: None)
+
+    manager._apply_change_batch(
+        [
+            {
+                "operationType": "update",
+                "ns": {"coll": "clients"},
+                "documentKey": {"_id": "rt-missing"},
+                "fullDocument": None,
+            }
+        ]
+    )
+
+    with manager._pending_changes_lock:
+        assert manager._pending_changes == {"clients"}
+        assert not manager._pending_applied_changes
+
+
+def test_realtime_insert_listeners_receive_notification_documents(tmp_path, monkeypatch):
+    repo = _FakeRepoWithSqlite(db_path=tmp_path / "realtime_listeners.db", remote_clients=[])
+    manager = RealtimeSyncManager(repo)
+    monkeypatch.setattr(manager, "_schedule_emit_changes", lambda: None)
+    received: list[dict] = []
+    manager.add_insert_listener("notifications", received.append)
+
+    notification = {"_id": "nt-1", "title": "Hello", "created_at": "2026-03-02T09:00:00"}
+    manager._apply_change_batch(
+        [
+            {
+                "operationType": "insert",
+                "ns": {"coll": "notifications"},
+                "documentKey": {"_id": "nt-1"},
+                "fullDocument": notification,
+            },
+            {
+                "operationType": "update",
+                "ns": {"coll": "notifications"},
+                "documentKey": {"_id": "nt-1"},
+                "fullDocument": {**notification, "is_read": True},
+            },
+        ]
+    )
+
+    assert received == [notification]
+    with manager._pending_changes_lock:
+        assert manager._pending_changes == {"notifications"}
+
+    manager.remove_insert_listener("notifications", received.append)
+    assert manager._insert_listeners == {}
+
+
+def test_sync_scheduler_merges_triggers_by_priority_and_reports_metrics():
+    from core.sync_scheduler import PRIORITY_LOCAL_CHANGE, PRIORITY_PERIODIC, SyncScheduler
+
+    executed = []
+    busy_once = {"payments": True}
+
+    def _executor(task):
+        executed.append((task.table, task.priority, task.push, task.pull))
+        if busy_once.pop(task.table, False):
+            return {"success": False, "reason": "delta_busy"}
+        return {"success": True, "pulled": 1}
+
+    scheduler = SyncScheduler(_executor, ["clients", "payments"], coalesce_seconds=0.05)
+    assert scheduler.request("payments", reason="remote") is True
+    assert scheduler.request("clients", push=False, priority=PRIORITY_PERIODIC) is True
+    # نفس الجدول يندمج في المهمة المعلقة ويأخذ أعلى أولوية
+    assert scheduler.request("clients", priority=PRIORITY_LOCAL_CHANGE, reason="local") is False
+
+    deadline = time.monotonic() + 2.0
+    while scheduler.is_busy() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert executed == [
+        ("clients", PRIORITY_LOCAL_CHANGE, True, True),
+        ("payments", 1, True, True),
+        ("payments", 1, True, True),
+    ]
+    metrics = scheduler.metrics()
+    assert metrics["queue_depth"] == 0
+    assert metrics["requests"] == 3
+    assert metrics["merged_requests"] == 1
+    assert metrics["busy_retries"] == 1
+    assert metrics["tasks_run"] == 2
+    assert metrics["dirty_tables"] == []
+    assert metrics["avg_latency_ms"] >= 50.0
+    assert set(metrics["table_last_pull_age_s"]) == {"clients", "payments"}
+    assert scheduler.delta_is_consistent(60.0) is True
+
+    scheduler.request("clients", pull=False)
+    assert scheduler.delta_is_consistent(60.0) is False  # تغيير محلي لم يُرفع بعد
+    scheduler.stop()
+
+
+def test_sync_scheduler_heartbeat_backs_off_while_sync_is_busy():
+    from core.sync_scheduler import SyncScheduler
+
+    calls = []
+    busy_until = time.monotonic() + 1.5
+
+    def _executor(task):
+        calls.append(task.table)
+        if time.monotonic() < busy_until:
+            return {"success": False, "reason": "full_sync_in_progress"}
+        return {"success": True}
+
+    scheduler = SyncScheduler(_executor, ["clients"], interval_seconds=0.5)
+    scheduler.start()
+    time.sleep(1.8)
+    metrics = scheduler.metrics()
+    scheduler.stop()
+
+    # نبضة مشغولة تُعاد كل BUSY_RETRY_SECONDS فقط بدل تنفيذ نبضة جديدة في كل لفة
+    assert 2 <= len(calls) <= 15
+    assert metrics["heartbeats"] <= 4
+    assert metrics["busy_retries"] <= 12
+    assert metrics["tasks_run"] >= 1
+
+
+def test_periodic_full_sync_runs_only_when_delta_cannot_prove_consistency(tmp_path, monkeypatch):
+    class _CountingCollection(_FakeCollection):
+        def count_documents(self, query):
+            return sum(1 for doc in self._records if _matches_mongo_query(doc, query))
+
+    remote = [{"_id": "c-1", "name": "Client", "last_modified": "2026-03-01T10:00:00"}]
+    repo = _FakeRepoWithSqlite(db_path=tmp_path / "consistency.db", remote_clients=[])
+    repo.mongo_db["clients"] = _CountingCollection(remote)
+    repo.sqlite_conn.execute(
+        "INSERT INTO clients (_mongo_id, name, sync_status) VALUES ('c-1', 'Client', 'synced')"
+    )
+    repo.sqlite_conn.commit()
+    manager = UnifiedSyncManagerV3(repo)
+
+    # لا يوجد سحب ناجح بعد -> الـ Delta لا تثبت شيئاً
+    assert manager._delta_proves_consistency() is False
+
+    manager._scheduler.mark_full_sync(True)
+    assert manager._delta_proves_consistency() is True
+
+    started_targets = []
+    sync_calls = []
+
+    class _FakeThread:
+        def __init__(self, target=None, **_kwargs):
+            self._target = target
+
+        def start(self):
+            started_targets.append(self._target)
+
+    monkeypatch.setattr(unified_sync_mod.threading, "Thread", _FakeThread)
+    monkeypatch.setattr(
+        manager, "full_sync_from_cloud", lambda: sync_calls.append("sync") or {"success": True}
+    )
+
+    assert manager._run_full_sync_async(source="periodic") is True
+    started_targets[-1]()
+    assert sync_calls == []
+    assert manager.get_sync_metrics()["scheduler"]["full_syncs_skipped"] == 1
+
+    # حذف نهائي في السحابة لا تراه الـ Delta -> مطابقة الأعداد تفشل فتعمل المزامنة الكاملة
+    remote.clear()
+    assert manager._run_full_sync_async(source="periodic") is True
+    started_targets[-1]()
+    assert sync_calls == ["sync"]
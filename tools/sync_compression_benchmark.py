@@ -0,0 +1,197 @@
+"""
+مقارنة أحجام وأزمنة السحب/الرفع مع ضغط بروتوكول MongoDB وبدونه.
+
+- قسم محلي دائماً: حجم BSON لمستندات مشاريع تجريبية (بنود items كبيرة) وحجمها بعد كل ضاغط متاح.
+- قسم حي اختياري (--uri): رفع وسحب نفس المستندات عبر collection مؤقتة لكل ضاغط،
+  مع قراءة bytes الشبكة الفعلية من serverStatus قبل وبعد كل عملية.
+
+    python tools/sync_compression_benchmark.py --docs 500
+    python tools/sync_compression_benchmark.py --uri mongodb://localhost:27017 --docs 500
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import zlib
+from datetime import datetime
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.insert(0, _ROOT_DIR)
+
+_BENCH_COLLECTION = "_skywave_compression_benchmark"
+
+
+def _format_bytes(value: int) -> str:
+    from core.unified_sync import UnifiedSyncManagerV3
+
+    return UnifiedSyncManagerV3._format_bytes(value)
+
+
+_SAMPLE_WORDS = (
+    "تصميم",
+    "هوية",
+    "حملة",
+    "إعلانات",
+    "تطوير",
+    "موقع",
+    "تطبيق",
+    "محتوى",
+    "تصوير",
+    "مونتاج",
+    "استضافة",
+    "صيانة",
+    "تسويق",
+    "تحليل",
+    "تقارير",
+    "استشارة",
+)
+
+
+def _sample_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_SAMPLE_WORDS) for _ in range(words))
+
+
+def _sample_projects(count: int, items_per_project: int) -> list[dict]:
+    now = datetime.now()
+    rng = random.Random(20260)
+    return [
+        {
+            "name": f"Benchmark Project {index}",
+            "client_id": f"client-{index % 40}",
+            "status": "نشط",
+            "description": _sample_text(rng, 30),
+            "items": [
+                {
+                    "service_id": f"service-{line % 25}",
+                    "description": f"{line}- {_sample_text(rng, 8)}",
+                    "quantity": float(rng.randint(1, 12)),
+                    "unit_price": round(rng.uniform(150.0, 25000.0), 2),
+                    "discount_rate": 0.0,
+                    "total": round(rng.uniform(150.0, 300000.0), 2),
+                }
+                for line in range(items_per_project)
+            ],
+            "milestones": [
+                {"name": f"مرحلة {stage}", "percentage": 25.0, "status": "pending"}
+                for stage in range(4)
+            ],
+            "total_amount": 125000.0 + index,
+            "created_at": now,
+            "last_modified": now,
+            "is_deleted": False,
+        }
+        for index in range(count)
+    ]
+
+
+def _available_compressors() -> dict:
+    compressors = {"zlib": lambda payload: zlib.compress(payload, 6)}
+    try:
+        import zstandard
+
+        zstd_compressor = zstandard.ZstdCompressor()
+        compressors["zstd"] = zstd_compressor.compress
+    except ImportError:
+        pass
+    try:
+        import snappy
+
+        compressors["snappy"] = snappy.compress
+    except ImportError:
+        pass
+    return compressors
+
+
+def _payload_report(documents: list[dict]) -> None:
+    from bson import encode as bson_encode
+
+    started = time.perf_counter()
+    payloads = [bson_encode(document) for document in documents]
+    encode_ms = (time.perf_counter() - started) * 1000
+    raw_size = sum(len(payload) for payload in payloads)
+    print(f"none  : {_format_bytes(raw_size):>9}  (BSON encode {encode_ms:.1f} ms)")
+
+    # الضغط يتم على مستوى رسالة البروتوكول: نضغط دفعات بحجم batch السحب الافتراضي
+    batch = 100
+    for name, compress in _available_compressors().items():
+        started = time.perf_counter()
+        compressed = sum(
+            len(compress(b"".join(payloads[start : start + batch])))
+            for start in range(0, len(payloads), batch)
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        ratio = compressed / raw_size if raw_size else 0.0
+        print(
+            f"{name:<6}: {_format_bytes(compressed):>9}  "
+            f"({ratio:.0%} من الحجم، ضغط {elapsed_ms:.1f} ms)"
+        )
+
+
+def _network_bytes(client) -> tuple[int, int]:
+    network = client.admin.command("serverStatus").get("network", {})
+    bytes_in = network.get("physicalBytesIn", network.get("bytesIn", 0))
+    bytes_out = network.get("physicalBytesOut", network.get("bytesOut", 0))
+    return int(bytes_in), int(bytes_out)
+
+
+def _live_report(uri: str, db_name: str, documents: list[dict]) -> None:
+    import pymongo
+
+    modes = [[]] + [[name] for name in ("zstd", "snappy", "zlib")]
+    available = _available_compressors()
+    for compressors in modes:
+        if compressors and compressors[0] not in available:
+            continue
+        label = compressors[0] if compressors else "none"
+        options = {"compressors": compressors} if compressors else {}
+        client = pymongo.MongoClient(uri, serverSelectionTimeoutMS=5000, **options)
+        try:
+            collection = client[db_name][_BENCH_COLLECTION]
+            collection.drop()
+
+            before_in, before_out = _network_bytes(client)
+            started = time.perf_counter()
+            for start in range(0, len(documents), 100):
+                collection.insert_many([dict(doc) for doc in documents[start : start + 100]])
+            push_ms = (time.perf_counter() - started) * 1000
+            after_in, after_out = _network_bytes(client)
+            push_bytes = after_in - before_in
+
+            started = time.perf_counter()
+            pulled = len(list(collection.find({}).sort([("last_modified", 1), ("_id", 1)])))
+            pull_ms = (time.perf_counter() - started) * 1000
+            _final_in, final_out = _network_bytes(client)
+            pull_bytes = final_out - after_out
+
+            print(
+                f"{label:<6}: رفع {_format_bytes(push_bytes):>9} في {push_ms:7.1f} ms | "
+                f"سحب {pulled} مستند {_format_bytes(pull_bytes):>9} في {pull_ms:7.1f} ms"
+            )
+            collection.drop()
+        finally:
+            client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SkyWave sync wire compression benchmark")
+    parser.add_argument("--docs", type=int, default=300, help="عدد مستندات المشاريع")
+    parser.add_argument("--items", type=int, default=60, help="عدد البنود لكل مشروع")
+    parser.add_argument("--uri", default=None, help="MongoDB URI لتشغيل القياس الحي")
+    parser.add_argument("--db", default="skywave_benchmark", help="قاعدة بيانات القياس الحي")
+    args = parser.parse_args()
+
+    documents = _sample_projects(max(1, args.docs), max(1, args.items))
+    print("== SkyWaveERP Sync Compression Benchmark ==")
+    print(f"-- payload ({len(documents)} projects × {args.items} items) --")
+    _payload_report(documents)
+
+    if args.uri:
+        print(f"-- live round-trip ({args.uri}) --")
+        _live_report(args.uri, args.db, documents)
+
+
+if __name__ == "__main__":
+    main()
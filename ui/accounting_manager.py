@@ -3,7 +3,7 @@
 تاب المحاسبة - واجهة تشغيلية للخزن فوق الحسابات النقدية الداخلية.
 """
 
-from PyQt6.QtCore import QItemSelectionModel, Qt, QTimer
+from PyQt6.QtCore import QItemSelectionModel, Qt, QTimer, pyqtSignal
 from PyQt6.QtGui import QColor, QKeySequence, QShortcut, QStandardItem, QStandardItemModel
 from PyQt6.QtWidgets import (
     QAbstractItemView,
@@ -70,6 +70,9 @@ class AccountingManagerTab(QWidget):
     _accounts_cache_time = 0
     _ACCOUNTS_CACHE_TTL = 60  # 60 ثانية
 
+    # ⚡ اكتمال مراجعة الخزن الخلفية (تُرسل من thread المهمة وتُستقبل في thread الواجهة)
+    cashbox_audit_completed = pyqtSignal(dict)
+
     def __init__(
         self,
         expense_service: ExpenseService,
@@ -97,6 +100,7 @@ class AccountingManagerTab(QWidget):
         self._reload_retry_timer = QTimer(self)
         self._reload_retry_timer.setSingleShot(True)
         self._reload_retry_timer.timeout.connect(self._run_scheduled_reload)
+        self.cashbox_audit_completed.connect(self._on_cashbox_audit_completed)
 
         main_layout = QVBoxLayout()
         main_layout.setContentsMargins(10, 10, 10, 10)
@@ -133,13 +137,15 @@ class AccountingManagerTab(QWidget):
         """⚡ معالج التحديث الفوري عند تغيير بيانات المحاسبة"""
         # ⚡ إبطال الـ cache أولاً لضمان جلب البيانات الجديدة
         self.invalidate_cache()
-        # ⚡ إبطال cache الـ service أيضاً
-        if hasattr(self.accounting_service, "_hierarchy_cache"):
-            self.accounting_service._hierarchy_cache = None
-            self.accounting_service._hierarchy_cache_time = 0
+        # ⚡ شجرة الـ service تُرقَّع بفروق الحركات النقدية؛ أي تغيير آخر يُبطلها
+        consume_patch = getattr(self.accounting_service, "consume_hierarchy_patch", None)
+        if not (callable(consume_patch) and consume_patch()):
+            invalidate_tree = getattr(self.accounting_service, "invalidate_hierarchy_cache", None)
+            if callable(invalidate_tree):
+                invalidate_tree()
         if not self.isVisible():
             return
-        self.load_accounts_data(force_refresh=True)
+        self.load_accounts_data(force_refresh=True, rebuild_tree=False)
 
     def _on_any_data_changed(self, _data_type: str = None):
         """⚡ معالج التحديث الفوري عند تغيير أي بيانات - معطل لتجنب التكرار"""
@@ -953,6 +959,36 @@ class AccountingManagerTab(QWidget):
 
         self._apply_cashbox_audit_state()
 
+    @staticmethod
+    def _with_cashbox_audit_totals(cashbox_audit: dict) -> dict:
+        """إضافة إجماليات الشارة (قابل للإصلاح/غير محلول) لنتيجة مراجعة الخزن."""
+        cashbox_audit["repairable_total"] = int(
+            cashbox_audit.get("fixed_expense_payment_refs", 0) or 0
+        ) + int(cashbox_audit.get("backfilled_expense_payment_refs", 0) or 0)
+        cashbox_audit["fixed_total"] = 0
+        cashbox_audit["unresolved_total"] = int(
+            cashbox_audit.get("unresolved_payment_account_refs", 0) or 0
+        ) + int(cashbox_audit.get("unresolved_expense_payment_refs", 0) or 0)
+        return cashbox_audit
+
+    def _emit_cashbox_audit_completed(self, result: dict):
+        """مستمع مهمة المراجعة (thread خلفي): نقل النتيجة لـ thread الواجهة عبر الإشارة."""
+        try:
+            self.cashbox_audit_completed.emit(result)
+        except RuntimeError:
+            # التاب اتقفل/اتحذف قبل اكتمال المراجعة
+            pass
+
+    def _on_cashbox_audit_completed(self, result: dict):
+        """⚡ استبدال نتيجة المراجعة الجزئية بالكاملة وإعادة رسم الهيدر بدون إعادة التحميل."""
+        if not self.cashbox_audit.get("partial"):
+            return
+        self.cashbox_audit = self._with_cashbox_audit_totals(dict(result))
+        cached = AccountingManagerTab._accounts_cache
+        if isinstance(cached, dict):
+            cached["cashbox_audit"] = self.cashbox_audit
+        self._refresh_accounts_meta()
+
     def _apply_cashbox_audit_state(self):
         """تحديث شارة الهيدر بحسب سلامة ربط الخزن في البيانات."""
         if not hasattr(self, "hero_badge_label"):
@@ -961,6 +997,7 @@ class AccountingManagerTab(QWidget):
         unresolved = int(self.cashbox_audit.get("unresolved_total", 0) or 0)
         repairable = int(self.cashbox_audit.get("repairable_total", 0) or 0)
         fixed = int(self.cashbox_audit.get("fixed_total", 0) or 0)
+        partial = bool(self.cashbox_audit.get("partial"))
 
         if unresolved:
             badge_text = f"{unresolved} مرجع يحتاج مراجعة"
@@ -968,12 +1005,18 @@ class AccountingManagerTab(QWidget):
             badge_text = f"{repairable} مرجع قديم"
         elif fixed:
             badge_text = f"تم إصلاح {fixed} مرجع"
+        elif partial:
+            badge_text = "جارٍ مراجعة ربط الخزن..."
         else:
             badge_text = "مرتبطة بالتحصيل والصرف"
+        if partial and (unresolved or repairable or fixed):
+            # الأعداد ناقصة حتى تكتمل المراجعة الخلفية
+            badge_text += " (مراجعة جارية)"
 
         self.hero_badge_label.setText(badge_text)
         self.hero_badge_label.setToolTip(
-            "مراجعة ربط الخزن بالدفعات والمصروفات.\n"
+            ("المراجعة لم تكتمل بعد؛ الأعداد جزئية.\n" if partial else "")
+            + "مراجعة ربط الخزن بالدفعات والمصروفات.\n"
             f"الدفعات غير المحلولة: {int(self.cashbox_audit.get('unresolved_payment_account_refs', 0) or 0)}\n"
             f"مراجع مصروف غير محلولة: {int(self.cashbox_audit.get('unresolved_expense_payment_refs', 0) or 0)}\n"
             f"مراجع قديمة قابلة للإصلاح: {repairable}\n"
@@ -1094,8 +1137,11 @@ class AccountingManagerTab(QWidget):
         self._pending_force_reload = False
         self.load_accounts_data(force_refresh=pending_force)
 
-    def load_accounts_data(self, force_refresh: bool = False):
-        """⚡ تحميل الحسابات في الخلفية لمنع التجميد (مع cache ذكي)"""
+    def load_accounts_data(self, force_refresh: bool = False, rebuild_tree: bool | None = None):
+        """
+        ⚡ تحميل الحسابات في الخلفية لمنع التجميد (مع cache ذكي)
+        rebuild_tree: إعادة بناء شجرة الـ service (الافتراضي = force_refresh)
+        """
         import time
 
         from core.data_loader import get_data_loader
@@ -1140,9 +1186,9 @@ class AccountingManagerTab(QWidget):
         # دالة جلب البيانات (مع استخدام cache الـ service)
         def fetch_accounts():
             try:
-                # ⚡ استخدام cache الـ service (بدون force_refresh)
+                # ⚡ استخدام cache الـ service ما لم تُطلب إعادة بناء الشجرة
                 tree_map = self.accounting_service.get_hierarchy_with_balances(
-                    force_refresh=force_refresh
+                    force_refresh=force_refresh if rebuild_tree is None else rebuild_tree
                 )
                 all_accounts = self.accounting_service.repo.get_all_accounts()
                 payments = (
@@ -1155,19 +1201,27 @@ class AccountingManagerTab(QWidget):
                     if hasattr(self.accounting_service.repo, "get_all_expenses")
                     else []
                 )
-                cashbox_audit = self.accounting_service.audit_cashbox_integrity(
-                    apply_fixes=False,
-                    preloaded_accounts=all_accounts,
-                    preloaded_payments=payments,
-                    preloaded_expenses=expenses,
-                )
-                cashbox_audit["repairable_total"] = int(
-                    cashbox_audit.get("fixed_expense_payment_refs", 0) or 0
-                ) + int(cashbox_audit.get("backfilled_expense_payment_refs", 0) or 0)
-                cashbox_audit["fixed_total"] = 0
-                cashbox_audit["unresolved_total"] = int(
-                    cashbox_audit.get("unresolved_payment_account_refs", 0) or 0
-                ) + int(cashbox_audit.get("unresolved_expense_payment_refs", 0) or 0)
+                cashbox_audit = None
+                # ⚡ مراجعة تزايدية بمهلة قصيرة؛ الباقي يكمله thread خلفي من نقاط التحقق
+                audit_job = getattr(self.accounting_service, "get_cashbox_audit_job", None)
+                audit_job = audit_job() if callable(audit_job) else None
+                if audit_job is not None:
+                    try:
+                        cashbox_audit = audit_job.run(budget_seconds=0.3)
+                        if isinstance(cashbox_audit, dict) and not cashbox_audit.get("complete"):
+                            audit_job.add_completion_listener(self._emit_cashbox_audit_completed)
+                            audit_job.start()
+                    except Exception as e:
+                        safe_print(f"WARNING: [AccManager] فشلت المراجعة التزايدية للخزن: {e}")
+                        cashbox_audit = None
+                if not isinstance(cashbox_audit, dict):
+                    cashbox_audit = self.accounting_service.audit_cashbox_integrity(
+                        apply_fixes=False,
+                        preloaded_accounts=all_accounts,
+                        preloaded_payments=payments,
+                        preloaded_expenses=expenses,
+                    )
+                cashbox_audit = self._with_cashbox_audit_totals(cashbox_audit)
                 return {
                     "tree_map": tree_map,
                     "all_accounts": all_accounts,
@@ -1195,6 +1249,12 @@ class AccountingManagerTab(QWidget):
                 payments = data.get("payments", [])
                 expenses = data.get("expenses", [])
                 self.cashbox_audit = data.get("cashbox_audit", {})
+                if self.cashbox_audit.get("partial"):
+                    # ⚡ المهمة الخلفية ربما اكتملت قبل وصول البيانات للواجهة
+                    latest = self.accounting_service.get_cashbox_audit_job().result()
+                    if latest.get("complete"):
+                        self.cashbox_audit = self._with_cashbox_audit_totals(latest)
+                        data["cashbox_audit"] = self.cashbox_audit
 
                 # 🔥 [تعديل هام] تطبيق الإصلاح الرياضي قبل العرض
                 if tree_map:
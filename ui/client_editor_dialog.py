@@ -115,15 +115,15 @@ class ClientEditorDialog(QDialog):
             f"""
             QScrollArea {{
                 border: none;
-                background-color: {COLORS['bg_dark']};
+                background-color: {COLORS["bg_dark"]};
             }}
             QScrollBar:vertical {{
-                background-color: {COLORS['bg_medium']};
+                background-color: {COLORS["bg_medium"]};
                 width: 6px;
                 border-radius: 3px;
             }}
             QScrollBar::handle:vertical {{
-                background-color: {COLORS['primary']};
+                background-color: {COLORS["primary"]};
                 border-radius: 3px;
                 min-height: 20px;
             }}
@@ -139,34 +139,34 @@ class ClientEditorDialog(QDialog):
         # ستايل الحقول مع أسهم واضحة (RTL)
         field_style = f"""
             QLineEdit {{
-                background-color: {COLORS['bg_medium']};
-                color: {COLORS['text_primary']};
-                border: 1px solid {COLORS['border']};
+                background-color: {COLORS["bg_medium"]};
+                color: {COLORS["text_primary"]};
+                border: 1px solid {COLORS["border"]};
                 border-radius: 5px;
                 padding: 7px 10px;
                 font-size: 11px;
                 min-height: 16px;
             }}
             QLineEdit:hover {{
-                border-color: {COLORS['primary']};
+                border-color: {COLORS["primary"]};
             }}
             QLineEdit:focus {{
-                border: 1px solid {COLORS['primary']};
+                border: 1px solid {COLORS["primary"]};
             }}
             QComboBox {{
-                background-color: {COLORS['bg_medium']};
-                color: {COLORS['text_primary']};
-                border: 1px solid {COLORS['border']};
+                background-color: {COLORS["bg_medium"]};
+                color: {COLORS["text_primary"]};
+                border: 1px solid {COLORS["border"]};
                 border-radius: 5px;
                 padding: 7px 10px 7px 25px;
                 font-size: 11px;
                 min-height: 16px;
             }}
             QComboBox:hover {{
-                border-color: {COLORS['primary']};
+                border-color: {COLORS["primary"]};
             }}
             QComboBox:focus {{
-                border: 1px solid {COLORS['primary']};
+                border: 1px solid {COLORS["primary"]};
             }}
             QComboBox::drop-down {{
                 subcontrol-origin: border;
@@ -180,9 +180,9 @@ class ClientEditorDialog(QDialog):
                 height: 10px;
             }}
             QTextEdit {{
-                background-color: {COLORS['bg_medium']};
-                color: {COLORS['text_primary']};
-                border: 1px solid {COLORS['border']};
+                background-color: {COLORS["bg_medium"]};
+                color: {COLORS["text_primary"]};
+                border: 1px solid {COLORS["border"]};
                 border-radius: 5px;
                 padding: 6px;
                 font-size: 11px;
@@ -297,16 +297,16 @@ class ClientEditorDialog(QDialog):
         self.work_field_input.setStyleSheet(
             f"""
             QComboBox {{
-                background-color: {COLORS['bg_medium']};
-                color: {COLORS['text_primary']};
-                border: 1px solid {COLORS['border']};
+                background-color: {COLORS["bg_medium"]};
+                color: {COLORS["text_primary"]};
+                border: 1px solid {COLORS["border"]};
                 border-radius: 5px;
                 padding: 7px 10px 7px 25px;
                 font-size: 11px;
                 min-height: 16px;
             }}
             QComboBox:hover {{
-                border-color: {COLORS['primary']};
+                border-color: {COLORS["primary"]};
             }}
             QComboBox::drop-down {{
                 subcontrol-origin: border;
@@ -320,10 +320,10 @@ class ClientEditorDialog(QDialog):
                 height: 10px;
             }}
             QComboBox QAbstractItemView {{
-                background-color: {COLORS['bg_medium']};
-                color: {COLORS['text_primary']};
-                border: 1px solid {COLORS['border']};
-                selection-background-color: {COLORS['primary']};
+                background-color: {COLORS["bg_medium"]};
+                color: {COLORS["text_primary"]};
+                border: 1px solid {COLORS["border"]};
+                selection-background-color: {COLORS["primary"]};
                 selection-color: white;
                 padding: 4px;
             }}
@@ -371,15 +371,15 @@ class ClientEditorDialog(QDialog):
         select_logo_btn.setStyleSheet(
             f"""
             QPushButton {{
-                background-color: {COLORS['bg_medium']};
-                color: {COLORS['text_primary']};
-                border: 1px solid {COLORS['border']};
+                background-color: {COLORS["bg_medium"]};
+                color: {COLORS["text_primary"]};
+                border: 1px solid {COLORS["border"]};
                 border-radius: 4px;
                 padding: 5px 12px;
                 font-size: 10px;
             }}
             QPushButton:hover {{
-                border-color: {COLORS['primary']};
+                border-color: {COLORS["primary"]};
             }}
         """
         )
@@ -451,8 +451,8 @@ class ClientEditorDialog(QDialog):
         buttons_container.setStyleSheet(
             f"""
             QWidget {{
-                background-color: {COLORS['bg_medium']};
-                border-top: 1px solid {COLORS['border']};
+                background-color: {COLORS["bg_medium"]};
+                border-top: 1px solid {COLORS["border"]};
             }}
         """
         )
@@ -528,7 +528,11 @@ class ClientEditorDialog(QDialog):
         else:
             self.work_field_input.setCurrentText(work_field)
 
-        has_logo_data = hasattr(self.client_to_edit, "logo_data") and self.client_to_edit.logo_data
+        # ⚡ عملاء القوائم يحملون بصمة الصورة فقط (الصورة نفسها في مخزن blobs)
+        has_logo_data = bool(
+            getattr(self.client_to_edit, "logo_data", None)
+            or getattr(self.client_to_edit, "logo_hash", None)
+        )
         logo_path = self.client_to_edit.logo_path or ""
 
         if has_logo_data:
@@ -26,6 +26,7 @@ from PyQt6.QtWidgets import (
 )
 
 from core import schemas
+from core.speed_optimizer import LRUCache
 from services.client_service import ClientService
 from ui.client_editor_dialog import ClientEditorDialog
 from ui.styles import BUTTON_STYLES, TABLE_STYLE_DARK, create_centered_item, get_cairo_font
@@ -42,6 +43,10 @@ except ImportError:
             pass
 
 
+# ⚡ صور الشعارات المصغرة حسب بصمة المحتوى: نفس الشعار لعدة عملاء يُفك مرة واحدة
+_LOGO_PIXMAP_CACHE = LRUCache(maxsize=256, ttl_seconds=3600)
+
+
 class ClientManagerTab(QWidget):
     """
     (معدل) التاب الخاص بإدارة العملاء (مع عمود اللوجو)
@@ -549,6 +554,8 @@ class ClientManagerTab(QWidget):
             return
         if getattr(client, "logo_data", None):
             return
+        if self._has_local_logo(client):
+            return
 
         identity = self._client_identity(client)
         if not identity or identity in self._logo_fetch_inflight:
@@ -667,12 +674,66 @@ class ClientManagerTab(QWidget):
         self._logo_icon_cache[key] = icon
         return icon
 
+    def _has_local_logo(self, client: schemas.Client) -> bool:
+        logo_hash = getattr(client, "logo_hash", None)
+        checker = getattr(self.client_service, "has_local_logo", None)
+        return bool(logo_hash) and callable(checker) and checker(logo_hash) is True
+
+    def _get_hashed_logo_pixmap(self, logo_hash: str) -> QPixmap | None:
+        """⚡ الصورة المصغرة من مخزن blobs (جاهزة PNG) مع LRU مشترك حسب البصمة."""
+        cached = _LOGO_PIXMAP_CACHE.get(logo_hash)
+        if cached is not None:
+            return cached
+
+        pixmap = None
+        get_thumbnail = getattr(self.client_service, "get_logo_thumbnail", None)
+        thumbnail = get_thumbnail(logo_hash) if callable(get_thumbnail) else None
+        if isinstance(thumbnail, bytes):
+            pm = QPixmap()
+            if pm.loadFromData(thumbnail) and not pm.isNull():
+                pixmap = pm
+
+        if pixmap is None:
+            get_blob = getattr(self.client_service, "get_logo_blob", None)
+            blob = get_blob(logo_hash) if callable(get_blob) else None
+            if not isinstance(blob, tuple):
+                return None
+            pm = QPixmap()
+            if not pm.loadFromData(blob[0]) or pm.isNull():
+                return None
+            pixmap = pm.scaled(
+                128,
+                128,
+                Qt.AspectRatioMode.KeepAspectRatio,
+                Qt.TransformationMode.SmoothTransformation,
+            )
+            # الصورة حُفظت بدون Qt: نخزن المصغرة مرة واحدة للمرات القادمة
+            save_thumbnail = getattr(self.client_service, "save_logo_thumbnail", None)
+            if callable(save_thumbnail):
+                from PyQt6.QtCore import QBuffer, QIODevice
+
+                buffer = QBuffer()
+                buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+                pixmap.save(buffer, "PNG")
+                save_thumbnail(logo_hash, bytes(buffer.data()))
+                buffer.close()
+
+        _LOGO_PIXMAP_CACHE.set(logo_hash, pixmap)
+        return pixmap
+
     def _get_client_logo_pixmap(self, client: schemas.Client) -> QPixmap | None:
         key = self._client_identity(client)
         self._ensure_logo_cache_fresh(client)
         if key in self._logo_pixmap_cache:
             return self._logo_pixmap_cache[key]
 
+        logo_hash = getattr(client, "logo_hash", None)
+        if logo_hash and bool(getattr(client, "has_logo", False)):
+            pixmap = self._get_hashed_logo_pixmap(str(logo_hash))
+            if pixmap is not None:
+                self._logo_pixmap_cache[key] = pixmap
+                return pixmap
+
         pixmap = None
         logo_data = getattr(client, "logo_data", None)
         has_logo = bool(getattr(client, "has_logo", False))
@@ -733,6 +794,7 @@ class ClientManagerTab(QWidget):
         has_logo = bool(getattr(client, "has_logo", False))
         return (
             f"has={1 if has_logo else 0}"
+            f"|hash={getattr(client, 'logo_hash', None) or ''}"
             f"|data={1 if bool(logo_data) else 0}"
             f"|len={len(str(logo_data)) if logo_data else 0}"
             f"|path={logo_path}"
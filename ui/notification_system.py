@@ -539,7 +539,7 @@ class ToastNotification(QWidget):
         time_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         time_label.setStyleSheet(
             f"""
-            color: {COLORS['text_secondary']};
+            color: {COLORS["text_secondary"]};
             background: transparent;
             border: none;
             padding: 0;
@@ -557,7 +557,7 @@ class ToastNotification(QWidget):
         title_label.setWordWrap(True)
         title_label.setStyleSheet(
             f"""
-            color: {COLORS['text_primary']};
+            color: {COLORS["text_primary"]};
             background: transparent;
             font-size: {title_font_size}px;
             font-weight: 700;
@@ -756,7 +756,7 @@ class ToastNotification(QWidget):
         title_label.setWordWrap(True)
         title_label.setStyleSheet(
             f"""
-            color: {COLORS['text_primary']};
+            color: {COLORS["text_primary"]};
             background: transparent;
             font-size: {title_font_size}px;
             font-weight: 700;
@@ -766,14 +766,14 @@ class ToastNotification(QWidget):
         )
         header_row.addWidget(title_label, 1)
 
-        close_btn = QPushButton("\u00D7")
+        close_btn = QPushButton("\u00d7")
         close_btn.setFixedSize(18, 18)
         close_btn.setCursor(Qt.CursorShape.PointingHandCursor)
         close_btn.setStyleSheet(
             f"""
             QPushButton {{
                 background: transparent;
-                color: {COLORS['text_secondary']};
+                color: {COLORS["text_secondary"]};
                 border: none;
                 font-size: 14px;
                 font-weight: 700;
@@ -781,7 +781,7 @@ class ToastNotification(QWidget):
             }}
             QPushButton:hover {{
                 background: transparent;
-                color: {COLORS['text_primary']};
+                color: {COLORS["text_primary"]};
             }}
         """
         )
@@ -835,7 +835,7 @@ class ToastNotification(QWidget):
         time_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         time_label.setStyleSheet(
             f"""
-            color: {COLORS['text_secondary']};
+            color: {COLORS["text_secondary"]};
             background: transparent;
             border: none;
             padding: 0;
@@ -1196,7 +1196,19 @@ class NotificationSyncWorker(QThread):
         self._session_started_at = datetime.now()
         # Poll below 1s for fast cross-device fallback when Change Streams are unavailable.
         self._check_interval = 700
+        # أقصى مدى للتعويض لو توقف الـ cursor طويلاً (انقطاع/إسبات)
         self._poll_lookback_seconds = 3600
+        # هامش فرق الساعات بين الأجهزة: created_at يكتبه الجهاز المرسل
+        self._poll_clock_skew_seconds = 5
+        self._poll_batch_size = 30
+        # ⚡ cursor متزايد: آخر created_at تمت رؤيته + _id المستندات داخل هامش الساعات
+        self._poll_cursor: datetime | None = None
+        self._cursor_window: dict = {}
+        self._stream_manager = None
+        # استعلام تعويضي واحد بعد كل اشتراك: يلتقط ما أُدرج قبل ربط الـ listener
+        self._stream_catch_up_pending = False
+        self._pushed_lock = threading.Lock()
+        self._pushed_notifications: deque = deque()
         self._last_cleanup = 0.0
         self._last_sync_trigger = 0.0
         self._sync_trigger_cooldown = 0.4
@@ -1218,6 +1230,9 @@ class NotificationSyncWorker(QThread):
                 self._check_interval = max(300, min(5000, int(poll_ms)))
             if lookback_s is not None:
                 self._poll_lookback_seconds = max(60, min(24 * 3600, int(lookback_s)))
+            skew_s = cfg.get("notification_poll_clock_skew_seconds")
+            if skew_s is not None:
+                self._poll_clock_skew_seconds = max(0, min(300, int(skew_s)))
         except Exception:
             # Keep safe defaults.
             pass
@@ -1344,6 +1359,8 @@ class NotificationSyncWorker(QThread):
     def set_repository(self, repo):
         self.repo = repo
         self._session_started_at = datetime.now()
+        self._poll_cursor = None
+        self._cursor_window = {}
         safe_print(
             f"INFO: [NotificationSync] Repository set, online={getattr(repo, 'online', False)}"
         )
@@ -1359,6 +1376,7 @@ class NotificationSyncWorker(QThread):
                     and getattr(self.repo, "online", False)
                     and getattr(self.repo, "mongo_db", None) is not None
                 ):
+                    self._sync_change_stream_subscription()
                     had_activity = bool(self._check_new_notifications())
             except Exception as e:
                 safe_print(f"WARNING: [NotificationSync] {e}")
@@ -1371,14 +1389,152 @@ class NotificationSyncWorker(QThread):
             backoff_factor = 1 + min(4, idle_streak // 2)
             sleep_ms = int(self._check_interval * backoff_factor)
             self._sleep_with_shutdown_checks(max(300, min(5000, sleep_ms)))
+        self._detach_change_stream()
 
     def _sleep_with_shutdown_checks(self, total_ms: int) -> None:
         remaining_ms = max(0, int(total_ms))
         while remaining_ms > 0 and self.is_running and not self.isInterruptionRequested():
+            if self._pushed_notifications:
+                # إشعار وصل عبر change stream: معالجة فورية بدل انتظار باقي الـ backoff
+                return
             chunk_ms = min(200, remaining_ms)
             self.msleep(chunk_ms)
             remaining_ms -= chunk_ms
 
+    # ---------- change stream ----------
+
+    def _sync_change_stream_subscription(self) -> None:
+        """
+        الاشتراك في إدراجات notifications عبر RealtimeSyncManager لو الـ change stream شغال،
+        وإلغاؤه (والرجوع لاستعلام الـ cursor) لو توقف.
+        """
+        manager = None
+        try:
+            from core.realtime_sync import get_realtime_manager
+
+            manager = get_realtime_manager()
+        except Exception:
+            manager = None
+        streaming = False
+        if manager is not None:
+            try:
+                is_streaming = getattr(manager, "is_streaming", None)
+                streaming = bool(is_streaming()) if callable(is_streaming) else False
+            except Exception:
+                streaming = False
+        if not streaming:
+            manager = None
+        if manager is self._stream_manager:
+            return
+        self._detach_change_stream()
+        if manager is None:
+            return
+        try:
+            manager.add_insert_listener("notifications", self._on_stream_notification)
+            self._stream_manager = manager
+            self._stream_catch_up_pending = True
+            safe_print("INFO: [NotificationSync] Using change stream for notifications")
+        except Exception as e:
+            safe_print(f"WARNING: [NotificationSync] Change stream subscribe failed: {e}")
+
+    def _detach_change_stream(self) -> None:
+        manager = self._stream_manager
+        self._stream_manager = None
+        if manager is None:
+            return
+        try:
+            manager.remove_insert_listener("notifications", self._on_stream_notification)
+        except Exception:
+            pass
+
+    def _on_stream_notification(self, document: dict) -> None:
+        # تُستدعى من thread الـ change stream؛ المعالجة تتم في thread الـ worker
+        with self._pushed_lock:
+            self._pushed_notifications.append(document)
+            while len(self._pushed_notifications) > self._max_seen_ids:
+                self._pushed_notifications.popleft()
+
+    def _drain_pushed_notifications(self) -> list[dict]:
+        with self._pushed_lock:
+            documents = list(self._pushed_notifications)
+            self._pushed_notifications.clear()
+        return documents
+
+    # ---------- cursor polling ----------
+
+    def _cursor_floor(self) -> datetime:
+        """بداية نافذة الاستعلام: آخر created_at ناقص هامش فرق الساعات بين الأجهزة."""
+        now = datetime.now()
+        cursor = self._poll_cursor
+        if cursor is None:
+            cursor = self._session_started_at
+        floor = cursor - timedelta(seconds=self._poll_clock_skew_seconds)
+        return max(floor, now - timedelta(seconds=self._poll_lookback_seconds))
+
+    def _advance_cursor(self, notifications: list[dict]) -> None:
+        """
+        تقديم الـ cursor لأحدث created_at مستلم، مع الاحتفاظ بـ _id المستندات الواقعة
+        داخل هامش الساعات فقط لاستبعادها من الاستعلام التالي.
+        """
+        # ساعة جهاز متقدمة لا تجمّد الـ cursor: التقدم محدود بالوقت الحالي + الهامش
+        cursor_limit = datetime.now() + timedelta(seconds=self._poll_clock_skew_seconds)
+        for notif in notifications:
+            created_at = self._notification_created_at(notif)
+            if created_at is None:
+                continue
+            cursor_value = min(created_at, cursor_limit)
+            if self._poll_cursor is None or cursor_value > self._poll_cursor:
+                self._poll_cursor = cursor_value
+            raw_id = notif.get("_id")
+            if raw_id is not None:
+                self._cursor_window[str(raw_id)] = (raw_id, created_at)
+        floor = self._cursor_floor()
+        self._cursor_window = {
+            key: value for key, value in self._cursor_window.items() if value[1] > floor
+        }
+
+    @classmethod
+    def _notification_cursor_query(
+        cls, floor_iso: str, floor_dt: datetime, seen_window_ids: list
+    ) -> dict:
+        query = cls._notification_poll_query(floor_iso, floor_dt)
+        if seen_window_ids:
+            query["$and"].append({"_id": {"$nin": seen_window_ids}})
+        return query
+
+    def _poll_new_notifications(self, collection) -> list[dict] | None:
+        """
+        ⚡ استعلام cursor: created_at أكبر من آخر ما تمت رؤيته (على index created_at/_id)
+        بترتيب تصاعدي، فكل استعلام يرجع المستندات الجديدة فقط بدل إعادة مسح آخر ساعة.
+        """
+        floor_dt = self._cursor_floor()
+        floor_iso = floor_dt.isoformat()
+        window_ids = [raw_id for raw_id, _created_at in self._cursor_window.values()]
+        sort_spec = [("created_at", 1), ("_id", 1)]
+        try:
+            query = self._notification_cursor_query(floor_iso, floor_dt, window_ids)
+            return list(collection.find(query).sort(sort_spec).limit(self._poll_batch_size))
+        except Exception as e:
+            try:
+                # Fallback: ignore device filter if server rejects complex query.
+                return list(
+                    collection.find(
+                        {
+                            "$or": [
+                                {"created_at": {"$gt": floor_iso}},
+                                {"created_at": {"$gt": floor_dt}},
+                            ]
+                        }
+                    )
+                    .sort(sort_spec)
+                    .limit(self._poll_batch_size)
+                )
+            except Exception as fallback_error:
+                safe_print(
+                    f"ERROR: [NotificationSync] MongoDB query failed: {e} | {fallback_error}"
+                )
+                return None
+
     def _check_new_notifications(self):
         try:
             if self.repo is None or self.repo.mongo_db is None:
@@ -1386,32 +1542,26 @@ class NotificationSyncWorker(QThread):
 
             collection = self.repo.mongo_db.notifications
 
-            check_dt = datetime.now() - timedelta(seconds=self._poll_lookback_seconds)
-            check_iso = check_dt.isoformat()
-
-            try:
-                query = self._notification_poll_query(check_iso, check_dt)
-                notifications = list(collection.find(query).sort("created_at", -1).limit(30))
-            except Exception as e:
-                try:
-                    # Fallback: ignore device filter if server rejects complex query.
-                    notifications = list(
-                        collection.find(
-                            {
-                                "$or": [
-                                    {"created_at": {"$gt": check_iso}},
-                                    {"created_at": {"$gt": check_dt}},
-                                ]
-                            }
-                        )
-                        .sort("created_at", -1)
-                        .limit(30)
-                    )
-                except Exception as fallback_error:
-                    safe_print(
-                        f"ERROR: [NotificationSync] MongoDB query failed: {e} | {fallback_error}"
-                    )
+            has_more = False
+            if self._stream_manager is not None:
+                # change stream يدفع المستندات الجديدة: لا استعلام MongoDB أثناء الخمول،
+                # عدا استعلام تعويضي بعد الاشتراك لما وصل بين آخر استعلام وربط الـ listener
+                polled = []
+                if self._stream_catch_up_pending:
+                    polled = self._poll_new_notifications(collection)
+                    if polled is None:
+                        polled = []
+                    else:
+                        has_more = len(polled) >= self._poll_batch_size
+                        self._stream_catch_up_pending = has_more
+                notifications = polled + self._drain_pushed_notifications()
+            else:
+                polled = self._poll_new_notifications(collection)
+                if polled is None:
                     return False
+                notifications = polled + self._drain_pushed_notifications()
+                has_more = len(polled) >= self._poll_batch_size
+            self._advance_cursor(notifications)
 
             # Main query path with explicit device filter (split to keep Mongo query syntax valid).
             try:
@@ -1522,7 +1672,7 @@ class NotificationSyncWorker(QThread):
                     safe_print(f"WARNING: [NotificationSync] فشل تنظيف الإشعارات القديمة: {e}")
                 self._last_cleanup = time.time()
 
-            return bool(saw_new or settings_triggered)
+            return bool(saw_new or settings_triggered or has_more)
 
         except Exception as e:
             safe_print(f"ERROR: [NotificationSync] Check failed: {e}")
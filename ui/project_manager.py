@@ -476,7 +476,7 @@ class ProjectEditorDialog(QDialog):
         combo.blockSignals(True)
         combo.clear()
         for currency in ordered:
-            combo.addItem(f'{currency["name"]} ({currency["code"]})', currency["code"])
+            combo.addItem(f"{currency['name']} ({currency['code']})", currency["code"])
         target_index = combo.findData(code)
         if target_index < 0:
             target_index = 0
@@ -3408,7 +3408,6 @@ class ProjectManagerTab(QWidget):
             row = selected[0].row()
             project = self._project_from_row(row)
             if project:
-
                 dialog = ProjectProfitDialog(project, self.project_service, self)
                 dialog.exec()
 
@@ -3429,7 +3428,6 @@ class ProjectManagerTab(QWidget):
             return
 
         try:
-
             # استخدام نفس المرجع الثابت المعتمد في بقية المسارات لتجنب
             # السقوط إلى الاسم عند وجود id و _mongo_id معًا.
             project_id = self._project_ref(self.selected_project, self.selected_project.name)
@@ -3638,6 +3636,17 @@ class ProjectManagerTab(QWidget):
         if not client_text:
             return ""
 
+        resolver_getter = getattr(
+            getattr(self.client_service, "repo", None), "get_identity_resolver", None
+        )
+        if callable(resolver_getter):
+            try:
+                name = resolver_getter().client_name(client_text)
+                if isinstance(name, str) and name:
+                    return name
+            except Exception:
+                pass
+
         try:
             client = self.client_service.get_client_by_id(client_text)
             if client and getattr(client, "name", None):
@@ -4750,7 +4759,6 @@ class ProjectManagerTab(QWidget):
     def _load_project_tasks(self, project_id: str):
         """تحميل المهام المرتبطة بالمشروع (متزامن - للاستخدام بعد إضافة مهمة)"""
         try:
-
             task_service = TaskService()
             tasks = task_service.get_tasks_by_project(str(project_id))
             self._populate_tasks_table(tasks)
@@ -4770,7 +4778,6 @@ class ProjectManagerTab(QWidget):
             return
 
         try:
-
             # إنشاء مهمة جديدة مع ربطها بالمشروع
             project_id = getattr(self.selected_project, "id", None) or getattr(
                 self.selected_project, "_mongo_id", self.selected_project.name
@@ -1688,9 +1688,7 @@ class SettingsTab(QWidget):
                     QMessageBox.information(
                         self,
                         "✅ نجاح",
-                        "تم تحسين قاعدة البيانات بنجاح!\n\n"
-                        "• تم ضغط الملفات\n"
-                        "• تم تحديث الفهارس",
+                        "تم تحسين قاعدة البيانات بنجاح!\n\n• تم ضغط الملفات\n• تم تحديث الفهارس",
                     )
                 finally:
                     cursor.close()
@@ -1702,7 +1700,6 @@ class SettingsTab(QWidget):
         """تحميل سجل النسخ الاحتياطية"""
         self._ensure_section_ui("backup")
         try:
-
             # البحث عن ملفات النسخ الاحتياطية
             backup_files = glob.glob("skywave_backup_*.json")
             backup_files.extend(glob.glob("exports/skywave_backup_*.json"))
@@ -2678,14 +2675,14 @@ class SettingsTab(QWidget):
                 stats_text = f"""
 📊 إحصائيات قاعدة البيانات:
 
-• العملاء: {data['clients']} سجل
-• الخدمات: {data['services']} سجل
-• المشاريع: {data['projects']} سجل
-• الفواتير: {data['invoices']} سجل
-• المصروفات: {data['expenses']} سجل
-• الحسابات المحاسبية: {data['accounts']} سجل
-• العملات: {data['currencies']} سجل
-• قيود اليومية: {data['journal']} سجل
+• العملاء: {data["clients"]} سجل
+• الخدمات: {data["services"]} سجل
+• المشاريع: {data["projects"]} سجل
+• الفواتير: {data["invoices"]} سجل
+• المصروفات: {data["expenses"]} سجل
+• الحسابات المحاسبية: {data["accounts"]} سجل
+• العملات: {data["currencies"]} سجل
+• قيود اليومية: {data["journal"]} سجل
 
 📁 إجمالي السجلات: {total}
 
@@ -4017,7 +4014,8 @@ class SettingsTab(QWidget):
                 ],
                 "conflict_resolution": "local_wins",
                 "batch_size": 30,
-                "enable_compression": False,
+                "enable_compression": bool(previous_config.get("enable_compression", False)),
+                "compressors": previous_config.get("compressors", ["zstd", "snappy", "zlib"]),
                 "enable_encryption": False,
                 "sync_status": "ready",
                 "realtime_attempt_local_rs_bootstrap": bool(
@@ -4178,6 +4176,18 @@ class SettingsTab(QWidget):
             status_lines.append(
                 f"• إجمالي السجلات المزامنة: {metrics.get('total_records_synced', 0)}"
             )
+            scheduler_metrics = metrics.get("scheduler") or {}
+            if scheduler_metrics:
+                status_lines.append(
+                    f"• طابور المزامنة: {scheduler_metrics.get('queue_depth', 0)} "
+                    f"(متوسط الانتظار {scheduler_metrics.get('avg_latency_ms', 0.0)} ms)"
+                )
+            if "pull_bytes_human" in metrics:
+                compressors = ", ".join(metrics.get("wire_compressors") or []) or "بدون"
+                status_lines.append(
+                    f"• حجم البيانات: سحب {metrics['pull_bytes_human']} / "
+                    f"رفع {metrics.get('push_bytes_human', '0.0B')} (الضغط: {compressors})"
+                )
 
             # حالة الجداول
             tables_info = sync_status.get("tables", {})
@@ -5474,7 +5484,6 @@ class SettingsTab(QWidget):
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             )
             if reply == QMessageBox.StandardButton.Yes:
-
                 webbrowser.open(self.update_download_url)
         else:
             QMessageBox.critical(self, "خطأ", f"فشل تنزيل التحديث:\n{error_message}")
@@ -5527,7 +5536,6 @@ class NoteTemplateDialog(QDialog):
 
         # تطبيق شريط العنوان المخصص
         try:
-
             setup_custom_title_bar(self)
         except (ImportError, AttributeError):
             pass
@@ -5648,7 +5656,6 @@ class PaymentMethodDialog(QDialog):
         self.setMinimumHeight(420)
 
         try:
-
             setup_custom_title_bar(self)
         except (ImportError, AttributeError):
             pass